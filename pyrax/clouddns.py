@@ -17,9 +17,19 @@
 #    under the License.
 from __future__ import absolute_import, unicode_literals
 
+from collections import deque
+from concurrent import futures
+import datetime
+from functools import partial
 from functools import wraps
+import heapq
+import io
+import itertools
 import json
+import logging
+import os
 import re
+import threading
 import time
 
 import six
@@ -36,8 +46,350 @@ import pyrax.utils as utils
 DEFAULT_TIMEOUT = 5
 # How long (in seconds) to wait in between checks for async completion
 DEFAULT_DELAY = 0.5
+# The longest time (in seconds) to wait in between checks for async
+# completion; the wait doubles after each check, up to this limit.
+DEFAULT_MAX_DELAY = 10
 # How many times to retry a GET before raising an error
 DEFAULT_RETRY = 3
+# The largest number of records added, updated or deleted in one call when
+# reconciling a domain's records
+RECORD_BATCH_SIZE = 100
+# The types of record that are never deleted when reconciling a domain
+PROTECTED_RECORD_TYPES = ("NS", "SOA")
+# The types of record whose data is a host name
+HOSTNAME_RECORD_TYPES = ("CNAME", "MX", "NS", "PTR", "SRV")
+# The most batches of records submitted at once when importing a zone
+DEFAULT_IMPORT_PENDING = 10
+# How long (in seconds) a record cache is used before it is checked for
+# changes
+DEFAULT_RECORD_CACHE_AGE = 30
+# How far back (in seconds) before the last check a record cache or change
+# feed asks for changes, to allow for the server's clock differing from ours
+CHANGES_SYNC_MARGIN = 60
+# The most changed records that a record cache fetches individually; if there
+# are more, it lists all of the domain's records again instead
+RECORD_CACHE_MAX_CHANGES = 100
+
+
+def _response_body(resp, resp_body):
+    return resp_body
+
+
+def _offset_page_uris(next_uri, total):
+    """
+    Returns a list of the URIs of the pages of a listing of 'total' entries,
+    starting with the page at 'next_uri' and using the same limit. Returns
+    None if they cannot be worked out from 'next_uri' and 'total'.
+    """
+    limit = re.search(r"(?<=[?&])limit=(\d+)", next_uri)
+    offset = re.search(r"(?<=[?&])offset=(\d+)", next_uri)
+    try:
+        limit = int(limit.group(1))
+        offset = int(offset.group(1))
+        total = int(total)
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if limit < 1:
+        return None
+    uris = [re.sub(r"(?<=[?&])offset=\d+", "offset=%s" % page_offset,
+            next_uri) for page_offset in range(offset, total, limit)]
+    return uris or None
+
+
+def _full_record_name(domain_name, name):
+    """
+    Returns the fully-qualified, lower-case form of a record name, which may
+    be relative to the domain, or "@" for the domain itself.
+    """
+    dom_name = domain_name.rstrip(".").lower()
+    name = (name or "").strip().rstrip(".").lower()
+    if name in ("", "@"):
+        return dom_name
+    if name != dom_name and not name.endswith(".%s" % dom_name):
+        name = "%s.%s" % (name, dom_name)
+    return name
+
+
+def _record_key(domain_name, record_type, name, data):
+    """
+    Returns a tuple that is the same for records that differ only in the
+    form of their names or host names.
+    """
+    record_type = record_type.upper()
+    data = ("%s" % data).strip()
+    if record_type in HOSTNAME_RECORD_TYPES:
+        data = data.rstrip(".").lower()
+    elif record_type == "AAAA":
+        data = data.lower()
+    return (record_type, _full_record_name(domain_name, name), data)
+
+
+def _record_changes(record, rec, with_data=False):
+    """
+    Returns the dict needed to update the existing 'record' so that it
+    matches the record dict 'rec', or None if it already matches.
+    """
+    changes = {}
+    fields = ("data", "ttl", "priority", "comment") if with_data else (
+            "ttl", "priority", "comment")
+    for field in fields:
+        val = rec.get(field)
+        if val is not None and val != getattr(record, field, None):
+            changes[field] = val
+    if not changes:
+        return None
+    changes["id"] = record.id
+    changes["name"] = record.name
+    return changes
+
+
+def _change_event(domain, change):
+    """
+    Returns the change dict returned by DNSChangeFeed for one of the changes
+    returned by changes_since().
+    """
+    details = change.get("changeDetails") or []
+    return {"domain_id": domain.id,
+            "domain_name": change.get("domain") or domain.name,
+            "action": (change.get("action") or "").lower(),
+            "target_type": change.get("targetType"),
+            "target_id": change.get("targetId"),
+            "details": dict((detail.get("field"),
+                (detail.get("originalValue"), detail.get("newValue")))
+                for detail in details),
+            }
+
+
+def _ptr_creation_error(err):
+    """
+    Returns the exception for a Future from `add_ptr_records_async()` that
+    failed with 'err'. A lack of rights to the device or IP address shows up
+    as EndpointNotFound; see the comment in `add_ptr_records()` for why.
+    """
+    if isinstance(err, exc.EndpointNotFound):
+        return exc.InvalidPTRRecord("The domain/IP address information is "
+                "not valid for this device.")
+    return err
+
+
+def _bind_tokens(line):
+    """
+    Splits a line of a BIND zone file into its tokens, leaving out any
+    comment. Returns a 3-tuple of the tokens, whether the line started with
+    whitespace, and the change in the depth of parentheses. Quoted strings
+    are returned as single tokens, including their quotes.
+    """
+    tokens = []
+    depth = 0
+    token = ""
+    quoted = False
+    escaped = False
+    for char in line.rstrip("\r\n"):
+        if quoted:
+            token += char
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                quoted = False
+        elif char == '"':
+            token += char
+            quoted = True
+        elif char == ";":
+            break
+        elif char in "()" or char.isspace():
+            if token:
+                tokens.append(token)
+                token = ""
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+        else:
+            token += char
+    if token:
+        tokens.append(token)
+    return tokens, line[:1].isspace(), depth
+
+
+def _bind_ttl(val):
+    """
+    Returns the number of seconds in a BIND TTL, such as '3600' or '1h30m',
+    or None if 'val' is not a TTL.
+    """
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+    if val.isdigit():
+        return int(val)
+    mtch = re.match(r"^(\d+[smhdw])+$", val.lower())
+    if not mtch:
+        return None
+    return sum(int(num) * units[unit]
+            for num, unit in re.findall(r"(\d+)([smhdw])", val.lower()))
+
+
+def _bind_name(name, origin):
+    """
+    Returns the fully-qualified form of a name in a zone file, without the
+    trailing period.
+    """
+    if name == "@":
+        return origin
+    if name.endswith("."):
+        return name[:-1]
+    if not origin:
+        return name
+    return "%s.%s" % (name, origin)
+
+
+def _bind_text(tokens):
+    """
+    Returns the text of the (possibly quoted) strings in TXT record data.
+    """
+    parts = []
+    for token in tokens:
+        if token.startswith('"') and token.endswith('"') and len(token) > 1:
+            token = re.sub(r"\\(.)", r"\1", token[1:-1])
+        parts.append(token)
+    return "".join(parts)
+
+
+def iter_bind_records(lines, origin=None, ttl=None):
+    """
+    Parses a zone file in the BIND 9 format one line at a time, and yields
+    a record dict for each record in it, in the form used by
+    `add_records()`. 'lines' can be any iterable of lines, such as an open
+    file, so that a zone of any size can be read without holding all of it
+    in memory.
+
+    Names are made fully-qualified using the $ORIGIN directive, or 'origin'
+    if there is none. As in BIND, where the origin defaults to the name of
+    the zone, a zone with neither takes its origin from the owner of its SOA
+    record, which must then be fully-qualified. Records without a TTL get
+    the one from the $TTL directive or 'ttl'; if there is neither, they have
+    no 'ttl' key. The priority of MX and SRV records is split out of their
+    data, host names in the data are made fully-qualified, and the quotes
+    are removed from TXT data. SOA records are included, with their data
+    unchanged.
+
+    Raises InvalidZoneFile for lines that cannot be parsed.
+    """
+    origin = origin.rstrip(".") if origin else None
+    last_name = origin
+    tokens = []
+    depth = 0
+    blank_owner = False
+    for num, line in enumerate(lines, 1):
+        if isinstance(line, six.binary_type):
+            line = line.decode("utf-8")
+        line_tokens, starts_blank, change = _bind_tokens(line)
+        if not tokens and not depth:
+            blank_owner = starts_blank
+        tokens.extend(line_tokens)
+        depth += change
+        if depth or not tokens:
+            continue
+        entry, tokens = tokens, []
+        if entry[0].startswith("$"):
+            directive = entry[0].upper()
+            if directive == "$ORIGIN" and len(entry) > 1:
+                origin = _bind_name(entry[1], origin)
+            elif directive == "$TTL" and len(entry) > 1 and _bind_ttl(
+                    entry[1]) is not None:
+                ttl = _bind_ttl(entry[1])
+            else:
+                raise exc.InvalidZoneFile("Unsupported directive on line "
+                        "%s: %s" % (num, line.strip()))
+            continue
+        if not blank_owner:
+            last_name = _bind_name(entry.pop(0), origin)
+        rec_ttl = ttl
+        while entry and (_bind_ttl(entry[0]) is not None or
+                entry[0].upper() in ("IN", "CH", "HS")):
+            val = entry.pop(0)
+            if _bind_ttl(val) is not None:
+                rec_ttl = _bind_ttl(val)
+        if not entry:
+            raise exc.InvalidZoneFile("Could not parse the record on line "
+                    "%s: %s" % (num, line.strip()))
+        if not last_name:
+            raise exc.InvalidZoneFile("The name on line %s is relative, but "
+                    "the zone has no origin; add an $ORIGIN directive, or "
+                    "supply the name of the zone: %s" % (num, line.strip()))
+        rec_type = entry.pop(0).upper()
+        if rec_type == "SOA" and not origin:
+            origin = last_name
+        record = {"type": rec_type, "name": last_name}
+        if rec_ttl is not None:
+            record["ttl"] = rec_ttl
+        try:
+            if rec_type in ("MX", "SRV"):
+                record["priority"] = int(entry.pop(0))
+            if rec_type == "TXT":
+                data = _bind_text(entry)
+            elif rec_type in ("CNAME", "MX", "NS", "PTR"):
+                data = _bind_name(entry[0], origin)
+            elif rec_type == "SRV":
+                data = " ".join(entry[:2] + [_bind_name(entry[2], origin)])
+            else:
+                data = " ".join(entry)
+        except (IndexError, ValueError):
+            data = None
+        if not data:
+            raise exc.InvalidZoneFile("Could not parse the data of the "
+                    "record on line %s: %s" % (num, line.strip()))
+        record["data"] = data
+        yield record
+    if tokens:
+        raise exc.InvalidZoneFile("The zone file ended inside parentheses.")
+
+
+def bind_record_line(record):
+    """
+    Returns a line in the BIND 9 zone file format for a record, which can be
+    either a CloudDNSRecord or a record dict in the form used by
+    `add_records()`, with a fully-qualified name.
+    """
+    if not isinstance(record, dict):
+        record = dict((att, getattr(record, att, None))
+                for att in ("type", "name", "data", "ttl", "priority"))
+    rec_type = record["type"].upper()
+    data = record["data"]
+    if rec_type in ("CNAME", "MX", "NS", "PTR"):
+        data = "%s." % data.rstrip(".")
+    elif rec_type == "SRV":
+        parts = data.split()
+        parts[-1] = "%s." % parts[-1].rstrip(".")
+        data = " ".join(parts)
+    elif rec_type == "TXT":
+        data = '"%s"' % data.replace("\\", "\\\\").replace('"', '\\"')
+    if rec_type in ("MX", "SRV"):
+        data = "%s %s" % (record.get("priority") or 0, data)
+    ttl = record.get("ttl")
+    return "%s.\t%s\tIN\t%s\t%s\n" % (record["name"].rstrip("."),
+            "" if ttl is None else ttl, rec_type, data)
+
+
+def _zone_lines(source):
+    """
+    Returns an iterable of the lines of a zone file, which may be passed as
+    an open file, the path to a file, or the text of the zone.
+    """
+    if hasattr(source, "read"):
+        return source
+    if os.path.isfile(source):
+        return io.open(source, encoding="utf-8")
+    return source.splitlines()
+
+
+def _wait_for_all(futs):
+    """
+    Waits for all of the futures to finish, and then raises the first error,
+    if any of them failed.
+    """
+    futures.wait(futs)
+    for fut in futs:
+        fut.result()
 
 
 def assure_domain(fnc):
@@ -148,6 +500,26 @@ class CloudDNSDomain(BaseResource):
         return self.manager.export_domain(self)
 
 
+    def export_to_file(self, target):
+        """
+        Writes this domain's records to 'target', which may be an open file
+        or a path, in the BIND 9 format, a page of records at a time. Returns
+        the number of records written.
+        """
+        return self.manager.export_domain_to_file(self, target)
+
+
+    def import_records(self, source, batch_size=RECORD_BATCH_SIZE,
+            max_pending=DEFAULT_IMPORT_PENDING):
+        """
+        Adds the records in a BIND 9 zone file, passed as an open file, the
+        path to a file, or its text, to this domain in concurrent batches.
+        See CloudDNSManager.import_records() for details.
+        """
+        return self.manager.import_records(self, source, batch_size=batch_size,
+                max_pending=max_pending)
+
+
     def update(self, emailAddress=None, ttl=None, comment=None):
         """
         Provides a way to modify the following attributes of a domain
@@ -160,18 +532,22 @@ class CloudDNSDomain(BaseResource):
                 ttl=ttl, comment=comment)
 
 
-    def list_subdomains(self, limit=None, offset=None):
+    def list_subdomains(self, limit=None, offset=None, list_all=False):
         """
-        Returns a list of all subdomains for this domain.
+        Returns a list of all subdomains for this domain. If 'list_all' is
+        True, all of the pages of subdomains are returned.
         """
-        return self.manager.list_subdomains(self, limit=limit, offset=offset)
+        return self.manager.list_subdomains(self, limit=limit, offset=offset,
+                list_all=list_all)
 
 
-    def list_records(self, limit=None, offset=None):
+    def list_records(self, limit=None, offset=None, list_all=False):
         """
-        Returns a list of all records configured for this domain.
+        Returns a list of all records configured for this domain. If
+        'list_all' is True, all of the pages of records are returned.
         """
-        return self.manager.list_records(self, limit=limit, offset=offset)
+        return self.manager.list_records(self, limit=limit, offset=offset,
+                list_all=list_all)
 
 
     def search_records(self, record_type, name=None, data=None):
@@ -183,6 +559,23 @@ class CloudDNSDomain(BaseResource):
                 name=name, data=data)
 
 
+    def enable_record_cache(self, max_age=DEFAULT_RECORD_CACHE_AGE):
+        """
+        Starts keeping a local copy of this domain's records, which is then
+        used by `search_records()` and `find_record()` instead of querying
+        the API each time. The copy is checked for changes once it is more
+        than 'max_age' seconds old. Returns the DNSRecordCache.
+        """
+        return self.manager.enable_record_cache(self, max_age=max_age)
+
+
+    def disable_record_cache(self):
+        """
+        Stops keeping a local copy of this domain's records.
+        """
+        return self.manager.disable_record_cache(self)
+
+
     def find_record(self, record_type, name=None, data=None):
         """
         Returns a single record for this domain that matches the supplied
@@ -218,6 +611,15 @@ class CloudDNSDomain(BaseResource):
     add_record = add_records
 
 
+    def add_records_async(self, records):
+        """
+        Starts adding the records to this domain, and returns a Future whose
+        result will be the list of new records, without waiting for them to
+        be created.
+        """
+        return self.manager.add_records_async(self, records)
+
+
     def get_record(self, record):
         """
         Gets the full information for an existing record for this domain.
@@ -251,6 +653,15 @@ class CloudDNSDomain(BaseResource):
         return self.manager.update_records(self, records)
 
 
+    def update_records_async(self, records):
+        """
+        Starts modifying multiple existing records for this domain, and
+        returns a Future for the result, without waiting for the changes to
+        complete.
+        """
+        return self.manager.update_records_async(self, records)
+
+
     def delete_record(self, record):
         """
         Deletes an existing record for this domain.
@@ -258,6 +669,49 @@ class CloudDNSDomain(BaseResource):
         return self.manager.delete_record(self, record)
 
 
+    def delete_record_async(self, record):
+        """
+        Starts deleting an existing record for this domain, and returns a
+        Future for the result, without waiting for it to be deleted.
+        """
+        return self.manager.delete_record_async(self, record)
+
+
+    def delete_records(self, records):
+        """
+        Deletes several existing records for this domain with a single API
+        call.
+        """
+        return self.manager.delete_records(self, records)
+
+
+    def plan_records(self, desired, prune=True,
+            protected_types=PROTECTED_RECORD_TYPES):
+        """
+        Returns the changes needed to make this domain's records match the
+        'desired' records, without making them. See
+        CloudDNSManager.plan_records() for details.
+        """
+        return self.manager.plan_records(self, desired, prune=prune,
+                protected_types=protected_types)
+
+
+    def reconcile(self, desired, prune=True, dry_run=False,
+            batch_size=RECORD_BATCH_SIZE,
+            protected_types=PROTECTED_RECORD_TYPES):
+        """
+        Makes this domain's records match the 'desired' records, which are
+        dicts in the same form as for `add_records()`, using as few API calls
+        as possible. Records that are not desired are deleted unless 'prune'
+        is False. Returns the changes that were made; if 'dry_run' is True,
+        returns the changes that would be made, without making them. See
+        CloudDNSManager.reconcile_records() for details.
+        """
+        return self.manager.reconcile_records(self, desired, prune=prune,
+                dry_run=dry_run, batch_size=batch_size,
+                protected_types=protected_types)
+
+
 
 class CloudDNSPTRRecord(object):
     """
@@ -292,10 +746,17 @@ class CloudDNSManager(BaseManager):
         super(CloudDNSManager, self).__init__(api, resource_class=resource_class,
                 response_key=response_key, plural_response_key=plural_response_key,
                 uri_base=uri_base)
-        self._paging = {"domain": {}, "subdomain": {}, "record": {}}
-        self._reset_paging(service="all")
+        # Holds the paging state for each thread; see _paging.
+        self._local = threading.local()
         self._timeout = DEFAULT_TIMEOUT
         self._delay = DEFAULT_DELAY
+        self._job_poller = None
+        self._job_poller_lock = threading.Lock()
+        # The most pages of a listing that are fetched at the same time; None
+        # means utils.DEFAULT_MAX_WORKERS.
+        self.max_page_workers = None
+        # The DNSRecordCache objects for domains that have them, by domain ID
+        self._record_caches = {}
 
 
     def _create_body(self, name, emailAddress, ttl=3600, comment=None,
@@ -339,6 +800,24 @@ class CloudDNSManager(BaseManager):
         self._delay = delay
 
 
+    @property
+    def _paging(self):
+        """
+        The state used by the list_*_next_page() and list_*_previous_page()
+        methods to keep track of the current page of each kind of listing. It
+        is kept separately for each thread, so that threads sharing a manager
+        cannot change each other's place in a listing; the results iterators
+        keep track of their own place, and do not use it at all.
+        """
+        try:
+            return self._local.paging
+        except AttributeError:
+            self._local.paging = dict((svc, {"next_uri": None,
+                    "prev_uri": None, "total_entries": None})
+                    for svc in ("domain", "subdomain", "record"))
+            return self._local.paging
+
+
     def _reset_paging(self, service, body=None):
         """
         Resets the internal attributes when there is no current paging request.
@@ -355,17 +834,59 @@ class CloudDNSManager(BaseManager):
         if not body:
             return
         svc_dct["total_entries"] = body.get("totalEntries")
-        links = body.get("links")
+        svc_dct["next_uri"], svc_dct["prev_uri"] = self._page_links(body)
+
+
+    def _page_links(self, body):
+        """
+        Returns a 2-tuple of the URIs of the next and previous pages of
+        results, as found in the links of the response body. Either will be
+        None if there is no such page.
+        """
+        next_uri = prev_uri = None
         uri_base = self.uri_base
-        if links:
-            for link in links:
-                href = link["href"]
-                pos = href.index(uri_base)
-                page_uri = href[pos - 1:]
-                if link["rel"] == "next":
-                    svc_dct["next_uri"] = page_uri
-                elif link["rel"] == "previous":
-                    svc_dct["prev_uri"] = page_uri
+        for link in body.get("links") or []:
+            href = link["href"]
+            pos = href.index(uri_base)
+            page_uri = href[pos - 1:]
+            if link["rel"] == "next":
+                next_uri = page_uri
+            elif link["rel"] == "previous":
+                prev_uri = page_uri
+        return next_uri, prev_uri
+
+
+    def _get_remaining_pages(self, body):
+        """
+        Returns a list of the response bodies for all of the pages of results
+        that follow the page whose response body is 'body', in order.
+
+        Cloud DNS pages by offset, and the first response includes the total
+        number of entries, so the URIs of the remaining pages can be worked
+        out from the 'next' link, and those pages fetched at the same time.
+        If the URIs cannot be worked out, or more entries were added while
+        the pages were being fetched, the 'next' links are followed one page
+        at a time instead.
+        """
+        next_uri = self._page_links(body)[0]
+        if not next_uri:
+            return []
+        page_uris = _offset_page_uris(next_uri, body.get("totalEntries"))
+        if page_uris is None or len(page_uris) == 1:
+            bodies = [self._retry_get(next_uri)[1]]
+        else:
+            bodies = []
+            results = utils.run_concurrently(self._retry_get, page_uris,
+                    max_workers=self.max_page_workers)
+            for page_uri, result, err in results:
+                if err is not None:
+                    raise err
+                bodies.append(result[1])
+        next_uri = self._page_links(bodies[-1])[0]
+        while next_uri:
+            bodies.append(self._retry_get(next_uri)[1])
+            next_uri = self._page_links(bodies[-1])[0]
+        return bodies
 
 
     def _get_pagination_qs(self, limit, offset):
@@ -379,10 +900,14 @@ class CloudDNSManager(BaseManager):
         return qs
 
 
-    def list(self, limit=None, offset=None):
-        """Gets a list of all domains, or optionally a page of domains."""
+    def list(self, limit=None, offset=None, list_all=False):
+        """
+        Gets a list of all domains, or optionally a page of domains. If
+        'list_all' is True, all of the pages of domains are returned, with
+        the pages after the first being fetched at the same time.
+        """
         uri = "/%s%s" % (self.uri_base, self._get_pagination_qs(limit, offset))
-        return self._list(uri)
+        return self._list(uri, list_all=list_all)
 
 
     def _list(self, uri, obj_class=None, list_all=False):
@@ -390,21 +915,30 @@ class CloudDNSManager(BaseManager):
         Handles the communication with the API when getting
         a full listing of the resources managed by this class.
         """
+        ret, body = self._get_domain_page(uri, obj_class=obj_class,
+                list_all=list_all)
+        self._reset_paging("domain", body)
+        return ret
+
+
+    def _get_domain_page(self, uri, obj_class=None, list_all=False):
+        """
+        Returns a 2-tuple of the list of domains on the page at 'uri' (and on
+        all of the pages that follow it, if 'list_all' is True), and the
+        response body for the last of those pages. Unlike _list(), this does
+        not change the paging state.
+        """
         resp, resp_body = self._retry_get(uri)
         if obj_class is None:
             obj_class = self.resource_class
 
-        data = resp_body[self.plural_response_key]
-        ret = [obj_class(self, res, loaded=False)
-                for res in data if res]
-        self._reset_paging("domain", resp_body)
+        bodies = [resp_body]
         if list_all:
-            dom_paging = self._paging.get("domain", {})
-            while dom_paging.get("next_uri"):
-                next_uri = dom_paging.get("next_uri")
-                ret.extend(self._list(uri=next_uri, obj_class=obj_class,
-                        list_all=False))
-        return ret
+            bodies.extend(self._get_remaining_pages(resp_body))
+        ret = [obj_class(self, res, loaded=False)
+                for body in bodies
+                for res in body[self.plural_response_key] if res]
+        return ret, bodies[-1]
 
 
     def list_previous_page(self):
@@ -470,6 +1004,33 @@ class CloudDNSManager(BaseManager):
         the response. If no error class is specified, the response headers
         and body will be returned to the calling method, which will have
         to handle the result.
+
+        The status of the call is checked every 'delay' seconds at first,
+        doubling after each check up to DEFAULT_MAX_DELAY seconds, until it
+        completes or the timeout is reached.
+        """
+        resp, resp_body = self._start_async_call(uri, body=body, method=method,
+                error_class=error_class, *args, **kwargs)
+        status_uri = self._get_status_uri(resp_body)
+        start = time.time()
+        delay = self._delay
+        while resp_body["status"] == "RUNNING":
+            if self._timeout and (time.time() - start) > self._timeout:
+                raise exc.DNSCallTimedOut("The API call to '%s' did not "
+                        "complete after %s seconds." % (uri, self._timeout))
+            resp, resp_body = self._retry_get(status_uri)
+            if resp_body["status"] == "RUNNING":
+                time.sleep(delay)
+                delay = min(delay * 2, max(self._delay, DEFAULT_MAX_DELAY))
+        return self._finish_async_call(resp, resp_body, error_class,
+                has_response)
+
+
+    def _start_async_call(self, uri, body=None, method="GET",
+            error_class=None, *args, **kwargs):
+        """
+        Makes the request that starts an asynchronous job, and returns the
+        response and its body, which contains the job's status.
         """
         api_methods = {
                 "GET": self._retry_get,
@@ -480,30 +1041,29 @@ class CloudDNSManager(BaseManager):
         api_method = api_methods[method]
         try:
             if body is None:
-                resp, resp_body = api_method(uri, *args, **kwargs)
+                return api_method(uri, *args, **kwargs)
             else:
-                resp, resp_body = api_method(uri, body=body, *args, **kwargs)
+                return api_method(uri, body=body, *args, **kwargs)
         except Exception as e:
             if error_class:
                 raise error_class(e)
             else:
                 raise
 
+
+    def _get_status_uri(self, resp_body):
+        """
+        Returns the URI for checking the status of an asynchronous job.
+        """
         callbackURL = resp_body["callbackUrl"].split("/status/")[-1]
-        massagedURL = "/status/%s?showDetails=true" % callbackURL
-        start = time.time()
-        timed_out = False
-        while (resp_body["status"] == "RUNNING") and not timed_out:
-            resp_body = None
-            while resp_body is None and not timed_out:
-                resp, resp_body = self._retry_get(massagedURL)
-                if self._timeout:
-                    timed_out = ((time.time() - start) > self._timeout)
-                    time.sleep(self._delay)
-
-        if timed_out:
-            raise exc.DNSCallTimedOut("The API call to '%s' did not complete "
-                    "after %s seconds." % (uri, self._timeout))
+        return "/status/%s?showDetails=true" % callbackURL
+
+
+    def _finish_async_call(self, resp, resp_body, error_class, has_response):
+        """
+        Raises the appropriate error if a completed asynchronous job failed;
+        otherwise, returns the result of the job.
+        """
         if error_class and (resp_body["status"] == "ERROR"):
             # This call will handle raising the error.
             self._process_async_error(resp_body, error_class)
@@ -511,13 +1071,36 @@ class CloudDNSManager(BaseManager):
             ret = resp, resp_body["response"]
         else:
             ret = resp, resp_body
-        try:
-            resp_body = json.loads(resp_body)
-        except Exception:
-            pass
         return ret
 
 
+    def _get_job_poller(self):
+        """
+        Returns the DNSJobPoller shared by this manager's asynchronous calls,
+        creating it if necessary.
+        """
+        with self._job_poller_lock:
+            if self._job_poller is None:
+                self._job_poller = DNSJobPoller(self)
+            return self._job_poller
+
+
+    def _submit_async_call(self, uri, body=None, method="GET",
+            error_class=None, has_response=True, transform=None,
+            transform_error=None):
+        """
+        Starts an asynchronous call without waiting for it to complete.
+        Returns a Future whose result is what `_async_call()` would have
+        returned, or, if 'transform' is specified, the result of calling it
+        with that response and body. If 'transform_error' is specified, it is
+        called with any exception the call raises, and the Future's exception
+        is set to what it returns.
+        """
+        return self._get_job_poller().submit(uri, body=body, method=method,
+                error_class=error_class, has_response=has_response,
+                transform=transform, transform_error=transform_error)
+
+
     def _process_async_error(self, resp_body, error_class):
         """
         The DNS API does not return a consistent format for their error
@@ -673,6 +1256,151 @@ class CloudDNSManager(BaseManager):
         return resp_body
 
 
+    def export_domain_to_file(self, domain, target):
+        """
+        Writes the records of the domain to 'target', which may be an open
+        file or a path, in the BIND 9 format. Unlike `export_domain()`, which
+        returns the whole zone as a single string, the records are fetched
+        and written a page at a time, so that a zone of any size can be
+        exported. The SOA record is not included, since Cloud DNS does not
+        list it. Returns the number of records written.
+        """
+        if hasattr(target, "write"):
+            return self._write_zone(domain, target)
+        with io.open(target, "w", encoding="utf-8") as zone_file:
+            return self._write_zone(domain, zone_file)
+
+
+    def _write_zone(self, domain, zone_file):
+        zone_file.write("$ORIGIN %s.\n" % domain.name.rstrip("."))
+        count = 0
+        for record in RecordResultsIterator(self, domain):
+            zone_file.write(bind_record_line(record))
+            count += 1
+        return count
+
+
+    def import_records(self, domain, source, batch_size=RECORD_BATCH_SIZE,
+            max_pending=DEFAULT_IMPORT_PENDING):
+        """
+        Adds the records in a BIND 9 zone file to an existing domain. The zone
+        can be passed as an open file, the path to a file, or its text.
+
+        The zone file is read a line at a time, and its records are added in
+        batches of up to 'batch_size' records per call. Up to 'max_pending'
+        batches are submitted at once through the shared job poller, so that
+        a zone of any size can be imported quickly without holding all of it
+        in memory. The SOA record, and the NS records for the domain itself,
+        are skipped, since Cloud DNS manages those.
+
+        Returns a dict with these keys:
+
+            added: the number of records added
+            batches: the number of batches submitted
+            failed: a list of dicts for the batches that could not be added,
+                each with the 'records' of the batch and the 'error' raised
+
+        If a line of the zone file cannot be parsed, InvalidZoneFile is
+        raised once the batches that were already submitted have finished,
+        with this dict for those batches as its 'report' attribute.
+        """
+        lines = _zone_lines(source)
+        try:
+            records = iter_bind_records(lines, origin=domain.name)
+            return self._import_records(domain, records, batch_size,
+                    max_pending)
+        finally:
+            if lines is not source and hasattr(lines, "close"):
+                lines.close()
+
+
+    def _import_records(self, domain, records, batch_size, max_pending):
+        dom_name = domain.name.rstrip(".").lower()
+        report = {"added": 0, "batches": 0, "failed": []}
+        pending = deque()
+
+        def _finish(fut, batch):
+            try:
+                report["added"] += len(fut.result())
+            except Exception as e:
+                report["failed"].append({"records": batch, "error": e})
+
+        def _submit(batch):
+            if len(pending) >= max_pending:
+                _finish(*pending.popleft())
+            pending.append((self.add_records_async(domain, batch), batch))
+            report["batches"] += 1
+
+        batch = []
+        try:
+            for record in records:
+                if record["type"] == "SOA" or (record["type"] == "NS" and
+                        record["name"].lower() == dom_name):
+                    continue
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    _submit(batch)
+                    batch = []
+            if batch:
+                _submit(batch)
+        except exc.InvalidZoneFile as e:
+            # Let the caller see what was added before the bad line.
+            e.report = report
+            raise
+        finally:
+            while pending:
+                _finish(*pending.popleft())
+        return report
+
+
+    def import_zone(self, source, name=None, emailAddress=None, ttl=None,
+            comment=None, batch_size=RECORD_BATCH_SIZE,
+            max_pending=DEFAULT_IMPORT_PENDING):
+        """
+        Creates a new domain from a BIND 9 zone file of any size, passed as an
+        open file, the path to a file, or its text. Unlike `import_domain()`,
+        which sends the whole zone in a single request, the domain is created
+        first, and its records are then added as described for
+        `import_records()`.
+
+        The domain's name and email address are taken from the zone's SOA
+        record, unless 'name' and 'emailAddress' are specified. Returns the
+        same dict as `import_records()`, with the new CloudDNSDomain as
+        'domain'. Since the domain is created before the rest of the file is
+        read, an InvalidZoneFile raised after that point includes the domain
+        in its 'report', so that it can be fixed or deleted.
+        """
+        lines = _zone_lines(source)
+        try:
+            records = iter_bind_records(lines, origin=name)
+            first = next(records, None)
+            if first is not None and first["type"] == "SOA":
+                soa = first["data"].split()
+                name = name or first["name"]
+                if not emailAddress and len(soa) > 1:
+                    emailAddress = soa[1].rstrip(".").replace(".", "@", 1)
+            if not (name and emailAddress):
+                raise exc.InvalidZoneFile("The zone file has no SOA record, "
+                        "so you must supply the 'name' and 'emailAddress' of "
+                        "the domain.")
+            domain = self.create(name=name.rstrip("."),
+                    emailAddress=emailAddress, ttl=ttl or 3600,
+                    comment=comment)
+            if first is not None:
+                records = itertools.chain([first], records)
+            try:
+                report = self._import_records(domain, records, batch_size,
+                        max_pending)
+            except exc.InvalidZoneFile as e:
+                e.report["domain"] = domain
+                raise
+        finally:
+            if lines is not source and hasattr(lines, "close"):
+                lines.close()
+        report["domain"] = domain
+        return report
+
+
     def update_domain(self, domain, emailAddress=None, ttl=None, comment=None):
         """
         Provides a way to modify the following attributes of a domain
@@ -698,9 +1426,11 @@ class CloudDNSManager(BaseManager):
         return resp_body
 
 
-    def list_subdomains(self, domain, limit=None, offset=None):
+    def list_subdomains(self, domain, limit=None, offset=None,
+            list_all=False):
         """
-        Returns a list of all subdomains of the specified domain.
+        Returns a list of all subdomains of the specified domain. If
+        'list_all' is True, all of the pages of subdomains are returned.
         """
         # The commented-out uri is the official API, but it is
         # horribly slow.
@@ -709,16 +1439,36 @@ class CloudDNSManager(BaseManager):
         page_qs = self._get_pagination_qs(limit, offset)
         if page_qs:
             uri = "%s&%s" % (uri, page_qs[1:])
-        return self._list_subdomains(uri, domain.id)
+        return self._list_subdomains(uri, domain.id, list_all=list_all)
 
 
-    def _list_subdomains(self, uri, domain_id):
-        resp, body = self._retry_get(uri)
+    def _list_subdomains(self, uri, domain_id=None, list_all=False):
+        if domain_id is None:
+            # Paging through the subdomains of the last domain listed
+            domain_id = self._paging["subdomain"].get("domain_id")
+        ret, body = self._get_subdomain_page(uri, domain_id,
+                list_all=list_all)
         self._reset_paging("subdomain", body)
-        subdomains = body.get("domains", [])
-        return [CloudDNSDomain(self, subdomain, loaded=False)
-                for subdomain in subdomains
+        self._paging["subdomain"]["domain_id"] = domain_id
+        return ret
+
+
+    def _get_subdomain_page(self, uri, domain_id, list_all=False):
+        """
+        Returns a 2-tuple of the list of subdomains on the page at 'uri' (and
+        on all of the pages that follow it, if 'list_all' is True), and the
+        response body for the last of those pages. This does not change the
+        paging state.
+        """
+        resp, body = self._retry_get(uri)
+        bodies = [body]
+        if list_all:
+            bodies.extend(self._get_remaining_pages(body))
+        ret = [CloudDNSDomain(self, subdomain, loaded=False)
+                for body in bodies
+                for subdomain in body.get("domains", [])
                 if subdomain["id"] != domain_id]
+        return ret, bodies[-1]
 
 
     def list_subdomains_previous_page(self):
@@ -747,27 +1497,44 @@ class CloudDNSManager(BaseManager):
         return self._list_subdomains(uri)
 
 
-    def list_records(self, domain, limit=None, offset=None):
+    def list_records(self, domain, limit=None, offset=None, list_all=False):
         """
-        Returns a list of all records configured for the specified domain.
+        Returns a list of all records configured for the specified domain. If
+        'list_all' is True, all of the pages of records are returned.
         """
         uri = "/domains/%s/records%s" % (utils.get_id(domain),
                 self._get_pagination_qs(limit, offset))
-        return self._list_records(uri)
+        return self._list_records(uri, list_all=list_all)
 
 
-    def _list_records(self, uri):
-        resp, body = self._retry_get(uri)
+    def _list_records(self, uri, list_all=False):
+        ret, body = self._get_record_page(uri, list_all=list_all)
         self._reset_paging("record", body)
+        return ret
+
+
+    def _get_record_page(self, uri, list_all=False):
+        """
+        Returns a 2-tuple of the list of records on the page at 'uri' (and on
+        all of the pages that follow it, if 'list_all' is True), and the
+        response body for the last of those pages. This does not change the
+        paging state.
+        """
+        resp, body = self._retry_get(uri)
+        bodies = [body]
+        if list_all:
+            bodies.extend(self._get_remaining_pages(body))
         # The domain ID will be in the URL
         pat = "domains/([^/]+)/records"
         mtch = re.search(pat, uri)
         dom_id = mtch.groups()[0]
-        records = body.get("records", [])
+        records = [record for body in bodies
+                for record in body.get("records", [])]
         for record in records:
             record["domain_id"] = dom_id
-        return [CloudDNSRecord(self, record, loaded=False)
+        ret = [CloudDNSRecord(self, record, loaded=False)
                 for record in records if record]
+        return ret, bodies[-1]
 
 
     def list_records_previous_page(self):
@@ -798,8 +1565,12 @@ class CloudDNSManager(BaseManager):
     def search_records(self, domain, record_type, name=None, data=None):
         """
         Returns a list of all records configured for the specified domain that
-        match the supplied search criteria.
+        match the supplied search criteria. If the domain has a record cache,
+        the search is made against that instead of the API.
         """
+        cache = self.get_record_cache(domain)
+        if cache is not None:
+            return cache.search(record_type, name=name, data=data)
         search_params = []
         if name:
             search_params.append("name=%s" % name)
@@ -810,18 +1581,7 @@ class CloudDNSManager(BaseManager):
         uri = "/domains/%s/records?type=%s" % (dom_id, record_type)
         if query_string:
             uri = "%s&%s" % (uri, query_string)
-        resp, body = self._retry_get(uri)
-        records = body.get("records", [])
-        self._reset_paging("record", body)
-        rec_paging = self._paging.get("record", {})
-        while rec_paging.get("next_uri"):
-            resp, body = self._retry_get(rec_paging.get("next_uri"))
-            self._reset_paging("record", body)
-            records.extend(body.get("records", []))
-        for record in records:
-            record["domain_id"] = dom_id
-        return [CloudDNSRecord(self, record, loaded=False)
-                for record in records if record]
+        return self._get_record_page(uri, list_all=True)[0]
 
 
     def add_records(self, domain, records):
@@ -843,6 +1603,37 @@ class CloudDNSManager(BaseManager):
         body = {"records": records}
         resp, resp_body = self._async_call(uri, method="POST", body=body,
                 error_class=exc.DomainRecordAdditionFailed, has_response=False)
+        ret = self._added_records(dom_id, resp, resp_body)
+        self._update_record_cache(domain, added=ret)
+        return ret
+
+
+    def add_records_async(self, domain, records):
+        """
+        Starts adding the records to this domain, without waiting for the
+        records to be created. Returns a Future whose result will be the list
+        of new CloudDNSRecord objects. See `add_records()` for the format of
+        the records.
+        """
+        if isinstance(records, dict):
+            # Single record passed
+            records = [records]
+        dom_id = utils.get_id(domain)
+        uri = "/domains/%s/records" % dom_id
+        body = {"records": records}
+        fut = self._submit_async_call(uri, method="POST", body=body,
+                error_class=exc.DomainRecordAdditionFailed, has_response=False,
+                transform=partial(self._added_records, dom_id))
+        fut.add_done_callback(partial(self._update_record_cache_when_done,
+                domain))
+        return fut
+
+
+    def _added_records(self, dom_id, resp, resp_body):
+        """
+        Returns CloudDNSRecord objects for the records in the response to an
+        add_records call.
+        """
         records = resp_body.get("response", {}).get("records", [])
         for record in records:
             record["domain_id"] = dom_id
@@ -889,9 +1680,28 @@ class CloudDNSManager(BaseManager):
         resp, resp_body = self._async_call(uri, method="PUT",
                 body={"records": records},
                 error_class=exc.DomainRecordUpdateFailed, has_response=False)
+        self._update_record_cache(domain, updated=records)
         return resp_body
 
 
+    def update_records_async(self, domain, records):
+        """
+        Starts modifying existing records for a domain, without waiting for
+        the changes to complete. Returns a Future whose result will be the
+        same as that of `update_records()`.
+        """
+        if not isinstance(records, list):
+            raise TypeError("Expected records of type list")
+        uri = "/domains/%s/records" % utils.get_id(domain)
+        fut = self._submit_async_call(uri, method="PUT",
+                body={"records": records},
+                error_class=exc.DomainRecordUpdateFailed, has_response=False,
+                transform=_response_body)
+        fut.add_done_callback(partial(self._update_record_cache_when_done,
+                domain, updated=records))
+        return fut
+
+
     def delete_record(self, domain, record):
         """
         Deletes an existing record for a domain.
@@ -900,9 +1710,236 @@ class CloudDNSManager(BaseManager):
                 utils.get_id(record))
         resp, resp_body = self._async_call(uri, method="DELETE",
                 error_class=exc.DomainRecordDeletionFailed, has_response=False)
+        self._update_record_cache(domain, deleted=[record])
+        return resp_body
+
+
+    def delete_record_async(self, domain, record):
+        """
+        Starts deleting an existing record for a domain, without waiting for
+        it to complete. Returns a Future whose result will be the same as that
+        of `delete_record()`.
+        """
+        uri = "/domains/%s/records/%s" % (utils.get_id(domain),
+                utils.get_id(record))
+        fut = self._submit_async_call(uri, method="DELETE",
+                error_class=exc.DomainRecordDeletionFailed, has_response=False,
+                transform=_response_body)
+        fut.add_done_callback(partial(self._update_record_cache_when_done,
+                domain, deleted=[record]))
+        return fut
+
+
+    def delete_records(self, domain, records):
+        """
+        Deletes several existing records for a domain with a single API call.
+        """
+        uri = self._delete_records_uri(domain, records)
+        resp, resp_body = self._async_call(uri, method="DELETE",
+                error_class=exc.DomainRecordDeletionFailed, has_response=False)
+        self._update_record_cache(domain, deleted=utils.coerce_to_list(records))
         return resp_body
 
 
+    def delete_records_async(self, domain, records):
+        """
+        Starts deleting several existing records for a domain with a single
+        API call, without waiting for it to complete. Returns a Future whose
+        result will be the same as that of `delete_records()`.
+        """
+        uri = self._delete_records_uri(domain, records)
+        fut = self._submit_async_call(uri, method="DELETE",
+                error_class=exc.DomainRecordDeletionFailed, has_response=False,
+                transform=_response_body)
+        fut.add_done_callback(partial(self._update_record_cache_when_done,
+                domain, deleted=utils.coerce_to_list(records)))
+        return fut
+
+
+    def enable_record_cache(self, domain, max_age=DEFAULT_RECORD_CACHE_AGE):
+        """
+        Starts keeping a local copy of the domain's records, which is then
+        used by `search_records()` and `find_record()` instead of querying
+        the API each time. Returns the DNSRecordCache; if the domain already
+        has one, its 'max_age' is changed and it is returned.
+        """
+        cache = self._record_caches.setdefault(utils.get_id(domain),
+                DNSRecordCache(self, domain, max_age=max_age))
+        cache.max_age = max_age
+        return cache
+
+
+    def disable_record_cache(self, domain):
+        """
+        Stops keeping a local copy of the domain's records, if one was kept.
+        """
+        self._record_caches.pop(utils.get_id(domain), None)
+
+
+    def get_record_cache(self, domain):
+        """
+        Returns the DNSRecordCache for the domain, or None if it does not
+        have one.
+        """
+        return self._record_caches.get(utils.get_id(domain))
+
+
+    def _update_record_cache(self, domain, added=None, updated=None,
+            deleted=None):
+        """
+        Updates the domain's record cache, if it has one, with changes made
+        through this manager.
+        """
+        cache = self.get_record_cache(domain)
+        if cache is not None:
+            cache.apply(added=added, updated=updated, deleted=deleted)
+
+
+    def _update_record_cache_when_done(self, domain, fut, updated=None,
+            deleted=None):
+        """
+        Called when the Future for an asynchronous change to the domain's
+        records is done, to update its record cache if the change succeeded.
+        If neither 'updated' nor 'deleted' are passed, the change added the
+        records that are the Future's result.
+        """
+        if fut.cancelled() or fut.exception() is not None:
+            return
+        if updated is None and deleted is None:
+            self._update_record_cache(domain, added=fut.result())
+        else:
+            self._update_record_cache(domain, updated=updated, deleted=deleted)
+
+
+    def _delete_records_uri(self, domain, records):
+        if not isinstance(records, (list, tuple)):
+            records = [records]
+        ids = "&".join(["id=%s" % utils.get_id(record) for record in records])
+        return "/domains/%s/records?%s" % (utils.get_id(domain), ids)
+
+
+    def plan_records(self, domain, desired, prune=True,
+            protected_types=PROTECTED_RECORD_TYPES):
+        """
+        Compares the records that the domain currently has with the 'desired'
+        records, and works out the smallest set of changes that would make
+        them match. Nothing is changed.
+
+        'desired' is a list of record dicts, in the same form as for
+        `add_records()`. Names may be given relative to the domain, and "@"
+        stands for the domain itself; names and host names in the data are
+        compared without regard to case or a trailing period. The 'ttl',
+        'priority' and 'comment' of a record are only compared when they are
+        included in its dict.
+
+        Returns a dict with these keys:
+
+            add: the record dicts to be added
+            update: the dicts to pass to `update_records()`, for existing
+                records whose attributes differ. If a record name and type
+                has both records to add and records to delete, the existing
+                records are updated with the new data instead.
+            delete: the CloudDNSRecord objects to be deleted. These are only
+                included if 'prune' is True, and never include records whose
+                type is in 'protected_types'.
+            unchanged: the CloudDNSRecord objects that already match
+        """
+        dom_name = domain.name
+        current = self._list_all_records(domain)
+        existing = {}
+        for record in current:
+            key = _record_key(dom_name, record.type, record.name, record.data)
+            existing.setdefault(key, []).append(record)
+        plan = {"add": [], "update": [], "delete": [], "unchanged": []}
+        seen = set()
+        unmatched = []
+        for rec in desired:
+            rec = dict(rec)
+            rec["type"] = rec["type"].upper()
+            rec["name"] = _full_record_name(dom_name, rec.get("name"))
+            key = _record_key(dom_name, rec["type"], rec["name"], rec["data"])
+            if key in seen:
+                continue
+            seen.add(key)
+            if existing.get(key):
+                record = existing[key].pop(0)
+                changes = _record_changes(record, rec)
+                if changes:
+                    plan["update"].append(changes)
+                else:
+                    plan["unchanged"].append(record)
+            else:
+                unmatched.append(rec)
+        # Existing records that no longer match anything can be updated with
+        # the data for a new record of the same name and type, which takes
+        # one change instead of a deletion and an addition.
+        leftover = {}
+        for record in current:
+            key = _record_key(dom_name, record.type, record.name, record.data)
+            if record in existing[key] and record.type not in protected_types:
+                leftover.setdefault(key[:2], []).append(record)
+        for rec in unmatched:
+            candidates = leftover.get((rec["type"], rec["name"]))
+            if candidates:
+                record = candidates.pop(0)
+                plan["update"].append(_record_changes(record, rec,
+                        with_data=True))
+            else:
+                plan["add"].append(rec)
+        if prune:
+            for records in leftover.values():
+                plan["delete"].extend(records)
+        return plan
+
+
+    def reconcile_records(self, domain, desired, prune=True, dry_run=False,
+            batch_size=RECORD_BATCH_SIZE,
+            protected_types=PROTECTED_RECORD_TYPES):
+        """
+        Makes the domain's records match the 'desired' records, using the
+        changes worked out by `plan_records()`; see that method for the
+        meaning of 'desired', 'prune' and 'protected_types'.
+
+        The changes are made in as few API calls as possible: records are
+        deleted, then added and updated, in batches of up to 'batch_size'
+        records per call, and the batches of each kind are submitted together
+        rather than one after another. If 'dry_run' is True, nothing is
+        changed.
+
+        Returns the plan; once it has been applied, its 'add' entry contains
+        the new CloudDNSRecord objects rather than the dicts they were
+        created from. If any batch fails, the first error is raised after all
+        of the batches have finished.
+        """
+        plan = self.plan_records(domain, desired, prune=prune,
+                protected_types=protected_types)
+        if dry_run:
+            return plan
+
+        def _batches(items):
+            return [items[pos:pos + batch_size]
+                    for pos in range(0, len(items), batch_size)]
+
+        # Delete first, so that new records cannot conflict with old ones.
+        _wait_for_all([self.delete_records_async(domain, batch)
+                for batch in _batches(plan["delete"])])
+        adds = [self.add_records_async(domain, batch)
+                for batch in _batches(plan["add"])]
+        updates = [self.update_records_async(domain, batch)
+                for batch in _batches(plan["update"])]
+        _wait_for_all(adds + updates)
+        plan["add"] = [record for fut in adds for record in fut.result()]
+        return plan
+
+
+    def _list_all_records(self, domain):
+        """
+        Returns a list of all of the records for the domain.
+        """
+        uri = "/domains/%s/records" % utils.get_id(domain)
+        return self._get_record_page(uri, list_all=True)[0]
+
+
     def _get_ptr_details(self, device, device_type):
         """
         Takes a device and device type and returns the corresponding HREF link
@@ -966,17 +2003,7 @@ class CloudDNSManager(BaseManager):
         """
         Adds one or more PTR records to the specified device.
         """
-        device_type = self._resolve_device_type(device)
-        href, svc_name = self._get_ptr_details(device, device_type)
-        if not isinstance(records, (list, tuple)):
-            records = [records]
-        body = {"recordsList": {
-                    "records": records},
-                "link": {
-                    "content": "",
-                    "href": href,
-                    "rel": svc_name,
-                }}
+        body = self._ptr_records_body(device, records)
         uri = "/rdns"
         # This is a necessary hack, so here's why: if you attempt to add
         # PTR records to device, and you don't have rights to either the device
@@ -1045,15 +2072,784 @@ class CloudDNSManager(BaseManager):
         Deletes the PTR records for the specified device. If 'ip_address' is
         supplied, only the PTR records with that IP address will be deleted.
         """
+        uri = self._ptr_records_uri(device, ip_address)
+        resp, resp_body = self._async_call(uri, method="DELETE",
+                has_response=False,
+                error_class=exc.PTRRecordDeletionFailed)
+        return resp_body.get("status") == "COMPLETED"
+
+
+    def _ptr_records_body(self, device, records):
+        """
+        Returns the request body for adding the PTR records to the device.
+        """
+        device_type = self._resolve_device_type(device)
+        href, svc_name = self._get_ptr_details(device, device_type)
+        if not isinstance(records, (list, tuple)):
+            records = [records]
+        return {"recordsList": {
+                    "records": records},
+                "link": {
+                    "content": "",
+                    "href": href,
+                    "rel": svc_name,
+                }}
+
+
+    def _ptr_records_uri(self, device, ip_address=None):
+        """
+        Returns the URI for deleting the device's PTR records, or just those
+        for 'ip_address' if it is supplied.
+        """
         device_type = self._resolve_device_type(device)
         href, svc_name = self._get_ptr_details(device, device_type)
         uri = "/rdns/%s?href=%s" % (svc_name, href)
         if ip_address:
             uri = "%s&ip=%s" % (uri, ip_address)
-        resp, resp_body = self._async_call(uri, method="DELETE",
-                has_response=False,
-                error_class=exc.PTRRecordDeletionFailed)
-        return resp_body.get("status") == "COMPLETED"
+        return uri
+
+
+    def add_ptr_records_async(self, device, records):
+        """
+        Starts adding one or more PTR records to the specified device, without
+        waiting for them to be created. Returns a Future whose result will be
+        the list of new records.
+        """
+        body = self._ptr_records_body(device, records)
+        return self._submit_async_call("/rdns", method="POST", body=body,
+                error_class=exc.PTRRecordCreationFailed,
+                transform=lambda resp, resp_body: resp_body.get("records"),
+                transform_error=_ptr_creation_error)
+
+
+    def delete_ptr_records_async(self, device, ip_address=None):
+        """
+        Starts deleting the PTR records for the specified device, or just
+        those for 'ip_address' if it is supplied, without waiting for them to
+        be deleted. Returns a Future whose result will be True once they are.
+        """
+        uri = self._ptr_records_uri(device, ip_address)
+        return self._submit_async_call(uri, method="DELETE",
+                error_class=exc.PTRRecordDeletionFailed, has_response=False,
+                transform=lambda resp, resp_body:
+                    resp_body.get("status") == "COMPLETED")
+
+
+    def add_ptr_records_bulk(self, entries, ttl=None, comment=None):
+        """
+        Adds PTR records to many devices at once. 'entries' is an iterable of
+        (device, ip_address, hostname) tuples. The records for each device are
+        added with a single call, and the calls for all of the devices are
+        made concurrently. If 'ttl' or 'comment' are supplied, they are used
+        for every record.
+
+        Returns a dict keyed by device ID. Each value is a dict with the
+        'device', the list of 'records' that were added to it, and the
+        'error' raised if they could not be added, which is otherwise None. A
+        failure for one device does not affect any of the others.
+        """
+        devices = {}
+        for device, ip_address, hostname in entries:
+            rec = {"name": hostname, "type": "PTR", "data": ip_address}
+            if ttl is not None:
+                # Minimum TTL is 300 seconds
+                rec["ttl"] = max(300, ttl)
+            if comment is not None:
+                # Maximum comment length is 160 chars
+                rec["comment"] = comment[:160]
+            devices.setdefault(utils.get_id(device), (device, []))[1].append(
+                    rec)
+        report = {}
+        futs = {}
+        for dev_id, (device, records) in devices.items():
+            report[dev_id] = {"device": device, "records": [], "error": None}
+            try:
+                futs[dev_id] = self.add_ptr_records_async(device, records)
+            except Exception as e:
+                report[dev_id]["error"] = e
+        futures.wait(list(futs.values()))
+        for dev_id, fut in futs.items():
+            if fut.exception() is not None:
+                report[dev_id]["error"] = fut.exception()
+            else:
+                report[dev_id]["records"] = fut.result() or []
+        return report
+
+
+    def delete_ptr_records_bulk(self, entries):
+        """
+        Deletes PTR records from many devices at once. 'entries' is an
+        iterable of (device, ip_address) tuples; if the IP address is None,
+        all of the device's PTR records are deleted. The calls for all of the
+        devices are made concurrently.
+
+        Returns a dict keyed by device ID. Each value is a dict with the
+        'device', the list of IP addresses whose records were 'deleted'
+        (which contains None if all of the device's records were), and the
+        first 'error' raised for that device, which is otherwise None.
+        """
+        devices = {}
+        for device, ip_address in entries:
+            ips = devices.setdefault(utils.get_id(device), (device, []))[1]
+            if ip_address not in ips:
+                ips.append(ip_address)
+        report = {}
+        futs = []
+        for dev_id, (device, ips) in devices.items():
+            report[dev_id] = {"device": device, "deleted": [], "error": None}
+            if None in ips:
+                # Deleting all of them makes the others redundant.
+                ips = [None]
+            for ip_address in ips:
+                try:
+                    fut = self.delete_ptr_records_async(device, ip_address)
+                except Exception as e:
+                    report[dev_id]["error"] = report[dev_id]["error"] or e
+                    continue
+                futs.append((dev_id, ip_address, fut))
+        futures.wait([fut for dev_id, ip_address, fut in futs])
+        for dev_id, ip_address, fut in futs:
+            if fut.exception() is not None:
+                report[dev_id]["error"] = (report[dev_id]["error"] or
+                        fut.exception())
+            else:
+                report[dev_id]["deleted"].append(ip_address)
+        return report
+
+
+
+class DNSRecordCache(object):
+    """
+    Keeps a local copy of the records for a domain, indexed by type and name
+    and by type and data, so that `search_records()` and `find_record()` can
+    be answered without an API call. Create one with the manager's (or the
+    domain's, or the client's) `enable_record_cache()` method.
+
+    The records are listed in full when first needed. After that, once the
+    copy is more than 'max_age' seconds old, the domain's `changes_since()`
+    is checked before the next search, and only the records that changed are
+    fetched again; if too many records changed, the records are listed in
+    full again instead. Records added, updated or deleted through the same
+    manager are updated in the copy as soon as the change succeeds.
+    """
+    def __init__(self, manager, domain, max_age=DEFAULT_RECORD_CACHE_AGE):
+        self.manager = manager
+        self.domain = domain
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._records = {}
+        self._by_name = {}
+        self._by_data = {}
+        # The UTC time at which the last check for changes started
+        self._synced_at = None
+        # The time.time() of the last check for changes
+        self._checked_at = None
+        self.loads = 0
+        self.refreshes = 0
+
+
+    def search(self, record_type, name=None, data=None):
+        """
+        Returns a list of the records of the specified type that match the
+        name and data, if those are specified, checking for changes first if
+        the copy is more than 'max_age' seconds old. Names may be relative to
+        the domain, and names and host names are compared without regard to
+        case or a trailing period.
+        """
+        with self._lock:
+            if self._synced_at is None:
+                self.load()
+            elif time.time() - self._checked_at >= self.max_age:
+                self.refresh()
+            key = self._key(record_type, name or "", data or "")
+            if name:
+                ids = self._by_name.get(key[:2], [])
+            elif data:
+                ids = self._by_data.get((key[0], key[2]), [])
+            else:
+                ids = [rec_id for rec_id, rec in self._records.items()
+                        if rec.type.upper() == key[0]]
+            matches = []
+            for rec_id in ids:
+                rec = self._records[rec_id]
+                rec_key = self._record_key(rec)
+                if name and rec_key[1] != key[1]:
+                    continue
+                if data and rec_key[2] != key[2]:
+                    continue
+                matches.append(rec)
+            return matches
+
+
+    def load(self):
+        """
+        Replaces the local copy with a full listing of the domain's records.
+        """
+        with self._lock:
+            started = datetime.datetime.utcnow()
+            records = self.manager._list_all_records(self.domain)
+            self._records = {}
+            self._by_name = {}
+            self._by_data = {}
+            for record in records:
+                self._add(record)
+            self._synced_at = started
+            self._checked_at = time.time()
+            self.loads += 1
+
+
+    def refresh(self):
+        """
+        Checks the domain for changes since the last check, and updates the
+        local copy with them.
+        """
+        with self._lock:
+            if self._synced_at is None:
+                return self.load()
+            started = datetime.datetime.utcnow()
+            since = self._synced_at - datetime.timedelta(
+                    seconds=CHANGES_SYNC_MARGIN)
+            changes = self.manager.changes_since(self.domain, since)
+            changed = []
+            deleted = []
+            for change in changes:
+                if (change.get("targetType") or "").lower() == "domain":
+                    # Changes to the domain itself, such as its serial number
+                    continue
+                rec_id = change.get("targetId")
+                if rec_id is None:
+                    return self.load()
+                if (change.get("action") or "").lower() == "delete":
+                    deleted.append(rec_id)
+                elif rec_id not in changed:
+                    changed.append(rec_id)
+            if len(changed) > RECORD_CACHE_MAX_CHANGES:
+                return self.load()
+            results = utils.run_concurrently(partial(self.manager.get_record,
+                    self.domain), [rec_id for rec_id in changed
+                    if rec_id not in deleted])
+            for rec_id, record, err in results:
+                if isinstance(err, exc.NotFound):
+                    deleted.append(rec_id)
+                elif err is not None:
+                    return self.load()
+                else:
+                    self._remove(rec_id)
+                    self._add(record)
+            for rec_id in deleted:
+                self._remove(rec_id)
+            self._synced_at = started
+            self._checked_at = time.time()
+            self.refreshes += 1
+
+
+    def apply(self, added=None, updated=None, deleted=None):
+        """
+        Updates the local copy with changes made through the manager: the
+        CloudDNSRecord objects that were 'added', the record dicts that they
+        were 'updated' with, and the records or IDs that were 'deleted'.
+        """
+        with self._lock:
+            for record in added or []:
+                self._remove(record.id)
+                self._add(record)
+            for rec in updated or []:
+                record = self._records.get(rec["id"])
+                if record is None:
+                    continue
+                self._remove(record.id)
+                for att in ("data", "ttl", "priority", "comment"):
+                    if att in rec:
+                        setattr(record, att, rec[att])
+                self._add(record)
+            for record in deleted or []:
+                self._remove(utils.get_id(record))
+
+
+    def __len__(self):
+        return len(self._records)
+
+
+    def _key(self, record_type, name, data):
+        return _record_key(self.domain.name, record_type, name, data)
+
+
+    def _record_key(self, record):
+        return self._key(record.type, record.name, record.data)
+
+
+    def _add(self, record):
+        key = self._record_key(record)
+        self._records[record.id] = record
+        self._by_name.setdefault(key[:2], []).append(record.id)
+        self._by_data.setdefault((key[0], key[2]), []).append(record.id)
+
+
+    def _remove(self, rec_id):
+        record = self._records.pop(rec_id, None)
+        if record is None:
+            return
+        key = self._record_key(record)
+        for index, index_key in ((self._by_name, key[:2]),
+                (self._by_data, (key[0], key[2]))):
+            ids = index.get(index_key, [])
+            if rec_id in ids:
+                ids.remove(rec_id)
+            if not ids:
+                index.pop(index_key, None)
+
+
+
+class DNSChangeFeed(object):
+    """
+    Follows the changes made to many domains, for keeping another copy of
+    them, such as an inventory, up to date without listing them again.
+
+    The feed keeps a high-water mark for each domain: the time up to which
+    its changes have been collected. Each call to `poll()` calls
+    `changes_since()` for all of the domains concurrently, in a pool of up to
+    'max_workers' threads, advances the mark of each domain that succeeded,
+    and returns the new changes as a list of dicts with these keys:
+
+        domain_id, domain_name: the domain that changed
+        action: "create", "update" or "delete"
+        target_type: the type of thing that changed, such as "Domain" or a
+            record type
+        target_id: the ID of the domain or record that changed
+        details: a dict whose keys are the fields that changed, and whose
+            values are (original value, new value) tuples
+
+    If 'domains' is None, every domain in the account is followed, and
+    domains that are created later are picked up on the next poll. Changes
+    are collected from 'since' (a date, datetime or string, as for
+    `changes_since()`), or from the time the feed is created if that is not
+    specified. To allow for the server's clock differing from ours, each poll
+    asks for changes from a little before the last one, and any changes that
+    were already returned by that poll are skipped.
+
+    Domains whose changes cannot be fetched keep their mark, so their changes
+    are collected on a later poll. `follow()` returns a generator that polls
+    every 'interval' seconds and yields the changes one at a time; to handle
+    them in a background thread instead, pass 'on_changes', which is called
+    with the list of changes from each poll that finds any, and call
+    `start()` and `stop()`.
+    """
+    def __init__(self, manager, domains=None, since=None, interval=60,
+            max_workers=None, on_changes=None):
+        self.manager = manager
+        self.interval = interval
+        self.max_workers = max_workers or utils.DEFAULT_MAX_WORKERS
+        self.on_changes = on_changes
+        self.follow_all = domains is None
+        self._since = since or datetime.datetime.utcnow()
+        self._cond = threading.Condition()
+        self._domains = {}
+        self._marks = {}
+        self._seen = {}
+        self._stopping = False
+        self._thread = None
+        self.polls = 0
+        self.errors = 0
+        for domain in domains or []:
+            self.add_domain(domain)
+
+
+    def add_domain(self, domain, since=None):
+        """
+        Starts following the changes to the specified domain from 'since', or
+        from the start of the feed if that is not specified.
+        """
+        with self._cond:
+            if domain.id not in self._domains:
+                self._domains[domain.id] = domain
+                self._marks[domain.id] = since or self._since
+                # The changes returned by the last poll of the domain, or
+                # None if it has not been polled yet
+                self._seen[domain.id] = None
+
+
+    def remove_domain(self, domain):
+        """
+        Stops following the changes to the specified domain, which may be
+        passed as either its ID or a CloudDNSDomain object.
+        """
+        with self._cond:
+            dom_id = utils.get_id(domain)
+            self._domains.pop(dom_id, None)
+            self._marks.pop(dom_id, None)
+            self._seen.pop(dom_id, None)
+
+
+    def get_marks(self):
+        """
+        Returns a dict of the high-water mark of each domain, keyed by domain
+        ID. These can be saved and passed to `add_domain()` to resume the
+        feed later.
+        """
+        with self._cond:
+            return dict(self._marks)
+
+
+    def poll(self):
+        """
+        Collects the changes made to all of the domains since their marks,
+        and returns them as a list of change dicts.
+        """
+        log = logging.getLogger("pyrax")
+        if self.follow_all:
+            try:
+                self._add_new_domains()
+            except Exception as e:
+                log.error("Error listing the domains to follow: %s", e)
+                self.errors += 1
+        with self._cond:
+            polls = [(domain, self._marks[dom_id],
+                    self._seen[dom_id] is not None)
+                    for dom_id, domain in self._domains.items()]
+        results = utils.run_concurrently(self._get_changes, polls,
+                max_workers=self.max_workers)
+        events = []
+        with self._cond:
+            for (domain, since, overlap), result, err in results:
+                if err is not None:
+                    log.error("Error getting the changes for domain '%s': "
+                            "%s", domain.name, err)
+                    self.errors += 1
+                    continue
+                if domain.id not in self._domains:
+                    # The domain has been removed.
+                    continue
+                started, changes = result
+                seen = self._seen[domain.id] or set()
+                keys = set()
+                for change in changes:
+                    key = json.dumps(change, sort_keys=True)
+                    if key not in keys and key not in seen:
+                        events.append(_change_event(domain, change))
+                    keys.add(key)
+                self._seen[domain.id] = keys
+                self._marks[domain.id] = started
+            self.polls += 1
+        return events
+
+
+    def follow(self):
+        """
+        Returns a generator that polls for changes every 'interval' seconds
+        until `stop()` is called, and yields each change as it is found.
+        """
+        self._stopping = False
+        while True:
+            started = time.time()
+            for event in self.poll():
+                yield event
+            with self._cond:
+                wait = started + self.interval - time.time()
+                if not self._stopping and wait > 0:
+                    self._cond.wait(wait)
+                if self._stopping:
+                    return
+
+
+    def start(self):
+        """
+        Starts polling in a background thread, passing the changes from each
+        poll to 'on_changes'. Returns the feed, so that it can be created and
+        started in a single expression.
+        """
+        if self._thread:
+            return self
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+
+    def stop(self, wait=True):
+        """
+        Stops polling. If 'wait' is True and the feed was started with
+        `start()`, this does not return until any poll that is in progress
+        has finished and its changes have been handled.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread and wait:
+            self._thread.join()
+        self._thread = None
+
+
+    def _run(self):
+        log = logging.getLogger("pyrax")
+        while True:
+            started = time.time()
+            events = self.poll()
+            if events and self.on_changes:
+                try:
+                    self.on_changes(events)
+                except Exception as e:
+                    log.error("Error in the DNS change feed callback: %s", e)
+            with self._cond:
+                wait = started + self.interval - time.time()
+                if not self._stopping and wait > 0:
+                    self._cond.wait(wait)
+                if self._stopping:
+                    return
+
+
+    def _add_new_domains(self):
+        domains = self.manager.list(list_all=True)
+        with self._cond:
+            current = set()
+            for domain in domains:
+                current.add(domain.id)
+                self.add_domain(domain)
+            for dom_id in list(self._domains):
+                if dom_id not in current:
+                    self.remove_domain(dom_id)
+
+
+    def _get_changes(self, poll):
+        domain, since, overlap = poll
+        started = datetime.datetime.utcnow()
+        if overlap:
+            since = since - datetime.timedelta(seconds=CHANGES_SYNC_MARGIN)
+        changes = self.manager.changes_since(domain, since)
+        return started, changes
+
+
+
+class DNSJobPoller(object):
+    """
+    Waits for many asynchronous Cloud DNS jobs at once, so that a large number
+    of changes can be submitted without a thread blocking on each one.
+
+    Each call to `submit()` returns a Future right away. The request that
+    starts the job is made in a pool of up to 'max_workers' threads, and the
+    job's status is then checked from a single scheduler thread, which hands
+    the checks off to the same pool. A job is first checked after the
+    manager's delay, and the time between checks is multiplied by 'backoff'
+    after each one, up to 'max_interval' seconds. When the job completes, its
+    Future's result is set to what the blocking call would have returned, or
+    its exception to the error that the blocking call would have raised. Jobs
+    that take longer than the manager's timeout fail with DNSCallTimedOut.
+
+    The threads are started when the first job is submitted. Call
+    `shutdown()` to stop them once all the jobs are done.
+    """
+    def __init__(self, manager, max_workers=None, max_interval=DEFAULT_MAX_DELAY,
+            backoff=2):
+        self.manager = manager
+        self.max_workers = max_workers or utils.DEFAULT_MAX_WORKERS
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self._cond = threading.Condition()
+        self._schedule = []
+        self._seq = itertools.count()
+        self._stopping = False
+        self._thread = None
+        self._executor = None
+        self.pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.polls = 0
+
+
+    def submit(self, uri, body=None, method="GET", error_class=None,
+            has_response=True, transform=None, transform_error=None):
+        """
+        Starts an asynchronous call, and returns a Future for its result. The
+        parameters are the same as for CloudDNSManager._async_call(); if
+        'transform' is specified, it is called with the response and body
+        that the call would have returned, and its return value becomes the
+        Future's result. Likewise, if 'transform_error' is specified, it is
+        called with any exception that the call would have raised, and its
+        return value becomes the Future's exception.
+        """
+        timeout = self.manager._timeout
+        job = {"uri": uri,
+                "body": body,
+                "method": method,
+                "error_class": error_class,
+                "has_response": has_response,
+                "transform": transform,
+                "transform_error": transform_error,
+                "future": futures.Future(),
+                "interval": self.manager._delay,
+                "deadline": time.time() + timeout if timeout else None,
+                "status_uri": None,
+                }
+        with self._cond:
+            self._start()
+            self.pending += 1
+            self.submitted += 1
+            self._executor.submit(self._begin, job)
+        return job["future"]
+
+
+    def get_stats(self):
+        """
+        Returns a dict with the number of jobs that have been 'submitted',
+        that are still 'pending', and that have 'completed' or 'failed', along
+        with the number of status checks ('polls') made so far.
+        """
+        with self._cond:
+            return {"submitted": self.submitted,
+                    "pending": self.pending,
+                    "completed": self.completed,
+                    "failed": self.failed,
+                    "polls": self.polls,
+                    }
+
+
+    def shutdown(self, wait=True):
+        """
+        Stops the poller's threads. If 'wait' is True, this first waits for
+        all of the submitted jobs to finish; otherwise, the Futures of any
+        jobs that have not finished are cancelled. More jobs can be submitted
+        afterwards, which starts the threads again.
+        """
+        with self._cond:
+            while wait and self.pending:
+                self._cond.wait()
+            self._stopping = True
+            self._cond.notify_all()
+            thread, executor = self._thread, self._executor
+            self._thread = self._executor = None
+            abandoned = [entry[2] for entry in self._schedule]
+            self._schedule = []
+        if thread:
+            thread.join()
+            executor.shutdown(wait=wait)
+        for job in abandoned:
+            self._resolve(job, cancel=True)
+
+
+    def _start(self):
+        """
+        Starts the threads if they are not running. Must be called with the
+        lock held.
+        """
+        if self._thread:
+            return
+        self._stopping = False
+        self._executor = futures.ThreadPoolExecutor(
+                max_workers=self.max_workers)
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def _run(self):
+        with self._cond:
+            while not self._stopping:
+                if not self._schedule:
+                    self._cond.wait()
+                    continue
+                when, seq, job = self._schedule[0]
+                delay = when - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._schedule)
+                self._executor.submit(self._poll, job)
+
+
+    def _begin(self, job):
+        """
+        Makes the request that starts the job.
+        """
+        mgr = self.manager
+        try:
+            resp, resp_body = mgr._start_async_call(job["uri"],
+                    body=job["body"], method=job["method"],
+                    error_class=job["error_class"])
+            job["status_uri"] = mgr._get_status_uri(resp_body)
+        except Exception as e:
+            self._resolve(job, error=e)
+            return
+        self._check(job, resp, resp_body)
+
+
+    def _poll(self, job):
+        """
+        Checks the status of the job.
+        """
+        if job["future"].cancelled():
+            self._resolve(job, cancel=True)
+            return
+        try:
+            resp, resp_body = self.manager._retry_get(job["status_uri"])
+        except Exception as e:
+            self._resolve(job, error=e)
+            return
+        with self._cond:
+            self.polls += 1
+        self._check(job, resp, resp_body)
+
+
+    def _check(self, job, resp, resp_body):
+        """
+        Resolves the job's Future if it has finished, or schedules the next
+        check of its status if it has not.
+        """
+        if resp_body["status"] == "RUNNING":
+            if job["deadline"] and time.time() > job["deadline"]:
+                err = exc.DNSCallTimedOut("The API call to '%s' did not "
+                        "complete after %s seconds." % (job["uri"],
+                        self.manager._timeout))
+                self._resolve(job, error=err)
+                return
+            with self._cond:
+                stopping = self._stopping
+                if not stopping:
+                    when = time.time() + job["interval"]
+                    job["interval"] = min(job["interval"] * self.backoff,
+                            max(self.max_interval, self.manager._delay))
+                    heapq.heappush(self._schedule,
+                            (when, next(self._seq), job))
+                    self._cond.notify_all()
+            if stopping:
+                # The poller was shut down without waiting for this job.
+                self._resolve(job, cancel=True)
+            return
+        try:
+            resp, result = self.manager._finish_async_call(resp, resp_body,
+                    job["error_class"], job["has_response"])
+            if job["transform"]:
+                result = job["transform"](resp, result)
+            else:
+                result = (resp, result)
+        except Exception as e:
+            self._resolve(job, error=e)
+            return
+        self._resolve(job, result=result)
+
+
+    def _resolve(self, job, result=None, error=None, cancel=False):
+        """
+        Sets the result or exception of the job's Future, unless it has been
+        cancelled, and updates the counts.
+        """
+        future = job["future"]
+        if cancel:
+            future.cancel()
+        if error is not None and job["transform_error"]:
+            error = job["transform_error"](error)
+        if future.set_running_or_notify_cancel():
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+        with self._cond:
+            self.pending -= 1
+            if error is None and not future.cancelled():
+                self.completed += 1
+            else:
+                self.failed += 1
+            self._cond.notify_all()
 
 
 
@@ -1102,9 +2898,13 @@ class CloudDNSClient(BaseClient):
         self._manager._set_delay(delay)
 
 
-    def list(self, limit=None, offset=None):
-        """Returns a list of all resources."""
-        return self._manager.list(limit=limit, offset=offset)
+    def list(self, limit=None, offset=None, list_all=False):
+        """
+        Returns a list of all domains, or optionally a page of domains. If
+        'list_all' is True, all of the pages of domains are returned.
+        """
+        return self._manager.list(limit=limit, offset=offset,
+                list_all=list_all)
 
 
     def list_previous_page(self):
@@ -1182,6 +2982,41 @@ class CloudDNSClient(BaseClient):
         return self._manager.import_domain(domain_data)
 
 
+    @assure_domain
+    def export_domain_to_file(self, domain, target):
+        """
+        Writes the records of the specified domain to 'target', which may be
+        an open file or a path, in the BIND 9 format, a page of records at a
+        time. Returns the number of records written.
+        """
+        return domain.export_to_file(target)
+
+
+    @assure_domain
+    def import_domain_records(self, domain, source,
+            batch_size=RECORD_BATCH_SIZE, max_pending=DEFAULT_IMPORT_PENDING):
+        """
+        Adds the records in a BIND 9 zone file, passed as an open file, the
+        path to a file, or its text, to the specified domain in concurrent
+        batches. See CloudDNSManager.import_records() for details.
+        """
+        return domain.import_records(source, batch_size=batch_size,
+                max_pending=max_pending)
+
+
+    def import_zone(self, source, name=None, emailAddress=None, ttl=None,
+            comment=None, batch_size=RECORD_BATCH_SIZE,
+            max_pending=DEFAULT_IMPORT_PENDING):
+        """
+        Creates a new domain from a BIND 9 zone file of any size, and adds its
+        records in concurrent batches. See CloudDNSManager.import_zone() for
+        details.
+        """
+        return self._manager.import_zone(source, name=name,
+                emailAddress=emailAddress, ttl=ttl, comment=comment,
+                batch_size=batch_size, max_pending=max_pending)
+
+
     @assure_domain
     def update_domain(self, domain, emailAddress=None, ttl=None, comment=None):
         """
@@ -1206,11 +3041,14 @@ class CloudDNSClient(BaseClient):
 
 
     @assure_domain
-    def list_subdomains(self, domain, limit=None, offset=None):
+    def list_subdomains(self, domain, limit=None, offset=None,
+            list_all=False):
         """
-        Returns a list of all subdomains for the specified domain.
+        Returns a list of all subdomains for the specified domain. If
+        'list_all' is True, all of the pages of subdomains are returned.
         """
-        return domain.list_subdomains(limit=limit, offset=offset)
+        return domain.list_subdomains(limit=limit, offset=offset,
+                list_all=list_all)
 
 
     def get_subdomain_iterator(self, domain, limit=None, offset=None):
@@ -1234,11 +3072,13 @@ class CloudDNSClient(BaseClient):
 
 
     @assure_domain
-    def list_records(self, domain, limit=None, offset=None):
+    def list_records(self, domain, limit=None, offset=None, list_all=False):
         """
-        Returns a list of all records configured for the specified domain.
+        Returns a list of all records configured for the specified domain. If
+        'list_all' is True, all of the pages of records are returned.
         """
-        return domain.list_records(limit=limit, offset=offset)
+        return domain.list_records(limit=limit, offset=offset,
+                list_all=list_all)
 
 
     def get_record_iterator(self, domain):
@@ -1271,6 +3111,24 @@ class CloudDNSClient(BaseClient):
                 name=name, data=data)
 
 
+    @assure_domain
+    def enable_record_cache(self, domain, max_age=DEFAULT_RECORD_CACHE_AGE):
+        """
+        Starts keeping a local copy of the specified domain's records, which
+        is then used by `search_records()` and `find_record()` instead of
+        querying the API each time. Returns the DNSRecordCache.
+        """
+        return domain.enable_record_cache(max_age=max_age)
+
+
+    @assure_domain
+    def disable_record_cache(self, domain):
+        """
+        Stops keeping a local copy of the specified domain's records.
+        """
+        return domain.disable_record_cache()
+
+
     @assure_domain
     def find_record(self, domain, record_type, name=None, data=None):
         """
@@ -1303,6 +3161,17 @@ class CloudDNSClient(BaseClient):
     add_record = add_records
 
 
+    @assure_domain
+    def add_records_async(self, domain, records):
+        """
+        Starts adding the records to the specified domain, and returns a
+        Future whose result will be the list of new records, without waiting
+        for them to be created. Many such calls can be outstanding at once;
+        they are all tracked by a single DNSJobPoller.
+        """
+        return domain.add_records_async(records)
+
+
     @assure_domain
     def get_record(self, domain, record):
         """
@@ -1340,6 +3209,15 @@ class CloudDNSClient(BaseClient):
         return domain.update_records(records)
 
 
+    @assure_domain
+    def update_records_async(self, domain, records):
+        """
+        Starts modifying multiple existing records for a domain, and returns a
+        Future for the result, without waiting for the changes to complete.
+        """
+        return domain.update_records_async(records)
+
+
     @assure_domain
     def delete_record(self, domain, record):
         """
@@ -1348,6 +3226,67 @@ class CloudDNSClient(BaseClient):
         return domain.delete_record(record)
 
 
+    @assure_domain
+    def delete_record_async(self, domain, record):
+        """
+        Starts deleting an existing record for a domain, and returns a Future
+        for the result, without waiting for it to be deleted.
+        """
+        return domain.delete_record_async(record)
+
+
+    @assure_domain
+    def delete_records(self, domain, records):
+        """
+        Deletes several existing records for a domain with a single API call.
+        """
+        return domain.delete_records(records)
+
+
+    @assure_domain
+    def reconcile_records(self, domain, desired, prune=True, dry_run=False,
+            batch_size=RECORD_BATCH_SIZE,
+            protected_types=PROTECTED_RECORD_TYPES):
+        """
+        Makes the records for the specified domain match the 'desired'
+        records, using as few API calls as possible. See
+        CloudDNSDomain.reconcile() for details.
+        """
+        return domain.reconcile(desired, prune=prune, dry_run=dry_run,
+                batch_size=batch_size, protected_types=protected_types)
+
+
+    def get_change_feed(self, domains=None, since=None, interval=60,
+            max_workers=None, on_changes=None):
+        """
+        Returns a DNSChangeFeed that follows the changes made to the
+        specified domains, or to all of the domains in the account if
+        'domains' is None. See DNSChangeFeed for the meaning of the other
+        parameters.
+        """
+        return DNSChangeFeed(self._manager, domains=domains, since=since,
+                interval=interval, max_workers=max_workers,
+                on_changes=on_changes)
+
+
+    def get_job_stats(self):
+        """
+        Returns the counts of the asynchronous jobs started by the '_async'
+        methods; see DNSJobPoller.get_stats().
+        """
+        return self._manager._get_job_poller().get_stats()
+
+
+    def wait_for_jobs(self):
+        """
+        Waits until all of the jobs started by the '_async' methods have
+        finished, and stops the threads that were tracking them.
+        """
+        poller = self._manager._job_poller
+        if poller is not None:
+            poller.shutdown(wait=True)
+
+
     def list_ptr_records(self, device):
         """
         Returns a list of all PTR records configured for this device.
@@ -1379,6 +3318,44 @@ class CloudDNSClient(BaseClient):
         return self._manager.delete_ptr_records(device, ip_address=ip_address)
 
 
+    def add_ptr_records_async(self, device, records):
+        """
+        Starts adding one or more PTR records to the specified device, and
+        returns a Future whose result will be the list of new records.
+        """
+        return self._manager.add_ptr_records_async(device, records)
+
+
+    def delete_ptr_records_async(self, device, ip_address=None):
+        """
+        Starts deleting the PTR records for the specified device, or just
+        those for 'ip_address', and returns a Future whose result will be True
+        once they are deleted.
+        """
+        return self._manager.delete_ptr_records_async(device,
+                ip_address=ip_address)
+
+
+    def add_ptr_records_bulk(self, entries, ttl=None, comment=None):
+        """
+        Adds PTR records to many devices concurrently. 'entries' is an
+        iterable of (device, ip_address, hostname) tuples. Returns a dict with
+        the records added to, or the error raised for, each device ID.
+        """
+        return self._manager.add_ptr_records_bulk(entries, ttl=ttl,
+                comment=comment)
+
+
+    def delete_ptr_records_bulk(self, entries):
+        """
+        Deletes PTR records from many devices concurrently. 'entries' is an
+        iterable of (device, ip_address) tuples, where an IP address of None
+        deletes all of the device's records. Returns a dict with the IP
+        addresses deleted from, or the error raised for, each device ID.
+        """
+        return self._manager.delete_ptr_records_bulk(entries)
+
+
     def get_absolute_limits(self):
         """
         Returns a dict with the absolute limits for the current account.
@@ -1410,8 +3387,13 @@ class ResultsIterator(object):
     This object will iterate over all the results for a given
     type of listing, no matter how many items exist.
 
-    This is an abstract class; subclasses must define the
-    _init_methods() method.
+    Each iterator keeps track of its own place in the listing, rather than
+    using the manager's paging state, so any number of iterators may be used
+    at once with the same manager, from any number of threads.
+
+    This is an abstract class; subclasses must define the _init_methods()
+    method, which sets 'page_method' to the manager method that returns the
+    results and response body for a page, and the _first_uri() method.
     """
     def __init__(self, manager, domain=None):
         self.manager = manager
@@ -1430,6 +3412,13 @@ class ResultsIterator(object):
         raise NotImplementedError()
 
 
+    def _first_uri(self):
+        """
+        Must be implemented in subclasses.
+        """
+        raise NotImplementedError()
+
+
     def __iter__(self):
         return self
 
@@ -1446,50 +3435,53 @@ class ResultsIterator(object):
         except IndexError:
             if self.next_uri is None:
                 raise StopIteration()
-            else:
-                if not self.next_uri:
-                    if self.domain:
-                        self.results = self.list_method(self.domain)
-                    else:
-                        self.results = self.list_method()
-                else:
-                    args = self.extra_args
-                    self.results = self._list_method(self.next_uri, *args)
-                self.next_uri = self.manager._paging.get(
-                        self.paging_service, {}).get("next_uri")
+            uri = self.next_uri or self._first_uri()
+            self.results, body = self.page_method(uri, *self.extra_args)
+            self.next_uri = self.manager._page_links(body)[0]
         # We should have more results.
         try:
             return self.results.pop(0)
         except IndexError:
             raise StopIteration()
 
+    __next__ = next
+
 
 class DomainResultsIterator(ResultsIterator):
     """
     ResultsIterator subclass for iterating over all domains.
     """
     def _init_methods(self):
-        self.list_method = self.manager.list
-        self._list_method = self.manager._list
+        self.page_method = self.manager._get_domain_page
         self.paging_service = "domain"
 
 
+    def _first_uri(self):
+        return "/%s" % self.manager.uri_base
+
+
 class SubdomainResultsIterator(ResultsIterator):
     """
     ResultsIterator subclass for iterating over all subdomains.
     """
     def _init_methods(self):
-        self.list_method = self.manager.list_subdomains
-        self._list_method = self.manager._list_subdomains
+        self.page_method = self.manager._get_subdomain_page
         self.extra_args = (self.domain_id, )
         self.paging_service = "subdomain"
 
 
+    def _first_uri(self):
+        return "/domains?name=%s" % self.domain.name
+
+
 class RecordResultsIterator(ResultsIterator):
     """
     ResultsIterator subclass for iterating over all domain records.
     """
     def _init_methods(self):
-        self.list_method = self.manager.list_records
-        self._list_method = self.manager._list_records
+        self.page_method = self.manager._get_record_page
         self.paging_service = "record"
+
+
+    def _first_uri(self):
+        return "/domains/%s/records" % self.domain_id
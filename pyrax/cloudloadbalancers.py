@@ -17,8 +17,22 @@
 #    under the License.
 from __future__ import absolute_import, unicode_literals
 
+import array
+from collections import deque
+from concurrent import futures
+from functools import partial
 from functools import wraps
-
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+# NumPy is an optional import
+try:
+    import numpy
+except ImportError:
+    numpy = None
 import six
 
 import pyrax
@@ -28,6 +42,29 @@ from pyrax.manager import BaseManager
 from pyrax.resource import BaseResource
 import pyrax.utils as utils
 
+# The most nodes or access list items that can be removed from a load
+# balancer with one call.
+NODE_DELETE_BATCH_SIZE = 10
+ACCESS_LIST_DELETE_BATCH_SIZE = 10
+# While a load balancer is being changed, its status is checked after this
+# many seconds, then at doubling intervals up to the maximum.
+DEFAULT_ACTIVE_INTERVAL = 1
+DEFAULT_MAX_ACTIVE_INTERVAL = 10
+# How long to wait for a load balancer to become ACTIVE.
+DEFAULT_ACTIVE_TIMEOUT = 600
+# How many times a change is retried when the load balancer is immutable.
+DEFAULT_IMMUTABLE_RETRIES = 5
+# A load balancer in any of these states will never become ACTIVE.
+FAILED_STATUSES = ("ERROR", "SUSPENDED", "PENDING_DELETE", "DELETED")
+NODE_CONDITIONS = ("ENABLED", "DISABLED", "DRAINING")
+# The load balancer stats that count events since the load balancer was
+# created, and those that give its current state.
+STATS_COUNTERS = ("connectTimeOut", "connectError", "connectFailure",
+        "dataTimedOut", "keepAliveTimedOut", "connectTimeOutSsl",
+        "connectErrorSsl", "connectFailureSsl", "dataTimedOutSsl",
+        "keepAliveTimedOutSsl")
+STATS_GAUGES = ("currentConn", "maxConn", "currentConnSsl", "maxConnSsl")
+
 
 def assure_parent(fnc):
     @wraps(fnc)
@@ -52,6 +89,22 @@ def assure_loadbalancer(fnc):
     return _wrapped
 
 
+def _is_immutable_error(err):
+    """
+    Returns True if the API rejected a call because the load balancer cannot
+    be changed until a previous change has been made.
+    """
+    text = "%s %s" % (err.message, err.details or "")
+    return err.code == 422 and "immutable" in text.lower()
+
+
+def _access_key(item):
+    """
+    Returns the value used to compare access list items.
+    """
+    return (item["address"].strip().lower(), item["type"].upper())
+
+
 
 class CloudLoadBalancer(BaseResource):
     """Represents a Cloud Load Balancer instance."""
@@ -128,6 +181,27 @@ class CloudLoadBalancer(BaseResource):
         return self.manager.delete_node(self, node)
 
 
+    def delete_nodes(self, nodes):
+        """Removes the nodes from the load balancer with a single call."""
+        return self.manager.delete_nodes(self, nodes)
+
+
+    def node_changes(self):
+        """
+        Returns a NodeChangeQueue for collecting changes to this load
+        balancer's nodes and applying them with as few calls as possible.
+        """
+        return NodeChangeQueue(self)
+
+
+    def wait_for_active(self, timeout=DEFAULT_ACTIVE_TIMEOUT):
+        """
+        Waits until this load balancer's status is ACTIVE, so that it can be
+        changed again.
+        """
+        return self.manager.wait_for_active(self, timeout=timeout)
+
+
     def update_node(self, node, diff=None):
         """Updates the node's attributes."""
         return self.manager.update_node(node, diff=diff)
@@ -181,6 +255,25 @@ class CloudLoadBalancer(BaseResource):
         return self.manager.delete_access_list_items(self, item_ids)
 
 
+    def plan_access_list(self, desired):
+        """
+        Returns the changes needed to make this load balancer's access list
+        match the 'desired' one, without making them. See
+        CloudLoadBalancerManager.plan_access_list() for details.
+        """
+        return self.manager.plan_access_list(self, desired)
+
+
+    def reconcile_access_list(self, desired, dry_run=False):
+        """
+        Makes this load balancer's access list match the 'desired' one, with
+        as few API calls as possible, and returns the changes that were made.
+        See CloudLoadBalancerManager.reconcile_access_list() for details.
+        """
+        return self.manager.reconcile_access_list(self, desired,
+                dry_run=dry_run)
+
+
     def get_health_monitor(self):
         """
         Returns a dict representing the health monitor for the load
@@ -554,6 +647,71 @@ class CloudLoadBalancerManager(BaseManager):
         return resp, body
 
 
+    def delete_nodes(self, loadbalancer, nodes):
+        """
+        Removes the nodes from the load balancer with a single call. No more
+        than NODE_DELETE_BATCH_SIZE nodes can be removed at once.
+        """
+        nodes = utils.coerce_to_list(nodes)
+        ids = "&".join(["id=%s" % utils.get_id(node) for node in nodes])
+        uri = "/loadbalancers/%s/nodes?%s" % (utils.get_id(loadbalancer), ids)
+        resp, body = self.api.method_delete(uri)
+        return resp, body
+
+
+    def get_status(self, loadbalancer):
+        """
+        Returns the current status of the load balancer.
+        """
+        uri = "/loadbalancers/%s" % utils.get_id(loadbalancer)
+        resp, body = self.api.method_get(uri)
+        return body["loadBalancer"]["status"]
+
+
+    def wait_for_active(self, loadbalancer, timeout=DEFAULT_ACTIVE_TIMEOUT):
+        """
+        Waits until the load balancer's status is ACTIVE. The status is
+        checked every DEFAULT_ACTIVE_INTERVAL seconds at first, doubling after
+        each check up to DEFAULT_MAX_ACTIVE_INTERVAL seconds. Raises
+        LoadBalancerNotActive if the load balancer reaches a state from which
+        it cannot become ACTIVE, or is still not ACTIVE after 'timeout'
+        seconds.
+        """
+        start = time.time()
+        delay = DEFAULT_ACTIVE_INTERVAL
+        while True:
+            status = self.get_status(loadbalancer)
+            if status == "ACTIVE":
+                return
+            if status in FAILED_STATUSES:
+                raise exc.LoadBalancerNotActive("Load balancer '%s' has a "
+                        "status of '%s'." % (utils.get_id(loadbalancer),
+                        status))
+            if timeout and (time.time() - start + delay) > timeout:
+                raise exc.LoadBalancerNotActive("Load balancer '%s' was still "
+                        "'%s' after %s seconds." % (utils.get_id(loadbalancer),
+                        status, timeout))
+            time.sleep(delay)
+            delay = min(delay * 2, DEFAULT_MAX_ACTIVE_INTERVAL)
+
+
+    def _call_when_active(self, loadbalancer, fnc, *args, **kwargs):
+        """
+        Calls 'fnc' with the supplied arguments. If the call is rejected
+        because the load balancer is immutable while a previous change is
+        being made, this waits for it to become ACTIVE, and then tries again,
+        up to DEFAULT_IMMUTABLE_RETRIES times.
+        """
+        for attempt in range(DEFAULT_IMMUTABLE_RETRIES + 1):
+            try:
+                return fnc(*args, **kwargs)
+            except exc.ClientException as e:
+                if (not _is_immutable_error(e) or
+                        attempt == DEFAULT_IMMUTABLE_RETRIES):
+                    raise
+            self.wait_for_active(loadbalancer)
+
+
     def add_virtualip(self, lb, vip):
         """Adds the VirtualIP to the specified load balancer."""
         resp, body = self.api.method_post("/loadbalancers/%s/virtualips" % lb.id,
@@ -624,14 +782,107 @@ class CloudLoadBalancerManager(BaseManager):
         if bad_ids:
             raise exc.AccessListIDNotFound("The following ID(s) are not valid "
                     "Access List items: %s" % ", ".join(bad_ids))
+        return self._delete_access_list_ids(loadbalancer, item_ids)
+
+
+    def _delete_access_list_ids(self, loadbalancer, item_ids):
+        """
+        Removes the items with the given IDs from the access list, without
+        checking that they exist.
+        """
         items = "&".join(["id=%s" % item_id for item_id in item_ids])
         uri = "/loadbalancers/%s/accesslist?%s" % (
                 utils.get_id(loadbalancer), items)
-        # TODO: add the item ids
         resp, body = self.api.method_delete(uri)
         return body
 
 
+    def plan_access_list(self, loadbalancer, desired):
+        """
+        Compares the load balancer's current access list with the 'desired'
+        one, and works out the items that would have to be added and deleted
+        to make them match. Nothing is changed.
+
+        'desired' is a list of dicts with 'address' and 'type' keys, in the
+        same form as for `add_access_list()`, or a dict with that list as its
+        'accessList' value. Addresses are compared without regard to case.
+        Since access list items cannot be modified, an address whose type
+        has changed is deleted and then added again.
+
+        Returns a dict with these keys:
+
+            add: the item dicts to be added
+            delete: the current items to be deleted
+            unchanged: the current items that are already desired
+        """
+        if isinstance(desired, dict):
+            desired = desired.get("accessList", [])
+        wanted = {}
+        order = []
+        for item in desired:
+            key = _access_key(item)
+            if key not in wanted:
+                wanted[key] = {"address": item["address"].strip(),
+                        "type": item["type"].upper()}
+                order.append(key)
+        plan = {"add": [], "delete": [], "unchanged": []}
+        seen = set()
+        for item in self.get_access_list(loadbalancer) or []:
+            key = _access_key(item)
+            if key in wanted and key not in seen:
+                plan["unchanged"].append(item)
+                seen.add(key)
+            else:
+                plan["delete"].append(item)
+        plan["add"] = [wanted[key] for key in order if key not in seen]
+        return plan
+
+
+    def reconcile_access_list(self, loadbalancer, desired, dry_run=False):
+        """
+        Makes the load balancer's access list match the 'desired' one, using
+        as few API calls as possible. See `plan_access_list()` for the form
+        of 'desired' and of the changes that are returned; if 'dry_run' is
+        True, the changes are returned without being made.
+
+        The current access list is fetched once. So that the load balancer is
+        never left without the items that are being kept or added, the new
+        items are all added with one call before the stale items are
+        deleted, ACCESS_LIST_DELETE_BATCH_SIZE at a time. The exception is an
+        address whose type is changing, since the same address cannot be in
+        the list twice: its old item is deleted before the new items are
+        added. If the desired list is empty, the whole access list is deleted
+        with a single call. Between calls, this waits for the load balancer
+        to become ACTIVE again.
+        """
+        plan = self.plan_access_list(loadbalancer, desired)
+        if dry_run:
+            return plan
+        adding = set(_access_key(item)[0] for item in plan["add"])
+        retyped = [item["id"] for item in plan["delete"]
+                if _access_key(item)[0] in adding]
+        stale = [item["id"] for item in plan["delete"]
+                if _access_key(item)[0] not in adding]
+        calls = []
+        for pos in range(0, len(retyped), ACCESS_LIST_DELETE_BATCH_SIZE):
+            calls.append((self._delete_access_list_ids,
+                    (retyped[pos:pos + ACCESS_LIST_DELETE_BATCH_SIZE], )))
+        if plan["add"]:
+            calls.append((self.add_access_list, (plan["add"], )))
+        if stale and not (plan["unchanged"] or plan["add"]):
+            calls.append((self.delete_access_list, ()))
+        else:
+            for pos in range(0, len(stale), ACCESS_LIST_DELETE_BATCH_SIZE):
+                calls.append((self._delete_access_list_ids,
+                        (stale[pos:pos + ACCESS_LIST_DELETE_BATCH_SIZE], )))
+        for num, (fnc, args) in enumerate(calls):
+            if num:
+                # The previous call made the load balancer immutable.
+                self.wait_for_active(loadbalancer)
+            self._call_when_active(loadbalancer, fnc, loadbalancer, *args)
+        return plan
+
+
     def get_health_monitor(self, loadbalancer):
         """
         Returns a dict representing the health monitor for the load
@@ -1223,6 +1474,783 @@ class VirtualIP(object):
 
 
 
+class NodeChangeQueue(object):
+    """
+    Collects changes to the nodes of a load balancer, and then applies them
+    with as few calls as the API allows. Since a load balancer cannot be
+    changed again until the previous change has completed, making each change
+    separately means a wait after every one of them.
+
+    Several updates to the same node are merged into a single update, and
+    deleting a node discards any updates queued for it. When `apply()` is
+    called, the nodes to delete are removed NODE_DELETE_BATCH_SIZE at a
+    time, the new nodes are all added with one call, and then each updated
+    node is changed with a call of its own, since the API can only update one
+    node at a time. The load balancer's status is only checked between calls,
+    when a previous call has made it immutable.
+
+    The queue can also be used as a context manager, which applies the
+    changes on exit; the results are then available as its 'results'
+    attribute.
+    """
+    def __init__(self, loadbalancer):
+        self.loadbalancer = loadbalancer
+        self.manager = loadbalancer.manager
+        self.results = None
+        self._adds = []
+        self._updates = {}
+        self._deletes = {}
+        self._pending = False
+        self._fatal = None
+
+
+    def __len__(self):
+        return len(self._adds) + len(self._updates) + len(self._deletes)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, type, value, traceback):
+        if type is None:
+            self.apply()
+
+
+    def add_nodes(self, nodes):
+        """
+        Queues the Node or list of Nodes to be added to the load balancer.
+        """
+        self._adds.extend(utils.coerce_to_list(nodes))
+
+
+    def update_node(self, node, condition=None, weight=None, type=None):
+        """
+        Queues a change to the condition, weight or type of the node, which
+        may be a Node or a node ID.
+        """
+        changes = {}
+        if condition is not None:
+            condition = condition.upper()
+            if condition not in NODE_CONDITIONS:
+                raise exc.InvalidNodeCondition("Node conditions must be one "
+                        "of %s; '%s' is not valid." % (
+                        ", ".join(NODE_CONDITIONS), condition))
+            changes["condition"] = condition
+        if weight is not None:
+            changes["weight"] = weight
+        if type is not None:
+            changes["type"] = type
+        if not changes:
+            return
+        if any(node is added for added in self._adds):
+            # Not created yet, so just change what will be created.
+            for key, val in changes.items():
+                setattr(node, key, val)
+            return
+        node_id = utils.get_id(node)
+        if node_id in self._deletes:
+            return
+        self._updates.setdefault(node_id, (node, {}))[1].update(changes)
+
+
+    def delete_node(self, node):
+        """
+        Queues the node, which may be a Node or a node ID, to be removed from
+        the load balancer.
+        """
+        if any(node is added for added in self._adds):
+            self._adds = [added for added in self._adds if added is not node]
+            return
+        node_id = utils.get_id(node)
+        self._updates.pop(node_id, None)
+        self._deletes[node_id] = node
+
+
+    def apply(self):
+        """
+        Makes the queued changes, and empties the queue. Returns a list with
+        a dict for each node that was added, updated or deleted, containing
+        the 'node', the 'action' ("add", "update" or "delete"), and the
+        'error' raised if the change failed, which is otherwise None. For
+        nodes that were added, 'node' is the new Node, with its ID, if the API
+        returned it.
+
+        If the load balancer stops being able to accept changes, such as when
+        its status changes to ERROR, the remaining changes are not attempted,
+        and fail with the same LoadBalancerNotActive error.
+        """
+        adds, updates, deletes = self._adds, self._updates, self._deletes
+        self._adds, self._updates, self._deletes = [], {}, {}
+        self._pending = False
+        self._fatal = None
+        results = []
+        delete_nodes = list(deletes.values())
+        for pos in range(0, len(delete_nodes), NODE_DELETE_BATCH_SIZE):
+            batch = delete_nodes[pos:pos + NODE_DELETE_BATCH_SIZE]
+            error = self._mutate(self.manager.delete_nodes, self.loadbalancer,
+                    batch)[1]
+            results.extend([{"node": node, "action": "delete", "error": error}
+                    for node in batch])
+        if adds:
+            body, error = self._mutate(self.manager.add_nodes,
+                    self.loadbalancer, adds)
+            added = adds
+            infos = (body or {}).get("nodes") or []
+            if error is None and len(infos) == len(adds):
+                added = [Node(parent=self.loadbalancer, **info)
+                        for info in infos]
+            results.extend([{"node": node, "action": "add", "error": error}
+                    for node in added])
+        for node, changes in updates.values():
+            error = self._update(node, changes)
+            results.append({"node": node, "action": "update", "error": error})
+        self.results = results
+        return results
+
+
+    def _update(self, node, changes):
+        """
+        Sends the changes for one node, and updates the Node to match if the
+        call succeeds.
+        """
+        uri = "/loadbalancers/%s/nodes/%s" % (
+                utils.get_id(self.loadbalancer), utils.get_id(node))
+        error = self._mutate(self.manager.api.method_put, uri,
+                body={"node": changes})[1]
+        if error is None and isinstance(node, Node):
+            for key, val in changes.items():
+                setattr(node, key, val)
+            node._original_state = node.to_dict()
+        return error
+
+
+    def _mutate(self, fnc, *args, **kwargs):
+        """
+        Makes one call that changes the load balancer, first waiting for it
+        to become ACTIVE if the previous call made it immutable. Returns a
+        2-tuple of the response body and the error raised, one of which will
+        be None.
+        """
+        if self._fatal:
+            return None, self._fatal
+        mgr = self.manager
+        try:
+            if self._pending:
+                mgr.wait_for_active(self.loadbalancer)
+            resp, body = mgr._call_when_active(self.loadbalancer, fnc, *args,
+                    **kwargs)
+        except exc.LoadBalancerNotActive as e:
+            self._fatal = e
+            return None, e
+        except Exception as e:
+            return None, e
+        self._pending = True
+        return body, None
+
+
+
+class LoadBalancerScheduler(object):
+    """
+    Makes changes to many load balancers at once. A load balancer is
+    immutable while a change is being made to it, so the changes for each
+    load balancer are made one after another, while the changes for
+    different load balancers are made in parallel.
+
+    Each call to `submit()` returns a Future right away. The changes are made
+    in a pool of up to 'max_workers' threads. A load balancer's status is
+    only checked when it is known to be changing: after a change has been
+    made to it, or when a change is rejected because it is immutable. In
+    that case the next change waits, without tying up a thread, while the
+    status is checked every DEFAULT_ACTIVE_INTERVAL seconds at first,
+    doubling after each check up to DEFAULT_MAX_ACTIVE_INTERVAL seconds. If
+    the load balancer does not become ACTIVE within 'timeout' seconds, or
+    reaches a status from which it never will, its waiting changes fail with
+    LoadBalancerNotActive.
+
+    The threads are started when the first change is submitted. Call
+    `shutdown()` to stop them once all the changes are done, or use the
+    scheduler as a context manager, which does so on exit.
+    """
+    def __init__(self, manager, max_workers=None,
+            timeout=DEFAULT_ACTIVE_TIMEOUT):
+        self.manager = manager
+        self.max_workers = max_workers or utils.DEFAULT_MAX_WORKERS
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._states = {}
+        self._schedule = []
+        self._seq = itertools.count()
+        self._stopping = False
+        self._thread = None
+        self._executor = None
+        self.pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.polls = 0
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, type, value, traceback):
+        self.shutdown(wait=type is None)
+
+
+    def submit(self, loadbalancer, method, *args, **kwargs):
+        """
+        Schedules a change to the load balancer, and returns a Future for its
+        result. 'method' is either the name of a CloudLoadBalancerManager
+        method, such as "add_health_monitor", or any callable; it is called
+        with the load balancer, followed by the other arguments passed here.
+        Changes to the same load balancer are made in the order in which they
+        are submitted.
+        """
+        if isinstance(method, six.string_types):
+            method = getattr(self.manager, method)
+        job = {"call": partial(method, loadbalancer, *args, **kwargs),
+                "future": futures.Future(),
+                "attempts": 0,
+                }
+        lb_id = utils.get_id(loadbalancer)
+        with self._cond:
+            self._start()
+            state = self._states.get(lb_id)
+            if state is None:
+                state = self._states[lb_id] = {"loadbalancer": loadbalancer,
+                        "jobs": deque(),
+                        "busy": False,
+                        "changing": False,
+                        "interval": DEFAULT_ACTIVE_INTERVAL,
+                        "deadline": None,
+                        }
+            state["jobs"].append(job)
+            self.pending += 1
+            self.submitted += 1
+            if not state["busy"]:
+                state["busy"] = True
+                if state["changing"]:
+                    # The last change may have been made long ago, so wait
+                    # for the full timeout from now if it's still changing.
+                    self._changing(state)
+                self._executor.submit(self._step, state)
+        return job["future"]
+
+
+    def submit_many(self, loadbalancers, method, *args, **kwargs):
+        """
+        Schedules the same change to each of the load balancers, and returns
+        a list of the Futures for their results, in the same order.
+        """
+        return [self.submit(lb, method, *args, **kwargs)
+                for lb in loadbalancers]
+
+
+    def get_stats(self):
+        """
+        Returns a dict with the number of changes that have been 'submitted',
+        that are still 'pending', and that have 'completed' or 'failed', along
+        with the number of status checks ('polls') made so far.
+        """
+        with self._cond:
+            return {"submitted": self.submitted,
+                    "pending": self.pending,
+                    "completed": self.completed,
+                    "failed": self.failed,
+                    "polls": self.polls,
+                    }
+
+
+    def shutdown(self, wait=True):
+        """
+        Stops the scheduler's threads. If 'wait' is True, this first waits for
+        all of the submitted changes to be made; otherwise, the Futures of any
+        changes that have not started are cancelled. More changes can be
+        submitted afterwards, which starts the threads again.
+        """
+        with self._cond:
+            while wait and self.pending:
+                self._cond.wait()
+            self._stopping = True
+            self._cond.notify_all()
+            thread, executor = self._thread, self._executor
+            self._thread = self._executor = None
+            abandoned = [entry[2] for entry in self._schedule]
+            self._schedule = []
+        if thread:
+            thread.join()
+            # Changes that are being made are allowed to finish, but any
+            # others are cancelled if not waiting.
+            executor.shutdown(wait=True)
+        for state in abandoned:
+            self._fail_waiting(state, None)
+
+
+    def _start(self):
+        """
+        Starts the threads if they are not running. Must be called with the
+        lock held.
+        """
+        if self._thread:
+            return
+        self._stopping = False
+        self._executor = futures.ThreadPoolExecutor(
+                max_workers=self.max_workers)
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def _run(self):
+        with self._cond:
+            while not self._stopping:
+                if not self._schedule:
+                    self._cond.wait()
+                    continue
+                when, seq, state = self._schedule[0]
+                delay = when - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._schedule)
+                self._executor.submit(self._step, state)
+
+
+    def _step(self, state):
+        """
+        Makes the load balancer's waiting changes, until there are none left
+        or it has to wait for the load balancer to become ACTIVE.
+        """
+        lb = state["loadbalancer"]
+        while True:
+            with self._cond:
+                stopping = self._stopping
+            if stopping:
+                # The scheduler was shut down without waiting for these.
+                self._fail_waiting(state, None)
+                return
+            if state["changing"]:
+                try:
+                    status = self.manager.get_status(lb)
+                except Exception as e:
+                    self._fail_waiting(state, e)
+                    return
+                with self._cond:
+                    self.polls += 1
+                if status in FAILED_STATUSES:
+                    self._fail_waiting(state, exc.LoadBalancerNotActive(
+                            "Load balancer '%s' has a status of '%s'." % (
+                            utils.get_id(lb), status)))
+                    return
+                if status != "ACTIVE":
+                    if time.time() > state["deadline"]:
+                        self._fail_waiting(state, exc.LoadBalancerNotActive(
+                                "Load balancer '%s' was still '%s' after %s "
+                                "seconds." % (utils.get_id(lb), status,
+                                self.timeout)))
+                    else:
+                        self._wait(state)
+                    return
+                state["changing"] = False
+            with self._cond:
+                if not state["jobs"]:
+                    state["busy"] = False
+                    return
+                job = state["jobs"].popleft()
+            if (not job["attempts"] and
+                    not job["future"].set_running_or_notify_cancel()):
+                self._finish(job)
+                continue
+            job["attempts"] += 1
+            try:
+                result = job["call"]()
+            except exc.ClientException as e:
+                if (_is_immutable_error(e) and
+                        job["attempts"] <= DEFAULT_IMMUTABLE_RETRIES):
+                    # Try again once the load balancer is ACTIVE.
+                    with self._cond:
+                        state["jobs"].appendleft(job)
+                    self._changing(state)
+                    self._wait(state)
+                    return
+                job["future"].set_exception(e)
+            except Exception as e:
+                job["future"].set_exception(e)
+            else:
+                job["future"].set_result(result)
+                self._changing(state)
+            self._finish(job)
+            if state["changing"]:
+                with self._cond:
+                    if not state["jobs"]:
+                        state["busy"] = False
+                        return
+                self._wait(state)
+                return
+
+
+    def _changing(self, state):
+        """
+        Records that the load balancer has started changing.
+        """
+        state["changing"] = True
+        state["interval"] = DEFAULT_ACTIVE_INTERVAL
+        state["deadline"] = time.time() + (self.timeout or float("inf"))
+
+
+    def _wait(self, state):
+        """
+        Schedules the next check of the load balancer's status.
+        """
+        with self._cond:
+            if self._stopping:
+                stopping = True
+            else:
+                stopping = False
+                when = time.time() + state["interval"]
+                state["interval"] = min(state["interval"] * 2,
+                        DEFAULT_MAX_ACTIVE_INTERVAL)
+                heapq.heappush(self._schedule, (when, next(self._seq), state))
+                self._cond.notify_all()
+        if stopping:
+            # The scheduler was shut down without waiting for these changes.
+            self._fail_waiting(state, None)
+
+
+    def _fail_waiting(self, state, error):
+        """
+        Fails all of the load balancer's waiting changes with 'error', or
+        cancels them if it is None.
+        """
+        with self._cond:
+            jobs = list(state["jobs"])
+            state["jobs"].clear()
+            state["busy"] = False
+        for job in jobs:
+            future = job["future"]
+            # A change that is being retried has already started running.
+            running = bool(job["attempts"])
+            if not running:
+                if error is None:
+                    future.cancel()
+                running = future.set_running_or_notify_cancel()
+            if running:
+                future.set_exception(error or futures.CancelledError())
+            self._finish(job)
+
+
+    def _finish(self, job):
+        """
+        Updates the counts once a change's Future has been resolved.
+        """
+        future = job["future"]
+        with self._cond:
+            self.pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+            self._cond.notify_all()
+
+
+
+class _StatsHistory(object):
+    """
+    Holds the most recent 'size' samples of a load balancer's stats. Each
+    sample is a row of its timestamp followed by the values of STATS_COUNTERS
+    and STATS_GAUGES, and all of the rows are kept in a single array of
+    floats, which is a NumPy array if NumPy is installed. Once the array is
+    full, each new row overwrites the oldest one.
+    """
+    columns = ("timestamp", ) + STATS_COUNTERS + STATS_GAUGES
+
+    def __init__(self, size):
+        self.size = size
+        self.width = len(self.columns)
+        if numpy is not None:
+            self._data = numpy.zeros((size, self.width))
+        else:
+            self._data = array.array(str("d"), [0.0]) * (size * self.width)
+        self._next = 0
+        self.count = 0
+
+
+    def __len__(self):
+        return self.count
+
+
+    def append(self, stamp, stats):
+        """
+        Adds a row for the stats sampled at 'stamp'. Stats that are missing
+        are recorded as zero.
+        """
+        row = [stamp] + [float(stats.get(name) or 0)
+                for name in self.columns[1:]]
+        if numpy is not None:
+            self._data[self._next] = row
+        else:
+            start = self._next * self.width
+            self._data[start:start + self.width] = array.array(str("d"), row)
+        self._next = (self._next + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+
+    def _positions(self):
+        """
+        Returns the positions of the rows, oldest first.
+        """
+        first = (self._next - self.count) % self.size
+        return [(first + num) % self.size for num in range(self.count)]
+
+
+    def column(self, name):
+        """
+        Returns the values in the named column, oldest first, as a NumPy
+        array if NumPy is installed, or otherwise a list.
+        """
+        col = self.columns.index(name)
+        positions = self._positions()
+        if numpy is not None:
+            return self._data[positions, col]
+        return [self._data[pos * self.width + col] for pos in positions]
+
+
+    def row(self, num):
+        """
+        Returns the row at position 'num' counting from the oldest, or from
+        the newest if 'num' is negative, as a dict keyed by column name.
+        """
+        pos = self._positions()[num]
+        if numpy is not None:
+            values = self._data[pos].tolist()
+        else:
+            values = self._data[pos * self.width:(pos + 1) * self.width]
+        return dict(zip(self.columns, values))
+
+
+    def increase(self, name):
+        """
+        Returns the total increase in the named counter over all the rows. A
+        counter that goes down has been reset, so it counts from zero again.
+        """
+        values = self.column(name)
+        if numpy is not None:
+            diffs = numpy.diff(values)
+            diffs = numpy.where(diffs < 0, values[1:], diffs)
+            return float(diffs.sum())
+        return sum([(curr - prev) if curr >= prev else curr
+                for prev, curr in zip(values, values[1:])])
+
+
+
+class LoadBalancerStatsCollector(object):
+    """
+    Collects the stats of many load balancers at a regular interval, so that
+    dashboards can show how they change over time without fetching them
+    again for each view.
+
+    Every 'interval' seconds, the stats of all of the load balancers are
+    fetched concurrently in a pool of up to 'max_workers' threads. The most
+    recent 'history' samples of each load balancer are kept in a fixed-size
+    array of floats, which is a NumPy array if NumPy is installed. From these,
+    `get_metrics()` works out the latest values, the change in each counter
+    since the previous sample, and the rate at which each counter increased
+    over the period covered by the history. `get_series()` returns the
+    history of a single stat.
+
+    If 'on_sample' is given, it is called with the result of `get_metrics()`
+    after each round of sampling. Load balancers can be added and removed at
+    any time with `add_loadbalancer()` and `remove_loadbalancer()`. Call
+    `start()` to begin collecting in a background thread, and `stop()` to
+    finish; `sample()` can also be called directly to take a single round
+    of samples.
+    """
+    def __init__(self, loadbalancers=None, interval=60, history=60,
+            max_workers=None, on_sample=None):
+        self.interval = interval
+        self.history = history
+        self.max_workers = max_workers or utils.DEFAULT_MAX_WORKERS
+        self.on_sample = on_sample
+        self._cond = threading.Condition()
+        self._loadbalancers = {}
+        self._histories = {}
+        self._stopping = False
+        self._thread = None
+        self.rounds = 0
+        self.errors = 0
+        for lb in loadbalancers or []:
+            self.add_loadbalancer(lb)
+
+
+    def add_loadbalancer(self, loadbalancer):
+        """
+        Starts collecting the stats of the specified load balancer. Unlike the
+        other methods, this needs a CloudLoadBalancer object rather than an
+        ID, since the stats are fetched through it.
+        """
+        with self._cond:
+            if loadbalancer.id not in self._loadbalancers:
+                self._loadbalancers[loadbalancer.id] = loadbalancer
+                self._histories[loadbalancer.id] = _StatsHistory(self.history)
+
+
+    def remove_loadbalancer(self, loadbalancer):
+        """
+        Stops collecting the stats of the specified load balancer, and
+        discards its history. The load balancer may be passed as either its
+        ID or a CloudLoadBalancer object.
+        """
+        with self._cond:
+            lb_id = utils.get_id(loadbalancer)
+            self._loadbalancers.pop(lb_id, None)
+            self._histories.pop(lb_id, None)
+
+
+    def start(self):
+        """
+        Starts the collecting thread. Returns the collector, so that it can
+        be created and started in a single expression.
+        """
+        if self._thread:
+            return self
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+
+    def stop(self, wait=True):
+        """
+        Stops collecting. If 'wait' is True, this does not return until any
+        round of sampling that is in progress has finished.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread and wait:
+            self._thread.join()
+        self._thread = None
+
+
+    def sample(self):
+        """
+        Fetches the current stats of all of the load balancers, adds them to
+        their histories, and returns the result of `get_metrics()`. Load
+        balancers whose stats cannot be fetched are skipped for this round.
+        """
+        log = logging.getLogger("pyrax")
+        with self._cond:
+            lbs = list(self._loadbalancers.values())
+        results = utils.run_concurrently(
+                lambda lb: (lb.get_stats(), time.time()), lbs,
+                max_workers=self.max_workers)
+        with self._cond:
+            for lb, result, err in results:
+                if err is not None:
+                    log.error("Error getting the stats for load balancer "
+                            "'%s': %s", lb.id, err)
+                    self.errors += 1
+                    continue
+                history = self._histories.get(lb.id)
+                if history is None:
+                    # The load balancer has been removed.
+                    continue
+                stats, stamp = result
+                history.append(stamp, stats or {})
+            self.rounds += 1
+        metrics = self.get_metrics()
+        if self.on_sample:
+            try:
+                self.on_sample(metrics)
+            except Exception as e:
+                log.error("Error in the load balancer stats callback: %s", e)
+        return metrics
+
+
+    def get_series(self, loadbalancer, name):
+        """
+        Returns the history of the named stat for the specified load
+        balancer, oldest first, as a 2-tuple of the sample times and the
+        values. These are NumPy arrays if NumPy is installed; otherwise they
+        are lists. The load balancer may be passed as either its ID or a
+        CloudLoadBalancer object.
+        """
+        if name not in STATS_COUNTERS + STATS_GAUGES:
+            raise ValueError("Unknown load balancer stat: '%s'." % name)
+        with self._cond:
+            history = self._histories.get(utils.get_id(loadbalancer))
+            if not history:
+                if numpy is not None:
+                    return numpy.zeros(0), numpy.zeros(0)
+                return [], []
+            return history.column("timestamp"), history.column(name)
+
+
+    def get_metrics(self):
+        """
+        Returns a dict with the latest metrics for each load balancer that
+        has been sampled in 'loadbalancers', keyed by ID, and a summary of
+        them all in 'fleet'. Each load balancer's metrics contain:
+
+            sampled_at: the time of the latest sample
+            stats: a dict of the latest value of each stat
+            deltas: a dict of the increase in each counter since the previous
+                sample, or None until there are at least two samples
+            rates: a dict of the increase in each counter per second over
+                the period covered by the history, or None until there are
+                at least two samples
+
+        The 'fleet' summary has the sums of 'currentConn' and
+        'currentConnSsl' across all of the load balancers, and the sums of
+        their 'rates'.
+        """
+        with self._cond:
+            lbs = {}
+            fleet = {"currentConn": 0, "currentConnSsl": 0,
+                    "rates": dict.fromkeys(STATS_COUNTERS, 0.0)}
+            for lb_id, history in self._histories.items():
+                if not history:
+                    continue
+                last = history.row(-1)
+                stamp = last.pop("timestamp")
+                deltas = rates = None
+                if len(history) > 1:
+                    prev = history.row(-2)
+                    deltas = dict((name, last[name] - prev[name]
+                            if last[name] >= prev[name] else last[name])
+                            for name in STATS_COUNTERS)
+                    elapsed = stamp - history.row(0)["timestamp"]
+                    if elapsed > 0:
+                        rates = dict((name, history.increase(name) / elapsed)
+                                for name in STATS_COUNTERS)
+                        for name, rate in rates.items():
+                            fleet["rates"][name] += rate
+                lbs[lb_id] = {"sampled_at": stamp,
+                        "stats": last,
+                        "deltas": deltas,
+                        "rates": rates,
+                        }
+                fleet["currentConn"] += last["currentConn"]
+                fleet["currentConnSsl"] += last["currentConnSsl"]
+        return {"loadbalancers": lbs, "fleet": fleet}
+
+
+    def _run(self):
+        while True:
+            start = time.time()
+            self.sample()
+            with self._cond:
+                delay = self.interval - (time.time() - start)
+                if not self._stopping and delay > 0:
+                    self._cond.wait(delay)
+                if self._stopping:
+                    return
+
+
+
 class CloudLoadBalancerClient(BaseClient):
     """
     This is the primary class for interacting with Cloud Load Balancers.
@@ -1343,6 +2371,61 @@ class CloudLoadBalancerClient(BaseClient):
         return node.delete()
 
 
+    @assure_loadbalancer
+    def delete_nodes(self, loadbalancer, nodes):
+        """Removes the nodes from the load balancer with a single call."""
+        return loadbalancer.delete_nodes(nodes)
+
+
+    @assure_loadbalancer
+    def node_changes(self, loadbalancer):
+        """
+        Returns a NodeChangeQueue for collecting changes to the load
+        balancer's nodes and applying them with as few calls as possible.
+        """
+        return loadbalancer.node_changes()
+
+
+    def collect_stats(self, loadbalancers=None, interval=60, history=60,
+            max_workers=None, on_sample=None):
+        """
+        Starts collecting the stats of the specified load balancers, or of
+        all the load balancers in the account if none are specified, every
+        'interval' seconds. The last 'history' samples of each are kept, and
+        'on_sample', if given, is called with the metrics after each round.
+        Returns the running LoadBalancerStatsCollector; see that class for
+        details.
+        """
+        if loadbalancers is None:
+            loadbalancers = self.list()
+        loadbalancers = [lb if isinstance(lb, CloudLoadBalancer) else
+                self._manager.get(lb) for lb in loadbalancers]
+        collector = LoadBalancerStatsCollector(loadbalancers=loadbalancers,
+                interval=interval, history=history, max_workers=max_workers,
+                on_sample=on_sample)
+        return collector.start()
+
+
+    def get_scheduler(self, max_workers=None,
+            timeout=DEFAULT_ACTIVE_TIMEOUT):
+        """
+        Returns a LoadBalancerScheduler for making changes to many load
+        balancers at once, waiting for each one to become ACTIVE between its
+        changes.
+        """
+        return LoadBalancerScheduler(self._manager, max_workers=max_workers,
+                timeout=timeout)
+
+
+    @assure_loadbalancer
+    def wait_for_active(self, loadbalancer, timeout=DEFAULT_ACTIVE_TIMEOUT):
+        """
+        Waits until the load balancer's status is ACTIVE, so that it can be
+        changed again.
+        """
+        return loadbalancer.wait_for_active(timeout=timeout)
+
+
     def update_node(self, node):
         """Updates the node's attributes."""
         return node.update()
@@ -1400,6 +2483,25 @@ class CloudLoadBalancerClient(BaseClient):
         return loadbalancer.delete_access_list_items(item_ids)
 
 
+    @assure_loadbalancer
+    def plan_access_list(self, loadbalancer, desired):
+        """
+        Returns the changes needed to make the load balancer's access list
+        match the 'desired' one, without making them.
+        """
+        return loadbalancer.plan_access_list(desired)
+
+
+    @assure_loadbalancer
+    def reconcile_access_list(self, loadbalancer, desired, dry_run=False):
+        """
+        Makes the load balancer's access list match the 'desired' one, with
+        as few API calls as possible, and returns the changes that were made.
+        'desired' is a list of dicts with 'address' and 'type' keys.
+        """
+        return loadbalancer.reconcile_access_list(desired, dry_run=dry_run)
+
+
     @assure_loadbalancer
     def get_health_monitor(self, loadbalancer):
         """
@@ -29,6 +29,9 @@ class PyraxException(Exception):
 class AccessListIDNotFound(PyraxException):
     pass
 
+class AiohttpModuleNotInstalled(PyraxException):
+    pass
+
 class AuthenticationFailed(PyraxException):
     pass
 
@@ -188,6 +191,12 @@ class InvalidVirtualIPVersion(PyraxException):
 class InvalidVolumeResize(PyraxException):
     pass
 
+class InvalidZoneFile(PyraxException):
+    pass
+
+class LoadBalancerNotActive(PyraxException):
+    pass
+
 class MissingAuthSettings(PyraxException):
     pass
 
@@ -224,6 +233,9 @@ class MonitoringCheckTargetNotSpecified(PyraxException):
 class MonitoringZonesPollMissing(PyraxException):
     pass
 
+class MsgpackModuleNotInstalled(PyraxException):
+    pass
+
 class NetworkCIDRInvalid(PyraxException):
     pass
 
@@ -305,6 +317,12 @@ class PTRRecordUpdateFailed(PyraxException):
 class QueueClientIDNotDefined(PyraxException):
     pass
 
+class QueueMessagePostFailed(PyraxException):
+    pass
+
+class QueueProducerClosed(PyraxException):
+    pass
+
 class ServiceNotAvailable(PyraxException):
     pass
 
@@ -326,6 +344,9 @@ class UnattachedVirtualIP(PyraxException):
 class UnicodePathError(PyraxException):
     pass
 
+class UnknownQueueCodec(PyraxException):
+    pass
+
 class UnsharableImage(PyraxException):
     pass
 
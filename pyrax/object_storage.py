@@ -21,17 +21,20 @@ from __future__ import absolute_import, print_function, unicode_literals
 import datetime
 from functools import wraps
 import hashlib
+import heapq
 import hmac
 import json
 import logging
 import math
 import mimetypes
+import mmap
 import os
 import re
 import six
 import threading
 import time
 import uuid
+import zlib
 
 import pyrax
 from pyrax.client import BaseClient
@@ -49,12 +52,21 @@ OBJECT_META_PREFIX = "X-Object-Meta-"
 MAX_FILE_SIZE = 5368709119
 # Default size for chunked uploads, in bytes
 DEFAULT_CHUNKSIZE = 65536
+# Local files of at least this size, in bytes, are memory-mapped when uploaded
+# by path, so that their contents are hashed and sent without being copied
+# into intermediate buffers. Set to None to always read files normally.
+MMAP_THRESHOLD = 16 * 1024 * 1024
 # The default for CDN when TTL is not specified.
 DEFAULT_CDN_TTL = 86400
 # When comparing files dates, represents a date older than anything.
 EARLY_DATE_STR = "1900-01-01T00:00:00"
 # Maximum number of objects that can be passed to bulk-delete
 MAX_BULK_DELETE = 10000
+# Content types that are compressed when uploading with 'compress=True'. These
+# are shell-style patterns, so 'text/*' matches any text type.
+COMPRESSIBLE_CONTENT_TYPES = ["text/*", "application/json",
+        "application/javascript", "application/x-javascript",
+        "application/xml", "application/x-ndjson", "image/svg+xml"]
 
 # Used to indicate values that are lazy-loaded
 class Fault_cls(object):
@@ -144,6 +156,85 @@ def _handle_object_not_found(fnc):
     return wrapped
 
 
+def _parse_metadata(headers, prefix, default_prefix):
+    """
+    Returns a dict of the metadata contained in the supplied headers. Only the
+    headers that begin with 'prefix' (or 'default_prefix' if 'prefix' is None)
+    are included, with the prefix removed and any hyphens converted to
+    underscores.
+    """
+    if prefix is None:
+        prefix = default_prefix
+    low_prefix = prefix.lower()
+    ret = {}
+    for hkey, hval in list(headers.items()):
+        if hkey.lower().startswith(low_prefix):
+            cleaned = hkey.replace(low_prefix, "").replace("-", "_")
+            ret[cleaned] = hval
+    return ret
+
+
+def _is_compressible(obj_name, content_type=None, compress_types=None):
+    """
+    Returns True if an object with the given name and content type should be
+    compressed on upload. If no content type is given, it is guessed from the
+    object name. The content type must match one of the patterns in
+    'compress_types', which defaults to COMPRESSIBLE_CONTENT_TYPES.
+    """
+    if compress_types is None:
+        compress_types = COMPRESSIBLE_CONTENT_TYPES
+    ctype = content_type or mimetypes.guess_type(obj_name)[0]
+    if not ctype:
+        return False
+    ctype = ctype.split(";")[0].strip().lower()
+    return utils.match_pattern(ctype, compress_types)
+
+
+def _gzip_stream(content, chunk_size=None, encoding="utf8"):
+    """
+    Generator that reads 'content' in blocks of 'chunk_size' bytes and yields
+    it compressed in gzip format, so that it can be uploaded using chunked
+    transfer without having to compress the whole thing in memory first.
+    'content' can be a file-like object, or a string of bytes or text.
+    """
+    chunk_size = chunk_size or DEFAULT_CHUNKSIZE
+    if isinstance(content, six.text_type):
+        content = content.encode(encoding)
+    if isinstance(content, six.binary_type):
+        content = six.BytesIO(content)
+    # The extra 16 in wbits tells zlib to write the gzip header and trailer.
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED,
+            16 + zlib.MAX_WBITS)
+    while True:
+        data = content.read(chunk_size)
+        if not data:
+            break
+        if isinstance(data, six.text_type):
+            data = data.encode(encoding)
+        compressed = compressor.compress(data)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def get_gzip_checksum(file_or_path, chunk_size=None):
+    """
+    Returns the MD5 checksum of the gzip-compressed version of a file, as it
+    would be stored by an upload with 'compress=True'. This is what the etag of
+    such an object will be, so it can be compared to that of a remote object
+    to see if the file has changed.
+    """
+    md = hashlib.md5()
+    if hasattr(file_or_path, "read"):
+        for chunk in _gzip_stream(file_or_path, chunk_size):
+            md.update(chunk)
+    else:
+        with open(file_or_path, "rb") as ff:
+            for chunk in _gzip_stream(ff, chunk_size):
+                md.update(chunk)
+    return md.hexdigest()
+
+
 def get_file_size(fileobj):
     """
     Returns the size of a file-like object.
@@ -155,6 +246,156 @@ def get_file_size(fileobj):
     return total_size
 
 
+def _usage_deltas(usage, previous, top):
+    """
+    Returns a dict describing how the account usage in 'usage' has changed
+    since the 'previous' snapshot. Only containers and groups whose object
+    count or size has changed are included.
+    """
+    def _diff(current, prior):
+        ret = {}
+        for name in set(current) | set(prior):
+            cur = current.get(name, {})
+            old = prior.get(name, {})
+            diff = {"bytes": cur.get("bytes", 0) - old.get("bytes", 0),
+                    "count": cur.get("count", 0) - old.get("count", 0)}
+            if diff["bytes"] or diff["count"]:
+                ret[name] = diff
+        return ret
+
+    curr_conts = usage["containers"]
+    prev_conts = previous.get("containers", {})
+    containers = _diff(curr_conts, prev_conts)
+    growth = heapq.nlargest(top, containers.items(),
+            key=lambda item: item[1]["bytes"])
+    return {
+            "seconds": usage["timestamp"] - previous.get("timestamp",
+                usage["timestamp"]),
+            "container_count": (usage["container_count"] -
+                previous.get("container_count", 0)),
+            "object_count": (usage["object_count"] -
+                previous.get("object_count", 0)),
+            "total_bytes": usage["total_bytes"] - previous.get("total_bytes", 0),
+            "added": sorted(set(curr_conts) - set(prev_conts)),
+            "removed": sorted(set(prev_conts) - set(curr_conts)),
+            "containers": containers,
+            "groups": _diff(usage["groups"], previous.get("groups", {})),
+            "top_growth_by_bytes": [[name, diff["bytes"]]
+                for name, diff in growth if diff["bytes"] > 0],
+            }
+
+
+def summarize_usage(containers_info, top=10, previous=None, delimiter=None):
+    """
+    Aggregates the storage used by an account from an iterable of container
+    info dicts, such as those returned by `iter_containers_info()`. Each must
+    have 'name', 'count' and 'bytes' keys. Since the iterable is consumed one
+    container at a time, it does not need to be a list.
+
+    Returns a dict with the following keys:
+        timestamp: the time the summary was created
+        container_count, object_count, total_bytes: totals for the account
+        containers: a dict keyed by container name, with the 'count' and
+                'bytes' of each container
+        groups: when 'delimiter' is specified, containers are grouped by the
+                part of their name before the first occurrence of 'delimiter',
+                and this is a dict keyed by group with the 'count', 'bytes'
+                and number of 'containers' for each group. Otherwise, it is
+                empty.
+        top_by_bytes, top_by_count: lists of [name, value] pairs for the 'top'
+                largest containers by size and by number of objects
+        deltas: None, unless a 'previous' summary is passed, in which case it
+                is a dict with the change in each of the totals, the number of
+                'seconds' between the two summaries, the names of the
+                containers 'added' and 'removed', the changes to 'containers'
+                and 'groups' that grew or shrank, and 'top_growth_by_bytes'.
+
+    The summary only contains JSON-compatible values, so it can be saved with
+    `json.dump()`, and loaded later to use as the 'previous' summary.
+    """
+    usage = {"timestamp": time.time(), "container_count": 0,
+            "object_count": 0, "total_bytes": 0, "containers": {},
+            "groups": {}}
+    for info in containers_info:
+        name = info["name"]
+        count = int(info.get("count", 0))
+        nbytes = int(info.get("bytes", 0))
+        usage["container_count"] += 1
+        usage["object_count"] += count
+        usage["total_bytes"] += nbytes
+        usage["containers"][name] = {"count": count, "bytes": nbytes}
+        if delimiter:
+            group = name.split(delimiter, 1)[0]
+            grp = usage["groups"].setdefault(group,
+                    {"count": 0, "bytes": 0, "containers": 0})
+            grp["count"] += count
+            grp["bytes"] += nbytes
+            grp["containers"] += 1
+    conts = usage["containers"]
+    for key, att in (("top_by_bytes", "bytes"), ("top_by_count", "count")):
+        largest = heapq.nlargest(top, conts, key=lambda nm: conts[nm][att])
+        usage[key] = [[name, conts[name][att]] for name in largest]
+    usage["deltas"] = None
+    if previous is not None:
+        usage["deltas"] = _usage_deltas(usage, previous, top)
+    return usage
+
+
+def _use_mmap(fsize):
+    """
+    Returns True if a local file of the given size should be memory-mapped
+    when it is uploaded.
+    """
+    if not MMAP_THRESHOLD:
+        return False
+    return MMAP_THRESHOLD <= fsize <= MAX_FILE_SIZE
+
+
+class _MappedFile(object):
+    """
+    Context manager that memory-maps a local file for reading, and returns a
+    memoryview of its contents. The view can be used as the body of an upload
+    request: both the checksum calculation and the socket work directly on the
+    mapped pages, instead of reading the file through a series of small
+    string buffers.
+
+    Under Python 2, mmap objects cannot be wrapped in a memoryview, so the
+    map itself is returned, and is read like a regular file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._map = None
+        self.view = None
+
+
+    def __enter__(self):
+        self._file = open(self.path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                    access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        try:
+            self.view = memoryview(self._map)
+        except TypeError:
+            self.view = self._map
+        return self.view
+
+
+    def __exit__(self, type, value, traceback):
+        try:
+            if self.view is not self._map:
+                self.view.release()
+            self._map.close()
+        except BufferError:
+            # Something is still holding a view of the map; it will be
+            # unmapped when that is garbage-collected.
+            pass
+        self._file.close()
+
+
 
 class Container(BaseResource):
     def __init__(self, *args, **kwargs):
@@ -166,6 +407,7 @@ class Container(BaseResource):
         self._cdn_streaming_uri = FAULT
         self._cdn_ios_uri = FAULT
         self._cdn_log_retention = FAULT
+        self._headers = FAULT
         self.object_manager = StorageObjectManager(self.manager.api,
                 uri_base=self.name, resource_class=StorageObject)
         self._non_display = ["object_manager"]
@@ -234,10 +476,48 @@ class Container(BaseResource):
                 self._cdn_log_retention = (value == "True")
 
 
-    def get_metadata(self, prefix=None):
+    def _set_cdn_info(self, info):
+        """
+        Sets the CDN-related attributes from an entry in the CDN container
+        listing. If 'info' is None, the container has never been CDN-enabled.
+        """
+        self._cdn_enabled = False
+        self._set_cdn_defaults()
+        if not info:
+            return
+        self._cdn_enabled = bool(info.get("cdn_enabled"))
+        self._cdn_uri = info.get("cdn_uri")
+        self._cdn_ssl_uri = info.get("cdn_ssl_uri")
+        self._cdn_streaming_uri = info.get("cdn_streaming_uri")
+        self._cdn_ios_uri = info.get("cdn_ios_uri")
+        self._cdn_log_retention = bool(info.get("log_retention"))
+        ttl = info.get("ttl")
+        if ttl is not None:
+            self._cdn_ttl = int(ttl)
+
+
+    def _set_headers(self, headers):
+        """
+        Stores the headers returned from a HEAD call for this container, and
+        updates the byte and object counts from them.
+        """
+        self._headers = headers
+        self.total_bytes = int(headers.get("x-container-bytes-used", "0"))
+        self.object_count = int(headers.get("x-container-object-count", "0"))
+
+
+    def get_metadata(self, prefix=None, cached=False):
         """
         Returns a dictionary containing the metadata for this container.
+
+        By default this makes an API call to get the current metadata. If the
+        container's headers have already been loaded by a call to the client's
+        `fetch_container_details()` method, you can pass `cached=True` to use
+        those headers instead.
         """
+        if cached and self._headers is not FAULT:
+            return _parse_metadata(self._headers, prefix,
+                    CONTAINER_META_PREFIX)
         return self.manager.get_metadata(self, prefix=prefix)
 
 
@@ -259,6 +539,7 @@ class Container(BaseResource):
         present. For non-standard headers, you must include a non-None prefix,
         such as an empty string.
         """
+        self._headers = FAULT
         return self.manager.set_metadata(self, metadata, clear=clear,
                 prefix=prefix)
 
@@ -268,6 +549,7 @@ class Container(BaseResource):
         Removes the specified key from the container's metadata. If the key
         does not exist in the metadata, nothing is done.
         """
+        self._headers = FAULT
         return self.manager.remove_metadata_key(self, key, prefix=prefix)
 
 
@@ -392,7 +674,7 @@ class Container(BaseResource):
     def create(self, file_or_path=None, data=None, obj_name=None,
             content_type=None, etag=None, content_encoding=None,
             content_length=None, ttl=None, chunked=False, metadata=None,
-            chunk_size=None, headers=None, return_none=False):
+            chunk_size=None, headers=None, return_none=False, compress=False):
         """
         Creates or replaces a storage object in this container.
 
@@ -421,13 +703,18 @@ class Container(BaseResource):
         the `content_length` and `etag` parameters. This allows the data to be
         streamed to the object in the container without having to be written to
         disk first.
+
+        If 'compress' is True and the content type (either supplied or guessed
+        from the object name) is one of COMPRESSIBLE_CONTENT_TYPES, the content
+        is gzip-compressed as it is uploaded, and stored with a
+        'Content-Encoding' of 'gzip'.
         """
         return self.object_manager.create(file_or_path=file_or_path,
                 data=data, obj_name=obj_name, content_type=content_type,
                 etag=etag, content_encoding=content_encoding,
                 content_length=content_length, ttl=ttl, chunked=chunked,
                 metadata=metadata, chunk_size=chunk_size, headers=headers,
-                return_none=return_none)
+                return_none=return_none, compress=compress)
 
 
     def store_object(self, obj_name, data, content_type=None, etag=None,
@@ -450,7 +737,7 @@ class Container(BaseResource):
 
     def upload_file(self, file_or_path, obj_name=None, content_type=None,
             etag=None, return_none=False, content_encoding=None, ttl=None,
-            content_length=None, headers=None):
+            content_length=None, headers=None, compress=False):
         """
         Uploads the specified file to this container. If no name is supplied,
         the file's name will be used. Either a file path or an open file-like
@@ -467,6 +754,9 @@ class Container(BaseResource):
         be stored in seconds in the `ttl` parameter. If this is specified, the
         object will be deleted after that number of seconds.
 
+        If 'compress' is True, text-based files are gzip-compressed as they
+        are uploaded; see create() for details.
+
         The 'extra_info' parameter is included for backwards compatibility. It
         is no longer used at all, and will not be modified with swiftclient
         info, since swiftclient is not used any more.
@@ -475,7 +765,7 @@ class Container(BaseResource):
                 content_type=content_type, etag=etag,
                 content_encoding=content_encoding, headers=headers,
                 content_length=content_length, ttl=ttl,
-                return_none=return_none)
+                return_none=return_none, compress=compress)
 
 
     def fetch(self, obj, include_meta=False, chunk_size=None, size=None,
@@ -688,6 +978,25 @@ class Container(BaseResource):
                 prefix=prefix)
 
 
+    def bulk_set_object_metadata(self, items, clear=False, prefix=None,
+            current_metadata=None, max_workers=None):
+        """
+        Updates the metadata for many objects in this container concurrently.
+        'items' is either a dict mapping object names to their new metadata,
+        or a list of (object, metadata) 2-tuples.
+
+        If you know the current metadata of any of the objects, pass it in
+        'current_metadata' as a dict keyed by object name to avoid having to
+        retrieve it for each object before updating.
+
+        Returns a dict with the number of objects 'updated' and 'failed', and
+        a list of 'errors' for any failures.
+        """
+        return self.object_manager.bulk_set_metadata(items, clear=clear,
+                prefix=prefix, current_metadata=current_metadata,
+                max_workers=max_workers)
+
+
     def list_subdirs(self, marker=None, limit=None, prefix=None, delimiter=None,
             full_listing=False):
         """
@@ -970,15 +1279,7 @@ class ContainerManager(BaseManager):
         Returns a dictionary containing the metadata for the container.
         """
         headers = self.get_headers(container)
-        if prefix is None:
-            prefix = CONTAINER_META_PREFIX
-        low_prefix = prefix.lower()
-        ret = {}
-        for hkey, hval in list(headers.items()):
-            if hkey.lower().startswith(low_prefix):
-                cleaned = hkey.replace(low_prefix, "").replace("-", "_")
-                ret[cleaned] = hval
-        return ret
+        return _parse_metadata(headers, prefix, CONTAINER_META_PREFIX)
 
 
     @_handle_container_not_found
@@ -1137,7 +1438,7 @@ class ContainerManager(BaseManager):
         return temp_url
 
 
-    def list_containers_info(self, limit=None, marker=None):
+    def list_containers_info(self, limit=None, marker=None, prefix=None):
         """Returns a list of info on Containers.
 
         For each container, a dict containing the following keys is returned:
@@ -1147,13 +1448,34 @@ class ContainerManager(BaseManager):
             bytes - the total bytes in the container
         """
         uri = ""
-        qs = utils.dict_to_qs({"limit": limit, "marker": marker})
+        qs = utils.dict_to_qs({"limit": limit, "marker": marker,
+                "prefix": prefix})
         if qs:
             uri += "%s?%s" % (uri, qs)
         resp, resp_body = self.api.method_get(uri)
         return resp_body
 
 
+    def iter_containers_info(self, prefix=None, limit=None):
+        """
+        Generator that yields the info dict (see `list_containers_info()`) for
+        every container in the account, or only those whose names begin with
+        'prefix'. The listing is requested one page of up to 'limit'
+        containers at a time as the results are consumed, so accounts with
+        any number of containers can be processed without holding the entire
+        listing in memory.
+        """
+        marker = None
+        while True:
+            page = self.list_containers_info(limit=limit, marker=marker,
+                    prefix=prefix)
+            if not page:
+                return
+            for info in page:
+                yield info
+            marker = page[-1]["name"]
+
+
     def list_public_containers(self):
         """
         Returns a list of the names of all CDN-enabled containers.
@@ -1162,6 +1484,99 @@ class ContainerManager(BaseManager):
         return [cont["name"] for cont in resp_body]
 
 
+    def list_cdn_info(self, limit=None, marker=None):
+        """
+        Returns a list of dicts containing the CDN settings for the containers
+        in the account that are, or have ever been, CDN-enabled. Pagination is
+        supported through the optional 'marker' and 'limit' parameters.
+        """
+        uri = ""
+        qs = utils.dict_to_qs({"limit": limit, "marker": marker})
+        if qs:
+            uri = "?%s" % qs
+        resp, resp_body = self.api.cdn_request(uri, "GET")
+        return resp_body or []
+
+
+    def _all_cdn_info(self):
+        """
+        Returns a dict keyed by container name of the CDN settings for every
+        container in the CDN container listing, paging through the listing as
+        needed. If the CDN is not available, an empty dict is returned.
+        """
+        ret = {}
+        marker = None
+        while True:
+            try:
+                page = self.list_cdn_info(marker=marker)
+            except exc.NotCDNEnabled:
+                break
+            if not page:
+                break
+            for info in page:
+                ret[info["name"]] = info
+            marker = page[-1]["name"]
+        return ret
+
+
+    def fetch_details(self, containers=None, include_metadata=True,
+            include_cdn=True, max_workers=None):
+        """
+        Fetches the headers and CDN settings for many containers at once, and
+        stores them in the corresponding Container objects, so that accessing
+        their CDN properties, or calling `get_metadata(cached=True)`, does not
+        require any further API calls.
+
+        The CDN settings for all the containers are obtained by paging through
+        the CDN container listing, rather than making a HEAD call for each
+        container. The headers for each container still require a HEAD call,
+        but these are made concurrently using up to 'max_workers' threads.
+        Pass False for either 'include_metadata' or 'include_cdn' to skip that
+        part of the process.
+
+        If 'containers' is not specified, all the containers in the account are
+        used. Containers may be passed either as Container objects or names.
+        Returns a list of the updated Container objects; any container whose
+        headers could not be retrieved will not be included.
+        """
+        if containers is None:
+            containers = self._list_all()
+        conts = [cont if isinstance(cont, Container) else
+                Container(self, {"name": cont}, loaded=False)
+                for cont in containers]
+        if include_cdn:
+            cdn_info = self._all_cdn_info()
+            for cont in conts:
+                cont._set_cdn_info(cdn_info.get(cont.name))
+        if not include_metadata:
+            return conts
+        ret = []
+        results = utils.run_concurrently(self.get_headers, conts,
+                max_workers=max_workers)
+        for cont, headers, err in results:
+            if err is not None:
+                continue
+            cont._set_headers(headers)
+            ret.append(cont)
+        return ret
+
+
+    def _list_all(self):
+        """
+        Returns a list of all the containers in the account, no matter how many
+        there are.
+        """
+        ret = []
+        marker = None
+        while True:
+            page = self.list(marker=marker)
+            if not page:
+                break
+            ret.extend(page)
+            marker = page[-1].name
+        return ret
+
+
     def make_public(self, container, ttl=None):
         """
         Enables CDN access for the specified container, and optionally sets the
@@ -1345,7 +1760,7 @@ class ContainerManager(BaseManager):
     def create_object(self, container, file_or_path=None, data=None,
             obj_name=None, content_type=None, etag=None, content_encoding=None,
             content_length=None, ttl=None, chunked=False, metadata=None,
-            chunk_size=None, headers=None, return_none=False):
+            chunk_size=None, headers=None, return_none=False, compress=False):
         """
         Creates or replaces a storage object in the specified container.
         Returns a StorageObject reference will be returned, unless the
@@ -1376,7 +1791,7 @@ class ContainerManager(BaseManager):
                 content_encoding=content_encoding,
                 content_length=content_length, ttl=ttl, chunked=chunked,
                 metadata=metadata, chunk_size=chunk_size, headers=headers,
-                return_none=return_none)
+                return_none=return_none, compress=compress)
 
 
     @assure_container
@@ -1556,6 +1971,31 @@ class ContainerManager(BaseManager):
                 prefix=prefix)
 
 
+    @assure_container
+    def bulk_set_object_metadata(self, container, items, clear=False,
+            prefix=None, current_metadata=None, max_workers=None):
+        """
+        Updates the metadata for many objects in the specified container at
+        once, using up to 'max_workers' threads. 'items' can be either a dict
+        mapping object names to their new metadata, or a list of (object,
+        metadata) 2-tuples.
+
+        Unless 'clear' is True, the current metadata for each object has to be
+        retrieved before it can be updated. If you already have that metadata,
+        pass it as 'current_metadata', a dict keyed by object name, and those
+        calls will be skipped.
+
+        Returns a dictionary with the following keys:
+
+            updated - the number of objects whose metadata was updated
+            failed - the number of objects that could not be updated
+            errors - a list of [object_name, exception] pairs for the failures
+        """
+        return container.bulk_set_object_metadata(items, clear=clear,
+                prefix=prefix, current_metadata=current_metadata,
+                max_workers=max_workers)
+
+
 
 class StorageObject(BaseResource):
     """
@@ -1808,7 +2248,7 @@ class StorageObjectManager(BaseManager):
     def create(self, file_or_path=None, data=None, obj_name=None,
             content_type=None, etag=None, content_encoding=None,
             content_length=None, ttl=None, chunked=False, metadata=None,
-            chunk_size=None, headers=None, return_none=False):
+            chunk_size=None, headers=None, return_none=False, compress=False):
         """
         Creates or replaces a storage object in this container.
 
@@ -1837,6 +2277,20 @@ class StorageObjectManager(BaseManager):
         the `content_length` and `etag` parameters. This allows the data to be
         streamed to the object in the container without having to be written to
         disk first.
+
+        If 'compress' is True and the content type (either supplied or guessed
+        from the object name) matches COMPRESSIBLE_CONTENT_TYPES, the content
+        is gzip-compressed as it is read, and uploaded using chunked transfer
+        with a 'Content-Encoding' of 'gzip'. Since the size of the compressed
+        content is not known in advance, any 'content_length' is ignored, and
+        an 'etag' must be that of the compressed content. Compression is
+        skipped if a 'content_encoding' is specified, since that indicates
+        that the content has already been encoded.
+
+        When 'file_or_path' is the path to a local file whose size is at least
+        MMAP_THRESHOLD bytes (and which does not need to be segmented), the
+        file is memory-mapped, and the mapped contents are hashed and sent to
+        the server in place, which avoids copying them through Python buffers.
         """
         # First make sure that there is a content source.
         if (data, file_or_path) == (None, None):
@@ -1859,7 +2313,19 @@ class StorageObjectManager(BaseManager):
             headers = metadata
         if ttl is not None:
             headers["X-Delete-After"] = ttl
-        if src is data:
+        if (compress and content_encoding is None and
+                _is_compressible(obj_name, content_type)):
+            content_type = content_type or mimetypes.guess_type(obj_name)[0]
+            if src is data or hasattr(file_or_path, "read"):
+                self._upload(obj_name, _gzip_stream(src, chunk_size),
+                        content_type, "gzip", None, etag, True, chunk_size,
+                        headers)
+            else:
+                with open(file_or_path, "rb") as ff:
+                    self._upload(obj_name, _gzip_stream(ff, chunk_size),
+                            content_type, "gzip", None, etag, True,
+                            chunk_size, headers)
+        elif src is data:
             self._upload(obj_name, data, content_type,
                     content_encoding, content_length, etag, chunked,
                     chunk_size, headers)
@@ -1867,6 +2333,11 @@ class StorageObjectManager(BaseManager):
             self._upload(obj_name, file_or_path, content_type,
                     content_encoding, content_length, etag, False,
                     chunk_size, headers)
+        elif _use_mmap(os.path.getsize(file_or_path)):
+            with _MappedFile(file_or_path) as view:
+                self._upload(obj_name, view, content_type,
+                        content_encoding, len(view), etag, False,
+                        chunk_size, headers)
         else:
             # Need to wrap the call in a context manager
             with open(file_or_path, "rb") as ff:
@@ -2141,16 +2612,27 @@ class StorageObjectManager(BaseManager):
         # Add the metadata prefix, if needed.
         if prefix is None:
             prefix = OBJECT_META_PREFIX
-        massaged = _massage_metakeys(metadata, prefix)
-        cname = utils.get_name(self.container)
-        oname = utils.get_name(obj)
-        new_meta = {}
         # Note that the API for object POST is the opposite of that for
         # container POST: for objects, all current metadata is deleted,
         # whereas for containers you need to set the values to an empty
         # string to delete them.
+        obj_meta = None
         if not clear:
             obj_meta = self.get_metadata(obj, prefix=prefix)
+        self._post_metadata(obj, metadata, prefix, obj_meta)
+
+
+    @_handle_object_not_found
+    def _post_metadata(self, obj, metadata, prefix, obj_meta=None):
+        """
+        Merges 'metadata' with the object's current metadata 'obj_meta' (if
+        any), and replaces the object's metadata with the result.
+        """
+        massaged = _massage_metakeys(metadata, prefix)
+        cname = utils.get_name(self.container)
+        oname = utils.get_name(obj)
+        new_meta = {}
+        if obj_meta:
             new_meta = _massage_metakeys(obj_meta, prefix)
         utils.case_insensitive_update(new_meta, massaged)
         # Remove any empty values, since the object metadata API will
@@ -2175,6 +2657,55 @@ class StorageObjectManager(BaseManager):
         return self.set_metadata(obj, meta_dict)
 
 
+    def bulk_set_metadata(self, items, clear=False, prefix=None,
+            current_metadata=None, max_workers=None):
+        """
+        Updates the metadata for many objects in this container at once.
+
+        'items' can be either a dict mapping object names to the metadata for
+        that object, or a list of (object, metadata) 2-tuples. The updates are
+        made concurrently using up to 'max_workers' threads.
+
+        Updating an object's metadata normally requires a HEAD call to get the
+        object's current metadata before it can be merged with the new values.
+        If you already know the current metadata for some or all of the
+        objects, pass it as 'current_metadata', a dict mapping object names to
+        their current metadata, and those HEAD calls will be skipped. Passing
+        'clear=True' skips them for every object, since any existing metadata
+        is replaced.
+
+        Returns a dictionary with the following keys:
+
+            updated - the number of objects whose metadata was updated
+            failed - the number of objects that could not be updated
+            errors - a list of [object_name, exception] pairs for the failures
+        """
+        if prefix is None:
+            prefix = OBJECT_META_PREFIX
+        if isinstance(items, dict):
+            items = list(items.items())
+        current_metadata = current_metadata or {}
+
+        def _update(item):
+            obj, metadata = item
+            oname = utils.get_name(obj)
+            if not clear and oname in current_metadata:
+                self._post_metadata(obj, metadata, prefix,
+                        current_metadata[oname])
+            else:
+                self.set_metadata(obj, metadata, clear=clear, prefix=prefix)
+
+        results = {"updated": 0, "failed": 0, "errors": []}
+        for item, _, err in utils.run_concurrently(_update, items,
+                max_workers=max_workers):
+            if err is None:
+                results["updated"] += 1
+            else:
+                results["failed"] += 1
+                results["errors"].append([utils.get_name(item[0]), err])
+        return results
+
+
 
 class StorageClient(BaseClient):
     """
@@ -2403,6 +2934,25 @@ class StorageClient(BaseClient):
         return self._manager.list_public_containers()
 
 
+    def fetch_container_details(self, containers=None, include_metadata=True,
+            include_cdn=True, max_workers=None):
+        """
+        Fetches the headers and CDN settings for many containers at once, and
+        caches them in the Container objects that are returned. The CDN
+        settings come from the CDN container listing, and the HEAD calls for
+        the containers' headers are made concurrently, so this is much faster
+        than accessing the CDN properties and metadata of each container in
+        turn.
+
+        If 'containers' is not specified, all the containers in the account are
+        used. Once loaded, use `container.get_metadata(cached=True)` to access
+        the cached metadata.
+        """
+        return self._manager.fetch_details(containers=containers,
+                include_metadata=include_metadata, include_cdn=include_cdn,
+                max_workers=max_workers)
+
+
     def make_container_public(self, container, ttl=None):
         """
         Enables CDN access for the specified container, and optionally sets the
@@ -2503,6 +3053,34 @@ class StorageClient(BaseClient):
         return self._manager.list_containers_info(limit=limit, marker=marker)
 
 
+    def iter_containers_info(self, prefix=None, limit=None):
+        """
+        Returns a generator that yields the info dict (name, count and bytes)
+        for every container in the account, or only those whose names begin
+        with 'prefix'. Pages of up to 'limit' containers are requested as they
+        are needed, rather than listing the entire account up front.
+        """
+        return self._manager.iter_containers_info(prefix=prefix, limit=limit)
+
+
+    def get_account_usage(self, prefix=None, top=10, previous=None,
+            delimiter=None):
+        """
+        Streams the listing of all the containers in the account (or only
+        those whose names begin with 'prefix'), and returns a summary of the
+        storage they use: totals, the 'top' largest containers by size and by
+        object count, and optionally totals for groups of containers whose
+        names share the same part before 'delimiter'.
+
+        If 'previous' is passed a summary returned by an earlier call (such as
+        one saved with `json.dump()` and loaded again), the summary also
+        contains the changes since then. See `summarize_usage()` for the
+        details of what is returned.
+        """
+        return summarize_usage(self.iter_containers_info(prefix=prefix),
+                top=top, previous=previous, delimiter=delimiter)
+
+
     def list_container_subdirs(self, container, limit=None, marker=None,
             prefix=None, delimiter=None, full_listing=False):
         """
@@ -2620,6 +3198,30 @@ class StorageClient(BaseClient):
                 clear=clear, prefix=prefix)
 
 
+    def bulk_set_object_metadata(self, container, items, clear=False,
+            prefix=None, current_metadata=None, max_workers=None):
+        """
+        Updates the metadata for many objects in the specified container at
+        once, using up to 'max_workers' threads. 'items' can be either a dict
+        mapping object names to their new metadata, or a list of (object,
+        metadata) 2-tuples.
+
+        Unless 'clear' is True, the current metadata for each object has to be
+        retrieved before it can be updated. If you already have that metadata,
+        pass it as 'current_metadata', a dict keyed by object name, and those
+        calls will be skipped.
+
+        Returns a dictionary with the following keys:
+
+            updated - the number of objects whose metadata was updated
+            failed - the number of objects that could not be updated
+            errors - a list of [object_name, exception] pairs for the failures
+        """
+        return self._manager.bulk_set_object_metadata(container, items,
+                clear=clear, prefix=prefix, current_metadata=current_metadata,
+                max_workers=max_workers)
+
+
     def remove_object_metadata_key(self, container, obj, key, prefix=None):
         """
         Removes the specified key from the storage object's metadata. If the key
@@ -2693,7 +3295,7 @@ class StorageClient(BaseClient):
     def upload_file(self, container, file_or_path, obj_name=None,
             content_type=None, etag=None, content_encoding=None, ttl=None,
             content_length=None, return_none=False, headers=None,
-            metadata=None, extra_info=None):
+            metadata=None, extra_info=None, compress=False):
         """
         Uploads the specified file to the container. If no name is supplied,
         the file's name will be used. Either a file path or an open file-like
@@ -2710,6 +3312,9 @@ class StorageClient(BaseClient):
         be stored in seconds in the `ttl` parameter. If this is specified, the
         object will be deleted after that number of seconds.
 
+        If 'compress' is True, text-based files are gzip-compressed as they
+        are uploaded; see create_object() for details.
+
         The 'extra_info' parameter is included for backwards compatibility. It
         is no longer used at all, and will not be modified with swiftclient
         info, since swiftclient is not used any more.
@@ -2717,13 +3322,13 @@ class StorageClient(BaseClient):
         return self.create_object(container, file_or_path=file_or_path,
                 obj_name=obj_name, content_type=content_type, etag=etag,
                 content_encoding=content_encoding, ttl=ttl, headers=headers,
-                metadata=metadata, return_none=return_none)
+                metadata=metadata, return_none=return_none, compress=compress)
 
 
     def create_object(self, container, file_or_path=None, data=None,
             obj_name=None, content_type=None, etag=None, content_encoding=None,
             content_length=None, ttl=None, chunk_size=None, metadata=None,
-            headers=None, return_none=False):
+            headers=None, return_none=False, compress=False):
         """
         Creates or replaces a storage object in the specified container.
 
@@ -2752,12 +3357,18 @@ class StorageClient(BaseClient):
         value, and omit the `content_length` and `etag` parameters. This allows
         the data to be streamed to the object in the container without having
         to be written to disk first.
+
+        If 'compress' is True and the content type (either supplied or guessed
+        from the object name) matches one of the patterns in
+        COMPRESSIBLE_CONTENT_TYPES, the content is gzip-compressed on the fly
+        as it is uploaded, and stored with a 'Content-Encoding' of 'gzip'.
         """
         return self._manager.create_object(container, file_or_path=file_or_path,
                 data=data, obj_name=obj_name, content_type=content_type,
                 etag=etag, content_encoding=content_encoding,
                 content_length=content_length, ttl=ttl, chunk_size=chunk_size,
-                metadata=metadata, headers=headers, return_none=return_none)
+                metadata=metadata, headers=headers, return_none=return_none,
+                compress=compress)
 
 
     def fetch_object(self, container, obj, include_meta=False,
@@ -2997,7 +3608,7 @@ class StorageClient(BaseClient):
 
     def sync_folder_to_container(self, folder_path, container, delete=False,
             include_hidden=False, ignore=None, ignore_timestamps=False,
-            object_prefix="", verbose=False):
+            object_prefix="", verbose=False, compress=False):
         """
         Compares the contents of the specified folder, and checks to make sure
         that the corresponding object is present in the specified container. If
@@ -3030,6 +3641,11 @@ class StorageClient(BaseClient):
 
         Set `verbose` to True to make it print what is going on. It will
         show which files are being uploaded and which ones are not and why.
+
+        If `compress` is True, files whose content type matches
+        COMPRESSIBLE_CONTENT_TYPES are gzip-compressed as they are uploaded.
+        Such files are compared with the remote objects using the checksum of
+        their compressed content, so unchanged files are still skipped.
         """
         cont = self.get_container(container)
         self._local_files = []
@@ -3052,7 +3668,8 @@ class StorageClient(BaseClient):
         self._sync_folder_to_container(folder_path, cont, prefix="",
                 delete=delete, include_hidden=include_hidden, ignore=ignore,
                 ignore_timestamps=ignore_timestamps,
-                object_prefix=object_prefix, verbose=verbose)
+                object_prefix=object_prefix, verbose=verbose,
+                compress=compress)
         # Unset the _remote_files
         self._remote_files = None
         if verbose:
@@ -3072,7 +3689,8 @@ class StorageClient(BaseClient):
 
 
     def _sync_folder_to_container(self, folder_path, container, prefix, delete,
-            include_hidden, ignore, ignore_timestamps, object_prefix, verbose):
+            include_hidden, ignore, ignore_timestamps, object_prefix, verbose,
+            compress=False):
         """
         This is the internal method that is called recursively to handle
         nested folder structures.
@@ -3094,11 +3712,16 @@ class StorageClient(BaseClient):
                 self._sync_folder_to_container(pth, container, prefix=subprefix,
                         delete=delete, include_hidden=include_hidden,
                         ignore=ignore, ignore_timestamps=ignore_timestamps,
-                        object_prefix=object_prefix, verbose=verbose)
+                        object_prefix=object_prefix, verbose=verbose,
+                        compress=compress)
                 continue
             self._local_files.append(os.path.join(object_prefix, prefix,
                     fname))
-            local_etag = utils.get_checksum(pth)
+            compress_file = compress and _is_compressible(fname)
+            if compress_file:
+                local_etag = get_gzip_checksum(pth)
+            else:
+                local_etag = utils.get_checksum(pth)
             if object_prefix:
                 prefix = os.path.join(object_prefix, prefix)
                 object_prefix = ""
@@ -3129,7 +3752,8 @@ class StorageClient(BaseClient):
                         continue
                 try:
                     container.upload_file(pth, obj_name=fullname_with_prefix,
-                        etag=local_etag, return_none=True)
+                        etag=local_etag, return_none=True,
+                        compress=compress_file)
                     self._sync_summary["uploaded"] += 1
                     if verbose:
                         log.info("%s UPLOADED", fullname_with_prefix)
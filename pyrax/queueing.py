@@ -17,13 +17,29 @@
 #    under the License.
 from __future__ import absolute_import, unicode_literals
 
+from collections import deque
+from concurrent import futures
+from functools import partial
 from functools import wraps
+import base64
+import heapq
+import itertools
 import json
+import logging
 import os
 import re
+import threading
+import time
+import zlib
 
 from six.moves import urllib
 
+# msgpack is an optional import, used by MsgpackCodec
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 import pyrax
 from pyrax.client import BaseClient
 import pyrax.exceptions as exc
@@ -33,6 +49,13 @@ import pyrax.utils as utils
 
 # The hard-coded maximum number of messages returned in a single call.
 MSG_LIMIT = 10
+# The maximum size, in bytes, of the body of a request to post messages.
+MAX_POST_BYTES = 262144
+# How often, in seconds, a QueueConsumer checks for claims to renew and
+# messages to acknowledge.
+CONSUMER_TICK = 0.1
+# The key that identifies the codec of an encoded message body.
+CODEC_KEY = "pyrax_codec"
 # Pattern for extracting the marker value from an href link.
 marker_pat = re.compile(r".+\bmarker=(\d+).*")
 
@@ -66,6 +89,226 @@ def assure_queue(fnc):
 
 
 
+class _Backoff(object):
+    """
+    Tracks the interval between polls of a queue. Each call to `idle()`
+    returns the current interval and multiplies it by 'factor', up to
+    'max_interval'; `reset()` goes back to 'min_interval' once there is
+    activity again.
+    """
+    def __init__(self, min_interval, max_interval, factor=2):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.factor = factor
+        self.interval = min_interval
+
+
+    def idle(self):
+        interval = self.interval
+        self.interval = min(self.interval * self.factor, self.max_interval)
+        return interval
+
+
+    def reset(self):
+        self.interval = self.min_interval
+
+
+
+class QueueCodec(object):
+    """
+    Base class for the codecs that convert message bodies to and from the
+    form in which they are stored in a queue. The default codec sends bodies
+    as plain JSON; other codecs can make large bodies smaller, so that they
+    fit within the message size limit and use less bandwidth.
+
+    Encoded bodies that are not plain JSON are stored as an envelope in the
+    form {CODEC_KEY: <codec name>, "data": <encoded body>}, so that they can
+    be decoded by any client, whatever codec it uses for posting. Subclasses
+    define a unique 'name', and override `_dumps()` and `_loads()` to convert
+    between a body and the string stored as the envelope's 'data'. Codecs
+    whose 'compact' attribute is True also post messages using compact JSON,
+    without the usual whitespace after separators.
+    """
+    name = None
+    compact = False
+
+
+    def encode(self, body):
+        """
+        Returns the value to post as the body of a message. Bodies that have
+        already been encoded are returned unchanged.
+        """
+        if _is_encoded(body):
+            return body
+        return {CODEC_KEY: self.name, "data": self._dumps(body)}
+
+
+    def decode(self, body):
+        """
+        Returns the original body from one that was encoded by this codec.
+        """
+        return self._loads(body["data"])
+
+
+    def _dumps(self, body):
+        raise NotImplementedError
+
+
+    def _loads(self, data):
+        raise NotImplementedError
+
+
+
+class JSONCodec(QueueCodec):
+    """
+    Posts message bodies unchanged, as plain JSON. This is the default.
+    """
+    name = "json"
+
+
+    def encode(self, body):
+        return body
+
+
+    def decode(self, body):
+        return body
+
+
+
+class CompactJSONCodec(JSONCodec):
+    """
+    Posts message bodies unchanged, but without the whitespace that is
+    normally added after separators in the JSON request body.
+    """
+    name = "json-compact"
+    compact = True
+
+
+
+class ZlibCodec(QueueCodec):
+    """
+    Compresses the JSON for each message body with zlib at the given 'level',
+    and posts it as base64 text.
+    """
+    name = "zlib"
+    compact = True
+
+
+    def __init__(self, level=6):
+        self.level = level
+
+
+    def _compress(self, raw):
+        return zlib.compress(raw, self.level)
+
+
+    def _decompress(self, raw):
+        return zlib.decompress(raw)
+
+
+    def _dumps(self, body):
+        raw = json.dumps(body, separators=(",", ":")).encode("utf8")
+        return base64.b64encode(self._compress(raw)).decode("ascii")
+
+
+    def _loads(self, data):
+        raw = self._decompress(base64.b64decode(data))
+        return json.loads(raw.decode("utf8"))
+
+
+
+class GzipCodec(ZlibCodec):
+    """
+    Like ZlibCodec, but uses the gzip format, for the benefit of consumers
+    written in other languages that only support gzip.
+    """
+    name = "gzip"
+
+
+    def _compress(self, raw):
+        # A wbits value of 16 + MAX_WBITS selects the gzip container.
+        comp = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return comp.compress(raw) + comp.flush()
+
+
+    def _decompress(self, raw):
+        return zlib.decompress(raw, 16 + zlib.MAX_WBITS)
+
+
+
+class MsgpackCodec(QueueCodec):
+    """
+    Packs each message body with MessagePack, and posts it as base64 text.
+    This requires the 'msgpack' package to be installed.
+    """
+    name = "msgpack"
+    compact = True
+
+
+    def _check(self):
+        if msgpack is None:
+            raise exc.MsgpackModuleNotInstalled("The 'msgpack' Python module "
+                    "is not installed on this system.")
+
+
+    def _dumps(self, body):
+        self._check()
+        packed = msgpack.packb(body, use_bin_type=True)
+        return base64.b64encode(packed).decode("ascii")
+
+
+    def _loads(self, data):
+        self._check()
+        return msgpack.unpackb(base64.b64decode(data), raw=False)
+
+
+# The codecs that can decode message bodies, keyed by name.
+_codecs = {}
+
+
+def register_codec(codec):
+    """
+    Makes a QueueCodec instance available by its name, both for posting to
+    queues that are set to use that name, and for decoding the messages that
+    it has encoded.
+    """
+    _codecs[codec.name] = codec
+
+
+def get_codec(codec):
+    """
+    Returns the registered codec with the given name. QueueCodec instances
+    are returned as they are.
+    """
+    if isinstance(codec, QueueCodec):
+        return codec
+    try:
+        return _codecs[codec]
+    except KeyError:
+        raise exc.UnknownQueueCodec("There is no queue codec named '%s'."
+                % codec)
+
+
+def _is_encoded(body):
+    return isinstance(body, dict) and body.get(CODEC_KEY) in _codecs
+
+
+def _decode_body(body):
+    """
+    Returns the original form of a message body that was encoded by one of
+    the registered codecs. Other bodies are returned unchanged.
+    """
+    if _is_encoded(body):
+        return _codecs[body[CODEC_KEY]].decode(body)
+    return body
+
+
+for _codec_class in (JSONCodec, CompactJSONCodec, ZlibCodec, GzipCodec,
+        MsgpackCodec):
+    register_codec(_codec_class())
+
+
+
 class BaseQueueManager(BaseManager):
     """
     This class attempts to add in all the common deviations from the API
@@ -135,6 +378,19 @@ class Queue(BaseResource):
                 echo=echo, marker=marker, limit=limit)
 
 
+    def iter_messages(self, include_claimed=False, echo=False, marker=None,
+            limit=None, prefetch=True):
+        """
+        Returns a generator that yields the messages in this queue as each
+        page of the listing arrives, rather than building a list of all of
+        them first. The parameters are the same as for `list()`; unless
+        'prefetch' is False, the next page is requested while the current one
+        is being consumed.
+        """
+        return self._message_manager.iter_list(include_claimed=include_claimed,
+                echo=echo, marker=marker, limit=limit, prefetch=prefetch)
+
+
     def list_by_ids(self, ids):
         """
         If you wish to retrieve a list of messages from this queue and know the
@@ -171,6 +427,26 @@ class Queue(BaseResource):
         return self._message_manager.create(body, ttl)
 
 
+    def post_messages(self, messages):
+        """
+        Creates several messages in this queue with a single API call.
+        'messages' is a list of (body, ttl) tuples; no more than MSG_LIMIT
+        messages can be posted at once. Returns a list of the IDs of the new
+        messages.
+        """
+        return self._message_manager.create_many(messages)
+
+
+    def producer(self, ttl, batch_size=MSG_LIMIT, max_bytes=MAX_POST_BYTES,
+            linger=0.05, max_workers=None):
+        """
+        Returns a QueueProducer for posting messages to this queue in batches.
+        See the QueueProducer class for details of the parameters.
+        """
+        return QueueProducer(self, ttl, batch_size=batch_size,
+                max_bytes=max_bytes, linger=linger, max_workers=max_workers)
+
+
     def claim_messages(self, ttl, grace, count=None):
         """
         Claims up to `count` unclaimed messages from this queue. If count is
@@ -193,6 +469,34 @@ class Queue(BaseResource):
         return self._claim_manager.claim(ttl, grace, count=count)
 
 
+    def wait_for_messages(self, ttl, grace, count=None, timeout=None,
+            min_interval=1, max_interval=30, backoff=2):
+        """
+        Claims messages from this queue, waiting until there are some to
+        claim. The 'ttl', 'grace' and 'count' parameters are the same as for
+        `claim_messages()`.
+
+        While the queue is empty, it is polled again after 'min_interval'
+        seconds, and the interval is multiplied by 'backoff' after each empty
+        poll, up to 'max_interval' seconds. If 'timeout' is specified and no
+        messages can be claimed within that many seconds, None is returned.
+        Otherwise the QueueClaim is returned.
+        """
+        poll = _Backoff(min_interval, max_interval, backoff)
+        end = None if timeout is None else time.time() + timeout
+        while True:
+            claim = self.claim_messages(ttl, grace, count=count)
+            if claim is not None and claim.messages:
+                return claim
+            delay = poll.idle()
+            if end is not None:
+                remaining = end - time.time()
+                if remaining <= 0:
+                    return None
+                delay = min(delay, remaining)
+            time.sleep(delay)
+
+
     def get_claim(self, claim):
         """
         Returns a QueueClaim object with information about the specified claim.
@@ -217,6 +521,26 @@ class Queue(BaseResource):
         return self._claim_manager.delete(claim)
 
 
+    def consume(self, handler, workers=10, claim_loops=1, ttl=60, grace=60,
+            count=None, max_in_flight=None, ack_batch_size=MSG_LIMIT,
+            ack_interval=1, renew_margin=None, idle_sleep=1,
+            max_idle_sleep=30):
+        """
+        Starts processing the messages in this queue by calling 'handler' with
+        each one in a pool of 'workers' threads. Handled messages are deleted
+        from the queue in batches, and claims are renewed while their messages
+        are still being handled. Returns the running QueueConsumer; call its
+        `stop()` method to finish. See the QueueConsumer class for details of
+        the other parameters.
+        """
+        consumer = QueueConsumer(self, handler, workers=workers,
+                claim_loops=claim_loops, ttl=ttl, grace=grace, count=count,
+                max_in_flight=max_in_flight, ack_batch_size=ack_batch_size,
+                ack_interval=ack_interval, renew_margin=renew_margin,
+                idle_sleep=idle_sleep, max_idle_sleep=max_idle_sleep)
+        return consumer.start()
+
+
     @property
     def id(self):
         return self.name
@@ -226,6 +550,20 @@ class Queue(BaseResource):
         self.name = val
 
 
+    @property
+    def codec(self):
+        """
+        The QueueCodec used to encode the bodies of messages posted to this
+        queue. It can be set to either a codec or the name of a registered
+        codec, such as "zlib"; setting it to None uses the client's codec.
+        """
+        return self._message_manager._get_codec()
+
+    @codec.setter
+    def codec(self, val):
+        self._message_manager.codec = None if val is None else get_codec(val)
+
+
 
 class QueueMessage(BaseResource):
     """
@@ -238,15 +576,28 @@ class QueueMessage(BaseResource):
         self.href = None
         self.ttl = None
         self.claim_id = None
+        self.decode_error = None
         super(QueueMessage, self).__init__(*args, **kwargs)
 
 
     def _add_details(self, info):
         """
         The 'id' and 'claim_id' attributes are not supplied directly, but
-        included as part of the 'href' value.
+        included as part of the 'href' value. Bodies that were encoded by one
+        of the registered codecs are decoded; if that fails, the body is left
+        as it was received, and the error is stored in 'decode_error', so
+        that one malformed message does not prevent the rest of a queue from
+        being read.
         """
         super(QueueMessage, self)._add_details(info)
+        self.decode_error = None
+        try:
+            self.body = _decode_body(self.body)
+        except Exception as e:
+            self.decode_error = e
+            log = logging.getLogger("pyrax")
+            log.warning("Could not decode the body of message '%s': %s",
+                    self.href, e)
         if self.href is None:
             return
         parsed = urllib.parse.urlparse(self.href)
@@ -292,56 +643,161 @@ class QueueMessageManager(BaseQueueManager):
     """
     Manager class for a Queue Message.
     """
+    # The codec used to encode message bodies. If this is None, the client's
+    # codec is used, which defaults to plain JSON.
+    codec = None
+
+
+    def _get_codec(self):
+        return get_codec(self.codec or getattr(self.api, "codec", None) or
+                JSONCodec.name)
+
+
     def _create_body(self, msg, ttl):
         """
         Used to create the dict required to create a new message.
         """
         body = [{
-                "body": msg,
+                "body": self._get_codec().encode(msg),
                 "ttl": ttl,
                 }]
         return body
 
 
+    def _create(self, uri, body, **kwargs):
+        """
+        Posts the new message using the codec's JSON format.
+        """
+        resp, resp_body = self._post(uri, body)
+        return self.resource_class(self, resp_body, self.response_key)
+
+
+    def _post(self, uri, body):
+        """
+        Posts the body, using compact JSON if the codec calls for it.
+        """
+        if self._get_codec().compact:
+            data = json.dumps(body, separators=(",", ":"))
+            return self.api.method_post(uri, data=data)
+        return self.api.method_post(uri, body=body)
+
+
+    def create_many(self, messages):
+        """
+        Posts several messages in a single request. 'messages' is a list of
+        (body, ttl) tuples. Returns a list of the IDs assigned to the messages,
+        in the same order. If the server only accepted some of the messages,
+        the list will be shorter than 'messages'.
+        """
+        body = self._create_many_body(messages)
+        uri = "/%s" % self.uri_base
+        resp, resp_body = self._post(uri, body)
+        return self._ids_from_response(resp_body)
+
+
+    def _create_many_body(self, messages):
+        """
+        Used to create the list required to post several messages at once.
+        """
+        codec = self._get_codec()
+        return [{"body": codec.encode(msg), "ttl": ttl}
+                for msg, ttl in messages]
+
+
+    def _ids_from_response(self, resp_body):
+        """
+        Returns the IDs of the messages created by a POST, which are the last
+        part of the hrefs in the response's 'resources'.
+        """
+        resources = (resp_body or {}).get("resources", [])
+        return [href.rsplit("/", 1)[-1] for href in resources]
+
+
     def list(self, include_claimed=False, echo=False, marker=None, limit=None):
         """
         Need to form the URI differently, so we can't use the default list().
         """
+        return list(self._iterate_list(include_claimed=include_claimed,
+                echo=echo, marker=marker, limit=limit))
+
+
+    def iter_list(self, include_claimed=False, echo=False, marker=None,
+            limit=None, prefetch=True):
+        """
+        Returns a generator that yields the messages in the queue, without
+        loading them all into memory first. The listing is requested one page
+        of MSG_LIMIT messages at a time; unless 'prefetch' is False, the next
+        page is requested in the background while the messages from the
+        current page are being consumed.
+        """
         return self._iterate_list(include_claimed=include_claimed, echo=echo,
-                marker=marker, limit=limit)
+                marker=marker, limit=limit, prefetch=prefetch)
 
 
-    def _iterate_list(self, include_claimed, echo, marker, limit):
+    def _list_page(self, include_claimed, echo, marker, limit):
         """
-        Recursive method to work around the hard limit of 10 items per call.
+        Returns a 2-tuple of the list of messages on a single page of the
+        listing, and the marker for the next page, or None if there are no
+        more pages.
         """
-        ret = []
-        if limit is None:
-            this_limit = MSG_LIMIT
-        else:
-            this_limit = min(MSG_LIMIT, limit)
-            limit = limit - this_limit
         uri = "/%s?include_claimed=%s&echo=%s" % (self.uri_base,
                 json.dumps(include_claimed), json.dumps(echo))
         qs_parts = []
         if marker is not None:
             qs_parts.append("marker=%s" % marker)
-        if this_limit is not None:
-            qs_parts.append("limit=%s" % this_limit)
+        if limit is not None:
+            qs_parts.append("limit=%s" % limit)
         if qs_parts:
             uri = "%s&%s" % (uri, "&".join(qs_parts))
         resp, resp_body = self._list(uri, return_raw=True)
         if not resp_body:
-            return ret
+            return [], None
         messages = resp_body.get(self.plural_response_key, [])
         ret = [QueueMessage(manager=self, info=item) for item in messages]
-        marker = _parse_marker(resp_body)
+        return ret, _parse_marker(resp_body)
 
-        loop = 0
-        if ((limit is None) or limit > 0) and marker:
-            loop += 1
-            ret.extend(self._iterate_list(include_claimed, echo, marker, limit))
-        return ret
+
+    def _iterate_list(self, include_claimed, echo, marker, limit,
+            prefetch=False):
+        """
+        Generator that works around the hard limit of MSG_LIMIT items per call
+        by following the 'next' links until there are no more messages, or
+        'limit' messages have been returned. If 'prefetch' is True, the next
+        page is requested in a background thread while the current one is
+        being consumed.
+        """
+        executor = None
+        if prefetch:
+            executor = futures.ThreadPoolExecutor(max_workers=1)
+        remaining = limit
+        try:
+            this_limit = MSG_LIMIT
+            if remaining is not None:
+                this_limit = min(MSG_LIMIT, remaining)
+            page, marker = self._list_page(include_claimed, echo, marker,
+                    this_limit)
+            while page:
+                next_page = None
+                if remaining is not None:
+                    remaining -= len(page)
+                    this_limit = min(MSG_LIMIT, remaining)
+                if marker and (remaining is None or remaining > 0):
+                    args = (include_claimed, echo, marker, this_limit)
+                    if executor:
+                        next_page = executor.submit(self._list_page, *args)
+                    else:
+                        next_page = args
+                for msg in page:
+                    yield msg
+                if next_page is None:
+                    break
+                if executor:
+                    page, marker = next_page.result()
+                else:
+                    page, marker = self._list_page(*next_page)
+        finally:
+            if executor:
+                executor.shutdown(wait=False)
 
 
     def delete(self, msg, claim_id=None):
@@ -407,7 +863,7 @@ class QueueClaimManager(BaseQueueManager):
         claimed message would normally live longer than the grace period, its
         expiration will not be adjusted.
 
-        bReturns a QueueClaim object, whose 'messages' attribute contains the
+        Returns a QueueClaim object, whose 'messages' attribute contains the
         list of QueueMessage objects representing the claimed messages.
         """
         if count is None:
@@ -422,10 +878,27 @@ class QueueClaimManager(BaseQueueManager):
         if resp.status_code == 204:
             # Nothing available to claim
             return None
-        # Get the claim ID from the first message in the list.
-        href = resp_body[0]["href"]
+        # The response contains the claimed messages, so there is no need to
+        # GET the claim again.
+        return self._claim_from_response(resp_body, ttl, grace,
+                location=resp.headers.get("Location"))
+
+
+    def _claim_from_response(self, messages, ttl, grace, location=None):
+        """
+        Creates a QueueClaim from the list of message dicts returned when the
+        claim was made. Its ID is taken from the first message's href.
+        """
+        href = messages[0]["href"]
         claim_id = href.split("claim_id=")[-1]
-        return self.get(claim_id)
+        claim_href = location or "/%s/%s" % (self.uri_base, claim_id)
+        info = {"href": claim_href,
+                "ttl": ttl,
+                "grace": grace,
+                "age": 0,
+                "messages": messages,
+                }
+        return QueueClaim(self, info, loaded=True)
 
 
     def update(self, claim, ttl=None, grace=None):
@@ -517,12 +990,821 @@ class QueueManager(BaseQueueManager):
 
 
 
+class QueueProducer(object):
+    """
+    Posts messages to a queue in batches, so that many messages can be sent
+    without making an API call for each one.
+
+    Each call to `post()` adds a message to a buffer, and returns a Future
+    whose result will be the ID assigned to the message (or whose exception
+    will be the error that prevented it from being posted). The buffer is
+    posted as a single request when it holds 'batch_size' messages, when
+    adding another message would make the request body larger than
+    'max_bytes', or when its oldest message has waited 'linger' seconds.
+    Batches are posted concurrently, using up to 'max_workers' threads.
+
+    Messages are posted with the supplied 'ttl', unless a different one is
+    passed to `post()`. Call `flush()` to post any buffered messages
+    immediately, and `close()` when finished, which posts any remaining
+    messages and waits for all the batches to complete. A producer can also
+    be used as a context manager, in which case it is closed on exit.
+    """
+    def __init__(self, queue, ttl, batch_size=MSG_LIMIT,
+            max_bytes=MAX_POST_BYTES, linger=0.05, max_workers=None):
+        self.queue = queue
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.linger = linger
+        self._cond = threading.Condition()
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._buffer_started = None
+        self._closed = False
+        self._executor = futures.ThreadPoolExecutor(
+                max_workers=max_workers or utils.DEFAULT_MAX_WORKERS)
+        self._lingerer = threading.Thread(target=self._linger_loop)
+        self._lingerer.daemon = True
+        self._lingerer.start()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+    def post(self, body, ttl=None):
+        """
+        Adds a message to be posted, and returns a Future for its ID.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        # Encode the body now, so that its size is known; the queue's codec
+        # leaves bodies that are already encoded as they are.
+        body = self.queue.codec.encode(body)
+        size = len(json.dumps({"body": body, "ttl": ttl})) + 1
+        future = futures.Future()
+        with self._cond:
+            if self._closed:
+                raise exc.QueueProducerClosed("This producer has been "
+                        "closed.")
+            if self._buffer and self._buffer_bytes + size > self.max_bytes:
+                self._send(self._take_batch())
+            self._buffer.append(((body, ttl), future))
+            self._buffer_bytes += size
+            if len(self._buffer) >= self.batch_size:
+                self._send(self._take_batch())
+            elif len(self._buffer) == 1:
+                self._buffer_started = time.time()
+                self._cond.notify_all()
+        return future
+
+
+    def flush(self):
+        """
+        Posts any buffered messages immediately, without waiting for the
+        batch to fill up.
+        """
+        with self._cond:
+            if self._buffer:
+                self._send(self._take_batch())
+
+
+    def close(self):
+        """
+        Posts any buffered messages, and waits until all the batches have
+        been posted. No more messages can be posted after this is called.
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            if self._buffer:
+                self._send(self._take_batch())
+            self._cond.notify_all()
+        self._lingerer.join()
+        self._executor.shutdown(wait=True)
+
+
+    def _take_batch(self):
+        """
+        Empties the buffer, and returns its contents, leaving out any messages
+        whose futures have been cancelled. The remaining futures are marked
+        as running, so they can no longer be cancelled. Must be called with
+        the lock held.
+        """
+        batch, self._buffer = self._buffer, []
+        self._buffer_bytes = 0
+        self._buffer_started = None
+        return [(msg, future) for msg, future in batch
+                if future.set_running_or_notify_cancel()]
+
+
+    def _send(self, batch):
+        if batch:
+            self._executor.submit(self._post_batch, batch)
+
+
+    def _post_batch(self, batch):
+        """
+        Posts a batch of messages, and resolves their futures.
+        """
+        try:
+            ids = self.queue.post_messages([msg for msg, future in batch])
+        except Exception as e:
+            for msg, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for pos, (msg, future) in enumerate(batch):
+            if future.done():
+                continue
+            if pos < len(ids):
+                future.set_result(ids[pos])
+            else:
+                future.set_exception(exc.QueueMessagePostFailed("The server "
+                        "did not accept this message."))
+
+
+    def _linger_loop(self):
+        with self._cond:
+            while not self._closed:
+                if self._buffer_started is None:
+                    self._cond.wait()
+                    continue
+                remaining = self._buffer_started + self.linger - time.time()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                self._send(self._take_batch())
+
+
+
+class QueueConsumer(object):
+    """
+    Processes the messages in a queue using a pool of handler threads.
+
+    One or more claim loops (set by 'claim_loops') claim up to 'count'
+    messages at a time, and pass each claimed message to 'handler', which is
+    called with the QueueMessage as its only argument in one of 'workers'
+    threads. No new claims are made while 'max_in_flight' messages (by
+    default, twice the number of workers) are waiting to be handled. When
+    there is nothing to claim, a claim loop sleeps for 'idle_sleep' seconds
+    before trying again; the sleep doubles after each empty claim, up to
+    'max_idle_sleep' seconds, and goes back to 'idle_sleep' as soon as
+    messages are claimed.
+
+    Messages whose handler returns without raising an exception are
+    acknowledged by deleting them from the queue with a single
+    `delete_by_ids()` call for every 'ack_batch_size' messages, or every
+    'ack_interval' seconds, whichever comes first. If a handler raises an
+    exception, its message is not deleted; once the rest of the messages in
+    its claim have been handled, that claim is released so that the message
+    can be claimed again.
+
+    Each claim is made with the supplied 'ttl' and 'grace' values. While any
+    of the messages in a claim are still being handled, the claim is renewed
+    with `update_claim()` whenever it is within 'renew_margin' seconds (by
+    default, a third of the ttl) of expiring, so that slow handlers do not
+    lose their messages to other consumers.
+
+    Call `start()` to begin processing, and `stop()` to finish; messages that
+    have already been claimed are handled before the consumer stops. The
+    current counters, including the overall throughput, are available from
+    `get_stats()`.
+    """
+    def __init__(self, queue, handler, workers=10, claim_loops=1, ttl=60,
+            grace=60, count=None, max_in_flight=None,
+            ack_batch_size=MSG_LIMIT, ack_interval=1, renew_margin=None,
+            idle_sleep=1, max_idle_sleep=30):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.claim_loops = claim_loops
+        self.ttl = ttl
+        self.grace = grace
+        self.count = count
+        self.max_in_flight = max_in_flight or 2 * workers
+        self.ack_batch_size = ack_batch_size
+        self.ack_interval = ack_interval
+        self.renew_margin = renew_margin or ttl / 3.0
+        self.idle_sleep = idle_sleep
+        self.max_idle_sleep = max_idle_sleep
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._executor = None
+        self._threads = []
+        self._claims = {}
+        self._acks = []
+        self._last_ack = time.time()
+        self._started = None
+        self._stopped = None
+        self.claimed = 0
+        self.processed = 0
+        self.failed = 0
+        self.acked = 0
+        self.renewed = 0
+        self.released = 0
+        self.in_flight = 0
+
+
+    def start(self):
+        """
+        Starts the claim loops and the handler pool. Returns the consumer, so
+        that it can be created and started in a single expression.
+        """
+        if self._threads:
+            return self
+        # Each run gets its own event, pool and threads, so that the threads
+        # of a run stopped without waiting can finish while a new one runs.
+        stop_event = self._stop_event = threading.Event()
+        self._started = time.time()
+        self._stopped = None
+        executor = self._executor = futures.ThreadPoolExecutor(
+                max_workers=self.workers)
+        threads = [threading.Thread(target=self._claim_loop,
+                args=(stop_event, executor))
+                for ii in range(self.claim_loops)]
+        threads.append(threading.Thread(target=self._maintenance_loop,
+                args=(stop_event, list(threads), executor)))
+        self._threads = threads
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        return self
+
+
+    def stop(self, wait=True):
+        """
+        Stops claiming new messages. The messages that have already been
+        claimed are still handled and acknowledged; if 'wait' is True, this
+        method does not return until that has finished.
+        """
+        threads, self._threads = self._threads, []
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if wait:
+            for thread in threads:
+                thread.join()
+
+
+    def get_stats(self):
+        """
+        Returns a dict with the number of messages that have been 'claimed',
+        'processed' successfully, 'failed', and 'acked', the number of claims
+        that have been 'renewed' and 'released', the number of messages that
+        are currently 'in_flight' and 'claims' that are currently active, and
+        the 'messages_per_second' that have been processed since the consumer
+        was started.
+        """
+        with self._cond:
+            end = self._stopped or time.time()
+            elapsed = end - self._started if self._started else 0
+            rate = self.processed / elapsed if elapsed else 0.0
+            return {"claimed": self.claimed,
+                    "processed": self.processed,
+                    "failed": self.failed,
+                    "acked": self.acked,
+                    "renewed": self.renewed,
+                    "released": self.released,
+                    "in_flight": self.in_flight,
+                    "claims": len(self._claims),
+                    "elapsed": elapsed,
+                    "messages_per_second": rate,
+                    }
+
+
+    def _claim_loop(self, stop_event, executor):
+        log = logging.getLogger("pyrax")
+        poll = _Backoff(self.idle_sleep, self.max_idle_sleep)
+        while not stop_event.is_set():
+            with self._cond:
+                if self.in_flight >= self.max_in_flight:
+                    self._cond.wait(self.idle_sleep)
+                    continue
+            try:
+                claim = self.queue.claim_messages(self.ttl, self.grace,
+                        count=self.count)
+            except Exception as e:
+                log.error("Error claiming messages from queue '%s': %s",
+                        self.queue.id, e)
+                claim = None
+            if claim and claim.messages:
+                poll.reset()
+                self._add_claim(claim, executor)
+            else:
+                stop_event.wait(poll.idle())
+
+
+    def _add_claim(self, claim, executor):
+        """
+        Records a new claim, and submits its messages to the handler pool.
+        """
+        num = len(claim.messages)
+        with self._cond:
+            self._claims[claim.id] = {"claim": claim,
+                    "expires": time.time() + self.ttl,
+                    "pending": num,
+                    "failed": 0,
+                    }
+            self.claimed += num
+            self.in_flight += num
+        for msg in claim.messages:
+            future = executor.submit(self.handler, msg)
+            future.add_done_callback(partial(self._handled, claim.id, msg))
+
+
+    def _handled(self, claim_id, msg, future):
+        """
+        Called when the handler for a message has finished.
+        """
+        err = future.exception()
+        if err is not None:
+            log = logging.getLogger("pyrax")
+            log.error("Error handling message '%s': %s", msg.id, err)
+        with self._cond:
+            self.in_flight -= 1
+            entry = self._claims[claim_id]
+            entry["pending"] -= 1
+            if err is None:
+                self.processed += 1
+                self._acks.append(msg.id)
+            else:
+                self.failed += 1
+                entry["failed"] += 1
+            self._cond.notify_all()
+
+
+    def _maintenance_loop(self, stop_event, claim_threads, executor):
+        while not stop_event.is_set():
+            self._maintain()
+            stop_event.wait(CONSUMER_TICK)
+        for thread in claim_threads:
+            thread.join()
+        executor.shutdown(wait=True)
+        self._maintain(final=True)
+        with self._cond:
+            if self._stop_event is stop_event:
+                self._stopped = time.time()
+
+
+    def _maintain(self, final=False):
+        """
+        Acknowledges handled messages, renews the claims that are about to
+        expire, and releases finished claims whose messages failed. When
+        'final' is True, all remaining messages are acknowledged.
+        """
+        log = logging.getLogger("pyrax")
+        now = time.time()
+        with self._cond:
+            finished = [claim_id for claim_id, entry in self._claims.items()
+                    if not entry["pending"]]
+            to_release = [self._claims[claim_id]["claim"]
+                    for claim_id in finished
+                    if self._claims[claim_id]["failed"]]
+            flush = (final or to_release or
+                    len(self._acks) >= self.ack_batch_size or
+                    (self._acks and now - self._last_ack >= self.ack_interval))
+            acks = []
+            if flush:
+                acks, self._acks = self._acks, []
+                self._last_ack = now
+            for claim_id in finished:
+                del self._claims[claim_id]
+            to_renew = [entry for entry in self._claims.values()
+                    if entry["expires"] - now <= self.renew_margin]
+        for pos in range(0, len(acks), self.ack_batch_size):
+            batch = acks[pos:pos + self.ack_batch_size]
+            try:
+                self.queue.delete_by_ids(batch)
+            except Exception as e:
+                log.error("Error deleting messages from queue '%s': %s",
+                        self.queue.id, e)
+                continue
+            with self._cond:
+                self.acked += len(batch)
+        for claim in to_release:
+            try:
+                self.queue.release_claim(claim)
+            except Exception as e:
+                log.error("Error releasing claim '%s': %s", claim.id, e)
+                continue
+            with self._cond:
+                self.released += 1
+        for entry in to_renew:
+            try:
+                self.queue.update_claim(entry["claim"], ttl=self.ttl)
+            except Exception as e:
+                log.error("Error renewing claim '%s': %s", entry["claim"].id,
+                        e)
+                continue
+            with self._cond:
+                entry["expires"] = time.time() + self.ttl
+                self.renewed += 1
+
+
+
+class QueuePoller(object):
+    """
+    Polls many queues for messages using a single scheduler thread, so that a
+    fleet of mostly-idle queues can be watched without a thread (or a tight
+    polling loop) for each one.
+
+    Each queue is polled by trying to claim up to 'count' of its messages with
+    the given 'ttl' and 'grace'. When a claim succeeds, 'handler' is called
+    with the Queue and the QueueClaim, and the queue is polled again as soon
+    as the handler returns. The handler is responsible for deleting the
+    messages it processes, or releasing the claim. When a queue is empty, the
+    time until it is next polled starts at 'min_interval' seconds, and is
+    multiplied by 'backoff' after each empty poll, up to 'max_interval'
+    seconds. Polls and handlers run in a pool of up to 'max_workers' threads,
+    and a queue is never polled again while it is still being polled or
+    handled.
+
+    Queues can be added and removed at any time with `add_queue()` and
+    `remove_queue()`. Call `start()` to begin polling, and `stop()` to
+    finish. The number of 'polls', 'empty_polls', 'claims' and 'errors' so
+    far are available from `get_stats()`, along with each queue's current
+    polling interval.
+    """
+    def __init__(self, handler, queues=None, ttl=60, grace=60, count=None,
+            min_interval=1, max_interval=30, backoff=2, max_workers=None):
+        self.handler = handler
+        self.ttl = ttl
+        self.grace = grace
+        self.count = count
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_workers = max_workers or utils.DEFAULT_MAX_WORKERS
+        self._cond = threading.Condition()
+        self._queues = {}
+        self._schedule = []
+        self._seq = itertools.count()
+        self._stopping = False
+        self._thread = None
+        self._executor = None
+        self.polls = 0
+        self.empty_polls = 0
+        self.claims = 0
+        self.errors = 0
+        for queue in queues or []:
+            self.add_queue(queue)
+
+
+    def add_queue(self, queue):
+        """
+        Starts polling the specified queue. It is polled right away, and then
+        according to how busy it is.
+        """
+        with self._cond:
+            if queue.id in self._queues:
+                return
+            entry = {"queue": queue,
+                    "backoff": _Backoff(self.min_interval, self.max_interval,
+                        self.backoff),
+                    }
+            self._queues[queue.id] = entry
+            self._schedule_poll(entry, 0)
+
+
+    def remove_queue(self, queue):
+        """
+        Stops polling the specified queue. The queue may be passed as either
+        its name or a Queue object.
+        """
+        with self._cond:
+            self._queues.pop(utils.get_id(queue), None)
+
+
+    def start(self):
+        """
+        Starts the scheduler thread. Returns the poller, so that it can be
+        created and started in a single expression.
+        """
+        if self._thread:
+            return self
+        self._stopping = False
+        self._executor = futures.ThreadPoolExecutor(
+                max_workers=self.max_workers)
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+
+    def stop(self, wait=True):
+        """
+        Stops polling. If 'wait' is True, this does not return until any
+        polls and handlers that are running have finished.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._executor.shutdown(wait=wait)
+        self._thread = None
+
+
+    def get_stats(self):
+        """
+        Returns a dict with the number of 'polls', 'empty_polls', 'claims'
+        and 'errors', and an 'intervals' dict containing the number of seconds
+        until each queue is next polled if it is still empty, keyed by queue
+        name.
+        """
+        with self._cond:
+            intervals = dict((queue_id, entry["backoff"].interval)
+                    for queue_id, entry in self._queues.items())
+            return {"polls": self.polls,
+                    "empty_polls": self.empty_polls,
+                    "claims": self.claims,
+                    "errors": self.errors,
+                    "intervals": intervals,
+                    }
+
+
+    def _schedule_poll(self, entry, delay):
+        """
+        Schedules the next poll of a queue. Must be called with the lock held.
+        """
+        heapq.heappush(self._schedule,
+                (time.time() + delay, next(self._seq), entry))
+        self._cond.notify_all()
+
+
+    def _run(self):
+        with self._cond:
+            while not self._stopping:
+                if not self._schedule:
+                    self._cond.wait()
+                    continue
+                when, seq, entry = self._schedule[0]
+                delay = when - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._schedule)
+                if self._queues.get(entry["queue"].id) is not entry:
+                    # The queue has been removed.
+                    continue
+                self._executor.submit(self._poll, entry)
+
+
+    def _poll(self, entry):
+        """
+        Tries to claim messages from a queue, passes any that are claimed to
+        the handler, and schedules the next poll.
+        """
+        log = logging.getLogger("pyrax")
+        queue = entry["queue"]
+        claim = None
+        try:
+            claim = queue.claim_messages(self.ttl, self.grace,
+                    count=self.count)
+        except Exception as e:
+            log.error("Error claiming messages from queue '%s': %s",
+                    queue.id, e)
+            with self._cond:
+                self.errors += 1
+        found = claim is not None and bool(claim.messages)
+        with self._cond:
+            self.polls += 1
+            if found:
+                self.claims += 1
+            else:
+                self.empty_polls += 1
+        if found:
+            try:
+                self.handler(queue, claim)
+            except Exception as e:
+                log.error("Error handling claim '%s' from queue '%s': %s",
+                        claim.id, queue.id, e)
+                with self._cond:
+                    self.errors += 1
+        with self._cond:
+            if found:
+                entry["backoff"].reset()
+                delay = 0
+            else:
+                delay = entry["backoff"].idle()
+            if self._queues.get(queue.id) is entry:
+                self._schedule_poll(entry, delay)
+
+
+
+class QueueStatsSampler(object):
+    """
+    Samples the message stats of many queues at a regular interval, for
+    monitoring a fleet of queues or driving autoscaling decisions.
+
+    Every 'interval' seconds, the stats of all of the queues are fetched
+    concurrently in a pool of up to 'max_workers' threads, and a sample of
+    (timestamp, free, claimed, total, oldest_age) is added to each queue's
+    history. Only the most recent 'history' samples of each queue are kept.
+    From these, `get_metrics()` works out the current backlog of each queue,
+    the age of its oldest message, and the rate at which its backlog is
+    growing (or shrinking) over the period covered by its history.
+
+    If 'on_sample' is given, it is called with the result of `get_metrics()`
+    after each round of sampling. Queues can be added and removed at any
+    time with `add_queue()` and `remove_queue()`. Call `start()` to begin
+    sampling in a background thread, and `stop()` to finish; `sample()` can
+    also be called directly to take a single round of samples.
+    """
+    def __init__(self, queues=None, interval=60, history=60, max_workers=None,
+            on_sample=None):
+        self.interval = interval
+        self.history = history
+        self.max_workers = max_workers or utils.DEFAULT_MAX_WORKERS
+        self.on_sample = on_sample
+        self._cond = threading.Condition()
+        self._queues = {}
+        self._samples = {}
+        self._stopping = False
+        self._thread = None
+        self.rounds = 0
+        self.errors = 0
+        for queue in queues or []:
+            self.add_queue(queue)
+
+
+    def add_queue(self, queue):
+        """
+        Starts sampling the stats of the specified queue.
+        """
+        with self._cond:
+            if queue.id not in self._queues:
+                self._queues[queue.id] = queue
+                self._samples[queue.id] = deque(maxlen=self.history)
+
+
+    def remove_queue(self, queue):
+        """
+        Stops sampling the specified queue, and discards its history. The
+        queue may be passed as either its name or a Queue object.
+        """
+        with self._cond:
+            queue_id = utils.get_id(queue)
+            self._queues.pop(queue_id, None)
+            self._samples.pop(queue_id, None)
+
+
+    def start(self):
+        """
+        Starts the sampling thread. Returns the sampler, so that it can be
+        created and started in a single expression.
+        """
+        if self._thread:
+            return self
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+
+    def stop(self, wait=True):
+        """
+        Stops sampling. If 'wait' is True, this does not return until any
+        round of sampling that is in progress has finished.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread and wait:
+            self._thread.join()
+        self._thread = None
+
+
+    def sample(self):
+        """
+        Fetches the current stats of all of the queues, adds them to their
+        histories, and returns the result of `get_metrics()`. Queues whose
+        stats cannot be fetched are skipped for this round.
+        """
+        log = logging.getLogger("pyrax")
+        with self._cond:
+            queues = list(self._queues.values())
+        results = utils.run_concurrently(
+                lambda queue: (queue.get_stats(), time.time()), queues,
+                max_workers=self.max_workers)
+        with self._cond:
+            for queue, result, err in results:
+                if err is not None:
+                    log.error("Error getting the stats for queue '%s': %s",
+                            queue.id, err)
+                    self.errors += 1
+                    continue
+                samples = self._samples.get(queue.id)
+                if samples is None:
+                    # The queue has been removed.
+                    continue
+                stats, stamp = result
+                stats = stats or {}
+                oldest = stats.get("oldest") or {}
+                samples.append((stamp, stats.get("free", 0),
+                        stats.get("claimed", 0), stats.get("total", 0),
+                        oldest.get("age", 0)))
+            self.rounds += 1
+        metrics = self.get_metrics()
+        if self.on_sample:
+            try:
+                self.on_sample(metrics)
+            except Exception as e:
+                log.error("Error in the queue stats callback: %s", e)
+        return metrics
+
+
+    def get_history(self, queue):
+        """
+        Returns the samples held for the specified queue, oldest first, as a
+        list of (timestamp, free, claimed, total, oldest_age) tuples. The
+        queue may be passed as either its name or a Queue object.
+        """
+        with self._cond:
+            return list(self._samples.get(utils.get_id(queue), []))
+
+
+    def get_metrics(self):
+        """
+        Returns a dict with the latest metrics for each queue that has been
+        sampled in 'queues', keyed by queue name, and a summary of them all in
+        'fleet'. Each queue's metrics contain:
+
+            sampled_at: the time of the latest sample
+            free, claimed, total: the number of messages in the queue
+            oldest_age: the age in seconds of the oldest message
+            growth_rate: the change in the total number of messages per
+                second over the period covered by the history, or None
+                until there are at least two samples
+            drain_time: if the backlog is shrinking, the number of seconds
+                until it would be empty at that rate; otherwise None
+
+        The 'fleet' summary has the sums of 'free', 'claimed', 'total' and
+        'growth_rate' across all of the queues, the largest 'oldest_age',
+        and the name of the queue with that message as 'oldest_queue'.
+        """
+        with self._cond:
+            histories = [(queue_id, samples[0], samples[-1])
+                    for queue_id, samples in self._samples.items()
+                    if samples]
+        queues = {}
+        fleet = {"free": 0, "claimed": 0, "total": 0, "growth_rate": 0.0,
+                "oldest_age": 0, "oldest_queue": None}
+        for queue_id, first, last in histories:
+            stamp, free, claimed, total, oldest_age = last
+            elapsed = stamp - first[0]
+            growth_rate = None
+            drain_time = None
+            if elapsed > 0:
+                growth_rate = (total - first[3]) / float(elapsed)
+                if growth_rate < 0:
+                    drain_time = total / -growth_rate
+                fleet["growth_rate"] += growth_rate
+            queues[queue_id] = {"sampled_at": stamp,
+                    "free": free,
+                    "claimed": claimed,
+                    "total": total,
+                    "oldest_age": oldest_age,
+                    "growth_rate": growth_rate,
+                    "drain_time": drain_time,
+                    }
+            fleet["free"] += free
+            fleet["claimed"] += claimed
+            fleet["total"] += total
+            if oldest_age > fleet["oldest_age"]:
+                fleet["oldest_age"] = oldest_age
+                fleet["oldest_queue"] = queue_id
+        return {"queues": queues, "fleet": fleet}
+
+
+    def _run(self):
+        while True:
+            start = time.time()
+            self.sample()
+            with self._cond:
+                delay = self.interval - (time.time() - start)
+                if not self._stopping and delay > 0:
+                    self._cond.wait(delay)
+                if self._stopping:
+                    return
+
+
+
 class QueueClient(BaseClient):
     """
     This is the primary class for interacting with Cloud Queues.
     """
     name = "Cloud Queues"
     client_id = None
+    # The default codec for message bodies; see QueueCodec. It can be either
+    # a codec or the name of a registered codec.
+    codec = None
 
 
     def _configure_manager(self):
@@ -672,6 +1954,21 @@ class QueueClient(BaseClient):
                 marker=marker, limit=limit)
 
 
+    @assure_queue
+    def iter_messages(self, queue, include_claimed=False, echo=False,
+            marker=None, limit=None, prefetch=True):
+        """
+        Returns a generator that yields the messages in the specified queue as
+        each page of the listing arrives, so that queues with large backlogs
+        can be processed without holding all their messages in memory. The
+        parameters are the same as for `list_messages()`; unless 'prefetch'
+        is False, the next page is requested while the current one is being
+        consumed.
+        """
+        return queue.iter_messages(include_claimed=include_claimed, echo=echo,
+                marker=marker, limit=limit, prefetch=prefetch)
+
+
     @assure_queue
     def list_messages_by_ids(self, queue, ids):
         """
@@ -710,6 +2007,29 @@ class QueueClient(BaseClient):
         return queue.post_message(body, ttl)
 
 
+    @assure_queue
+    def post_messages(self, queue, messages):
+        """
+        Creates several messages in the specified queue with a single API
+        call. 'messages' is a list of (body, ttl) tuples; no more than
+        MSG_LIMIT messages can be posted at once. Returns a list of the IDs of
+        the new messages.
+        """
+        return queue.post_messages(messages)
+
+
+    @assure_queue
+    def producer(self, queue, ttl, batch_size=MSG_LIMIT,
+            max_bytes=MAX_POST_BYTES, linger=0.05, max_workers=None):
+        """
+        Returns a QueueProducer for posting messages to the specified queue in
+        batches. Each call to its `post()` method returns a Future for the ID
+        of the message. See the QueueProducer class for details.
+        """
+        return queue.producer(ttl, batch_size=batch_size, max_bytes=max_bytes,
+                linger=linger, max_workers=max_workers)
+
+
     @assure_queue
     def claim_messages(self, queue, ttl, grace, count=None):
         """
@@ -733,6 +2053,58 @@ class QueueClient(BaseClient):
         return queue.claim_messages(ttl, grace, count=count)
 
 
+    @assure_queue
+    def wait_for_messages(self, queue, ttl, grace, count=None, timeout=None,
+            min_interval=1, max_interval=30, backoff=2):
+        """
+        Claims messages from the specified queue, waiting until there are some
+        to claim. While the queue is empty, the time between attempts starts at
+        'min_interval' seconds, and is multiplied by 'backoff' after each
+        empty attempt, up to 'max_interval' seconds. Returns the QueueClaim, or
+        None if 'timeout' seconds pass without any messages being claimed.
+        """
+        return queue.wait_for_messages(ttl, grace, count=count,
+                timeout=timeout, min_interval=min_interval,
+                max_interval=max_interval, backoff=backoff)
+
+
+    def poll_queues(self, queues, handler, ttl=60, grace=60, count=None,
+            min_interval=1, max_interval=30, backoff=2, max_workers=None):
+        """
+        Starts polling all of the specified queues for messages from a single
+        scheduler, calling 'handler' with the Queue and the QueueClaim whenever
+        messages are claimed. Idle queues are polled less and less often, up
+        to every 'max_interval' seconds, and busy queues are polled again as
+        soon as their messages have been handled. Queues may be passed as
+        either Queue objects or names; names are not checked for existence.
+        Returns the running QueuePoller; see that class for details.
+        """
+        queues = [queue if isinstance(queue, Queue) else
+                Queue(self._manager, {"name": queue}) for queue in queues]
+        poller = QueuePoller(handler, queues=queues, ttl=ttl, grace=grace,
+                count=count, min_interval=min_interval,
+                max_interval=max_interval, backoff=backoff,
+                max_workers=max_workers)
+        return poller.start()
+
+
+    def sample_stats(self, queues, interval=60, history=60, max_workers=None,
+            on_sample=None):
+        """
+        Starts sampling the message stats of all of the specified queues every
+        'interval' seconds, keeping the last 'history' samples of each, and
+        calling 'on_sample', if given, with the metrics after each round.
+        Queues may be passed as either Queue objects or names; names are not
+        checked for existence. Returns the running QueueStatsSampler; see that
+        class for details.
+        """
+        queues = [queue if isinstance(queue, Queue) else
+                Queue(self._manager, {"name": queue}) for queue in queues]
+        sampler = QueueStatsSampler(queues=queues, interval=interval,
+                history=history, max_workers=max_workers, on_sample=on_sample)
+        return sampler.start()
+
+
     @assure_queue
     def get_claim(self, queue, claim):
         """
@@ -758,3 +2130,23 @@ class QueueClient(BaseClient):
         by this claim as available for processing by other workers.
         """
         return queue.release_claim(claim)
+
+
+    @assure_queue
+    def consume(self, queue, handler, workers=10, claim_loops=1, ttl=60,
+            grace=60, count=None, max_in_flight=None,
+            ack_batch_size=MSG_LIMIT, ack_interval=1, renew_margin=None,
+            idle_sleep=1, max_idle_sleep=30):
+        """
+        Starts processing the messages in the specified queue by calling
+        'handler' with each one in a pool of 'workers' threads. Handled
+        messages are deleted from the queue in batches, and claims are renewed
+        while their messages are still being handled. Returns the running
+        QueueConsumer; call its `stop()` method to finish. See the
+        QueueConsumer class for details of the other parameters.
+        """
+        return queue.consume(handler, workers=workers, claim_loops=claim_loops,
+                ttl=ttl, grace=grace, count=count, max_in_flight=max_in_flight,
+                ack_batch_size=ack_batch_size, ack_interval=ack_interval,
+                renew_margin=renew_margin, idle_sleep=idle_sleep,
+                max_idle_sleep=max_idle_sleep)
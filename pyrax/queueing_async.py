@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c)2026 Rackspace US, Inc.
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+An asyncio counterpart of QueueClient, for applications that run on an event
+loop. Unlike the rest of pyrax, this module requires Python 3.5 or later, as
+well as the 'aiohttp' package, which is installed by the 'async' extra
+('pip install pyrax[async]'). It is not imported by pyrax itself, so import it
+directly when you need it:
+
+    from pyrax.queueing_async import AsyncQueueClient
+"""
+from __future__ import absolute_import, unicode_literals
+
+import asyncio
+import json
+
+# aiohttp is an optional import
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from pyrax.client import _safe_quote
+import pyrax.exceptions as exc
+from pyrax.queueing import Queue
+from pyrax.queueing import QueueMessage
+import pyrax.utils as utils
+
+
+class _AsyncResponse(object):
+    """
+    The parts of a response needed by exceptions.from_response().
+    """
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+
+
+
+class AsyncQueueClient(object):
+    """
+    Works with Cloud Queues from asyncio code, without tying up a thread for
+    each request. All of the public methods are coroutines.
+
+    It is created from a QueueClient, such as `pyrax.queues`, whose identity,
+    endpoint and client ID it shares. Requests are made with the aiohttp
+    ClientSession passed as 'session'; if none is passed, one is created when
+    first needed, and closed by `close()`. The client can also be used as an
+    async context manager, which closes it on exit. If the identity needs to
+    authenticate, that is done in the event loop's default executor, since
+    authentication is not asynchronous.
+
+    Queues may be passed as either Queue objects or names, and the results
+    are the same Queue, QueueMessage and QueueClaim objects returned by
+    QueueClient, so they can be used with either client.
+    """
+    def __init__(self, client, session=None):
+        self.client = client
+        self._session = session
+        self._owns_session = session is None
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, type, value, traceback):
+        await self.close()
+
+
+    async def close(self):
+        """
+        Closes the aiohttp session, if it was created by this client.
+        """
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+    def _get_session(self):
+        if self._session is None:
+            if aiohttp is None:
+                raise exc.AiohttpModuleNotInstalled("The 'aiohttp' Python "
+                        "module is not installed on this system.")
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+
+    def _queue(self, queue):
+        if isinstance(queue, Queue):
+            return queue
+        return Queue(self.client._manager, {"name": queue})
+
+
+    async def _authenticate(self):
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self.client.identity.authenticate)
+
+
+    def _headers(self):
+        id_svc = self.client.identity
+        headers = {"Content-Type": "application/json",
+                "Accept": "application/json",
+                "X-Auth-Token": id_svc.token,
+                }
+        if id_svc.tenant_id:
+            headers["X-Auth-Project-Id"] = id_svc.tenant_id
+        self.client._add_custom_headers(headers)
+        return headers
+
+
+    async def _send(self, method, url, data):
+        session = self._get_session()
+        async with session.request(method, url, data=data,
+                headers=self._headers()) as resp:
+            text = await resp.text()
+            status, headers = resp.status, resp.headers
+        try:
+            body = json.loads(text) if text else None
+        except ValueError:
+            body = text
+        return status, headers, body
+
+
+    async def _api_request(self, uri, method, body=None):
+        """
+        Makes the request, authenticating first if needed, and once more if
+        the token has expired. Returns a 3-tuple of the response status,
+        headers and JSON-decoded body, or raises the appropriate exception
+        for an error response.
+        """
+        id_svc = self.client.identity
+        if not all((self.client.management_url, id_svc.token,
+                id_svc.tenant_id)):
+            await self._authenticate()
+        if not self.client.management_url:
+            raise exc.ServiceNotAvailable("The '%s' service is not available."
+                    % self.client)
+        url = "%s%s" % (self.client.management_url, _safe_quote(uri))
+        data = None if body is None else json.dumps(body)
+        status, headers, resp_body = await self._send(method, url, data)
+        if status == 401:
+            await self._authenticate()
+            status, headers, resp_body = await self._send(method, url, data)
+        if status >= 400:
+            err = exc.from_response(_AsyncResponse(status, headers), resp_body)
+            if (status == 400 and
+                    err.message == 'The "Client-ID" header is required.'):
+                raise exc.QueueClientIDNotDefined("You must supply a client ID "
+                        "to work with Queue messages.")
+            raise err
+        return status, headers, resp_body
+
+
+    async def queue_exists(self, name):
+        """
+        Returns True or False, depending on the existence of the named queue.
+        """
+        try:
+            await self._api_request("/queues/%s" % name, "HEAD")
+            return True
+        except exc.NotFound:
+            return False
+
+
+    async def create(self, name):
+        """
+        Creates a queue with the specified name, and returns a Queue object
+        for it. Raises DuplicateQueue if the queue already exists.
+        """
+        if await self.queue_exists(name):
+            raise exc.DuplicateQueue("The queue '%s' already exists." % name)
+        try:
+            await self._api_request("/queues/%s" % name, "PUT")
+        except exc.BadRequest:
+            raise exc.InvalidQueueName("Queue names must not exceed 64 bytes "
+                    "in length, and are limited to US-ASCII letters, digits, "
+                    "underscores, and hyphens. Submitted: '%s'." % name)
+        return self._queue(name)
+
+
+    async def delete(self, queue):
+        """
+        Deletes the specified queue.
+        """
+        await self._api_request("/queues/%s" % utils.get_id(queue), "DELETE")
+
+
+    async def list(self, limit=None, marker=None):
+        """
+        Returns a list of Queue objects for a page of the queues in the
+        account. Pagination is supported through the optional 'marker' and
+        'limit' parameters.
+        """
+        uri = "/queues"
+        qs = utils.dict_to_qs({"limit": limit, "marker": marker})
+        if qs:
+            uri = "%s?%s" % (uri, qs)
+        status, headers, body = await self._api_request(uri, "GET")
+        return [self._queue(info["name"])
+                for info in (body or {}).get("queues", [])]
+
+
+    async def get_stats(self, queue):
+        """
+        Returns the message stats for the specified queue.
+        """
+        uri = "/queues/%s/stats" % utils.get_id(queue)
+        status, headers, body = await self._api_request(uri, "GET")
+        return body.get("messages")
+
+
+    async def get_metadata(self, queue):
+        """
+        Returns the metadata for the specified queue.
+        """
+        uri = "/queues/%s/metadata" % utils.get_id(queue)
+        status, headers, body = await self._api_request(uri, "GET")
+        return body
+
+
+    async def set_metadata(self, queue, metadata, clear=False):
+        """
+        Accepts a dictionary and adds that to the specified queue's metadata.
+        If the 'clear' argument is passed as True, any existing metadata is
+        replaced with the new metadata.
+        """
+        if clear:
+            curr = {}
+        else:
+            curr = await self.get_metadata(queue)
+        curr.update(metadata)
+        uri = "/queues/%s/metadata" % utils.get_id(queue)
+        await self._api_request(uri, "PUT", body=curr)
+
+
+    async def post_message(self, queue, body, ttl):
+        """
+        Creates a message in the specified queue, and returns a QueueMessage
+        for it. The value of ttl must be between 60 and 1209600 seconds.
+        """
+        msgs = await self.post_messages(queue, [(body, ttl)])
+        return msgs[0] if msgs else None
+
+
+    async def post_messages(self, queue, messages):
+        """
+        Creates several messages in the specified queue with a single API
+        call. 'messages' is a list of (body, ttl) tuples; no more than
+        MSG_LIMIT messages can be posted at once. Returns a list of
+        QueueMessage objects for the messages that were created.
+        """
+        mgr = self._queue(queue)._message_manager
+        uri = "/%s" % mgr.uri_base
+        status, headers, resp_body = await self._api_request(uri, "POST",
+                body=mgr._create_many_body(messages))
+        ids = mgr._ids_from_response(resp_body)
+        return [QueueMessage(mgr, {"href": "/%s/%s" % (mgr.uri_base, msg_id),
+                "body": body, "ttl": ttl})
+                for msg_id, (body, ttl) in zip(ids, messages)]
+
+
+    async def claim_messages(self, queue, ttl, grace, count=None):
+        """
+        Claims up to `count` unclaimed messages from the specified queue. See
+        QueueClient.claim_messages() for the meaning of 'ttl' and 'grace'.
+
+        Returns a QueueClaim object, whose 'messages' attribute contains the
+        list of QueueMessage objects representing the claimed messages, or
+        None if there was nothing to claim.
+        """
+        mgr = self._queue(queue)._claim_manager
+        uri = "/%s" % mgr.uri_base
+        if count is not None:
+            uri = "%s?limit=%s" % (uri, count)
+        status, headers, resp_body = await self._api_request(uri, "POST",
+                body={"ttl": ttl, "grace": grace})
+        if status == 204 or not resp_body:
+            # Nothing available to claim
+            return None
+        return mgr._claim_from_response(resp_body, ttl, grace,
+                location=headers.get("Location"))
+
+
+    async def update_claim(self, queue, claim, ttl=None, grace=None):
+        """
+        Updates the specified claim with either a new TTL or grace period, or
+        both.
+        """
+        body = {}
+        if ttl is not None:
+            body["ttl"] = ttl
+        if grace is not None:
+            body["grace"] = grace
+        if not body:
+            raise exc.MissingClaimParameters("You must supply a value for "
+                    "'ttl' or 'grace' when calling 'update_claim()'")
+        uri = "/queues/%s/claims/%s" % (utils.get_id(queue),
+                utils.get_id(claim))
+        await self._api_request(uri, "PATCH", body=body)
+
+
+    async def release_claim(self, queue, claim):
+        """
+        Releases the specified claim and makes any messages previously claimed
+        by this claim as available for processing by other workers.
+        """
+        uri = "/queues/%s/claims/%s" % (utils.get_id(queue),
+                utils.get_id(claim))
+        await self._api_request(uri, "DELETE")
+
+
+    async def delete_message(self, queue, msg_id, claim_id=None):
+        """
+        Deletes the message whose ID matches the supplied msg_id from the
+        specified queue. If the message has been claimed, the ID of that claim
+        must be passed as the 'claim_id' parameter.
+        """
+        uri = "/queues/%s/messages/%s" % (utils.get_id(queue),
+                utils.get_id(msg_id))
+        if claim_id:
+            uri = "%s?claim_id=%s" % (uri, claim_id)
+        await self._api_request(uri, "DELETE")
+
+
+    async def delete_by_ids(self, queue, ids):
+        """
+        Deletes the messages whose IDs are passed in from the specified queue.
+        """
+        ids = utils.coerce_to_list(ids)
+        uri = "/queues/%s/messages?ids=%s" % (utils.get_id(queue),
+                ",".join(ids))
+        await self._api_request(uri, "DELETE")
@@ -2,10 +2,12 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+from concurrent import futures
 import datetime
 import email.utils
 import fnmatch
 import hashlib
+import mmap
 import numbers
 import os
 import random
@@ -34,6 +36,8 @@ trace = pudb.set_trace
 
 SLUGIFY_STRIP_RE = re.compile(r"[^\w\s-]")
 SLUGIFY_HYPHENATE_RE = re.compile(r"[-\s]+")
+# Number of threads used by default for concurrent bulk operations.
+DEFAULT_MAX_WORKERS = 10
 
 
 def runproc(cmd):
@@ -220,6 +224,36 @@ class ResultsIterator(object):
             raise StopIteration()
 
 
+def run_concurrently(fnc, items, max_workers=None):
+    """
+    Calls `fnc` once for each element of `items`, using a pool of up to
+    `max_workers` threads (DEFAULT_MAX_WORKERS if not specified). This is
+    intended for the many bulk operations that have to make one API call per
+    item, and which would otherwise have to wait on each call in turn.
+
+    Returns a list of 3-tuples in the form of (item, result, exception), in the
+    same order as `items`. For each item either the result or the exception
+    will be None; exceptions are not re-raised, so it is up to the calling code
+    to decide how to report any failures.
+    """
+    items = list(items)
+    if not items:
+        return []
+    max_workers = max_workers or DEFAULT_MAX_WORKERS
+    results = [None] * len(items)
+
+    def _call(pos, item):
+        try:
+            results[pos] = (item, fnc(item), None)
+        except Exception as e:
+            results[pos] = (item, None, e)
+
+    with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for pos, item in enumerate(items):
+            executor.submit(_call, pos, item)
+    return results
+
+
 def get_checksum(content, encoding="utf8", block_size=8192):
     """
     Returns the MD5 checksum in hex for the given content. If 'content'
@@ -227,7 +261,8 @@ def get_checksum(content, encoding="utf8", block_size=8192):
     method. If 'content' is a file path, that file is read and its
     contents used. Otherwise, 'content' is assumed to be the string whose
     checksum is desired. If the content is unicode, it will be encoded
-    using the specified encoding.
+    using the specified encoding. Memory-mapped files and memoryviews are
+    hashed in place, without copying their contents.
 
     To conserve memory, files and file-like objects will be read in blocks,
     with the default block size of 8192 bytes, which is 64 * the digest block
@@ -241,6 +276,9 @@ def get_checksum(content, encoding="utf8", block_size=8192):
             txt = txt.encode(encoding)
         md.update(txt)
 
+    if isinstance(content, (mmap.mmap, memoryview)):
+        md.update(content)
+        return md.hexdigest()
     try:
         isfile = os.path.isfile(content)
     except (TypeError, ValueError):
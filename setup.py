@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 from setuptools import setup
+from setuptools.command.build_py import build_py as _build_py
 from setuptools.command.sdist import sdist as _sdist
 import re
 import sys
@@ -58,6 +59,23 @@ class sdist(_sdist):
         # Run parent constructor
         _sdist.run(self)
 
+
+# Modules that use syntax only available in newer versions of Python, along
+# with the version they need. They are left out of builds for older versions,
+# so that installing doesn't try to byte-compile them.
+version_modules = {
+    ("pyrax", "queueing_async"): (3, 5),
+}
+
+
+class build_py(_build_py):
+    """ custom build_py command, to skip modules this Python can't compile """
+
+    def find_package_modules(self, package, package_dir):
+        modules = _build_py.find_package_modules(self, package, package_dir)
+        return [(pkg, mod, path) for (pkg, mod, path) in modules
+                if sys.version_info >= version_modules.get((pkg, mod), (0,))]
+
 # Get the long description from the relevant file
 try:
     f = codecs.open('README.rst', encoding='utf-8')
@@ -96,10 +114,14 @@ setup(
         "keyring",
         "requests>=2.2.1,<3",
         "six>=1.9.0,<2",
+        "futures>=3.0;python_version<'3'",
     ] + testing_requires,
+    extras_require={
+        "async": ["aiohttp;python_version>='3.5'"],
+    },
     packages=[
         "pyrax",
         "pyrax/identity",
     ],
-    cmdclass={'sdist': sdist}
+    cmdclass={'build_py': build_py, 'sdist': sdist}
 )
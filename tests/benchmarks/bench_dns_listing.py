@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measures how long it takes to list every domain in an account against a local
+fake Cloud DNS server that adds a fixed latency to each request, comparing
+fetching the pages one after another by following their 'next' links with
+fetching the pages after the first at the same time.
+
+Usage:
+    python tests/benchmarks/bench_dns_listing.py [domains] [latency_ms]
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from pyrax.clouddns import CloudDNSClient
+
+NUM_DOMAINS = 2000
+LATENCY = 0.05
+PAGE_SIZE = 100
+
+
+class FakeDNSHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Answers requests for pages of the domain listing.
+    """
+    def do_GET(self):
+        time.sleep(LATENCY)
+        mtch = re.search(r"offset=(\d+)", self.path)
+        offset = int(mtch.group(1)) if mtch else 0
+        domains = [{"id": str(num), "name": "example%05d.com" % num}
+                for num in range(offset, min(offset + PAGE_SIZE,
+                NUM_DOMAINS))]
+        body = {"domains": domains, "totalEntries": NUM_DOMAINS}
+        if offset + PAGE_SIZE < NUM_DOMAINS:
+            body["links"] = [{"rel": "next",
+                    "href": "http://127.0.0.1/v1.0/123/domains?limit=%s"
+                    "&offset=%s" % (PAGE_SIZE, offset + PAGE_SIZE)}]
+        content = json.dumps(body).encode("utf8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+
+class BenchIdentity(object):
+    token = "token"
+    tenant_id = "tenant"
+
+    def authenticate(self):
+        pass
+
+
+def list_sequential(mgr):
+    # This is what list_all=True used to do.
+    ret = mgr._list("/domains")
+    while mgr._paging["domain"]["next_uri"]:
+        ret.extend(mgr._list(mgr._paging["domain"]["next_uri"]))
+    return ret
+
+
+def list_parallel(mgr):
+    return mgr.list(list_all=True)
+
+
+def run(num_domains=2000, latency_ms=50):
+    global NUM_DOMAINS, LATENCY
+    NUM_DOMAINS = num_domains
+    LATENCY = latency_ms / 1000.0
+    server = ThreadingServer(("127.0.0.1", 0), FakeDNSHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = "http://127.0.0.1:%s/v1.0/123" % server.server_port
+    clt = CloudDNSClient(BenchIdentity(), management_url=url)
+    mgr = clt._manager
+    print("%s domains in pages of %s, %s ms per request" % (num_domains,
+            PAGE_SIZE, latency_ms))
+    for label, fnc in (("sequential", list_sequential),
+            ("parallel", list_parallel)):
+        start = time.time()
+        domains = fnc(mgr)
+        elapsed = time.time() - start
+        assert len(domains) == num_domains
+        print("%-12s %8.2f sec" % (label, elapsed))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measures how long it takes to make a series of configuration changes to many
+load balancers, each of which stays PENDING_UPDATE for a short time after
+every change, comparing one change at a time with wait_for_active() between
+them against the LoadBalancerScheduler.
+
+Usage:
+    python tests/benchmarks/bench_lb_scheduler.py [loadbalancers] [changes]
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+import pyrax.cloudloadbalancers as clb
+from pyrax.cloudloadbalancers import CloudLoadBalancerManager
+from pyrax.cloudloadbalancers import LoadBalancerScheduler
+import pyrax.exceptions as exc
+
+# How long a load balancer stays PENDING_UPDATE after a change
+PENDING_TIME = 0.05
+# How long each API call takes
+LATENCY = 0.005
+
+
+class BenchManager(CloudLoadBalancerManager):
+    """
+    Stands in for the API, without making any requests.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.busy_until = {}
+
+    def get_status(self, loadbalancer):
+        time.sleep(LATENCY)
+        with self.lock:
+            if time.time() < self.busy_until.get(loadbalancer, 0):
+                return "PENDING_UPDATE"
+        return "ACTIVE"
+
+    def change(self, loadbalancer):
+        time.sleep(LATENCY)
+        with self.lock:
+            if time.time() < self.busy_until.get(loadbalancer, 0):
+                raise exc.ClientException(422, "Load balancer is considered "
+                        "immutable.")
+            self.busy_until[loadbalancer] = time.time() + PENDING_TIME
+
+
+def serial(mgr, lbs, changes):
+    for lb in lbs:
+        for ii in range(changes):
+            mgr.wait_for_active(lb)
+            mgr.change(lb)
+
+
+def scheduled(mgr, lbs, changes):
+    with LoadBalancerScheduler(mgr, max_workers=20) as sched:
+        for ii in range(changes):
+            sched.submit_many(lbs, mgr.change)
+
+
+def run(num_lbs=100, changes=3):
+    # Scale the polling intervals to match the simulated pending time.
+    clb.DEFAULT_ACTIVE_INTERVAL = PENDING_TIME / 5
+    clb.DEFAULT_MAX_ACTIVE_INTERVAL = PENDING_TIME
+    lbs = ["lb%s" % num for num in range(num_lbs)]
+    print("%s load balancers, %s changes each" % (num_lbs, changes))
+    for label, fnc in (("serial", serial), ("scheduler", scheduled)):
+        mgr = BenchManager()
+        start = time.time()
+        fnc(mgr, lbs, changes)
+        print("%-10s %8.2f sec" % (label, time.time() - start))
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:3]])
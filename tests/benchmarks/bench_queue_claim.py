@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measures how many claims per second a consumer can make against a local fake
+Cloud Queues server, comparing the current claim() path, which builds the
+QueueClaim from the POST response, with the previous one, which discarded
+that response and then fetched the same claim with an extra GET.
+
+Usage:
+    python tests/benchmarks/bench_queue_claim.py [claims] [messages_per_claim]
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+from six.moves import BaseHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from pyrax.queueing import Queue
+from pyrax.queueing import QueueClient
+
+QUEUE = "bench"
+MSGS_PER_CLAIM = 10
+
+
+class FakeQueueHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Answers claim requests for a queue that never runs out of messages.
+    """
+    def _messages(self, claim_id):
+        return [{"href": "/v1/queues/%s/messages/%s?claim_id=%s" % (QUEUE,
+                uuid.uuid4().hex, claim_id), "ttl": 300, "age": 0,
+                "body": {"event": "bench"}}
+                for ii in range(MSGS_PER_CLAIM)]
+
+    def _reply(self, status, body, headers=None):
+        content = json.dumps(body).encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for key, val in (headers or {}).items():
+            self.send_header(key, val)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        claim_id = uuid.uuid4().hex
+        location = "/v1/queues/%s/claims/%s" % (QUEUE, claim_id)
+        self._reply(201, self._messages(claim_id), {"Location": location})
+
+    def do_GET(self):
+        claim_id = self.path.rsplit("/", 1)[-1]
+        self._reply(200, {"href": self.path, "ttl": 60, "age": 0,
+                "messages": self._messages(claim_id)})
+
+    def log_message(self, *args):
+        pass
+
+
+class BenchIdentity(object):
+    token = "token"
+    tenant_id = "tenant"
+
+    def authenticate(self):
+        pass
+
+
+def claim_only(queue):
+    return queue.claim_messages(60, 60)
+
+
+def claim_and_get(queue):
+    # This is what claim() used to do.
+    claim = queue.claim_messages(60, 60)
+    return queue.get_claim(claim.id)
+
+
+def run(num_claims=500, msgs_per_claim=10):
+    global MSGS_PER_CLAIM
+    MSGS_PER_CLAIM = msgs_per_claim
+    server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), FakeQueueHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = "http://127.0.0.1:%s/v1" % server.server_port
+    clt = QueueClient(BenchIdentity(), management_url=url)
+    clt.client_id = str(uuid.uuid4())
+    queue = Queue(clt._manager, {"name": QUEUE})
+    print("%s claims of %s messages each" % (num_claims, msgs_per_claim))
+    for label, fnc in (("POST + GET", claim_and_get),
+            ("POST only", claim_only)):
+        start = time.time()
+        for ii in range(num_claims):
+            claim = fnc(queue)
+            assert len(claim.messages) == msgs_per_claim
+        elapsed = time.time() - start
+        print("%-12s %8.1f claims/sec" % (label, num_claims / elapsed))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:3]])
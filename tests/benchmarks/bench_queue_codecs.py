@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compares the queue message codecs on a few kinds of payload: the number of
+bytes each message adds to the body of a POST request, and the time taken to
+encode it into that request body and to decode it from a response.
+
+Usage:
+    python tests/benchmarks/bench_queue_codecs.py [rounds]
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import base64
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from pyrax.queueing import CompactJSONCodec
+from pyrax.queueing import GzipCodec
+from pyrax.queueing import JSONCodec
+from pyrax.queueing import MsgpackCodec
+from pyrax.queueing import ZlibCodec
+import pyrax.exceptions as exc
+
+
+def _payloads():
+    event = {"event": "order.created", "order_id": 12345,
+            "customer": {"id": 678, "name": "Jane Doe", "tier": "gold"},
+            "total": 99.95}
+    records = [{"timestamp": 1500000000 + num, "level": "INFO",
+            "service": "checkout", "host": "web-%02d" % (num % 8),
+            "message": "Processed request %s in %s ms" % (num, num % 97)}
+            for num in range(400)]
+    blob = {"name": "thumbnail.png",
+            "data": base64.b64encode(os.urandom(48000)).decode("ascii")}
+    return (("small event", event),
+            ("log batch", {"records": records}),
+            ("random blob", blob),
+            )
+
+
+def _codecs():
+    return (JSONCodec(), CompactJSONCodec(), ZlibCodec(level=1), ZlibCodec(),
+            GzipCodec(), MsgpackCodec())
+
+
+def _dumps(codec, body):
+    # This is what posting a message does with its body.
+    item = [{"body": codec.encode(body), "ttl": 300}]
+    if codec.compact:
+        return json.dumps(item, separators=(",", ":"))
+    return json.dumps(item)
+
+
+def _loads(codec, content):
+    # This is what listing or claiming a message does with its body.
+    return codec.decode(json.loads(content)[0]["body"])
+
+
+def _time(fnc, rounds):
+    start = time.time()
+    for _ in range(rounds):
+        fnc()
+    return (time.time() - start) / rounds * 1e6
+
+
+def run(rounds=200):
+    print("%-12s %-14s %10s %8s %12s %12s" % ("payload", "codec", "bytes",
+            "ratio", "encode usec", "decode usec"))
+    for label, body in _payloads():
+        base = None
+        for codec in _codecs():
+            try:
+                content = _dumps(codec, body)
+            except exc.MsgpackModuleNotInstalled:
+                continue
+            size = len(content)
+            base = base or size
+            name = codec.name
+            if isinstance(codec, ZlibCodec) and codec.level != 6:
+                name = "%s-%s" % (name, codec.level)
+            encode = _time(lambda: _dumps(codec, body), rounds)
+            decode = _time(lambda: _loads(codec, content), rounds)
+            print("%-12s %-14s %10s %8.2f %12.1f %12.1f" % (label, name, size,
+                    float(size) / base, encode, decode))
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:2]])
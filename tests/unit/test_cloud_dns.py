@@ -2,21 +2,31 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 
+import datetime
+import os
 import random
+import re
+import threading
 import time
 import unittest
 
 from mock import call
 from mock import patch
 from mock import MagicMock as Mock
+import six
 
 import pyrax
+import pyrax.clouddns as clouddns
 from pyrax.manager import BaseManager
 from pyrax.clouddns import assure_domain
 from pyrax.clouddns import CloudDNSClient
 from pyrax.clouddns import CloudDNSDomain
 from pyrax.clouddns import CloudDNSManager
 from pyrax.clouddns import CloudDNSRecord
+from pyrax.clouddns import DNSChangeFeed
+from pyrax.clouddns import DNSJobPoller
+from pyrax.clouddns import bind_record_line
+from pyrax.clouddns import iter_bind_records
 from pyrax.clouddns import ResultsIterator
 from pyrax.clouddns import DomainResultsIterator
 from pyrax.clouddns import SubdomainResultsIterator
@@ -406,6 +416,23 @@ class CloudDNSTest(unittest.TestCase):
         clt.method_get.assert_called_once_with(massaged_uri)
         mgr._process_async_error.assert_called_once_with(get_resp, err_class)
 
+    def test_async_call_backoff(self):
+        clt = self.client
+        mgr = clt._manager
+        mgr._set_delay(1)
+        mgr._set_timeout(0)
+        running = {"callbackUrl": "https://fake.example.com/status/fake",
+                "status": "RUNNING"}
+        done = {"response": {"result": "fake"}, "status": "COMPLETED"}
+        clt.method_post = Mock(return_value=({}, running))
+        clt.method_get = Mock(side_effect=[({}, running)] * 5 + [({}, done)])
+        with patch.object(time, "sleep") as sleep:
+            ret = mgr._async_call(example_uri, body={}, method="POST")
+        self.assertEqual(ret, ({}, done["response"]))
+        self.assertEqual(clt.method_get.call_count, 6)
+        self.assertEqual([args[0] for args, kwargs in sleep.call_args_list],
+                [1, 2, 4, 8, 10])
+
     def test_process_async_error(self):
         clt = self.client
         mgr = clt._manager
@@ -664,6 +691,53 @@ class CloudDNSTest(unittest.TestCase):
                 error_class=exc.DomainRecordUpdateFailed,
                 has_response=False)
 
+    def test_add_records_async(self):
+        clt = self.client
+        mgr = clt._manager
+        dom = self.domain
+        rec = {"type": "A", "name": "example.com", "data": "0.0.0.0"}
+        fut = mgr._submit_async_call = Mock()
+        uri = "/domains/%s/records" % utils.get_id(dom)
+        ret = clt.add_records_async(dom, rec)
+        self.assertEqual(ret, mgr._submit_async_call.return_value)
+        args, kwargs = mgr._submit_async_call.call_args
+        self.assertEqual(args, (uri, ))
+        self.assertEqual(kwargs["body"], {"records": [rec]})
+        self.assertEqual(kwargs["error_class"],
+                exc.DomainRecordAdditionFailed)
+        body = {"response": {"records": [{"id": "r1", "name": "x"}]}}
+        recs = kwargs["transform"]({}, body)
+        self.assertEqual(recs[0].id, "r1")
+        self.assertEqual(recs[0].domain_id, dom.id)
+
+    def test_update_records_async(self):
+        clt = self.client
+        mgr = clt._manager
+        dom = self.domain
+        recs = [{"id": "r1", "name": "x", "data": "0.0.0.0"}]
+        mgr._submit_async_call = Mock()
+        uri = "/domains/%s/records" % utils.get_id(dom)
+        clt.update_records_async(dom, recs)
+        args, kwargs = mgr._submit_async_call.call_args
+        self.assertEqual(args, (uri, ))
+        self.assertEqual(kwargs["method"], "PUT")
+        self.assertEqual(kwargs["body"], {"records": recs})
+        self.assertRaises(TypeError, clt.update_records_async, dom, recs[0])
+
+    def test_delete_record_async(self):
+        clt = self.client
+        mgr = clt._manager
+        dom = self.domain
+        rec = CloudDNSRecord(mgr, {"id": utils.random_unicode()})
+        mgr._submit_async_call = Mock()
+        uri = "/domains/%s/records/%s" % (utils.get_id(dom), utils.get_id(rec))
+        clt.delete_record_async(dom, rec)
+        args, kwargs = mgr._submit_async_call.call_args
+        self.assertEqual(args, (uri, ))
+        self.assertEqual(kwargs["method"], "DELETE")
+        self.assertEqual(kwargs["error_class"],
+                exc.DomainRecordDeletionFailed)
+
     def test_delete_record(self):
         clt = self.client
         mgr = clt._manager
@@ -676,6 +750,338 @@ class CloudDNSTest(unittest.TestCase):
                 error_class=exc.DomainRecordDeletionFailed,
                 has_response=False)
 
+    def test_delete_records(self):
+        clt = self.client
+        mgr = clt._manager
+        dom = self.domain
+        recs = [CloudDNSRecord(mgr, {"id": "r1"}),
+                CloudDNSRecord(mgr, {"id": "r2"})]
+        mgr._async_call = Mock(return_value=({}, {}))
+        uri = "/domains/%s/records?id=r1&id=r2" % utils.get_id(dom)
+        clt.delete_records(dom, recs)
+        mgr._async_call.assert_called_once_with(uri, method="DELETE",
+                error_class=exc.DomainRecordDeletionFailed,
+                has_response=False)
+
+    def test_delete_records_async(self):
+        clt = self.client
+        mgr = clt._manager
+        dom = self.domain
+        mgr._submit_async_call = Mock()
+        uri = "/domains/%s/records?id=r1" % utils.get_id(dom)
+        mgr.delete_records_async(dom, "r1")
+        args, kwargs = mgr._submit_async_call.call_args
+        self.assertEqual(args, (uri, ))
+        self.assertEqual(kwargs["method"], "DELETE")
+
+    def _current_records(self, mgr, dom, records):
+        dom.name = "example.com"
+        current = [CloudDNSRecord(mgr, dict(rec, id="r%s" % num),
+                loaded=False) for num, rec in enumerate(records)]
+        mgr._list_all_records = Mock(return_value=current)
+        return current
+
+    def test_plan_records(self):
+        mgr = self.client._manager
+        dom = self.domain
+        current = self._current_records(mgr, dom, [
+                {"type": "NS", "name": "example.com",
+                    "data": "dns1.stabletransit.com", "ttl": 300},
+                {"type": "A", "name": "www.example.com", "data": "1.1.1.1",
+                    "ttl": 300},
+                {"type": "A", "name": "api.example.com", "data": "2.2.2.2",
+                    "ttl": 300},
+                {"type": "CNAME", "name": "ftp.example.com",
+                    "data": "www.example.com", "ttl": 300},
+                {"type": "MX", "name": "example.com",
+                    "data": "mail.example.com", "ttl": 300, "priority": 10},
+                {"type": "TXT", "name": "old.example.com", "data": "bye",
+                    "ttl": 300},
+                ])
+        desired = [
+                {"type": "a", "name": "WWW", "data": "1.1.1.1"},
+                {"type": "A", "name": "api.example.com.", "data": "3.3.3.3"},
+                {"type": "CNAME", "name": "ftp", "data": "WWW.example.com.",
+                    "ttl": 600},
+                {"type": "MX", "name": "@", "data": "mail.example.com",
+                    "priority": 10},
+                {"type": "A", "name": "new", "data": "4.4.4.4"},
+                ]
+        plan = mgr.plan_records(dom, desired)
+        self.assertEqual(plan["unchanged"], [current[1], current[4]])
+        self.assertEqual(plan["update"], [
+                {"id": "r3", "name": "ftp.example.com", "ttl": 600},
+                {"id": "r2", "name": "api.example.com", "data": "3.3.3.3"},
+                ])
+        self.assertEqual(plan["add"], [{"type": "A",
+                "name": "new.example.com", "data": "4.4.4.4"}])
+        self.assertEqual(plan["delete"], [current[5]])
+
+    def test_plan_records_no_prune(self):
+        mgr = self.client._manager
+        dom = self.domain
+        self._current_records(mgr, dom, [
+                {"type": "TXT", "name": "old.example.com", "data": "bye"}])
+        plan = mgr.plan_records(dom, [], prune=False)
+        self.assertEqual(plan["delete"], [])
+
+    def test_plan_records_protected(self):
+        mgr = self.client._manager
+        dom = self.domain
+        current = self._current_records(mgr, dom, [
+                {"type": "NS", "name": "example.com", "data": "dns1.example.net"},
+                {"type": "A", "name": "example.com", "data": "1.1.1.1"},
+                ])
+        desired = [{"type": "NS", "name": "@", "data": "dns2.example.net"}]
+        plan = mgr.plan_records(dom, desired)
+        self.assertEqual(plan["add"], [{"type": "NS",
+                "name": "example.com", "data": "dns2.example.net"}])
+        self.assertEqual(plan["update"], [])
+        self.assertEqual(plan["delete"], [current[1]])
+        plan = mgr.plan_records(dom, [], protected_types=())
+        self.assertEqual(plan["delete"], current)
+
+    def test_plan_records_duplicates(self):
+        mgr = self.client._manager
+        dom = self.domain
+        current = self._current_records(mgr, dom, [
+                {"type": "A", "name": "www.example.com", "data": "1.1.1.1"}])
+        rec = {"type": "A", "name": "www", "data": "1.1.1.1"}
+        plan = mgr.plan_records(dom, [rec, rec])
+        self.assertEqual(plan["unchanged"], current)
+        self.assertEqual(plan["add"], [])
+
+    def test_reconcile_records_dry_run(self):
+        clt = self.client
+        mgr = clt._manager
+        dom = self.domain
+        plan = {"add": [{}], "update": [], "delete": [], "unchanged": []}
+        mgr.plan_records = Mock(return_value=plan)
+        mgr._submit_async_call = Mock()
+        ret = clt.reconcile_records(dom, [], dry_run=True)
+        self.assertEqual(ret, plan)
+        self.assertFalse(mgr._submit_async_call.called)
+
+    def test_reconcile_records(self):
+        clt = self.client
+        mgr = clt._manager
+        dom = self.domain
+        adds = [{"type": "A", "name": "h%s" % num, "data": "1.1.1.1"}
+                for num in range(5)]
+        updates = [{"id": "u%s" % num, "name": "x", "ttl": 600}
+                for num in range(3)]
+        deletes = [CloudDNSRecord(mgr, {"id": "d%s" % num})
+                for num in range(4)]
+        mgr.plan_records = Mock(return_value={"add": adds, "update": updates,
+                "delete": deletes, "unchanged": []})
+        order = []
+
+        def done(val):
+            fut = utils.futures.Future()
+            fut.set_result(val)
+            return fut
+
+        def add_async(domain, records):
+            order.append("add")
+            return done(["rec-%s" % rec["name"] for rec in records])
+
+        def update_async(domain, records):
+            order.append("update")
+            return done(None)
+
+        def delete_async(domain, records):
+            order.append("delete")
+            return done(None)
+
+        mgr.add_records_async = Mock(side_effect=add_async)
+        mgr.update_records_async = Mock(side_effect=update_async)
+        mgr.delete_records_async = Mock(side_effect=delete_async)
+        ret = clt.reconcile_records(dom, [], batch_size=2)
+        self.assertEqual(order, ["delete", "delete", "add", "add", "add",
+                "update", "update"])
+        mgr.delete_records_async.assert_has_calls([call(dom, deletes[:2]),
+                call(dom, deletes[2:])])
+        mgr.update_records_async.assert_has_calls([call(dom, updates[:2]),
+                call(dom, updates[2:])])
+        self.assertEqual(ret["add"], ["rec-h%s" % num for num in range(5)])
+
+    def test_reconcile_records_error(self):
+        mgr = self.client._manager
+        dom = self.domain
+        mgr.plan_records = Mock(return_value={"add": [{}], "update": [{}],
+                "delete": [], "unchanged": []})
+        failed = utils.futures.Future()
+        failed.set_exception(exc.DomainRecordAdditionFailed("bad"))
+        updated = utils.futures.Future()
+        updated.set_result(None)
+        mgr.add_records_async = Mock(return_value=failed)
+        mgr.update_records_async = Mock(return_value=updated)
+        self.assertRaises(exc.DomainRecordAdditionFailed,
+                mgr.reconcile_records, dom, [])
+        self.assertTrue(mgr.update_records_async.called)
+
+    def test_domain_reconcile(self):
+        dom = self.domain
+        mgr = dom.manager
+        mgr.reconcile_records = Mock()
+        desired = [{"type": "A", "name": "x", "data": "1.1.1.1"}]
+        dom.reconcile(desired, prune=False, dry_run=True)
+        mgr.reconcile_records.assert_called_once_with(dom, desired,
+                prune=False, dry_run=True, batch_size=100,
+                protected_types=("NS", "SOA"))
+
+    def test_list_all_records(self):
+        mgr = self.client._manager
+        dom = self.domain
+        mgr._get_record_page = Mock(return_value=(["a", "b"], {}))
+        self.assertEqual(mgr._list_all_records(dom), ["a", "b"])
+        mgr._get_record_page.assert_called_once_with(
+                "/domains/%s/records" % dom.id, list_all=True)
+
+    def test_client_list_all(self):
+        clt = self.client
+        mgr = clt._manager
+        mgr._list = Mock()
+        clt.list(limit=10, list_all=True)
+        mgr._list.assert_called_once_with("/domains?limit=10", list_all=True)
+
+    def _paged_backend(self, entries, limit, total=None):
+        """
+        Returns a replacement for method_get() that serves 'entries' as DNS
+        records in pages of 'limit', reporting 'total' as the number of
+        entries.
+        """
+        total = len(entries) if total is None else total
+
+        def mock_get(uri):
+            mtch = re.search(r"offset=(\d+)", uri)
+            offset = int(mtch.group(1)) if mtch else 0
+            body = {"records": entries[offset:offset + limit],
+                    "totalEntries": total}
+            links = []
+            if offset + limit < len(entries):
+                links.append({"rel": "next", "href": "%s/domains/d1/records"
+                        "?limit=%s&offset=%s" % (example_uri, limit,
+                        offset + limit)})
+            if offset:
+                links.append({"rel": "previous", "href": "%s/domains/d1/"
+                        "records?limit=%s&offset=%s" % (example_uri, limit,
+                        max(offset - limit, 0))})
+            if links:
+                body["links"] = links
+            return ({}, body)
+
+        return mock_get
+
+    def test_offset_page_uris(self):
+        uri = "/domains/d1/records?limit=10&offset=10"
+        self.assertEqual(clouddns._offset_page_uris(uri, 35), [
+                "/domains/d1/records?limit=10&offset=10",
+                "/domains/d1/records?limit=10&offset=20",
+                "/domains/d1/records?limit=10&offset=30"])
+        self.assertIsNone(clouddns._offset_page_uris(uri, None))
+        self.assertIsNone(clouddns._offset_page_uris(uri, 5))
+        self.assertIsNone(clouddns._offset_page_uris("/domains/d1/records",
+                35))
+
+    def test_list_records_all_pages(self):
+        clt = self.client
+        mgr = clt._manager
+        entries = [{"id": "r%s" % num} for num in range(23)]
+        clt.method_get = Mock(side_effect=self._paged_backend(entries, 5))
+        with patch.object(utils, "run_concurrently",
+                wraps=utils.run_concurrently) as run:
+            recs = mgr._list_records("/domains/d1/records?limit=5",
+                    list_all=True)
+            self.assertEqual(len(run.call_args[0][1]), 4)
+        self.assertEqual([rec.id for rec in recs],
+                [ent["id"] for ent in entries])
+        self.assertEqual(clt.method_get.call_count, 5)
+        self.assertIsNone(mgr._paging["record"]["next_uri"])
+
+    def test_list_records_all_pages_grown(self):
+        clt = self.client
+        mgr = clt._manager
+        entries = [{"id": "r%s" % num} for num in range(23)]
+        # The total is out of date, so the last pages must be followed.
+        clt.method_get = Mock(side_effect=self._paged_backend(entries, 5,
+                total=12))
+        recs = mgr._list_records("/domains/d1/records?limit=5", list_all=True)
+        self.assertEqual([rec.id for rec in recs],
+                [ent["id"] for ent in entries])
+
+    def test_list_records_all_pages_error(self):
+        clt = self.client
+        mgr = clt._manager
+        entries = [{"id": "r%s" % num} for num in range(23)]
+        backend = self._paged_backend(entries, 5)
+
+        def mock_get(uri):
+            if "offset=15" in uri:
+                raise exc.ServiceResponseFailure("")
+            return backend(uri)
+
+        clt.method_get = Mock(side_effect=mock_get)
+        self.assertRaises(exc.ServiceResponseFailure, mgr._list_records,
+                "/domains/d1/records?limit=5", list_all=True)
+
+    def test_list_subdomains_all_pages(self):
+        clt = self.client
+        mgr = clt._manager
+        entries = [{"id": "s%s" % num} for num in range(9)]
+        backend = self._paged_backend(entries, 4)
+
+        def mock_get(uri):
+            resp, body = backend(uri)
+            body["domains"] = body.pop("records")
+            return resp, body
+
+        clt.method_get = Mock(side_effect=mock_get)
+        subs = mgr._list_subdomains("/domains?name=x&limit=4", "s0",
+                list_all=True)
+        self.assertEqual([sub.id for sub in subs],
+                [ent["id"] for ent in entries[1:]])
+
+    def test_paging_per_thread(self):
+        mgr = self.client._manager
+        mgr._paging["record"]["next_uri"] = example_uri
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(
+                mgr._paging["record"]["next_uri"]))
+        thread.start()
+        thread.join()
+        self.assertEqual(seen, [None])
+        self.assertEqual(mgr._paging["record"]["next_uri"], example_uri)
+
+    def test_list_subdomains_next_page_domain_id(self):
+        clt = self.client
+        mgr = clt._manager
+        entries = [{"id": "s%s" % num} for num in range(6)]
+        backend = self._paged_backend(entries, 3)
+
+        def mock_get(uri):
+            resp, body = backend(uri)
+            body["domains"] = body.pop("records")
+            return resp, body
+
+        clt.method_get = Mock(side_effect=mock_get)
+        mgr._list_subdomains("/domains?name=x&limit=3", "s4")
+        subs = clt.list_subdomains_next_page()
+        self.assertEqual([sub.id for sub in subs], ["s3", "s5"])
+
+    def test_record_iter_own_paging(self):
+        clt = self.client
+        mgr = clt._manager
+        entries = [{"id": "r%s" % num} for num in range(7)]
+        clt.method_get = Mock(side_effect=self._paged_backend(entries, 3))
+        mgr._paging["record"]["next_uri"] = example_uri
+        dom = CloudDNSDomain(mgr, {"id": "d1", "name": "example.com"})
+        res_iter = RecordResultsIterator(mgr, domain=dom)
+        self.assertEqual([rec.id for rec in res_iter],
+                [ent["id"] for ent in entries])
+        self.assertEqual(mgr._paging["record"]["next_uri"], example_uri)
+        clt.method_get.assert_any_call("/domains/d1/records")
+
     def test_resolve_device_type(self):
         clt = self.client
         mgr = clt._manager
@@ -788,6 +1194,129 @@ class CloudDNSTest(unittest.TestCase):
                 error_class=exc.PTRRecordDeletionFailed,
                 method="DELETE", has_response=False)
 
+    def test_add_ptr_records_async(self):
+        clt = self.client
+        mgr = clt._manager
+        dvc = fakes.FakeDNSDevice()
+        href = "%s/%s" % (example_uri, dvc.id)
+        svc_name = "cloudServersOpenStack"
+        rec = {"foo": "bar"}
+        body = {"recordsList": {"records": [rec]},
+                "link": {"content": "", "href": href, "rel": svc_name}}
+        mgr._get_ptr_details = Mock(return_value=(href, svc_name))
+        fut = utils.futures.Future()
+        mgr._submit_async_call = Mock(return_value=fut)
+        ret = clt.add_ptr_records_async(dvc, rec)
+        self.assertTrue(ret is fut)
+        args, kwargs = mgr._submit_async_call.call_args
+        self.assertEqual(args, ("/rdns", ))
+        self.assertEqual(kwargs["body"], body)
+        self.assertEqual(kwargs["error_class"], exc.PTRRecordCreationFailed)
+        self.assertEqual(kwargs["transform"]({}, {"records": [rec]}), [rec])
+        self.assertTrue(isinstance(kwargs["transform_error"](
+                exc.EndpointNotFound("")), exc.InvalidPTRRecord))
+        err = exc.PTRRecordCreationFailed("")
+        self.assertTrue(kwargs["transform_error"](err) is err)
+
+    def test_add_ptr_records_async_unauthorized(self):
+        clt = self.client
+        mgr = clt._manager
+        dvc = fakes.FakeDNSDevice()
+        mgr._get_ptr_details = Mock(return_value=("href", "svc"))
+        mgr._start_async_call = Mock(side_effect=exc.EndpointNotFound(""))
+        report = clt.add_ptr_records_bulk([(dvc, "10.0.0.1",
+                "a.example.com")])
+        mgr._get_job_poller().shutdown()
+        self.assertTrue(isinstance(report[dvc.id]["error"],
+                exc.InvalidPTRRecord))
+
+    def test_delete_ptr_records_async(self):
+        clt = self.client
+        mgr = clt._manager
+        dvc = fakes.FakeDNSDevice()
+        href = "%s/%s" % (example_uri, dvc.id)
+        svc_name = "cloudServersOpenStack"
+        uri = "/rdns/%s?href=%s&ip=0.0.0.0" % (svc_name, href)
+        mgr._get_ptr_details = Mock(return_value=(href, svc_name))
+        mgr._submit_async_call = Mock()
+        clt.delete_ptr_records_async(dvc, ip_address="0.0.0.0")
+        args, kwargs = mgr._submit_async_call.call_args
+        self.assertEqual(args, (uri, ))
+        self.assertEqual(kwargs["method"], "DELETE")
+        self.assertTrue(kwargs["transform"]({}, {"status": "COMPLETED"}))
+
+    def _mock_ptr_futures(self, mgr, name, fail_for=None):
+        calls = []
+
+        def submit(device, *args):
+            calls.append((device, ) + args)
+            fut = utils.futures.Future()
+            if device is fail_for:
+                fut.set_exception(exc.PTRRecordCreationFailed("bad"))
+            else:
+                fut.set_result(args[0] if isinstance(args[0], list) else True)
+            return fut
+
+        setattr(mgr, name, Mock(side_effect=submit))
+        return calls
+
+    def test_add_ptr_records_bulk(self):
+        clt = self.client
+        mgr = clt._manager
+        dvc1 = fakes.FakeDNSDevice()
+        dvc2 = fakes.FakeDNSDevice()
+        dvc3 = fakes.FakeDNSDevice()
+        calls = self._mock_ptr_futures(mgr, "add_ptr_records_async",
+                fail_for=dvc2)
+        entries = [(dvc1, "10.0.0.1", "a.example.com"),
+                (dvc2, "10.0.0.2", "b.example.com"),
+                (dvc1, "10.0.0.3", "c.example.com"),
+                ("bogus", "10.0.0.4", "d.example.com"),
+                (dvc3, "10.0.0.5", "e.example.com")]
+        real_submit = mgr.add_ptr_records_async.side_effect
+
+        def submit(device, records):
+            if device == "bogus":
+                raise exc.InvalidDeviceType("bogus")
+            return real_submit(device, records)
+
+        mgr.add_ptr_records_async.side_effect = submit
+        report = clt.add_ptr_records_bulk(entries, ttl=100, comment="x" * 200)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(report[dvc1.id]["records"], [
+                {"name": "a.example.com", "type": "PTR", "data": "10.0.0.1",
+                    "ttl": 300, "comment": "x" * 160},
+                {"name": "c.example.com", "type": "PTR", "data": "10.0.0.3",
+                    "ttl": 300, "comment": "x" * 160}])
+        self.assertIsNone(report[dvc1.id]["error"])
+        self.assertTrue(report[dvc1.id]["device"] is dvc1)
+        self.assertEqual(report[dvc2.id]["records"], [])
+        self.assertTrue(isinstance(report[dvc2.id]["error"],
+                exc.PTRRecordCreationFailed))
+        self.assertTrue(isinstance(report["bogus"]["error"],
+                exc.InvalidDeviceType))
+        self.assertEqual(len(report[dvc3.id]["records"]), 1)
+
+    def test_delete_ptr_records_bulk(self):
+        clt = self.client
+        mgr = clt._manager
+        dvc1 = fakes.FakeDNSDevice()
+        dvc2 = fakes.FakeDNSDevice()
+        dvc3 = fakes.FakeDNSDevice()
+        calls = self._mock_ptr_futures(mgr, "delete_ptr_records_async",
+                fail_for=dvc3)
+        entries = [(dvc1, "10.0.0.1"), (dvc1, "10.0.0.2"), (dvc1, "10.0.0.1"),
+                (dvc2, "10.0.0.3"), (dvc2, None), (dvc3, "10.0.0.4")]
+        report = clt.delete_ptr_records_bulk(entries)
+        self.assertEqual(sorted(calls, key=lambda call: call[0].id),
+                sorted([(dvc1, "10.0.0.1"), (dvc1, "10.0.0.2"), (dvc2, None),
+                (dvc3, "10.0.0.4")], key=lambda call: call[0].id))
+        self.assertEqual(report[dvc1.id]["deleted"], ["10.0.0.1", "10.0.0.2"])
+        self.assertEqual(report[dvc2.id]["deleted"], [None])
+        self.assertEqual(report[dvc3.id]["deleted"], [])
+        self.assertTrue(isinstance(report[dvc3.id]["error"],
+                exc.PTRRecordCreationFailed))
+
     def test_get_absolute_limits(self):
         clt = self.client
         rand_limit = utils.random_unicode()
@@ -877,5 +1406,771 @@ class CloudDNSTest(unittest.TestCase):
         self.assertRaises(exc.ServiceResponseFailure, clt.get_absolute_limits)
 
 
+class DNSRecordCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.client = fakes.FakeDNSClient()
+        self.manager = mgr = self.client._manager
+        mgr._set_delay(0.000001)
+        self.domain = CloudDNSDomain(mgr, {"id": "d1",
+                "name": "example.com"})
+        self.records = [self._record("r1", "A", "www.example.com",
+                "10.0.0.1"), self._record("r2", "A", "api.example.com",
+                "10.0.0.2"), self._record("r3", "CNAME", "ftp.example.com",
+                "www.example.com"), self._record("r4", "A", "www.example.com",
+                "10.0.0.3")]
+        mgr._list_all_records = Mock(return_value=self.records)
+        self.client.method_get = Mock()
+        self.cache = self.client.enable_record_cache(self.domain)
+
+    def _record(self, rec_id, typ, name, data):
+        return CloudDNSRecord(self.manager, {"id": rec_id, "type": typ,
+                "name": name, "data": data, "ttl": 300, "domain_id": "d1"})
+
+    def _ids(self, records):
+        return sorted(rec.id for rec in records)
+
+    def test_enable(self):
+        mgr = self.manager
+        self.assertTrue(mgr.get_record_cache(self.domain) is self.cache)
+        cache = mgr.enable_record_cache("d1", max_age=5)
+        self.assertTrue(cache is self.cache)
+        self.assertEqual(cache.max_age, 5)
+
+    def test_disable(self):
+        mgr = self.manager
+        self.client.disable_record_cache(self.domain)
+        self.assertIsNone(mgr.get_record_cache(self.domain))
+        body = {"records": [{"id": "r9", "type": "A"}]}
+        self.client.method_get = Mock(return_value=({}, body))
+        recs = self.domain.search_records("A")
+        self.assertEqual(self._ids(recs), ["r9"])
+
+    def test_search(self):
+        dom = self.domain
+        self.assertEqual(self._ids(dom.search_records("A",
+                name="www.example.com")), ["r1", "r4"])
+        self.assertEqual(self._ids(dom.search_records("a", name="WWW")),
+                ["r1", "r4"])
+        self.assertEqual(self._ids(dom.search_records("A",
+                name="www.example.com.", data="10.0.0.3")), ["r4"])
+        self.assertEqual(self._ids(dom.search_records("CNAME",
+                data="WWW.example.com.")), ["r3"])
+        self.assertEqual(self._ids(dom.search_records("A")),
+                ["r1", "r2", "r4"])
+        self.assertEqual(dom.search_records("MX"), [])
+
+    def test_find_record_no_api_calls(self):
+        dom = self.domain
+        for ii in range(20):
+            rec = self.client.find_record(dom, "A", name="api.example.com")
+            self.assertEqual(rec.id, "r2")
+        self.assertRaises(exc.DomainRecordNotUnique, dom.find_record, "A",
+                name="www.example.com")
+        self.assertRaises(exc.DomainRecordNotFound, dom.find_record, "A",
+                name="nope.example.com")
+        self.assertEqual(self.manager._list_all_records.call_count, 1)
+        self.assertFalse(self.client.method_get.called)
+
+    def test_refresh_after_max_age(self):
+        mgr = self.manager
+        dom = self.domain
+        cache = self.cache
+        dom.search_records("A")
+        changes = [{"action": "update", "targetType": "Domain",
+                "targetId": "d1"},
+                {"action": "update", "targetType": "A", "targetId": "r1"},
+                {"action": "delete", "targetType": "A", "targetId": "r2"},
+                {"action": "create", "targetType": "MX", "targetId": "r5"}]
+        mgr.changes_since = Mock(return_value=changes)
+        fetched = {"r1": self._record("r1", "A", "web.example.com",
+                "10.0.0.1"), "r5": self._record("r5", "MX", "example.com",
+                "mail.example.com")}
+        mgr.get_record = Mock(side_effect=lambda dom, rec_id: fetched[rec_id])
+        dom.search_records("A")
+        self.assertFalse(mgr.changes_since.called)
+        cache._checked_at -= cache.max_age
+        self.assertEqual(self._ids(dom.search_records("A")), ["r1", "r4"])
+        self.assertEqual(self._ids(dom.search_records("A", name="web")),
+                ["r1"])
+        self.assertEqual(self._ids(dom.search_records("MX")), ["r5"])
+        self.assertEqual(mgr.get_record.call_count, 2)
+        self.assertEqual(cache.loads, 1)
+        self.assertEqual(cache.refreshes, 1)
+        since = mgr.changes_since.call_args[0][1]
+        self.assertTrue(since < cache._synced_at)
+
+    def test_refresh_deleted_since(self):
+        mgr = self.manager
+        cache = self.cache
+        cache.load()
+        mgr.changes_since = Mock(return_value=[{"action": "update",
+                "targetType": "A", "targetId": "r1"}])
+        mgr.get_record = Mock(side_effect=exc.NotFound(""))
+        cache.refresh()
+        self.assertEqual(len(cache), 3)
+
+    def test_refresh_too_many_changes(self):
+        mgr = self.manager
+        cache = self.cache
+        cache.load()
+        changes = [{"action": "update", "targetType": "A",
+                "targetId": "x%s" % num}
+                for num in range(clouddns.RECORD_CACHE_MAX_CHANGES + 1)]
+        mgr.changes_since = Mock(return_value=changes)
+        mgr.get_record = Mock()
+        cache.refresh()
+        self.assertFalse(mgr.get_record.called)
+        self.assertEqual(cache.loads, 2)
+
+    def test_refresh_error(self):
+        mgr = self.manager
+        cache = self.cache
+        cache.load()
+        mgr.changes_since = Mock(return_value=[{"action": "update",
+                "targetType": "A", "targetId": "r1"}])
+        mgr.get_record = Mock(side_effect=exc.ServiceResponseFailure(""))
+        cache.refresh()
+        self.assertEqual(cache.loads, 2)
+
+    def test_local_changes(self):
+        mgr = self.manager
+        dom = self.domain
+        dom.search_records("A")
+        added = {"response": {"records": [{"id": "r5", "type": "A",
+                "name": "new.example.com", "data": "10.0.0.5"}]}}
+        mgr._async_call = Mock(return_value=({}, added))
+        dom.add_records({"type": "A", "name": "new.example.com",
+                "data": "10.0.0.5"})
+        self.assertEqual(dom.find_record("A", name="new").id, "r5")
+        mgr._async_call = Mock(return_value=({}, {}))
+        dom.update_records([{"id": "r2", "name": "api.example.com",
+                "data": "10.0.0.9"}])
+        self.assertEqual(dom.find_record("A", data="10.0.0.9").id, "r2")
+        self.assertEqual(dom.search_records("A", data="10.0.0.2"), [])
+        dom.delete_record("r1")
+        mgr.delete_records(dom, [self.records[3]])
+        self.assertEqual(dom.search_records("A", name="www"), [])
+        self.assertEqual(mgr._list_all_records.call_count, 1)
+
+    def test_async_local_changes(self):
+        mgr = self.manager
+        dom = self.domain
+        self.cache.load()
+        futs = []
+
+        def submit(*args, **kwargs):
+            fut = utils.futures.Future()
+            futs.append(fut)
+            return fut
+
+        mgr._submit_async_call = Mock(side_effect=submit)
+        mgr.add_records_async(dom, {"type": "A", "name": "new",
+                "data": "10.0.0.5"})
+        mgr.delete_record_async(dom, "r1")
+        mgr.update_records_async(dom, [{"id": "r2", "ttl": 60}])
+        futs[0].set_result([self._record("r5", "A", "new.example.com",
+                "10.0.0.5")])
+        futs[1].set_exception(exc.DomainRecordDeletionFailed(""))
+        futs[2].set_result(None)
+        self.assertEqual(self._ids(dom.search_records("A")),
+                ["r1", "r2", "r4", "r5"])
+        self.assertEqual(dom.find_record("A", name="api").ttl, 60)
+
+
+
+class DNSChangeFeedTest(unittest.TestCase):
+    def setUp(self):
+        self.client = fakes.FakeDNSClient()
+        self.manager = mgr = self.client._manager
+        self.dom1 = CloudDNSDomain(mgr, {"id": "d1", "name": "one.com"})
+        self.dom2 = CloudDNSDomain(mgr, {"id": "d2", "name": "two.com"})
+        self.changes = {"d1": [], "d2": []}
+        mgr.changes_since = Mock(side_effect=lambda dom, since:
+                list(self.changes[dom.id]))
+        self.since = datetime.datetime(2014, 1, 1)
+
+    def _change(self, target_id, action="update", field="data"):
+        return {"action": action, "targetType": "A", "targetId": target_id,
+                "domain": "one.com", "accountId": 1,
+                "changeDetails": [{"field": field, "originalValue": "a",
+                    "newValue": "b"}]}
+
+    def test_poll(self):
+        mgr = self.manager
+        feed = DNSChangeFeed(mgr, domains=[self.dom1, self.dom2],
+                since=self.since)
+        self.changes["d1"] = [self._change("A-1"),
+                self._change("A-2", action="Delete")]
+        events = feed.poll()
+        self.assertEqual(len(events), 2)
+        self.assertEqual(events[0], {"domain_id": "d1",
+                "domain_name": "one.com", "action": "update",
+                "target_type": "A", "target_id": "A-1",
+                "details": {"data": ("a", "b")}})
+        self.assertEqual(events[1]["action"], "delete")
+        sinces = [args[0][1] for args in mgr.changes_since.call_args_list]
+        self.assertEqual(sinces, [self.since, self.since])
+        marks = feed.get_marks()
+        self.assertTrue(marks["d1"] > self.since)
+        self.assertTrue(marks["d2"] > self.since)
+        self.assertEqual(feed.polls, 1)
+
+    def test_poll_overlap(self):
+        mgr = self.manager
+        feed = DNSChangeFeed(mgr, domains=[self.dom1], since=self.since)
+        self.changes["d1"] = [self._change("A-1")]
+        feed.poll()
+        mark = feed.get_marks()["d1"]
+        self.changes["d1"] = [self._change("A-1"),
+                self._change("A-1", field="ttl")]
+        events = feed.poll()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["details"], {"ttl": ("a", "b")})
+        since = mgr.changes_since.call_args[0][1]
+        self.assertEqual(since, mark - datetime.timedelta(
+                seconds=clouddns.CHANGES_SYNC_MARGIN))
+        self.changes["d1"] = [self._change("A-1", field="ttl")]
+        self.assertEqual(feed.poll(), [])
+        self.changes["d1"] = []
+        self.assertEqual(feed.poll(), [])
+
+    def test_poll_error(self):
+        mgr = self.manager
+
+        def changes_since(dom, since):
+            if dom.id == "d2":
+                raise exc.ServiceResponseFailure("")
+            return [self._change("A-1")]
+
+        mgr.changes_since = Mock(side_effect=changes_since)
+        feed = DNSChangeFeed(mgr, domains=[self.dom1, self.dom2],
+                since=self.since)
+        events = feed.poll()
+        self.assertEqual([ev["domain_id"] for ev in events], ["d1"])
+        self.assertEqual(feed.errors, 1)
+        self.assertEqual(feed.get_marks()["d2"], self.since)
+
+    def test_follow_all_domains(self):
+        mgr = self.manager
+        mgr.list = Mock(return_value=[self.dom1])
+        feed = self.client.get_change_feed(since=self.since)
+        feed.poll()
+        self.assertEqual(list(feed.get_marks()), ["d1"])
+        mgr.list.assert_called_with(list_all=True)
+        mgr.list = Mock(return_value=[self.dom2])
+        feed.poll()
+        self.assertEqual(list(feed.get_marks()), ["d2"])
+
+    def test_add_remove_domain(self):
+        feed = DNSChangeFeed(self.manager, domains=[], since=self.since)
+        feed.add_domain(self.dom1, since="2013-01-01")
+        feed.add_domain(self.dom2)
+        self.assertEqual(feed.get_marks(), {"d1": "2013-01-01",
+                "d2": self.since})
+        feed.remove_domain("d1")
+        self.assertEqual(list(feed.get_marks()), ["d2"])
+
+    def test_follow(self):
+        feed = DNSChangeFeed(self.manager, domains=[self.dom1],
+                since=self.since, interval=0)
+        self.changes["d1"] = [self._change("A-1"), self._change("A-2")]
+        found = []
+        for event in feed.follow():
+            found.append(event["target_id"])
+            if len(found) == 2:
+                self.changes["d1"] = [self._change("A-3")]
+            if len(found) == 3:
+                feed.stop()
+        self.assertEqual(found, ["A-1", "A-2", "A-3"])
+
+    def test_start_stop(self):
+        batches = []
+        got = threading.Event()
+
+        def on_changes(events):
+            batches.append(events)
+            got.set()
+
+        feed = DNSChangeFeed(self.manager, domains=[self.dom1],
+                since=self.since, interval=60, on_changes=on_changes)
+        self.changes["d1"] = [self._change("A-1")]
+        self.assertTrue(feed.start() is feed)
+        self.assertTrue(got.wait(5))
+        feed.stop()
+        self.assertIsNone(feed._thread)
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(batches[0][0]["target_id"], "A-1")
+
+
+
+class BINDZoneTest(unittest.TestCase):
+    zone = "\n".join([
+            "$ORIGIN example.com.",
+            "$TTL 1h",
+            "@   IN SOA ns.rackspace.com. hostmaster.example.com. (",
+            "        1354918038 ; serial",
+            "        21600 3600 1814400 500 )",
+            "    IN NS dns1.stabletransit.com.",
+            "www 300 IN A 192.168.0.1",
+            "    IN AAAA ::1",
+            "mail IN MX 10 mx1",
+            "_sip._tcp 1d IN SRV 10 60 5060 sip.example.com.",
+            'txt IN TXT "hello; \\"world\\"" "!"',
+            "alias CNAME www ; a comment",
+            "sub.example.com. IN NS ns.other.net.",
+            ""])
+
+    def setUp(self):
+        self.client = fakes.FakeDNSClient()
+        self.manager = mgr = self.client._manager
+        self.domain = CloudDNSDomain(mgr, {"id": "d1",
+                "name": "example.com"})
+
+    def test_iter_bind_records(self):
+        recs = list(iter_bind_records(self.zone.splitlines()))
+        self.assertEqual(recs[0]["type"], "SOA")
+        self.assertEqual(recs[0]["data"], "ns.rackspace.com. "
+                "hostmaster.example.com. 1354918038 21600 3600 1814400 500")
+        self.assertEqual(recs[1:], [
+                {"type": "NS", "name": "example.com", "ttl": 3600,
+                    "data": "dns1.stabletransit.com"},
+                {"type": "A", "name": "www.example.com", "ttl": 300,
+                    "data": "192.168.0.1"},
+                {"type": "AAAA", "name": "www.example.com", "ttl": 3600,
+                    "data": "::1"},
+                {"type": "MX", "name": "mail.example.com", "ttl": 3600,
+                    "priority": 10, "data": "mx1.example.com"},
+                {"type": "SRV", "name": "_sip._tcp.example.com",
+                    "ttl": 86400, "priority": 10,
+                    "data": "60 5060 sip.example.com"},
+                {"type": "TXT", "name": "txt.example.com", "ttl": 3600,
+                    "data": 'hello; "world"!'},
+                {"type": "CNAME", "name": "alias.example.com", "ttl": 3600,
+                    "data": "www.example.com"},
+                {"type": "NS", "name": "sub.example.com", "ttl": 3600,
+                    "data": "ns.other.net"},
+                ])
+
+    def test_iter_bind_records_origin(self):
+        recs = list(iter_bind_records(["www A 10.0.0.1",
+                b"@ 60 MX 5 mail.example.com."], origin="example.com."))
+        self.assertEqual(recs, [
+                {"type": "A", "name": "www.example.com", "data": "10.0.0.1"},
+                {"type": "MX", "name": "example.com", "ttl": 60,
+                    "priority": 5, "data": "mail.example.com"}])
+
+    def test_iter_bind_records_soa_origin(self):
+        recs = list(iter_bind_records([
+                "example.com. 3600 IN SOA ns1.example.com. host.example.com. "
+                "1 2 3 4 5",
+                "www 300 IN A 10.0.0.1",
+                "@ IN MX 10 mail"]))
+        self.assertEqual(recs[1:], [
+                {"type": "A", "name": "www.example.com", "ttl": 300,
+                    "data": "10.0.0.1"},
+                {"type": "MX", "name": "example.com", "priority": 10,
+                    "data": "mail.example.com"}])
+
+    def test_iter_bind_records_no_origin(self):
+        lines = ["@ IN SOA ns1.example.com. host.example.com. 1 2 3 4 5"]
+        self.assertRaises(exc.InvalidZoneFile, list, iter_bind_records(lines))
+        recs = list(iter_bind_records(lines, origin="example.com"))
+        self.assertEqual(recs[0]["name"], "example.com")
+
+    def test_iter_bind_records_invalid(self):
+        for lines in (["$INCLUDE other.zone"], ["www IN"],
+                ["mail IN MX mx1.example.com."],
+                ["@ IN SOA ns1. host. ( 1 2"]):
+            self.assertRaises(exc.InvalidZoneFile, list,
+                    iter_bind_records(lines, origin="example.com"))
+
+    def test_bind_ttl(self):
+        self.assertEqual(clouddns._bind_ttl("300"), 300)
+        self.assertEqual(clouddns._bind_ttl("1h30m"), 5400)
+        self.assertEqual(clouddns._bind_ttl("1W"), 604800)
+        self.assertIsNone(clouddns._bind_ttl("A"))
+
+    def test_bind_record_line_round_trip(self):
+        recs = list(iter_bind_records(self.zone.splitlines()))
+        lines = [bind_record_line(rec) for rec in recs]
+        self.assertEqual(lines[4],
+                "mail.example.com.\t3600\tIN\tMX\t10 mx1.example.com.\n")
+        self.assertEqual(list(iter_bind_records(lines)), recs)
+
+    def test_bind_record_line_object(self):
+        rec = CloudDNSRecord(self.manager, {"type": "A",
+                "name": "www.example.com", "data": "10.0.0.1", "ttl": 300,
+                "id": "A-1"})
+        self.assertEqual(bind_record_line(rec),
+                "www.example.com.\t300\tIN\tA\t10.0.0.1\n")
+
+    def _mock_pages(self, records):
+        mgr = self.manager
+        pages = [records[:2], records[2:]]
+        bodies = [{"links": [{"rel": "next", "href": "/domains/d1/records"
+                "?limit=2&offset=2"}]}, {}]
+        mgr._get_record_page = Mock(side_effect=[(pages[0], bodies[0]),
+                (pages[1], bodies[1])])
+
+    def test_export_domain_to_file(self):
+        recs = [CloudDNSRecord(self.manager, {"type": "A",
+                "name": "h%s.example.com" % num, "data": "10.0.0.%s" % num,
+                "ttl": 300}) for num in range(3)]
+        self._mock_pages(recs)
+        out = six.StringIO()
+        count = self.client.export_domain_to_file(self.domain, out)
+        self.assertEqual(count, 3)
+        lines = out.getvalue().splitlines(True)
+        self.assertEqual(lines[0], "$ORIGIN example.com.\n")
+        self.assertEqual([rec["name"] for rec in iter_bind_records(lines)],
+                ["h0.example.com", "h1.example.com", "h2.example.com"])
+
+    def test_export_domain_to_path(self):
+        recs = [CloudDNSRecord(self.manager, {"type": "A",
+                "name": "h%s.example.com" % num, "data": "10.0.0.%s" % num,
+                "ttl": 300}) for num in range(3)]
+        self._mock_pages(recs)
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "example.com.zone")
+            self.domain.export_to_file(path)
+            with open(path) as zone_file:
+                self.assertEqual(len(zone_file.readlines()), 4)
+
+    def _mock_add_async(self, fail_on=None):
+        batches = []
+
+        def add_async(domain, records):
+            batches.append(records)
+            fut = utils.futures.Future()
+            if fail_on is not None and len(batches) == fail_on:
+                fut.set_exception(exc.DomainRecordAdditionFailed("bad"))
+            else:
+                fut.set_result(list(records))
+            return fut
+
+        self.manager.add_records_async = Mock(side_effect=add_async)
+        return batches
+
+    def test_import_records(self):
+        batches = self._mock_add_async()
+        report = self.client.import_domain_records(self.domain, self.zone,
+                batch_size=3, max_pending=1)
+        self.assertEqual(report, {"added": 7, "batches": 3, "failed": []})
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 1])
+        types = [rec["type"] for batch in batches for rec in batch]
+        self.assertFalse("SOA" in types)
+        self.assertEqual(types.count("NS"), 1)
+
+    def test_import_records_failed_batch(self):
+        batches = self._mock_add_async(fail_on=2)
+        report = self.domain.import_records(six.StringIO(self.zone),
+                batch_size=3)
+        self.assertEqual(report["added"], 4)
+        self.assertEqual(len(report["failed"]), 1)
+        self.assertEqual(report["failed"][0]["records"], batches[1])
+        self.assertTrue(isinstance(report["failed"][0]["error"],
+                exc.DomainRecordAdditionFailed))
+
+    def test_import_records_path(self):
+        self._mock_add_async()
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "example.com.zone")
+            with open(path, "w") as zone_file:
+                zone_file.write(self.zone)
+            report = self.manager.import_records(self.domain, path)
+        self.assertEqual(report["added"], 7)
+
+    def test_import_zone(self):
+        mgr = self.manager
+        mgr.create = Mock(return_value=self.domain)
+        self._mock_add_async()
+        report = self.client.import_zone(self.zone, comment="imported")
+        mgr.create.assert_called_once_with(name="example.com",
+                emailAddress="hostmaster@example.com", ttl=3600,
+                comment="imported")
+        self.assertTrue(report["domain"] is self.domain)
+        self.assertEqual(report["added"], 7)
+
+    def test_import_zone_invalid_line(self):
+        mgr = self.manager
+        mgr.create = Mock(return_value=self.domain)
+        batches = self._mock_add_async()
+        zone = self.zone + "bad IN\n"
+        try:
+            mgr.import_zone(zone, batch_size=3, max_pending=5)
+        except exc.InvalidZoneFile as e:
+            report = e.report
+        else:
+            self.fail("InvalidZoneFile was not raised")
+        self.assertTrue(mgr.create.called)
+        self.assertTrue(report["domain"] is self.domain)
+        self.assertEqual(report["batches"], 2)
+        self.assertEqual(report["added"], 6)
+        self.assertEqual([len(batch) for batch in batches], [3, 3])
+
+    def test_import_records_invalid_line(self):
+        self._mock_add_async()
+        zone = self.zone + "bad IN\n"
+        try:
+            self.domain.import_records(zone, batch_size=3)
+        except exc.InvalidZoneFile as e:
+            self.assertEqual(e.report, {"added": 6, "batches": 2,
+                    "failed": []})
+        else:
+            self.fail("InvalidZoneFile was not raised")
+
+    def test_import_zone_relative_names(self):
+        mgr = self.manager
+        mgr.create = Mock(return_value=self.domain)
+        self._mock_add_async()
+        zone = "\n".join([
+                "example.com. 3600 IN SOA ns1.example.com. "
+                "hostmaster.example.com. 1 2 3 4 5",
+                "www 300 IN A 10.0.0.1",
+                ""])
+        report = mgr.import_zone(zone)
+        self.assertEqual(report["added"], 1)
+        mgr.create.assert_called_once_with(name="example.com",
+                emailAddress="hostmaster@example.com", ttl=3600, comment=None)
+        self.assertEqual(mgr.add_records_async.call_args[0][1], [
+                {"type": "A", "name": "www.example.com", "ttl": 300,
+                    "data": "10.0.0.1"}])
+
+    def test_import_zone_no_soa(self):
+        mgr = self.manager
+        mgr.create = Mock(return_value=self.domain)
+        self._mock_add_async()
+        zone = "www A 10.0.0.1\n"
+        self.assertRaises(exc.InvalidZoneFile, mgr.import_zone, zone)
+        report = mgr.import_zone(zone, name="example.com",
+                emailAddress="me@example.com")
+        self.assertEqual(report["added"], 1)
+        self.assertEqual(mgr.add_records_async.call_args[0][1][0]["name"],
+                "www.example.com")
+
+
+
+class FakeDNSBackend(object):
+    """
+    Serves the records of several domains in pages, pausing briefly before
+    each response so that requests made from different threads interleave.
+    """
+    def __init__(self, domains, limit):
+        self.domains = domains
+        self.limit = limit
+
+    def method_get(self, uri):
+        time.sleep(random.random() / 1000)
+        dom_id = re.search(r"/domains/([^/?]+)/records", uri).group(1)
+        limit = re.search(r"limit=(\d+)", uri)
+        limit = int(limit.group(1)) if limit else self.limit
+        offset = re.search(r"offset=(\d+)", uri)
+        offset = int(offset.group(1)) if offset else 0
+        records = self.domains[dom_id]
+        body = {"records": [dict(rec) for rec in
+                records[offset:offset + limit]],
+                "totalEntries": len(records)}
+        links = []
+        page = "%s/domains/%s/records?limit=%s&offset=%%s" % (example_uri,
+                dom_id, limit)
+        if offset + limit < len(records):
+            links.append({"rel": "next", "href": page % (offset + limit)})
+        if offset:
+            links.append({"rel": "previous",
+                    "href": page % max(offset - limit, 0)})
+        if links:
+            body["links"] = links
+        return ({}, body)
+
+
+class DNSPagingConcurrencyTest(unittest.TestCase):
+    """
+    Lists the records of many domains at once from a pool of threads that
+    share one manager, using each way of paging through them.
+    """
+    def setUp(self):
+        self.client = fakes.FakeDNSClient()
+        self.manager = self.client._manager
+        self.manager.max_page_workers = 3
+        self.domains = dict(("d%s" % num, [{"id": "d%s-r%s" % (num, rec),
+                "type": "A", "name": "host%s.example.com" % rec,
+                "data": "10.0.0.%s" % rec} for rec in range(5 + num * 3)])
+                for num in range(12))
+        self.backend = FakeDNSBackend(self.domains, 4)
+        self.client.method_get = self.backend.method_get
+
+    def _expected(self, dom_id):
+        return [rec["id"] for rec in self.domains[dom_id]]
+
+    def _domain(self, dom_id):
+        return CloudDNSDomain(self.manager, {"id": dom_id,
+                "name": "%s.example.com" % dom_id})
+
+    def _list_by_pages(self, dom_id):
+        mgr = self.manager
+        ret = mgr.list_records(self._domain(dom_id), limit=3)
+        while True:
+            try:
+                ret.extend(mgr.list_records_next_page())
+            except exc.NoMoreResults:
+                return ret
+
+    def _list_by_iterator(self, dom_id):
+        return list(RecordResultsIterator(self.manager,
+                domain=self._domain(dom_id)))
+
+    def _list_all(self, dom_id):
+        return self.manager.list_records(self._domain(dom_id), list_all=True)
+
+    def _check(self, fnc, dom_id):
+        recs = fnc(dom_id)
+        self.assertEqual([rec.id for rec in recs], self._expected(dom_id))
+        self.assertTrue(all(rec.domain_id == dom_id for rec in recs))
+
+    def test_concurrent_listings(self):
+        jobs = [(fnc, dom_id) for dom_id in sorted(self.domains)
+                for fnc in (self._list_by_pages, self._list_by_iterator,
+                self._list_all)] * 4
+        random.shuffle(jobs)
+        with utils.futures.ThreadPoolExecutor(max_workers=16) as executor:
+            futs = [executor.submit(self._check, fnc, dom_id)
+                    for fnc, dom_id in jobs]
+        for fut in futs:
+            fut.result()
+
+    def test_concurrent_iterators(self):
+        iters = dict((dom_id, RecordResultsIterator(self.manager,
+                domain=self._domain(dom_id))) for dom_id in self.domains)
+        results = dict((dom_id, []) for dom_id in self.domains)
+        # Advance all of the iterators a record at a time, in turn.
+        while iters:
+            for dom_id, res_iter in list(iters.items()):
+                try:
+                    results[dom_id].append(next(res_iter).id)
+                except StopIteration:
+                    del iters[dom_id]
+        for dom_id, ids in results.items():
+            self.assertEqual(ids, self._expected(dom_id))
+
+
+
+class DNSJobPollerTest(unittest.TestCase):
+    def setUp(self):
+        self.client = fakes.FakeDNSClient()
+        self.mgr = fakes.FakeDNSManager(self.client)
+        self.mgr._set_delay(0.001)
+        self.polls = {}
+        self.statuses = {}
+        self.lock = threading.Lock()
+
+        def start(uri, body=None):
+            job_id = uri.rsplit("/", 1)[-1]
+            return {}, {"callbackUrl": "https://fake/status/%s" % job_id,
+                    "status": "RUNNING"}
+
+        def status(uri):
+            job_id = uri.split("/status/")[-1].split("?")[0]
+            with self.lock:
+                self.polls[job_id] = self.polls.get(job_id, 0) + 1
+                finished = self.polls[job_id] >= 3
+            if not finished:
+                return {}, {"status": "RUNNING"}
+            return {}, self.statuses.get(job_id, {"status": "COMPLETED",
+                    "response": {"id": job_id}})
+
+        self.client.method_post = Mock(side_effect=start)
+        self.client.method_delete = Mock(side_effect=start)
+        self.client.method_get = Mock(side_effect=status)
+
+    def test_submit_many(self):
+        poller = DNSJobPoller(self.mgr, max_workers=4)
+        futs = [poller.submit("/jobs/%s" % num, body={}, method="POST")
+                for num in range(50)]
+        results = [fut.result(timeout=10) for fut in futs]
+        self.assertEqual([body["id"] for resp, body in results],
+                [str(num) for num in range(50)])
+        poller.shutdown()
+        stats = poller.get_stats()
+        self.assertEqual(stats["submitted"], 50)
+        self.assertEqual(stats["completed"], 50)
+        self.assertEqual(stats["pending"], 0)
+        self.assertEqual(stats["polls"], 150)
+
+    def test_transform(self):
+        poller = DNSJobPoller(self.mgr)
+        fut = poller.submit("/jobs/x", body={}, method="POST",
+                transform=lambda resp, body: body["id"].upper())
+        self.assertEqual(fut.result(timeout=10), "X")
+        poller.shutdown()
+
+    def test_error(self):
+        self.statuses["bad"] = {"status": "ERROR",
+                "error": {"message": "oops", "details": "", "code": 400}}
+        poller = DNSJobPoller(self.mgr)
+        fut = poller.submit("/jobs/bad", body={}, method="POST",
+                error_class=exc.DomainRecordAdditionFailed)
+        self.assertRaises(exc.DomainRecordAdditionFailed, fut.result, 10)
+        poller.shutdown()
+        self.assertEqual(poller.get_stats()["failed"], 1)
+
+    def test_transform_error(self):
+        self.client.method_post = Mock(side_effect=exc.BadRequest(400))
+        poller = DNSJobPoller(self.mgr)
+        fut = poller.submit("/jobs/x", body={}, method="POST",
+                transform_error=lambda err: exc.DNSCallTimedOut(str(err)))
+        self.assertRaises(exc.DNSCallTimedOut, fut.result, 10)
+        poller.shutdown()
+
+    def test_start_error(self):
+        self.client.method_post = Mock(side_effect=exc.BadRequest(400))
+        poller = DNSJobPoller(self.mgr)
+        fut = poller.submit("/jobs/x", body={}, method="POST",
+                error_class=exc.DomainRecordAdditionFailed)
+        self.assertRaises(exc.DomainRecordAdditionFailed, fut.result, 10)
+        poller.shutdown()
+
+    def test_timeout(self):
+        self.mgr._set_timeout(0.000001)
+        self.client.method_get = Mock(return_value=({},
+                {"status": "RUNNING"}))
+        poller = DNSJobPoller(self.mgr)
+        fut = poller.submit("/jobs/x", body={}, method="POST")
+        self.assertRaises(exc.DNSCallTimedOut, fut.result, 10)
+        poller.shutdown()
+
+    def test_shutdown_no_wait(self):
+        self.mgr._set_delay(1000)
+        poller = DNSJobPoller(self.mgr)
+        fut = poller.submit("/jobs/x", body={}, method="POST")
+        end = time.time() + 5
+        while time.time() < end and not poller._schedule:
+            time.sleep(0.001)
+        poller.shutdown(wait=False)
+        self.assertTrue(fut.cancelled())
+        self.assertEqual(poller.get_stats()["pending"], 0)
+
+    def test_manager_shares_poller(self):
+        mgr = self.mgr
+        self.assertTrue(mgr._get_job_poller() is mgr._get_job_poller())
+        fut = mgr._submit_async_call("/jobs/x", body={}, method="POST",
+                has_response=False)
+        resp, body = fut.result(timeout=10)
+        self.assertEqual(body["status"], "COMPLETED")
+        mgr._job_poller.shutdown()
+
+    def test_client_wait_for_jobs(self):
+        clt = self.client
+        clt._manager = self.mgr
+        dom = fakes.FakeDNSDomain()
+        dom.manager = self.mgr
+        futs = [clt.delete_record_async(dom, "rec%s" % num)
+                for num in range(5)]
+        clt.wait_for_jobs()
+        self.assertEqual([fut.result(timeout=0)["status"] for fut in futs],
+                ["COMPLETED"] * 5)
+        self.assertEqual(clt.get_job_stats()["completed"], 5)
+
+
+
 if __name__ == "__main__":
     unittest.main()
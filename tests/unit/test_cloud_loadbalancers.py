@@ -3,17 +3,24 @@
 from __future__ import absolute_import, unicode_literals
 
 import random
+import threading
+import time
 import unittest
 
+from mock import call
 from mock import patch
 from mock import MagicMock as Mock
 
 from pyrax.cloudloadbalancers import CloudLoadBalancerClient
 from pyrax.cloudloadbalancers import CloudLoadBalancer
+from pyrax.cloudloadbalancers import LoadBalancerScheduler
+from pyrax.cloudloadbalancers import LoadBalancerStatsCollector
 from pyrax.cloudloadbalancers import Node
+from pyrax.cloudloadbalancers import NodeChangeQueue
 from pyrax.cloudloadbalancers import VirtualIP
 from pyrax.cloudloadbalancers import assure_parent
 from pyrax.cloudloadbalancers import assure_loadbalancer
+import pyrax.cloudloadbalancers as cloudloadbalancers
 import pyrax.exceptions as exc
 import pyrax.utils as utils
 
@@ -181,6 +188,71 @@ class CloudLoadBalancerTest(unittest.TestCase):
         clt.delete_node(nd)
         lb.manager.delete_node.assert_called_once_with(lb, nd)
 
+    def test_mgr_delete_nodes(self):
+        lb = self.loadbalancer
+        mgr = lb.manager
+        mgr.api.method_delete = Mock(return_value=({}, None))
+        lb.delete_nodes([fakes.FakeNode(id="n1"), "n2"])
+        mgr.api.method_delete.assert_called_once_with(
+                "/loadbalancers/%s/nodes?id=n1&id=n2" % lb.id)
+
+    def test_mgr_get_status(self):
+        lb = self.loadbalancer
+        mgr = lb.manager
+        mgr.api.method_get = Mock(return_value=({},
+                {"loadBalancer": {"status": "PENDING_UPDATE"}}))
+        self.assertEqual(mgr.get_status(lb), "PENDING_UPDATE")
+        mgr.api.method_get.assert_called_once_with("/loadbalancers/%s" %
+                lb.id)
+
+    @patch("time.sleep")
+    def test_mgr_wait_for_active(self, mock_sleep):
+        lb = self.loadbalancer
+        mgr = lb.manager
+        mgr.get_status = Mock(side_effect=["PENDING_UPDATE", "PENDING_UPDATE",
+                "PENDING_UPDATE", "PENDING_UPDATE", "PENDING_UPDATE",
+                "ACTIVE"])
+        self.client.wait_for_active(lb)
+        self.assertEqual([args[0][0] for args in mock_sleep.call_args_list],
+                [1, 2, 4, 8, 10])
+
+    @patch("time.sleep")
+    def test_mgr_wait_for_active_failed(self, mock_sleep):
+        lb = self.loadbalancer
+        mgr = lb.manager
+        mgr.get_status = Mock(side_effect=["PENDING_UPDATE", "ERROR"])
+        self.assertRaises(exc.LoadBalancerNotActive, lb.wait_for_active)
+
+    @patch("time.sleep")
+    def test_mgr_wait_for_active_timeout(self, mock_sleep):
+        lb = self.loadbalancer
+        mgr = lb.manager
+        mgr.get_status = Mock(return_value="PENDING_UPDATE")
+        self.assertRaises(exc.LoadBalancerNotActive, mgr.wait_for_active, lb,
+                timeout=5)
+        self.assertEqual(mgr.get_status.call_count, 4)
+
+    def test_mgr_call_when_active(self):
+        lb = self.loadbalancer
+        mgr = lb.manager
+        mgr.wait_for_active = Mock()
+        immutable = exc.ClientException(422, "Load Balancer '1' has a status "
+                "of 'PENDING_UPDATE' and is considered immutable.")
+        fnc = Mock(side_effect=[immutable, ({}, "ok")])
+        ret = mgr._call_when_active(lb, fnc, "a", b="c")
+        self.assertEqual(ret, ({}, "ok"))
+        self.assertEqual(fnc.call_count, 2)
+        fnc.assert_called_with("a", b="c")
+        mgr.wait_for_active.assert_called_once_with(lb)
+
+    def test_mgr_call_when_active_other_error(self):
+        lb = self.loadbalancer
+        mgr = lb.manager
+        mgr.wait_for_active = Mock()
+        fnc = Mock(side_effect=exc.ClientException(422, "Bad weight"))
+        self.assertRaises(exc.ClientException, mgr._call_when_active, lb, fnc)
+        self.assertFalse(mgr.wait_for_active.called)
+
     def test_client_update_node(self):
         clt = self.client
         lb = self.loadbalancer
@@ -616,6 +688,128 @@ class CloudLoadBalancerTest(unittest.TestCase):
         self.assertRaises(exc.AccessListIDNotFound,
                 mgr.delete_access_list_items, lb, ids)
 
+    def test_mgr_plan_access_list(self):
+        lb = self.loadbalancer
+        mgr = lb.manager
+        current = [{"id": 1, "address": "10.0.0.1", "type": "ALLOW"},
+                {"id": 2, "address": "10.0.0.2", "type": "ALLOW"},
+                {"id": 3, "address": "0.0.0.0/0", "type": "DENY"},
+                {"id": 4, "address": "10.0.0.1", "type": "ALLOW"},
+                {"id": 5, "address": "FE80::1", "type": "DENY"}]
+        mgr.get_access_list = Mock(return_value=current)
+        desired = {"accessList": [{"address": "10.0.0.1", "type": "allow"},
+                {"address": "0.0.0.0/0", "type": "DENY"},
+                {"address": "10.0.0.2", "type": "DENY"},
+                {"address": "fe80::1", "type": "DENY"},
+                {"address": "10.0.0.3 ", "type": "ALLOW"},
+                {"address": "10.0.0.3", "type": "ALLOW"}]}
+        plan = lb.plan_access_list(desired)
+        mgr.get_access_list.assert_called_once_with(lb)
+        self.assertEqual(plan["add"], [
+                {"address": "10.0.0.2", "type": "DENY"},
+                {"address": "10.0.0.3", "type": "ALLOW"}])
+        self.assertEqual([item["id"] for item in plan["delete"]], [2, 4])
+        self.assertEqual([item["id"] for item in plan["unchanged"]],
+                [1, 3, 5])
+
+    def _mock_access_calls(self, mgr, current):
+        calls = []
+        mgr.get_access_list = Mock(return_value=current)
+        mgr.wait_for_active = Mock()
+        mgr.api.method_delete = Mock(side_effect=lambda uri:
+                calls.append(("DELETE", uri)) or ({}, None))
+        mgr.api.method_post = Mock(side_effect=lambda uri, body:
+                calls.append(("POST", body["accessList"])) or ({}, None))
+        return calls
+
+    def test_mgr_reconcile_access_list(self):
+        lb = self.loadbalancer
+        mgr = lb.manager
+        current = [{"id": num, "address": "10.0.0.%s" % num, "type": "ALLOW"}
+                for num in range(1, 24)]
+        desired = [{"address": "10.0.0.1", "type": "ALLOW"},
+                {"address": "10.1.0.0/16", "type": "ALLOW"},
+                {"address": "0.0.0.0/0", "type": "DENY"}]
+        calls = self._mock_access_calls(mgr, current)
+        plan = self.client.reconcile_access_list(lb, desired)
+        self.assertEqual(len(plan["delete"]), 22)
+        uri = "/loadbalancers/%s/accesslist" % lb.id
+        # The new items are added before the stale ones are deleted.
+        self.assertEqual(calls, [("POST", desired[1:])] + [
+                ("DELETE", "%s?%s" % (uri, "&".join(["id=%s" % num
+                for num in ids]))) for ids in (range(2, 12), range(12, 22),
+                range(22, 24))])
+        self.assertEqual(mgr.wait_for_active.call_count, 3)
+        # The current list is only fetched once.
+        self.assertEqual(mgr.get_access_list.call_count, 1)
+
+    def test_mgr_reconcile_access_list_replace(self):
+        lb = self.loadbalancer
+        mgr = lb.manager
+        current = [{"id": num, "address": "10.0.0.%s" % num, "type": "ALLOW"}
+                for num in range(1, 4)]
+        desired = [{"address": "0.0.0.0/0", "type": "DENY"}]
+        calls = self._mock_access_calls(mgr, current)
+        mgr.delete_access_list = Mock()
+        lb.reconcile_access_list(desired)
+        # The whole list is never deleted, since that would leave the load
+        # balancer without one until the new items were added.
+        self.assertFalse(mgr.delete_access_list.called)
+        uri = "/loadbalancers/%s/accesslist" % lb.id
+        self.assertEqual(calls, [("POST", desired),
+                ("DELETE", "%s?id=1&id=2&id=3" % uri)])
+
+    def test_mgr_reconcile_access_list_type_change(self):
+        lb = self.loadbalancer
+        mgr = lb.manager
+        current = [{"id": 1, "address": "10.0.0.1", "type": "ALLOW"},
+                {"id": 2, "address": "10.0.0.2", "type": "ALLOW"}]
+        desired = [{"address": "10.0.0.1", "type": "DENY"},
+                {"address": "10.0.0.3", "type": "ALLOW"}]
+        calls = self._mock_access_calls(mgr, current)
+        lb.reconcile_access_list(desired)
+        uri = "/loadbalancers/%s/accesslist" % lb.id
+        # Only the address whose type changes is deleted before the add.
+        self.assertEqual(calls, [("DELETE", "%s?id=1" % uri),
+                ("POST", desired), ("DELETE", "%s?id=2" % uri)])
+        self.assertEqual(mgr.wait_for_active.call_count, 2)
+
+    def test_mgr_reconcile_access_list_empty(self):
+        lb = self.loadbalancer
+        mgr = lb.manager
+        current = [{"id": num, "address": "10.0.0.%s" % num, "type": "ALLOW"}
+                for num in range(1, 24)]
+        mgr.get_access_list = Mock(return_value=current)
+        mgr.wait_for_active = Mock()
+        mgr.delete_access_list = Mock()
+        mgr.add_access_list = Mock()
+        lb.reconcile_access_list([])
+        mgr.delete_access_list.assert_called_once_with(lb)
+        self.assertFalse(mgr.add_access_list.called)
+        self.assertFalse(mgr.wait_for_active.called)
+
+    def test_mgr_reconcile_access_list_unchanged(self):
+        lb = self.loadbalancer
+        mgr = lb.manager
+        current = [{"id": 1, "address": "10.0.0.1", "type": "ALLOW"}]
+        mgr.get_access_list = Mock(return_value=current)
+        mgr._call_when_active = Mock()
+        plan = mgr.reconcile_access_list(lb, [{"address": "10.0.0.1",
+                "type": "ALLOW"}])
+        self.assertEqual(plan["unchanged"], current)
+        self.assertFalse(mgr._call_when_active.called)
+
+    def test_mgr_reconcile_access_list_dry_run(self):
+        lb = self.loadbalancer
+        mgr = lb.manager
+        mgr.get_access_list = Mock(return_value=[])
+        mgr._call_when_active = Mock()
+        plan = mgr.reconcile_access_list(lb, [{"address": "10.0.0.1",
+                "type": "ALLOW"}], dry_run=True)
+        self.assertEqual(plan["add"], [{"address": "10.0.0.1",
+                "type": "ALLOW"}])
+        self.assertFalse(mgr._call_when_active.called)
+
     def test_mgr_get_health_monitor(self):
         lb = self.loadbalancer
         mgr = lb.manager
@@ -1319,5 +1513,485 @@ class CloudLoadBalancerTest(unittest.TestCase):
         self.assertEqual(clt.method_get.call_count, 1)
 
 
+
+class NodeChangeQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.loadbalancer = lb = fakes.FakeLoadBalancer()
+        self.manager = mgr = lb.manager
+        self.nodes = [fakes.FakeNode(id="n%s" % num, parent=lb)
+                for num in range(15)]
+        mgr.wait_for_active = Mock()
+        mgr.delete_nodes = Mock(return_value=({}, None))
+        mgr.add_nodes = Mock()
+        mgr.api.method_put = Mock(return_value=({}, None))
+
+    def test_coalesce(self):
+        lb = self.loadbalancer
+        nodes = self.nodes
+        new1 = Node(address="10.0.0.1", port=80)
+        new2 = Node(address="10.0.0.2", port=80)
+        changes = lb.node_changes()
+        changes.update_node(nodes[0], condition="draining")
+        changes.update_node(nodes[0], weight=5)
+        changes.update_node(nodes[1], weight=3)
+        changes.delete_node(nodes[1])
+        changes.update_node(nodes[1], weight=4)
+        changes.add_nodes([new1, new2])
+        changes.update_node(new1, condition="DISABLED")
+        changes.delete_node(new2)
+        changes.update_node(nodes[2])
+        self.assertEqual(len(changes), 3)
+        self.assertEqual(changes._updates, {"n0": (nodes[0],
+                {"condition": "DRAINING", "weight": 5})})
+        self.assertEqual(list(changes._deletes), ["n1"])
+        self.assertEqual(changes._adds, [new1])
+        self.assertEqual(new1.condition, "DISABLED")
+
+    def test_update_node_bad_condition(self):
+        changes = self.loadbalancer.node_changes()
+        self.assertRaises(exc.InvalidNodeCondition, changes.update_node,
+                self.nodes[0], condition="BROKEN")
+
+    def test_apply(self):
+        lb = self.loadbalancer
+        mgr = self.manager
+        nodes = self.nodes
+        new = Node(address="10.0.0.1", port=80)
+        mgr.add_nodes.return_value = ({}, {"nodes": [{"id": "n99",
+                "address": "10.0.0.1", "port": 80, "condition": "ENABLED",
+                "status": "ONLINE", "weight": 1}]})
+        with lb.node_changes() as changes:
+            for node in nodes[:12]:
+                changes.delete_node(node)
+            changes.add_nodes(new)
+            changes.update_node(nodes[12], weight=7)
+            changes.update_node(nodes[13], condition="DISABLED")
+        results = changes.results
+        self.assertEqual(len(changes), 0)
+        self.assertEqual(mgr.delete_nodes.call_args_list, [
+                call(lb, nodes[:10]), call(lb, nodes[10:12])])
+        mgr.add_nodes.assert_called_once_with(lb, [new])
+        uri = "/loadbalancers/%s/nodes/%%s" % lb.id
+        self.assertEqual(mgr.api.method_put.call_args_list, [
+                call(uri % "n12", body={"node": {"weight": 7}}),
+                call(uri % "n13", body={"node": {"condition": "DISABLED"}})])
+        # Waits only between calls, not before the first one
+        self.assertEqual(mgr.wait_for_active.call_count, 4)
+        self.assertEqual([(res["action"], utils.get_id(res["node"]),
+                res["error"]) for res in results],
+                [("delete", "n%s" % num, None) for num in range(12)] +
+                [("add", "n99", None), ("update", "n12", None),
+                ("update", "n13", None)])
+        self.assertEqual(results[12]["node"].parent, lb)
+        self.assertEqual(nodes[12].weight, 7)
+        self.assertEqual(nodes[13].condition, "DISABLED")
+
+    def test_apply_errors(self):
+        lb = self.loadbalancer
+        mgr = self.manager
+        nodes = self.nodes
+        err = exc.BadRequest(400, "bad")
+        mgr.api.method_put.side_effect = [err, ({}, None)]
+        changes = lb.node_changes()
+        changes.update_node(nodes[0], weight=500)
+        changes.update_node(nodes[1], weight=5)
+        results = changes.apply()
+        self.assertTrue(results[0]["error"] is err)
+        self.assertIsNone(results[1]["error"])
+        self.assertEqual(nodes[0].weight, 1)
+        # The failed call didn't change the load balancer, so no need to wait.
+        self.assertFalse(mgr.wait_for_active.called)
+
+    def test_apply_not_active(self):
+        lb = self.loadbalancer
+        mgr = self.manager
+        nodes = self.nodes
+        err = exc.LoadBalancerNotActive("ERROR")
+        mgr.wait_for_active.side_effect = err
+        changes = lb.node_changes()
+        for node in nodes[:3]:
+            changes.update_node(node, weight=2)
+        results = changes.apply()
+        self.assertEqual(mgr.api.method_put.call_count, 1)
+        self.assertEqual(mgr.wait_for_active.call_count, 1)
+        self.assertEqual([res["error"] for res in results], [None, err, err])
+
+    def test_apply_immutable(self):
+        lb = self.loadbalancer
+        mgr = self.manager
+        immutable = exc.ClientException(422, "Load Balancer is considered "
+                "immutable.")
+        mgr.api.method_put.side_effect = [immutable, ({}, None)]
+        changes = lb.node_changes()
+        changes.update_node(self.nodes[0], weight=2)
+        results = changes.apply()
+        self.assertIsNone(results[0]["error"])
+        mgr.wait_for_active.assert_called_once_with(lb)
+
+    def test_client_node_changes(self):
+        clt = fakes.FakeLoadBalancerClient()
+        changes = clt.node_changes(self.loadbalancer)
+        self.assertTrue(isinstance(changes, NodeChangeQueue))
+        self.assertTrue(changes.loadbalancer is self.loadbalancer)
+
+
+class FakeLBBackend(object):
+    """
+    Acts like load balancers that stay PENDING_UPDATE for a number of status
+    checks after each change, and reject any change made while they are.
+    """
+    def __init__(self, polls_per_change=2):
+        self.polls_per_change = polls_per_change
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.statuses = {}
+        self.calls = []
+        self.rejected = 0
+
+    def change(self, lb, value=None):
+        lb_id = utils.get_id(lb)
+        with self.lock:
+            if self.pending.get(lb_id):
+                self.rejected += 1
+                raise exc.ClientException(422, "Load Balancer '%s' has a "
+                        "status of 'PENDING_UPDATE' and is considered "
+                        "immutable." % lb_id)
+            self.calls.append((lb_id, value))
+            self.pending[lb_id] = self.polls_per_change
+        return value
+
+    def get_status(self, lb):
+        lb_id = utils.get_id(lb)
+        with self.lock:
+            if lb_id in self.statuses:
+                return self.statuses[lb_id]
+            if self.pending.get(lb_id):
+                self.pending[lb_id] -= 1
+                return "PENDING_UPDATE"
+            return "ACTIVE"
+
+
+@patch("pyrax.cloudloadbalancers.DEFAULT_ACTIVE_INTERVAL", 0.001)
+@patch("pyrax.cloudloadbalancers.DEFAULT_MAX_ACTIVE_INTERVAL", 0.005)
+class LoadBalancerSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.client = fakes.FakeLoadBalancerClient()
+        self.manager = mgr = self.client._manager
+        self.backend = FakeLBBackend()
+        mgr.get_status = Mock(side_effect=self.backend.get_status)
+        self.scheduler = LoadBalancerScheduler(mgr, max_workers=4)
+
+    def tearDown(self):
+        self.scheduler.shutdown(wait=False)
+
+    def test_serial_per_loadbalancer(self):
+        sched = self.scheduler
+        backend = self.backend
+        lbs = ["lb%s" % num for num in range(6)]
+        futs = []
+        for step in range(3):
+            futs.extend(sched.submit_many(lbs, backend.change, step))
+        sched.shutdown()
+        self.assertEqual([fut.result() for fut in futs],
+                [step for step in range(3) for lb in lbs])
+        self.assertEqual(backend.rejected, 0)
+        for lb in lbs:
+            self.assertEqual([val for lb_id, val in backend.calls
+                    if lb_id == lb], [0, 1, 2])
+        stats = sched.get_stats()
+        self.assertEqual(stats["completed"], 18)
+        self.assertEqual(stats["pending"], 0)
+        # Two changes to wait for on each load balancer, with two checks
+        # that find it PENDING_UPDATE and one that finds it ACTIVE.
+        self.assertEqual(stats["polls"], 6 * 2 * 3)
+
+    def test_no_poll_for_single_change(self):
+        sched = self.scheduler
+        fut = sched.submit("lb1", self.backend.change, "x")
+        sched.shutdown()
+        self.assertEqual(fut.result(), "x")
+        self.assertEqual(sched.get_stats()["polls"], 0)
+
+    def test_immutable_retry(self):
+        sched = self.scheduler
+        backend = self.backend
+        # Changed by someone else.
+        backend.pending["lb1"] = 3
+        fut = sched.submit("lb1", backend.change, "x")
+        sched.shutdown()
+        self.assertEqual(fut.result(), "x")
+        self.assertEqual(backend.rejected, 1)
+        self.assertEqual(backend.calls, [("lb1", "x")])
+
+    def test_failed_status(self):
+        sched = self.scheduler
+        backend = self.backend
+        backend.statuses["lb1"] = "ERROR"
+        fut1 = sched.submit("lb1", backend.change, 1)
+        fut2 = sched.submit("lb1", backend.change, 2)
+        fut3 = sched.submit("lb2", backend.change, 3)
+        sched.shutdown()
+        self.assertEqual(fut1.result(), 1)
+        self.assertRaises(exc.LoadBalancerNotActive, fut2.result)
+        self.assertEqual(fut3.result(), 3)
+        self.assertEqual(sched.get_stats()["failed"], 1)
+
+    def test_timeout(self):
+        sched = LoadBalancerScheduler(self.manager, timeout=0.01)
+        backend = self.backend
+        backend.statuses["lb1"] = "PENDING_UPDATE"
+        fut1 = sched.submit("lb1", backend.change, 1)
+        fut2 = sched.submit("lb1", backend.change, 2)
+        sched.shutdown()
+        self.assertEqual(fut1.result(), 1)
+        self.assertRaises(exc.LoadBalancerNotActive, fut2.result)
+
+    def test_stale_deadline(self):
+        sched = LoadBalancerScheduler(self.manager, timeout=5)
+        backend = self.backend
+        fut1 = sched.submit("lb1", backend.change, 1)
+        self.assertEqual(fut1.result(timeout=5), 1)
+        state = sched._states["lb1"]
+        with sched._cond:
+            while state["busy"]:
+                sched._cond.wait(0.01)
+            # The last change was made longer ago than the timeout.
+            self.assertTrue(state["changing"])
+            state["deadline"] = time.time() - 1
+        fut2 = sched.submit("lb1", backend.change, 2)
+        sched.shutdown()
+        self.assertEqual(fut2.result(), 2)
+        self.assertEqual(sched.get_stats()["failed"], 0)
+
+    def test_other_error(self):
+        sched = self.scheduler
+        err = exc.BadRequest(400, "bad")
+        fnc = Mock(side_effect=[err, "ok"])
+        fut1 = sched.submit("lb1", fnc, 1)
+        fut2 = sched.submit("lb1", fnc, 2)
+        sched.shutdown()
+        self.assertTrue(fut1.exception() is err)
+        self.assertEqual(fut2.result(), "ok")
+        # The failed change did not make the load balancer immutable.
+        self.assertEqual(sched.get_stats()["polls"], 0)
+
+    def test_method_name(self):
+        mgr = self.manager
+        mgr.add_connection_throttle = Mock(return_value="throttled")
+        lb = fakes.FakeLoadBalancer()
+        with self.client.get_scheduler() as sched:
+            fut = sched.submit(lb, "add_connection_throttle", maxConnections=5)
+        self.assertEqual(fut.result(), "throttled")
+        mgr.add_connection_throttle.assert_called_once_with(lb,
+                maxConnections=5)
+
+    def test_shutdown_no_wait(self):
+        sched = self.scheduler
+        backend = self.backend
+        backend.statuses["lb1"] = "PENDING_UPDATE"
+        fut1 = sched.submit("lb1", backend.change, 1)
+        fut2 = sched.submit("lb1", backend.change, 2)
+        fut1.result()
+        sched.shutdown(wait=False)
+        self.assertTrue(fut2.cancelled())
+        self.assertEqual(sched.get_stats()["pending"], 0)
+
+
+class FakeArray(list):
+    """
+    Acts like the parts of a NumPy array of floats that _StatsHistory uses.
+    """
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            rows, col = key
+            return FakeArray(list.__getitem__(self, row)[col] for row in rows)
+        val = list.__getitem__(self, key)
+        return FakeArray(val) if isinstance(key, slice) else val
+
+    def __setitem__(self, key, val):
+        if isinstance(val, list):
+            val = FakeArray(val)
+        list.__setitem__(self, key, val)
+
+    def __lt__(self, other):
+        return [val < other for val in self]
+
+    def tolist(self):
+        return list(self)
+
+    def sum(self):
+        return sum(self)
+
+
+class FakeNumPy(object):
+    """
+    Stands in for the NumPy functions used by _StatsHistory, so that its
+    NumPy code is tested even when NumPy is not installed.
+    """
+    def zeros(self, shape):
+        if isinstance(shape, tuple):
+            rows, cols = shape
+            return FakeArray(FakeArray([0.0] * cols) for row in range(rows))
+        return FakeArray([0.0] * shape)
+
+    def diff(self, values):
+        return FakeArray(curr - prev for prev, curr in zip(values,
+                values[1:]))
+
+    def where(self, cond, first, second):
+        return FakeArray(one if use_first else two
+                for use_first, one, two in zip(cond, first, second))
+
+
+class LoadBalancerStatsCollectorTest(unittest.TestCase):
+    numpy = None
+
+    def setUp(self):
+        patcher = patch.object(cloudloadbalancers, "numpy", self.numpy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _lb(self, stats):
+        lb = fakes.FakeLoadBalancer()
+        lb.get_stats = Mock(side_effect=stats)
+        return lb
+
+    def test_sample(self):
+        busy = self._lb([
+                {"connectError": 10, "currentConn": 40, "maxConn": 50},
+                {"connectError": 15, "currentConn": 60, "maxConn": 70},
+                {"connectError": 35, "currentConn": 20, "maxConn": 70}])
+        quiet = self._lb([
+                {"connectError": 1, "currentConn": 1},
+                {"connectError": 1, "currentConn": 2},
+                {"connectError": 3, "currentConn": 0}])
+        collector = LoadBalancerStatsCollector(loadbalancers=[busy, quiet])
+        with patch.object(time, "time", side_effect=[100, 100, 110, 110,
+                120, 120]):
+            first = collector.sample()
+            collector.sample()
+            metrics = collector.sample()
+        self.assertIsNone(first["loadbalancers"][busy.id]["deltas"])
+        self.assertIsNone(first["loadbalancers"][busy.id]["rates"])
+        lb_metrics = metrics["loadbalancers"][busy.id]
+        self.assertEqual(lb_metrics["sampled_at"], 120)
+        self.assertEqual(lb_metrics["stats"]["currentConn"], 20)
+        self.assertEqual(lb_metrics["stats"]["maxConn"], 70)
+        self.assertEqual(lb_metrics["stats"]["dataTimedOut"], 0)
+        self.assertEqual(lb_metrics["deltas"]["connectError"], 20)
+        self.assertEqual(lb_metrics["rates"]["connectError"], 1.25)
+        self.assertEqual(lb_metrics["rates"]["dataTimedOut"], 0)
+        self.assertEqual(metrics["loadbalancers"][quiet.id]["rates"][
+                "connectError"], 0.1)
+        fleet = metrics["fleet"]
+        self.assertEqual(fleet["currentConn"], 20)
+        self.assertEqual(fleet["rates"]["connectError"], 1.35)
+        stamps, values = collector.get_series(busy, "currentConn")
+        self.assertEqual(list(stamps), [100, 110, 120])
+        self.assertEqual(list(values), [40, 60, 20])
+
+    def test_counter_reset(self):
+        lb = self._lb([{"connectError": 50}, {"connectError": 60},
+                {"connectError": 5}])
+        collector = LoadBalancerStatsCollector(loadbalancers=[lb])
+        with patch.object(time, "time", side_effect=[0, 10, 20]):
+            for num in range(3):
+                metrics = collector.sample()
+        lb_metrics = metrics["loadbalancers"][lb.id]
+        self.assertEqual(lb_metrics["deltas"]["connectError"], 5)
+        self.assertEqual(lb_metrics["rates"]["connectError"], 0.75)
+
+    def test_history_limit(self):
+        lb = self._lb([{"currentConn": num} for num in range(5)])
+        collector = LoadBalancerStatsCollector(loadbalancers=[lb], history=3)
+        with patch.object(time, "time", side_effect=range(5)):
+            for num in range(5):
+                collector.sample()
+        stamps, values = collector.get_series(lb.id, "currentConn")
+        self.assertEqual(list(values), [2, 3, 4])
+        self.assertEqual(list(stamps), [2, 3, 4])
+        self.assertEqual(collector.get_metrics()["loadbalancers"][lb.id][
+                "stats"]["currentConn"], 4)
+
+    def test_get_series_unknown(self):
+        collector = LoadBalancerStatsCollector()
+        stamps, values = collector.get_series("fake", "currentConn")
+        self.assertEqual((list(stamps), list(values)), ([], []))
+        if self.numpy is None:
+            self.assertEqual((stamps, values), ([], []))
+        else:
+            # Empty arrays, rather than lists, when NumPy is installed.
+            array_type = type(self.numpy.zeros(0))
+            self.assertTrue(isinstance(stamps, array_type))
+            self.assertTrue(isinstance(values, array_type))
+        self.assertRaises(ValueError, collector.get_series, "fake", "bogus")
+
+    def test_get_series_type(self):
+        lb = self._lb([{"currentConn": 1}])
+        collector = LoadBalancerStatsCollector(loadbalancers=[lb])
+        collector.sample()
+        stamps, values = collector.get_series(lb, "currentConn")
+        expected = list if self.numpy is None else type(self.numpy.zeros(0))
+        self.assertTrue(isinstance(values, expected))
+
+    def test_sample_errors(self):
+        good = self._lb([{"currentConn": 1}])
+        bad = self._lb([exc.NotFound(404)])
+        on_sample = Mock(side_effect=ValueError)
+        collector = LoadBalancerStatsCollector(loadbalancers=[good, bad],
+                on_sample=on_sample)
+        metrics = collector.sample()
+        on_sample.assert_called_once_with(metrics)
+        self.assertEqual(list(metrics["loadbalancers"]), [good.id])
+        self.assertEqual(collector.errors, 1)
+        self.assertEqual(collector.rounds, 1)
+
+    def test_remove_loadbalancer(self):
+        lb = self._lb([{"currentConn": 1}])
+        collector = LoadBalancerStatsCollector(loadbalancers=[lb])
+        collector.sample()
+        collector.remove_loadbalancer(lb.id)
+        self.assertEqual(collector.get_metrics()["loadbalancers"], {})
+
+    def test_start_stop(self):
+        lb = fakes.FakeLoadBalancer()
+        lb.get_stats = Mock(return_value={"currentConn": 1})
+        samples = []
+        collector = LoadBalancerStatsCollector(loadbalancers=[lb],
+                interval=0.01, on_sample=samples.append)
+        collector.start()
+        end = time.time() + 5
+        while time.time() < end and len(samples) < 3:
+            time.sleep(0.01)
+        collector.stop()
+        count = lb.get_stats.call_count
+        self.assertTrue(count >= 3)
+        time.sleep(0.03)
+        self.assertEqual(lb.get_stats.call_count, count)
+
+    def test_client_collect_stats(self):
+        clt = fakes.FakeLoadBalancerClient()
+        lb1 = fakes.FakeLoadBalancer()
+        lb2 = fakes.FakeLoadBalancer()
+        clt.list = Mock(return_value=[lb1])
+        clt._manager.get = Mock(return_value=lb2)
+        with patch.object(LoadBalancerStatsCollector, "start", autospec=True,
+                side_effect=lambda collector: collector):
+            ret = clt.collect_stats(interval=5, history=3)
+            self.assertEqual(list(ret._loadbalancers), [lb1.id])
+            ret = clt.collect_stats([lb2.id])
+        clt._manager.get.assert_called_once_with(lb2.id)
+        self.assertEqual(list(ret._loadbalancers), [lb2.id])
+
+
+class FakeNumPyStatsCollectorTest(LoadBalancerStatsCollectorTest):
+    numpy = FakeNumPy()
+
+
+@unittest.skipIf(cloudloadbalancers.numpy is None, "requires NumPy")
+class NumPyStatsCollectorTest(LoadBalancerStatsCollectorTest):
+    numpy = cloudloadbalancers.numpy
+
+
 if __name__ == "__main__":
     unittest.main()
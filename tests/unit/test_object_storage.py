@@ -2,13 +2,16 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 
+import json
 import logging
 import mimetypes
 import os
 import random
 import time
 import unittest
+import zlib
 
+from six import BytesIO
 from six import StringIO
 
 from mock import patch
@@ -25,13 +28,19 @@ from pyrax.object_storage import Fault_cls
 from pyrax.object_storage import FAULT
 from pyrax.object_storage import FolderUploader
 from pyrax.object_storage import get_file_size
+from pyrax.object_storage import get_gzip_checksum
+from pyrax.object_storage import _gzip_stream
+from pyrax.object_storage import _is_compressible
 from pyrax.object_storage import _handle_container_not_found
 from pyrax.object_storage import _handle_object_not_found
 from pyrax.object_storage import OBJECT_META_PREFIX
+from pyrax.object_storage import _MappedFile
 from pyrax.object_storage import _massage_metakeys
 from pyrax.object_storage import StorageClient
 from pyrax.object_storage import StorageObject
 from pyrax.object_storage import StorageObjectIterator
+from pyrax.object_storage import summarize_usage
+from pyrax.object_storage import _use_mmap
 from pyrax.object_storage import _validate_file_or_path
 from pyrax.object_storage import _valid_upload_key
 import pyrax.exceptions as exc
@@ -158,6 +167,28 @@ class ObjectStorageTest(unittest.TestCase):
         ret = get_file_size(fobj)
         self.assertEqual(sz, ret)
 
+    @patch("pyrax.object_storage.MMAP_THRESHOLD", new=100)
+    def test_use_mmap(self):
+        self.assertFalse(_use_mmap(99))
+        self.assertTrue(_use_mmap(100))
+        self.assertFalse(_use_mmap(pyrax.object_storage.MAX_FILE_SIZE + 1))
+
+    @patch("pyrax.object_storage.MMAP_THRESHOLD", new=None)
+    def test_use_mmap_disabled(self):
+        self.assertFalse(_use_mmap(1024 * 1024 * 1024))
+
+    def test_mapped_file(self):
+        content = os.urandom(4096)
+        with utils.SelfDeletingTempfile() as tmp:
+            with open(tmp, "wb") as ff:
+                ff.write(content)
+            mapped = _MappedFile(tmp)
+            with mapped as view:
+                self.assertEqual(len(view), len(content))
+                self.assertEqual(bytes(view), content)
+            self.assertTrue(mapped._file.closed)
+            self.assertTrue(mapped._map.closed)
+
     @patch('pyrax.object_storage.StorageObjectManager',
             new=fakes.FakeStorageObjectManager)
     def test_container_create(self):
@@ -234,6 +265,37 @@ class ObjectStorageTest(unittest.TestCase):
         self.assertIsNone(ret)
         self.assertIsNone(cont.cdn_uri)
 
+    def test_set_cdn_info(self):
+        cont = self.container
+        cdn_uri = utils.random_unicode()
+        info = {"name": cont.name, "cdn_enabled": True, "cdn_uri": cdn_uri,
+                "ttl": 42, "log_retention": True}
+        cont.manager.fetch_cdn_data = Mock()
+        cont._set_cdn_info(info)
+        self.assertTrue(cont.cdn_enabled)
+        self.assertEqual(cont.cdn_uri, cdn_uri)
+        self.assertEqual(cont.cdn_ttl, 42)
+        self.assertTrue(cont.cdn_log_retention)
+        self.assertIsNone(cont.cdn_ssl_uri)
+        self.assertFalse(cont.manager.fetch_cdn_data.called)
+
+    def test_set_cdn_info_none(self):
+        cont = self.container
+        cont.manager.fetch_cdn_data = Mock()
+        cont._set_cdn_info(None)
+        self.assertFalse(cont.cdn_enabled)
+        self.assertIsNone(cont.cdn_uri)
+        self.assertFalse(cont.manager.fetch_cdn_data.called)
+
+    def test_set_headers(self):
+        cont = self.container
+        hdrs = {"x-container-bytes-used": "123",
+                "x-container-object-count": "4"}
+        cont._set_headers(hdrs)
+        self.assertEqual(cont.total_bytes, 123)
+        self.assertEqual(cont.object_count, 4)
+        self.assertTrue(cont._headers is hdrs)
+
     def test_cont_get_metadata(self):
         cont = self.container
         prefix = utils.random_unicode()
@@ -241,6 +303,28 @@ class ObjectStorageTest(unittest.TestCase):
         cont.get_metadata(prefix=prefix)
         cont.manager.get_metadata.assert_called_once_with(cont, prefix=prefix)
 
+    def test_cont_get_metadata_cached(self):
+        cont = self.container
+        cont.manager.get_metadata = Mock()
+        cont._set_headers({"x-container-meta-foo": "bar",
+                "X-Container-Object-Count": "1"})
+        ret = cont.get_metadata(cached=True)
+        self.assertEqual(ret, {"foo": "bar"})
+        self.assertFalse(cont.manager.get_metadata.called)
+
+    def test_cont_get_metadata_cached_not_loaded(self):
+        cont = self.container
+        cont.manager.get_metadata = Mock()
+        cont.get_metadata(cached=True)
+        cont.manager.get_metadata.assert_called_once_with(cont, prefix=None)
+
+    def test_cont_set_metadata_clears_cache(self):
+        cont = self.container
+        cont._set_headers({})
+        cont.manager.set_metadata = Mock()
+        cont.set_metadata({"foo": "bar"})
+        self.assertTrue(cont._headers is FAULT)
+
     def test_cont_set_metadata(self):
         cont = self.container
         prefix = utils.random_unicode()
@@ -434,7 +518,7 @@ class ObjectStorageTest(unittest.TestCase):
                 content_encoding=content_encoding,
                 content_length=content_length, ttl=ttl, chunked=chunked,
                 metadata=metadata, chunk_size=chunk_size, headers=headers,
-                return_none=return_none)
+                return_none=return_none, compress=False)
 
     def test_cont_store_object(self):
         cont = self.container
@@ -477,7 +561,7 @@ class ObjectStorageTest(unittest.TestCase):
                 obj_name=obj_name, content_type=content_type, etag=etag,
                 content_encoding=content_encoding, headers=headers,
                 content_length=content_length, ttl=ttl,
-                return_none=return_none)
+                return_none=return_none, compress=False)
 
     def test_cont_fetch(self):
         cont = self.container
@@ -625,6 +709,16 @@ class ObjectStorageTest(unittest.TestCase):
         cont.get_object_metadata(obj)
         cont.object_manager.get_metadata.assert_called_once_with(obj, None)
 
+    def test_cont_bulk_set_object_metadata(self):
+        cont = self.container
+        cont.object_manager.bulk_set_metadata = Mock()
+        items = utils.random_unicode()
+        curr = utils.random_unicode()
+        cont.bulk_set_object_metadata(items, current_metadata=curr)
+        cont.object_manager.bulk_set_metadata.assert_called_once_with(items,
+                clear=False, prefix=None, current_metadata=curr,
+                max_workers=None)
+
     def test_cont_set_object_metadata(self):
         cont = self.container
         cont.object_manager.set_metadata = Mock()
@@ -1093,6 +1187,20 @@ class ObjectStorageTest(unittest.TestCase):
         self.assertEqual(mgr.api.method_get.call_count, 1)
         self.assertEqual(ret, body)
 
+    def test_cmgr_iter_containers_info(self):
+        cont = self.container
+        mgr = cont.manager
+        prefix = utils.random_unicode()
+        page1 = [{"name": "a"}, {"name": "b"}]
+        page2 = [{"name": "c"}]
+        mgr.list_containers_info = Mock(side_effect=[page1, page2, []])
+        ret = mgr.iter_containers_info(prefix=prefix, limit=2)
+        self.assertEqual(mgr.list_containers_info.call_count, 0)
+        self.assertEqual([info["name"] for info in ret], ["a", "b", "c"])
+        self.assertEqual(mgr.list_containers_info.call_count, 3)
+        mgr.list_containers_info.assert_called_with(limit=2, marker="c",
+                prefix=prefix)
+
     def test_cmgr_list_public_containers(self):
         cont = self.container
         mgr = cont.manager
@@ -1106,6 +1214,77 @@ class ObjectStorageTest(unittest.TestCase):
         self.assertTrue(name1 in ret)
         self.assertTrue(name2 in ret)
 
+    def test_cmgr_list_cdn_info(self):
+        cont = self.container
+        mgr = cont.manager
+        body = [{"name": cont.name}]
+        mgr.api.cdn_request = Mock(return_value=(None, body))
+        ret = mgr.list_cdn_info(limit=10, marker="abc")
+        mgr.api.cdn_request.assert_called_once_with("?limit=10&marker=abc",
+                "GET")
+        self.assertEqual(ret, body)
+
+    def test_cmgr_all_cdn_info(self):
+        cont = self.container
+        mgr = cont.manager
+        page1 = [{"name": "a"}, {"name": "b"}]
+        page2 = [{"name": "c"}]
+        mgr.list_cdn_info = Mock(side_effect=[page1, page2, []])
+        ret = mgr._all_cdn_info()
+        self.assertEqual(sorted(ret.keys()), ["a", "b", "c"])
+        mgr.list_cdn_info.assert_called_with(marker="c")
+
+    def test_cmgr_all_cdn_info_not_enabled(self):
+        cont = self.container
+        mgr = cont.manager
+        mgr.list_cdn_info = Mock(side_effect=exc.NotCDNEnabled(""))
+        ret = mgr._all_cdn_info()
+        self.assertEqual(ret, {})
+
+    def test_cmgr_fetch_details(self):
+        mgr = self.container.manager
+        cont1 = Container(mgr, {"name": "a"})
+        cdn_uri = utils.random_unicode()
+        cdn_info = {"a": {"name": "a", "cdn_enabled": True,
+                "cdn_uri": cdn_uri}}
+        mgr._all_cdn_info = Mock(return_value=cdn_info)
+        hdrs = {"x-container-bytes-used": "99",
+                "x-container-object-count": "3"}
+        mgr.get_headers = Mock(return_value=hdrs)
+        mgr.fetch_cdn_data = Mock()
+        ret = mgr.fetch_details([cont1, "b"])
+        self.assertEqual(len(ret), 2)
+        self.assertTrue(ret[0] is cont1)
+        self.assertEqual(ret[1].name, "b")
+        self.assertEqual(cont1.cdn_uri, cdn_uri)
+        self.assertEqual(cont1.total_bytes, 99)
+        self.assertFalse(ret[1].cdn_enabled)
+        self.assertEqual(ret[1].object_count, 3)
+        self.assertEqual(mgr.get_headers.call_count, 2)
+        self.assertFalse(mgr.fetch_cdn_data.called)
+
+    def test_cmgr_fetch_details_failure(self):
+        mgr = self.container.manager
+        mgr._all_cdn_info = Mock(return_value={})
+
+        def fake_headers(cont):
+            if cont.name == "bad":
+                raise exc.NoSuchContainer("")
+            return {}
+
+        mgr.get_headers = Mock(side_effect=fake_headers)
+        ret = mgr.fetch_details(["good", "bad"])
+        self.assertEqual([cont.name for cont in ret], ["good"])
+
+    def test_cmgr_fetch_details_all(self):
+        mgr = self.container.manager
+        cont1 = Container(mgr, {"name": "a"})
+        mgr.list = Mock(side_effect=[[cont1], []])
+        mgr.get_headers = Mock(return_value={})
+        ret = mgr.fetch_details(include_cdn=False)
+        self.assertEqual(ret, [cont1])
+        mgr.list.assert_called_with(marker="a")
+
     def test_cmgr_make_public(self):
         cont = self.container
         mgr = cont.manager
@@ -1340,7 +1519,7 @@ class ObjectStorageTest(unittest.TestCase):
                 etag=etag, content_encoding=content_encoding,
                 content_length=content_length, ttl=ttl, chunked=chunked,
                 metadata=metadata, chunk_size=chunk_size, headers=headers,
-                return_none=return_none)
+                return_none=return_none, compress=False)
 
     def test_cmgr_fetch_object(self):
         cont = self.container
@@ -1496,6 +1675,18 @@ class ObjectStorageTest(unittest.TestCase):
         cont.set_object_metadata.assert_called_once_with(obj, metadata,
                 clear=clear, prefix=prefix)
 
+    def test_cmgr_bulk_set_object_metadata(self):
+        cont = self.container
+        mgr = cont.manager
+        mgr.get = Mock(return_value=cont)
+        items = {utils.random_unicode(): {"foo": "bar"}}
+        curr = utils.random_unicode()
+        cont.bulk_set_object_metadata = Mock()
+        mgr.bulk_set_object_metadata(cont, items, clear=True, prefix="",
+                current_metadata=curr, max_workers=3)
+        cont.bulk_set_object_metadata.assert_called_once_with(items,
+                clear=True, prefix="", current_metadata=curr, max_workers=3)
+
     def test_sobj_repr(self):
         obj = self.obj
         obj_repr = "%s" % obj
@@ -1840,6 +2031,155 @@ class ObjectStorageTest(unittest.TestCase):
             else:
                 self.assertEqual(ret, get_resp)
 
+    @patch("pyrax.object_storage.MMAP_THRESHOLD", new=1024)
+    def test_sobj_mgr_create_file_mmap(self):
+        cont = self.container
+        mgr = cont.object_manager
+        obj_name = utils.random_unicode()
+        content = os.urandom(2048)
+        uploaded = []
+
+        def fake_upload(obj_name, content, content_type, content_encoding,
+                content_length, etag, chunked, chunk_size, headers):
+            uploaded.append((bytes(content), content_length,
+                    utils.get_checksum(content)))
+
+        mgr._upload = Mock(side_effect=fake_upload)
+        with utils.SelfDeletingTempfile() as tmp:
+            with open(tmp, "wb") as ff:
+                ff.write(content)
+            mgr.create(tmp, obj_name=obj_name, return_none=True)
+        self.assertEqual(mgr._upload.call_count, 1)
+        self.assertTrue(isinstance(mgr._upload.call_args[0][1], memoryview))
+        self.assertEqual(uploaded, [(content, len(content),
+                utils.get_checksum(content))])
+
+    def test_summarize_usage(self):
+        infos = [{"name": "logs-a", "count": 5, "bytes": 100},
+                {"name": "logs-b", "count": 20, "bytes": 50},
+                {"name": "img", "count": 1, "bytes": 500}]
+        ret = summarize_usage(iter(infos), top=2, delimiter="-")
+        self.assertEqual(ret["container_count"], 3)
+        self.assertEqual(ret["object_count"], 26)
+        self.assertEqual(ret["total_bytes"], 650)
+        self.assertEqual(ret["containers"]["img"], {"count": 1, "bytes": 500})
+        self.assertEqual(ret["top_by_bytes"], [["img", 500], ["logs-a", 100]])
+        self.assertEqual(ret["top_by_count"], [["logs-b", 20], ["logs-a", 5]])
+        self.assertEqual(ret["groups"]["logs"],
+                {"count": 25, "bytes": 150, "containers": 2})
+        self.assertEqual(ret["groups"]["img"],
+                {"count": 1, "bytes": 500, "containers": 1})
+        self.assertIsNone(ret["deltas"])
+
+    def test_summarize_usage_no_delimiter(self):
+        ret = summarize_usage([{"name": "a-b", "count": 1, "bytes": 2}])
+        self.assertEqual(ret["groups"], {})
+
+    def test_summarize_usage_deltas(self):
+        old_infos = [{"name": "a", "count": 5, "bytes": 100},
+                {"name": "b", "count": 2, "bytes": 50},
+                {"name": "gone", "count": 1, "bytes": 10}]
+        new_infos = [{"name": "a", "count": 5, "bytes": 100},
+                {"name": "b", "count": 4, "bytes": 250},
+                {"name": "new", "count": 3, "bytes": 30}]
+        previous = summarize_usage(old_infos)
+        previous["timestamp"] -= 60
+        # Make sure that a saved summary works as well.
+        previous = json.loads(json.dumps(previous))
+        ret = summarize_usage(new_infos, previous=previous)
+        deltas = ret["deltas"]
+        self.assertTrue(deltas["seconds"] >= 60)
+        self.assertEqual(deltas["container_count"], 0)
+        self.assertEqual(deltas["object_count"], 4)
+        self.assertEqual(deltas["total_bytes"], 220)
+        self.assertEqual(deltas["added"], ["new"])
+        self.assertEqual(deltas["removed"], ["gone"])
+        self.assertEqual(deltas["containers"], {
+                "b": {"count": 2, "bytes": 200},
+                "new": {"count": 3, "bytes": 30},
+                "gone": {"count": -1, "bytes": -10}})
+        self.assertEqual(deltas["top_growth_by_bytes"],
+                [["b", 200], ["new", 30]])
+
+    def test_is_compressible(self):
+        self.assertTrue(_is_compressible("foo.txt"))
+        self.assertTrue(_is_compressible("foo.json"))
+        self.assertTrue(_is_compressible("foo",
+                content_type="text/plain; charset=utf-8"))
+        self.assertFalse(_is_compressible("foo.png"))
+        self.assertFalse(_is_compressible("foo"))
+        self.assertFalse(_is_compressible("foo.txt", compress_types=[]))
+        self.assertTrue(_is_compressible("foo.png",
+                compress_types=["image/*"]))
+
+    def test_gzip_stream(self):
+        txt = b"x" * 100000
+        chunks = list(_gzip_stream(BytesIO(txt), chunk_size=1000))
+        compressed = b"".join(chunks)
+        self.assertTrue(len(compressed) < len(txt))
+        self.assertEqual(zlib.decompress(compressed, 16 + zlib.MAX_WBITS),
+                txt)
+
+    def test_gzip_stream_text(self):
+        txt = utils.random_unicode()
+        compressed = b"".join(_gzip_stream(txt))
+        self.assertEqual(zlib.decompress(compressed, 16 + zlib.MAX_WBITS),
+                txt.encode("utf8"))
+
+    def test_get_gzip_checksum(self):
+        txt = b"abc" * 1000
+        compressed = b"".join(_gzip_stream(txt))
+        expected = utils.get_checksum(compressed)
+        self.assertEqual(get_gzip_checksum(BytesIO(txt)), expected)
+        with utils.SelfDeletingTempfile() as tmp:
+            with open(tmp, "wb") as ff:
+                ff.write(txt)
+            self.assertEqual(get_gzip_checksum(tmp), expected)
+
+    def test_sobj_mgr_create_compress(self):
+        cont = self.container
+        mgr = cont.object_manager
+        mgr._upload = Mock()
+        txt = b"abc" * 1000
+        with utils.SelfDeletingTempfile() as tmp:
+            with open(tmp, "wb") as ff:
+                ff.write(txt)
+            mgr.create(tmp, obj_name="log.txt", content_length=3000,
+                    compress=True, return_none=True)
+            args = mgr._upload.call_args[0]
+            self.assertEqual(args[0], "log.txt")
+            self.assertEqual(args[2], "text/plain")
+            self.assertEqual(args[3], "gzip")
+            self.assertIsNone(args[4])
+            self.assertTrue(args[6])
+
+    def test_sobj_mgr_create_compress_data(self):
+        cont = self.container
+        mgr = cont.object_manager
+        txt = b"abc" * 1000
+        sent = []
+
+        def fake_upload(obj_name, content, *args):
+            sent.append(b"".join(content))
+
+        mgr._upload = Mock(side_effect=fake_upload)
+        mgr.create(data=txt, obj_name="data.json", compress=True,
+                return_none=True)
+        self.assertEqual(zlib.decompress(sent[0], 16 + zlib.MAX_WBITS), txt)
+        self.assertEqual(mgr._upload.call_args[0][2], "application/json")
+
+    def test_sobj_mgr_create_compress_skipped(self):
+        cont = self.container
+        mgr = cont.object_manager
+        txt = utils.random_unicode()
+        for obj_name, encoding in (("pic.png", None), ("log.txt", "gzip")):
+            mgr._upload = Mock()
+            mgr.create(data=txt, obj_name=obj_name, compress=True,
+                    content_encoding=encoding, return_none=True)
+            args = mgr._upload.call_args[0]
+            self.assertEqual(args[1], txt)
+            self.assertEqual(args[3], encoding)
+
     def test_sobj_mgr_create_file_obj(self):
         cont = self.container
         mgr = cont.object_manager
@@ -2331,6 +2671,73 @@ class ObjectStorageTest(unittest.TestCase):
         mgr.set_metadata(obj, metadata, clear=clear, prefix=prefix)
         mgr.api.method_post.assert_called_once_with(exp_uri, headers=exp_meta)
 
+    def test_sobj_mgr_bulk_set_metadata(self):
+        mgr = self.obj.manager
+        items = [("a", {"x": "1"}), ("b", {"x": "2"})]
+        mgr.get_metadata = Mock(return_value={"old": "val"})
+        mgr.api.method_post = Mock(return_value=(None, None))
+        ret = mgr.bulk_set_metadata(items)
+        self.assertEqual(ret, {"updated": 2, "failed": 0, "errors": []})
+        self.assertEqual(mgr.get_metadata.call_count, 2)
+        cname = utils.get_name(mgr.container)
+        exp_meta = _massage_metakeys({"old": "val", "x": "2"},
+                OBJECT_META_PREFIX)
+        mgr.api.method_post.assert_any_call("/%s/b" % cname,
+                headers=exp_meta)
+
+    def test_sobj_mgr_bulk_set_metadata_current(self):
+        mgr = self.obj.manager
+        items = {"a": {"x": "1"}}
+        mgr.get_metadata = Mock()
+        mgr.api.method_post = Mock(return_value=(None, None))
+        ret = mgr.bulk_set_metadata(items,
+                current_metadata={"a": {"old": "val"}})
+        self.assertEqual(ret["updated"], 1)
+        self.assertFalse(mgr.get_metadata.called)
+        cname = utils.get_name(mgr.container)
+        exp_meta = _massage_metakeys({"old": "val", "x": "1"},
+                OBJECT_META_PREFIX)
+        mgr.api.method_post.assert_called_once_with("/%s/a" % cname,
+                headers=exp_meta)
+
+    def test_sobj_mgr_bulk_set_metadata_clear(self):
+        mgr = self.obj.manager
+        mgr.get_metadata = Mock()
+        mgr.api.method_post = Mock(return_value=(None, None))
+        ret = mgr.bulk_set_metadata({"a": {"x": "1"}}, clear=True,
+                current_metadata={"a": {"old": "val"}})
+        self.assertEqual(ret["updated"], 1)
+        self.assertFalse(mgr.get_metadata.called)
+        cname = utils.get_name(mgr.container)
+        mgr.api.method_post.assert_called_once_with("/%s/a" % cname,
+                headers={"X-Object-Meta-x": "1"})
+
+    def test_sobj_mgr_bulk_set_metadata_failure(self):
+        mgr = self.obj.manager
+        err = exc.NotFound("")
+
+        def fake_post(uri, headers=None):
+            if uri.endswith("/bad"):
+                raise err
+            return (None, None)
+
+        mgr.api.method_post = Mock(side_effect=fake_post)
+        ret = mgr.bulk_set_metadata([("good", {"x": "1"}),
+                ("bad", {"x": "2"})], clear=True)
+        self.assertEqual(ret["updated"], 1)
+        self.assertEqual(ret["failed"], 1)
+        self.assertEqual(ret["errors"][0][0], "bad")
+        self.assertTrue(isinstance(ret["errors"][0][1], exc.NoSuchObject))
+
+    def test_sobj_mgr_bulk_set_metadata_current_failure(self):
+        mgr = self.obj.manager
+        mgr.api.method_post = Mock(side_effect=exc.NotFound(""))
+        ret = mgr.bulk_set_metadata({"bad": {"x": "1"}},
+                current_metadata={"bad": {"old": "val"}})
+        self.assertEqual(ret["failed"], 1)
+        self.assertEqual(ret["errors"][0][0], "bad")
+        self.assertTrue(isinstance(ret["errors"][0][1], exc.NoSuchObject))
+
     def test_sobj_mgr_remove_metadata_key(self):
         obj = self.obj
         mgr = obj.manager
@@ -2513,6 +2920,15 @@ class ObjectStorageTest(unittest.TestCase):
         clt.list_public_containers()
         mgr.list_public_containers.assert_called_once_with()
 
+    def test_clt_fetch_container_details(self):
+        clt = self.client
+        mgr = clt._manager
+        cont = self.container
+        mgr.fetch_details = Mock()
+        clt.fetch_container_details([cont], include_cdn=False, max_workers=5)
+        mgr.fetch_details.assert_called_once_with(containers=[cont],
+                include_metadata=True, include_cdn=False, max_workers=5)
+
     def test_clt_make_container_public(self):
         clt = self.client
         mgr = clt._manager
@@ -2615,6 +3031,28 @@ class ObjectStorageTest(unittest.TestCase):
         mgr.list_containers_info.assert_called_once_with(limit=limit,
                 marker=marker)
 
+    def test_clt_iter_containers_info(self):
+        clt = self.client
+        mgr = clt._manager
+        prefix = utils.random_unicode()
+        limit = utils.random_unicode()
+        mgr.iter_containers_info = Mock()
+        clt.iter_containers_info(prefix=prefix, limit=limit)
+        mgr.iter_containers_info.assert_called_once_with(prefix=prefix,
+                limit=limit)
+
+    def test_clt_get_account_usage(self):
+        clt = self.client
+        mgr = clt._manager
+        prefix = utils.random_unicode()
+        infos = [{"name": "a", "count": 1, "bytes": 10}]
+        mgr.iter_containers_info = Mock(return_value=iter(infos))
+        ret = clt.get_account_usage(prefix=prefix, top=5)
+        mgr.iter_containers_info.assert_called_once_with(prefix=prefix,
+                limit=None)
+        self.assertEqual(ret["total_bytes"], 10)
+        self.assertEqual(ret["top_by_bytes"], [["a", 10]])
+
     def test_clt_list_container_subdirs(self):
         clt = self.client
         mgr = clt._manager
@@ -2712,6 +3150,17 @@ class ObjectStorageTest(unittest.TestCase):
         clt.get_object_metadata(cont, obj)
         mgr.get_object_metadata.assert_called_once_with(cont, obj, prefix=None)
 
+    def test_clt_bulk_set_object_metadata(self):
+        clt = self.client
+        mgr = clt._manager
+        cont = self.container
+        items = utils.random_unicode()
+        mgr.bulk_set_object_metadata = Mock()
+        clt.bulk_set_object_metadata(cont, items, clear=True, max_workers=4)
+        mgr.bulk_set_object_metadata.assert_called_once_with(cont, items,
+                clear=True, prefix=None, current_metadata=None,
+                max_workers=4)
+
     def test_clt_set_object_metadata(self):
         clt = self.client
         mgr = clt._manager
@@ -2861,7 +3310,8 @@ class ObjectStorageTest(unittest.TestCase):
                 file_or_path=file_or_path, obj_name=obj_name,
                 content_type=content_type, etag=etag,
                 content_encoding=content_encoding, ttl=ttl, headers=headers,
-                metadata=metadata, return_none=return_none)
+                metadata=metadata, return_none=return_none,
+                compress=False)
 
     def test_clt_create_object(self):
         clt = self.client
@@ -2890,7 +3340,8 @@ class ObjectStorageTest(unittest.TestCase):
                 content_type=content_type, etag=etag,
                 content_encoding=content_encoding,
                 content_length=content_length, ttl=ttl, chunk_size=chunk_size,
-                metadata=metadata, headers=headers, return_none=return_none)
+                metadata=metadata, headers=headers, return_none=return_none,
+                compress=False)
 
     def test_clt_fetch_object(self):
         clt = self.client
@@ -3092,7 +3543,8 @@ class ObjectStorageTest(unittest.TestCase):
         clt._sync_folder_to_container.assert_called_once_with(folder_path, cont,
                 prefix="", delete=delete, include_hidden=include_hidden,
                 ignore=ignore, ignore_timestamps=ignore_timestamps,
-                object_prefix=object_prefix, verbose=verbose)
+                object_prefix=object_prefix, verbose=verbose,
+                compress=False)
 
     @patch("logging.Logger.info")
     def test_clt_sync_folder_to_container_failures(self, mock_log):
@@ -3125,7 +3577,8 @@ class ObjectStorageTest(unittest.TestCase):
         clt._sync_folder_to_container.assert_called_once_with(folder_path, cont,
                 prefix="", delete=delete, include_hidden=include_hidden,
                 ignore=ignore, ignore_timestamps=ignore_timestamps,
-                object_prefix=object_prefix, verbose=verbose)
+                object_prefix=object_prefix, verbose=verbose,
+                compress=False)
 
     @patch("logging.Logger.info")
     @patch("os.listdir")
@@ -3158,6 +3611,34 @@ class ObjectStorageTest(unittest.TestCase):
                     verbose)
         self.assertEqual(cont.upload_file.call_count, 3)
 
+    @patch("logging.Logger.info")
+    @patch("os.listdir")
+    def test_clt_under_sync_folder_to_container_compress(self, mock_listdir,
+            mock_log):
+        clt = self.client
+        cont = self.container
+        cont.upload_file = Mock()
+        clt._local_files = []
+        clt._delete_objects_not_in_list = Mock()
+        with utils.SelfDeletingTempDirectory() as folder_path:
+            fnames = ["same.txt", "changed.txt", "pic.png"]
+            for fname in fnames:
+                pth = os.path.join(folder_path, fname)
+                open(pth, "w").write("faketext %s" % (fname == "same.txt"))
+            same_etag = get_gzip_checksum(os.path.join(folder_path,
+                    "same.txt"))
+            clt._remote_files = dict((nm, StorageObject(cont.object_manager,
+                    {"name": nm, "last_modified": "2000-01-01T00:00:00",
+                    "bytes": 42, "content_type": "text/plain",
+                    "hash": same_etag})) for nm in fnames)
+            mock_listdir.return_value = fnames
+            clt._sync_folder_to_container(folder_path, cont, "", False, False,
+                    None, True, "", False, compress=True)
+        self.assertEqual(cont.upload_file.call_count, 2)
+        compressed = dict((call[1]["obj_name"], call[1]["compress"])
+                for call in cont.upload_file.call_args_list)
+        self.assertEqual(compressed, {"changed.txt": True, "pic.png": False})
+
     @patch("logging.Logger.info")
     @patch("logging.Logger.error")
     @patch("os.listdir")
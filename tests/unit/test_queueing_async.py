@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+
+import json
+import unittest
+
+from mock import patch
+from mock import MagicMock as Mock
+
+# The async client requires Python 3.5+, but these tests must still import
+# cleanly on older versions so that they can be skipped.
+try:
+    import asyncio
+    import pyrax.queueing_async
+    from pyrax.queueing_async import AsyncQueueClient
+except (ImportError, SyntaxError):
+    asyncio = AsyncQueueClient = None
+
+from pyrax.queueing import Queue
+from pyrax.queueing import QueueClaim
+from pyrax.queueing import QueueMessage
+import pyrax.exceptions as exc
+
+from pyrax import fakes
+
+
+def _done(loop, val=None):
+    fut = loop.create_future()
+    fut.set_result(val)
+    return fut
+
+
+class FakeAsyncResponse(object):
+    def __init__(self, loop, status, body=None, headers=None):
+        self.loop = loop
+        self.status = status
+        self.headers = headers or {}
+        self._text = "" if body is None else json.dumps(body)
+
+    def __aenter__(self):
+        return _done(self.loop, self)
+
+    def __aexit__(self, *args):
+        return _done(self.loop)
+
+    def text(self):
+        return _done(self.loop, self._text)
+
+
+class FakeSession(object):
+    """
+    Records the requests made, and answers them with the queued responses.
+    """
+    def __init__(self, loop):
+        self.loop = loop
+        self.requests = []
+        self.responses = []
+        self.closed = False
+
+    def reply(self, status, body=None, headers=None):
+        self.responses.append(FakeAsyncResponse(self.loop, status, body,
+                headers))
+
+    def request(self, method, url, data=None, headers=None):
+        body = None if data is None else json.loads(data)
+        self.requests.append((method, url, body, headers))
+        return self.responses.pop(0)
+
+    def close(self):
+        self.closed = True
+        return _done(self.loop)
+
+
+
+@unittest.skipIf(AsyncQueueClient is None, "requires Python 3.5 or later")
+class AsyncQueueClientTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.session = FakeSession(self.loop)
+        self.client = fakes.FakeQueueClient()
+        self.client.management_url = "http://example.com/v1/123"
+        self.client.identity.token = "token"
+        self.client.identity.tenant_id = "123"
+        self.client.client_id = "client"
+        self.aclient = AsyncQueueClient(self.client, session=self.session)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_coro(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_request_headers(self):
+        sess = self.session
+        sess.reply(204)
+        self.run_coro(self.aclient.delete("fake"))
+        method, url, body, headers = sess.requests[0]
+        self.assertEqual(method, "DELETE")
+        self.assertEqual(url, "http://example.com/v1/123/queues/fake")
+        self.assertIsNone(body)
+        self.assertEqual(headers["X-Auth-Token"], "token")
+        self.assertEqual(headers["X-Auth-Project-Id"], "123")
+        self.assertEqual(headers["Client-ID"], "client")
+
+    def test_request_authenticates(self):
+        self.client.identity.token = None
+        self.client.identity.authenticate = Mock()
+        self.session.reply(204)
+        self.run_coro(self.aclient.delete("fake"))
+        self.client.identity.authenticate.assert_called_once_with()
+
+    def test_request_no_endpoint(self):
+        self.client.management_url = None
+        self.client.identity.authenticate = Mock()
+        self.assertRaises(exc.ServiceNotAvailable, self.run_coro,
+                self.aclient.delete("fake"))
+
+    def test_request_reauthenticates_on_401(self):
+        sess = self.session
+        self.client.identity.authenticate = Mock()
+        sess.reply(401)
+        sess.reply(204)
+        self.run_coro(self.aclient.delete("fake"))
+        self.client.identity.authenticate.assert_called_once_with()
+        self.assertEqual(len(sess.requests), 2)
+
+    def test_request_error(self):
+        self.session.reply(403, {"message": "denied"})
+        self.assertRaises(exc.Forbidden, self.run_coro,
+                self.aclient.delete("fake"))
+
+    def test_request_no_client_id(self):
+        self.session.reply(400,
+                {"message": 'The "Client-ID" header is required.'})
+        self.assertRaises(exc.QueueClientIDNotDefined, self.run_coro,
+                self.aclient.delete_by_ids("fake", ["a"]))
+
+    def test_get_session_no_aiohttp(self):
+        aclient = AsyncQueueClient(self.client)
+        with patch.object(pyrax.queueing_async, "aiohttp", None):
+            self.assertRaises(exc.AiohttpModuleNotInstalled,
+                    aclient._get_session)
+
+    def test_close(self):
+        aclient = AsyncQueueClient(self.client)
+        aclient._session = self.session
+        self.run_coro(aclient.close())
+        self.assertTrue(self.session.closed)
+        self.assertIsNone(aclient._session)
+
+    def test_close_shared_session(self):
+        self.run_coro(self.aclient.close())
+        self.assertFalse(self.session.closed)
+
+    def test_queue_exists(self):
+        sess = self.session
+        sess.reply(204)
+        sess.reply(404)
+        self.assertTrue(self.run_coro(self.aclient.queue_exists("fake")))
+        self.assertFalse(self.run_coro(self.aclient.queue_exists("fake")))
+        self.assertEqual(sess.requests[0][0], "HEAD")
+
+    def test_create(self):
+        sess = self.session
+        sess.reply(404)
+        sess.reply(201)
+        queue = self.run_coro(self.aclient.create("fake"))
+        self.assertTrue(isinstance(queue, Queue))
+        self.assertEqual(queue.name, "fake")
+        self.assertEqual(sess.requests[1][0], "PUT")
+
+    def test_create_exists(self):
+        self.session.reply(204)
+        self.assertRaises(exc.DuplicateQueue, self.run_coro,
+                self.aclient.create("fake"))
+
+    def test_create_invalid(self):
+        sess = self.session
+        sess.reply(404)
+        sess.reply(400, {"message": "bad name"})
+        self.assertRaises(exc.InvalidQueueName, self.run_coro,
+                self.aclient.create("fake"))
+
+    def test_list(self):
+        sess = self.session
+        sess.reply(200, {"queues": [{"name": "a"}, {"name": "b"}]})
+        queues = self.run_coro(self.aclient.list(limit=2, marker="x"))
+        self.assertEqual([q.name for q in queues], ["a", "b"])
+        url = sess.requests[0][1]
+        self.assertTrue("limit=2" in url)
+        self.assertTrue("marker=x" in url)
+
+    def test_get_stats(self):
+        self.session.reply(200, {"messages": {"free": 3}})
+        stats = self.run_coro(self.aclient.get_stats("fake"))
+        self.assertEqual(stats, {"free": 3})
+
+    def test_set_metadata(self):
+        sess = self.session
+        sess.reply(200, {"a": 1})
+        sess.reply(204)
+        self.run_coro(self.aclient.set_metadata("fake", {"b": 2}))
+        self.assertEqual(sess.requests[1][2], {"a": 1, "b": 2})
+
+    def test_set_metadata_clear(self):
+        sess = self.session
+        sess.reply(204)
+        self.run_coro(self.aclient.set_metadata("fake", {"b": 2},
+                clear=True))
+        self.assertEqual(len(sess.requests), 1)
+        self.assertEqual(sess.requests[0][2], {"b": 2})
+
+    def test_post_messages(self):
+        sess = self.session
+        sess.reply(201, {"partial": False, "resources": [
+                "/v1/queues/fake/messages/m1", "/v1/queues/fake/messages/m2"]})
+        msgs = self.run_coro(self.aclient.post_messages("fake",
+                [("one", 60), ("two", 120)]))
+        method, url, body, headers = sess.requests[0]
+        self.assertEqual(method, "POST")
+        self.assertTrue(url.endswith("/queues/fake/messages"))
+        self.assertEqual(body, [{"body": "one", "ttl": 60},
+                {"body": "two", "ttl": 120}])
+        self.assertTrue(all(isinstance(msg, QueueMessage) for msg in msgs))
+        self.assertEqual([msg.id for msg in msgs], ["m1", "m2"])
+        self.assertEqual(msgs[1].body, "two")
+
+    def test_post_message(self):
+        self.session.reply(201, {"partial": False,
+                "resources": ["/v1/queues/fake/messages/m1"]})
+        msg = self.run_coro(self.aclient.post_message("fake", "one", 60))
+        self.assertEqual(msg.id, "m1")
+
+    def test_claim_messages(self):
+        sess = self.session
+        href = "/v1/queues/fake/messages/m1?claim_id=c1"
+        sess.reply(201, [{"href": href, "ttl": 60, "age": 0, "body": "x"}],
+                {"Location": "/v1/queues/fake/claims/c1"})
+        claim = self.run_coro(self.aclient.claim_messages("fake", 60, 30,
+                count=5))
+        method, url, body, headers = sess.requests[0]
+        self.assertTrue(url.endswith("/queues/fake/claims?limit=5"))
+        self.assertEqual(body, {"ttl": 60, "grace": 30})
+        self.assertTrue(isinstance(claim, QueueClaim))
+        self.assertEqual(claim.id, "c1")
+        self.assertEqual(len(claim.messages), 1)
+
+    def test_claim_messages_empty(self):
+        self.session.reply(204)
+        claim = self.run_coro(self.aclient.claim_messages("fake", 60, 30))
+        self.assertIsNone(claim)
+
+    def test_update_claim(self):
+        sess = self.session
+        sess.reply(204)
+        self.run_coro(self.aclient.update_claim("fake", "c1", ttl=90))
+        method, url, body, headers = sess.requests[0]
+        self.assertEqual(method, "PATCH")
+        self.assertTrue(url.endswith("/queues/fake/claims/c1"))
+        self.assertEqual(body, {"ttl": 90})
+
+    def test_update_claim_no_params(self):
+        self.assertRaises(exc.MissingClaimParameters, self.run_coro,
+                self.aclient.update_claim("fake", "c1"))
+
+    def test_release_claim(self):
+        sess = self.session
+        sess.reply(204)
+        self.run_coro(self.aclient.release_claim("fake", "c1"))
+        self.assertEqual(sess.requests[0][0], "DELETE")
+        self.assertTrue(sess.requests[0][1].endswith("/queues/fake/claims/c1"))
+
+    def test_delete_message(self):
+        sess = self.session
+        sess.reply(204)
+        self.run_coro(self.aclient.delete_message("fake", "m1",
+                claim_id="c1"))
+        self.assertTrue(sess.requests[0][1].endswith(
+                "/queues/fake/messages/m1?claim_id=c1"))
+
+    def test_delete_by_ids(self):
+        sess = self.session
+        sess.reply(204)
+        self.run_coro(self.aclient.delete_by_ids("fake", ["m1", "m2"]))
+        self.assertTrue(sess.requests[0][1].endswith(
+                "/queues/fake/messages?ids=m1,m2"))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
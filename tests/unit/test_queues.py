@@ -2,8 +2,11 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 
+import base64
+import json
 import os
 import random
+import time
 import unittest
 
 from mock import patch
@@ -12,15 +15,30 @@ from mock import MagicMock as Mock
 import pyrax
 import pyrax.queueing
 from pyrax.queueing import BaseQueueManager
+from pyrax.queueing import CompactJSONCodec
+from pyrax.queueing import GzipCodec
+from pyrax.queueing import JSONCodec
+from pyrax.queueing import MsgpackCodec
 from pyrax.queueing import Queue
 from pyrax.queueing import QueueClaim
 from pyrax.queueing import QueueClaimManager
 from pyrax.queueing import QueueClient
+from pyrax.queueing import QueueCodec
+from pyrax.queueing import QueueConsumer
 from pyrax.queueing import QueueManager
 from pyrax.queueing import QueueMessage
 from pyrax.queueing import QueueMessageManager
+from pyrax.queueing import QueuePoller
+from pyrax.queueing import QueueProducer
+from pyrax.queueing import QueueStatsSampler
+from pyrax.queueing import ZlibCodec
 from pyrax.queueing import assure_queue
+from pyrax.queueing import _Backoff
 from pyrax.queueing import _parse_marker
+from pyrax.queueing import get_codec
+from pyrax.queueing import register_codec
+from pyrax.queueing import CODEC_KEY
+from pyrax.queueing import MSG_LIMIT
 
 import pyrax.exceptions as exc
 import pyrax.utils as utils
@@ -84,6 +102,12 @@ class QueuesTest(unittest.TestCase):
         ret = _parse_marker(body)
         self.assertIsNone(ret)
 
+    def test_backoff(self):
+        poll = _Backoff(1, 10, 3)
+        self.assertEqual([poll.idle() for ii in range(5)], [1, 3, 9, 10, 10])
+        poll.reset()
+        self.assertEqual(poll.idle(), 1)
+
     def test_assure_queue(self):
         @assure_queue
         def test(self, queue):
@@ -131,6 +155,15 @@ class QueuesTest(unittest.TestCase):
                 include_claimed=include_claimed, echo=echo, marker=marker,
                 limit=limit)
 
+    def test_queue_iter_messages(self):
+        q = self.queue
+        q._message_manager.iter_list = Mock()
+        marker = utils.random_unicode()
+        q.iter_messages(echo=True, marker=marker, limit=50)
+        q._message_manager.iter_list.assert_called_once_with(
+                include_claimed=False, echo=True, marker=marker, limit=50,
+                prefetch=True)
+
     def test_queue_list_by_ids(self):
         q = self.queue
         q._message_manager.list_by_ids = Mock()
@@ -161,6 +194,23 @@ class QueuesTest(unittest.TestCase):
         q.post_message(body, ttl)
         q._message_manager.create.assert_called_once_with(body, ttl)
 
+    def test_queue_post_messages(self):
+        q = self.queue
+        q._message_manager.create_many = Mock()
+        msgs = [(utils.random_unicode(), 60), (utils.random_unicode(), 90)]
+        q.post_messages(msgs)
+        q._message_manager.create_many.assert_called_once_with(msgs)
+
+    def test_queue_producer(self):
+        q = self.queue
+        prod = q.producer(300, batch_size=5, linger=1)
+        self.assertTrue(isinstance(prod, QueueProducer))
+        self.assertEqual(prod.queue, q)
+        self.assertEqual(prod.ttl, 300)
+        self.assertEqual(prod.batch_size, 5)
+        self.assertEqual(prod.linger, 1)
+        prod.close()
+
     def test_queue_claim_messages(self):
         q = self.queue
         q._claim_manager.claim = Mock()
@@ -170,6 +220,29 @@ class QueuesTest(unittest.TestCase):
         q.claim_messages(ttl, grace, count=count)
         q._claim_manager.claim.assert_called_once_with(ttl, grace, count=count)
 
+    def test_queue_wait_for_messages(self):
+        q = self.queue
+        claim = Mock(messages=[Mock()])
+        empty = Mock(messages=[])
+        q.claim_messages = Mock(side_effect=[None, empty, None, claim])
+        with patch("time.sleep") as mock_sleep:
+            ret = q.wait_for_messages(60, 90, count=5, min_interval=1,
+                    max_interval=3)
+        self.assertEqual(ret, claim)
+        q.claim_messages.assert_called_with(60, 90, count=5)
+        self.assertEqual([call[0][0] for call in mock_sleep.call_args_list],
+                [1, 2, 3])
+
+    def test_queue_wait_for_messages_timeout(self):
+        q = self.queue
+        q.claim_messages = Mock(return_value=None)
+        start = time.time()
+        ret = q.wait_for_messages(60, 60, timeout=0.05, min_interval=0.01,
+                max_interval=0.02)
+        self.assertIsNone(ret)
+        self.assertTrue(time.time() - start < 1)
+        self.assertTrue(q.claim_messages.call_count > 1)
+
     def test_queue_get_claim(self):
         q = self.queue
         q._claim_manager.get = Mock()
@@ -203,6 +276,20 @@ class QueuesTest(unittest.TestCase):
         q.id = val
         self.assertEqual(q.name, val)
 
+    def test_queue_consume(self):
+        q = self.queue
+        handler = Mock()
+        with patch.object(QueueConsumer, "start", autospec=True,
+                side_effect=lambda consumer: consumer) as mock_start:
+            ret = q.consume(handler, workers=3, ttl=120)
+        self.assertTrue(isinstance(ret, QueueConsumer))
+        self.assertEqual(mock_start.call_count, 1)
+        self.assertEqual(ret.queue, q)
+        self.assertEqual(ret.handler, handler)
+        self.assertEqual(ret.workers, 3)
+        self.assertEqual(ret.max_in_flight, 6)
+        self.assertEqual(ret.renew_margin, 40)
+
     def test_msg_add_details(self):
         id_ = _safe_id()
         claim_id = utils.random_unicode()
@@ -304,6 +391,81 @@ class QueuesTest(unittest.TestCase):
         self.assertEqual(dct["body"], msg)
         self.assertEqual(dct["ttl"], ttl)
 
+    def test_queue_msg_mgr_create_many(self):
+        q = self.queue
+        mgr = q._message_manager
+        msgs = [(utils.random_unicode(), 60), (utils.random_unicode(), 90)]
+        ids = [_safe_id(), _safe_id()]
+        rbody = {"partial": False, "resources": ["/v1/queues/%s/messages/%s" %
+                (q.id, msg_id) for msg_id in ids]}
+        mgr.api.method_post = Mock(return_value=(None, rbody))
+        ret = mgr.create_many(msgs)
+        exp_body = [{"body": msgs[0][0], "ttl": 60},
+                {"body": msgs[1][0], "ttl": 90}]
+        mgr.api.method_post.assert_called_once_with("/%s" % mgr.uri_base,
+                body=exp_body)
+        self.assertEqual(ret, ids)
+
+    def test_queue_msg_mgr_create_many_codec(self):
+        q = self.queue
+        q.codec = "zlib"
+        mgr = q._message_manager
+        msgs = [({"a": [1, 2]}, 60)]
+        rbody = {"partial": False, "resources": ["/v1/queues/x/messages/id"]}
+        mgr.api.method_post = Mock(return_value=(None, rbody))
+        ret = mgr.create_many(msgs)
+        self.assertEqual(ret, ["id"])
+        args, kwargs = mgr.api.method_post.call_args
+        self.assertFalse("body" in kwargs)
+        data = kwargs["data"]
+        self.assertFalse(", " in data)
+        posted = json.loads(data)
+        self.assertEqual(posted[0]["body"][CODEC_KEY], "zlib")
+        self.assertEqual(ZlibCodec().decode(posted[0]["body"]), {"a": [1, 2]})
+
+    def test_queue_msg_mgr_create_codec(self):
+        q = self.queue
+        q.codec = "json-compact"
+        mgr = q._message_manager
+        mgr.api.method_post = Mock(return_value=(None, {"resources": []}))
+        mgr.create({"a": 1}, 60)
+        mgr.api.method_post.assert_called_once_with("/%s" % mgr.uri_base,
+                data='[{"body":{"a":1},"ttl":60}]')
+
+    def test_queue_codec(self):
+        q = self.queue
+        self.assertTrue(isinstance(q.codec, JSONCodec))
+        q._message_manager.api.codec = "gzip"
+        self.assertTrue(isinstance(q.codec, GzipCodec))
+        codec = ZlibCodec(level=9)
+        q.codec = codec
+        self.assertEqual(q.codec, codec)
+        q.codec = None
+        self.assertTrue(isinstance(q.codec, GzipCodec))
+
+    def test_queue_codec_unknown(self):
+        q = self.queue
+        self.assertRaises(exc.UnknownQueueCodec, setattr, q, "codec",
+                "fake")
+
+    def test_queue_message_decodes(self):
+        mgr = self.queue._message_manager
+        body = {"text": utils.random_unicode()}
+        for codec in (JSONCodec(), CompactJSONCodec(), ZlibCodec(),
+                GzipCodec(), MsgpackCodec()):
+            info = {"href": "/v1/queues/x/messages/id",
+                    "body": codec.encode(body)}
+            msg = QueueMessage(manager=mgr, info=info)
+            self.assertEqual(msg.body, body)
+
+    def test_queue_claim_decodes(self):
+        mgr = self.queue._claim_manager
+        body = ["x" * 100]
+        msgs = [{"href": "/v1/queues/x/messages/%s?claim_id=c" % num,
+                "body": GzipCodec().encode(body)} for num in range(3)]
+        claim = mgr._claim_from_response(msgs, 60, 60)
+        self.assertEqual([msg.body for msg in claim.messages], [body] * 3)
+
     def test_queue_msg_mgr_list(self):
         q = self.queue
         mgr = q._message_manager
@@ -312,10 +474,13 @@ class QueuesTest(unittest.TestCase):
         marker = utils.random_unicode()
         limit = random.randint(15, 35)
         rbody = {"links": [], "messages": [{"href": "fake"}]}
-        pyrax.queueing._parse_marker = Mock(return_value="fake")
         mgr._list = Mock(return_value=(None, rbody))
-        msgs = mgr.list(include_claimed=include_claimed, echo=echo,
-                marker=marker, limit=limit)
+        with patch.object(pyrax.queueing, "_parse_marker",
+                return_value="fake"):
+            msgs = mgr.list(include_claimed=include_claimed, echo=echo,
+                    marker=marker, limit=limit)
+        self.assertEqual(len(msgs), limit)
+        self.assertEqual(mgr._list.call_count, limit)
 
     def test_queue_msg_mgr_no_limit_or_body(self):
         q = self.queue
@@ -323,10 +488,88 @@ class QueuesTest(unittest.TestCase):
         include_claimed = random.choice((True, False))
         echo = random.choice((True, False))
         marker = utils.random_unicode()
-        pyrax.queueing._parse_marker = Mock(return_value="fake")
         mgr._list = Mock(return_value=(None, None))
-        msgs = mgr.list(include_claimed=include_claimed, echo=echo,
-                marker=marker)
+        with patch.object(pyrax.queueing, "_parse_marker",
+                return_value="fake"):
+            msgs = mgr.list(include_claimed=include_claimed, echo=echo,
+                    marker=marker)
+        self.assertEqual(msgs, [])
+
+    def test_queue_msg_mgr_list_page(self):
+        q = self.queue
+        mgr = q._message_manager
+        marker = utils.random_unicode()
+        rbody = {"links": [{"rel": "next",
+                "href": "/v1/queues/foo/messages?marker=42"}],
+                "messages": [{"href": "/v1/queues/foo/messages/abc"}]}
+        mgr._list = Mock(return_value=(None, rbody))
+        msgs, next_marker = mgr._list_page(True, False, marker, 5)
+        exp_uri = ("/%s?include_claimed=true&echo=false&marker=%s&limit=5" %
+                (mgr.uri_base, marker))
+        mgr._list.assert_called_once_with(exp_uri, return_raw=True)
+        self.assertEqual([msg.id for msg in msgs], ["abc"])
+        self.assertEqual(next_marker, "42")
+
+    def test_queue_msg_mgr_list_corrupt_body(self):
+        q = self.queue
+        mgr = q._message_manager
+        corrupt = {CODEC_KEY: "zlib", "data": "not-valid"}
+        rbody = {"links": [], "messages": [
+                {"href": "/v1/queues/foo/messages/abc",
+                    "body": ZlibCodec().encode("good")},
+                {"href": "/v1/queues/foo/messages/def", "body": corrupt}]}
+        mgr._list = Mock(return_value=(None, rbody))
+        msgs = mgr.list()
+        self.assertEqual([msg.id for msg in msgs], ["abc", "def"])
+        self.assertEqual(msgs[0].body, "good")
+        self.assertIsNone(msgs[0].decode_error)
+        self.assertEqual(msgs[1].body, corrupt)
+        self.assertIsNotNone(msgs[1].decode_error)
+
+    def _fake_pages(self, mgr, num_pages, per_page=MSG_LIMIT):
+        pages = []
+        for num in range(num_pages):
+            msgs = [QueueMessage(mgr, {"href": "/messages/%s-%s" % (num, ii)})
+                    for ii in range(per_page)]
+            marker = "%s" % (num + 1) if num + 1 < num_pages else None
+            pages.append((msgs, marker))
+
+        def list_page(include_claimed, echo, marker, limit):
+            msgs, next_marker = pages[int(marker or 0)]
+            return msgs[:limit], next_marker
+
+        mgr._list_page = Mock(side_effect=list_page)
+        return [msg.id for msgs, marker in pages for msg in msgs]
+
+    def test_queue_msg_mgr_iter_list(self):
+        q = self.queue
+        mgr = q._message_manager
+        for prefetch in (True, False):
+            ids = self._fake_pages(mgr, 3)
+            ret = mgr.iter_list(prefetch=prefetch)
+            self.assertFalse(isinstance(ret, list))
+            self.assertEqual([msg.id for msg in ret], ids)
+            self.assertEqual(mgr._list_page.call_count, 3)
+            mgr._list_page.assert_called_with(False, False, "2", MSG_LIMIT)
+
+    def test_queue_msg_mgr_iter_list_limit(self):
+        q = self.queue
+        mgr = q._message_manager
+        ids = self._fake_pages(mgr, 5)
+        ret = list(mgr.iter_list(limit=25))
+        self.assertEqual([msg.id for msg in ret], ids[:25])
+        self.assertEqual(mgr._list_page.call_count, 3)
+        mgr._list_page.assert_called_with(False, False, "2", 5)
+
+    def test_queue_msg_mgr_list_many_pages(self):
+        q = self.queue
+        mgr = q._message_manager
+        # Enough pages to have exceeded the recursion limit when listing was
+        # done recursively.
+        ids = self._fake_pages(mgr, 2000, per_page=1)
+        ret = mgr.list()
+        self.assertEqual(len(ret), 2000)
+        self.assertEqual(ret[-1].id, ids[-1])
 
     def test_queue_msg_mgr_delete_claim(self):
         q = self.queue
@@ -371,33 +614,60 @@ class QueuesTest(unittest.TestCase):
     def test_queue_claim_mgr_claim(self):
         q = self.queue
         mgr = q._claim_manager
+        mgr.uri_base = "queues/%s/claims" % _safe_id()
         ttl = utils.random_unicode()
         grace = utils.random_unicode()
         count = utils.random_unicode()
-        claim_id = utils.random_unicode()
-        rbody = [{"href": "http://example.com/foo?claim_id=%s" % claim_id}]
+        claim_id = _safe_id()
+        msg_ids = [_safe_id() for ii in range(3)]
+        rbody = [{"href": "http://example.com/foo/%s?claim_id=%s" %
+                (msg_id, claim_id), "body": msg_id, "ttl": 300, "age": 1}
+                for msg_id in msg_ids]
         mgr.api.method_post = Mock(return_value=(fakes.FakeResponse(), rbody))
         mgr.get = Mock()
         exp_uri = "/%s?limit=%s" % (mgr.uri_base, count)
         exp_body = {"ttl": ttl, "grace": grace}
-        mgr.claim(ttl, grace, count=count)
+        ret = mgr.claim(ttl, grace, count=count)
         mgr.api.method_post.assert_called_once_with(exp_uri, body=exp_body)
-        mgr.get.assert_called_once_with(claim_id)
+        self.assertFalse(mgr.get.called)
+        self.assertTrue(isinstance(ret, QueueClaim))
+        self.assertEqual(ret.id, claim_id)
+        self.assertEqual(ret.ttl, ttl)
+        self.assertEqual(ret.grace, grace)
+        self.assertEqual([msg.id for msg in ret.messages], msg_ids)
+        self.assertEqual([msg.body for msg in ret.messages], msg_ids)
+        for msg in ret.messages:
+            self.assertTrue(isinstance(msg, QueueMessage))
+            self.assertEqual(msg.claim_id, claim_id)
+
+    def test_queue_claim_mgr_claim_location(self):
+        q = self.queue
+        mgr = q._claim_manager
+        claim_id = _safe_id()
+        rbody = [{"href": "http://example.com/foo?claim_id=%s" % claim_id}]
+        resp = fakes.FakeResponse()
+        resp.headers = {"Location": "/v1/queues/foo/claims/%s" % claim_id}
+        mgr.api.method_post = Mock(return_value=(resp, rbody))
+        ret = mgr.claim(60, 60)
+        self.assertEqual(ret.href, resp.headers["Location"])
+        self.assertEqual(ret.id, claim_id)
 
     def test_queue_claim_mgr_claim_no_count(self):
         q = self.queue
         mgr = q._claim_manager
+        mgr.uri_base = "queues/%s/claims" % _safe_id()
         ttl = utils.random_unicode()
         grace = utils.random_unicode()
-        claim_id = utils.random_unicode()
+        claim_id = _safe_id()
         rbody = [{"href": "http://example.com/foo?claim_id=%s" % claim_id}]
         mgr.api.method_post = Mock(return_value=(fakes.FakeResponse(), rbody))
         mgr.get = Mock()
         exp_uri = "/%s" % mgr.uri_base
         exp_body = {"ttl": ttl, "grace": grace}
-        mgr.claim(ttl, grace)
+        ret = mgr.claim(ttl, grace)
         mgr.api.method_post.assert_called_once_with(exp_uri, body=exp_body)
-        mgr.get.assert_called_once_with(claim_id)
+        self.assertFalse(mgr.get.called)
+        self.assertEqual(ret.id, claim_id)
 
     def test_queue_claim_mgr_claim_empty(self):
         q = self.queue
@@ -694,6 +964,14 @@ class QueuesTest(unittest.TestCase):
         q.list.assert_called_once_with(include_claimed=include_claimed,
                 echo=echo, marker=marker, limit=limit)
 
+    def test_clt_iter_messages(self):
+        clt = self.client
+        q = self.queue
+        q.iter_messages = Mock()
+        clt.iter_messages(q, include_claimed=True, prefetch=False)
+        q.iter_messages.assert_called_once_with(include_claimed=True,
+                echo=False, marker=None, limit=None, prefetch=False)
+
     def test_clt_list_messages_by_ids(self):
         clt = self.client
         q = self.queue
@@ -727,6 +1005,23 @@ class QueuesTest(unittest.TestCase):
         clt.post_message(q, body, ttl)
         q.post_message.assert_called_once_with(body, ttl)
 
+    def test_clt_post_messages(self):
+        clt = self.client
+        q = self.queue
+        msgs = [(utils.random_unicode(), 60)]
+        q.post_messages = Mock()
+        clt.post_messages(q, msgs)
+        q.post_messages.assert_called_once_with(msgs)
+
+    def test_clt_producer(self):
+        clt = self.client
+        q = self.queue
+        q.producer = Mock()
+        clt.producer(q, 60, batch_size=3)
+        q.producer.assert_called_once_with(60, batch_size=3,
+                max_bytes=pyrax.queueing.MAX_POST_BYTES, linger=0.05,
+                max_workers=None)
+
     def test_clt_claim_messages(self):
         clt = self.client
         q = self.queue
@@ -737,6 +1032,44 @@ class QueuesTest(unittest.TestCase):
         clt.claim_messages(q, ttl, grace, count=count)
         q.claim_messages.assert_called_once_with(ttl, grace, count=count)
 
+    def test_clt_wait_for_messages(self):
+        clt = self.client
+        q = self.queue
+        q.wait_for_messages = Mock()
+        clt.wait_for_messages(q, 60, 90, timeout=10, max_interval=5)
+        q.wait_for_messages.assert_called_once_with(60, 90, count=None,
+                timeout=10, min_interval=1, max_interval=5, backoff=2)
+
+    def test_clt_poll_queues(self):
+        clt = self.client
+        q = self.queue
+        name = utils.random_ascii()
+        handler = Mock()
+        with patch.object(QueuePoller, "start", autospec=True,
+                side_effect=lambda poller: poller):
+            ret = clt.poll_queues([q, name], handler, max_interval=5)
+        self.assertTrue(isinstance(ret, QueuePoller))
+        self.assertEqual(ret.handler, handler)
+        self.assertEqual(ret.max_interval, 5)
+        self.assertEqual(sorted(ret._queues), sorted([q.id, name]))
+        self.assertTrue(isinstance(ret._queues[name]["queue"], Queue))
+
+    def test_clt_sample_stats(self):
+        clt = self.client
+        q = self.queue
+        name = utils.random_ascii()
+        on_sample = Mock()
+        with patch.object(QueueStatsSampler, "start", autospec=True,
+                side_effect=lambda sampler: sampler):
+            ret = clt.sample_stats([q, name], interval=5, history=3,
+                    on_sample=on_sample)
+        self.assertTrue(isinstance(ret, QueueStatsSampler))
+        self.assertEqual(ret.interval, 5)
+        self.assertEqual(ret.on_sample, on_sample)
+        self.assertEqual(sorted(ret._queues), sorted([q.id, name]))
+        self.assertTrue(isinstance(ret._queues[name], Queue))
+        self.assertEqual(ret._samples[name].maxlen, 3)
+
     def test_clt_get_claim(self):
         clt = self.client
         q = self.queue
@@ -763,6 +1096,459 @@ class QueuesTest(unittest.TestCase):
         clt.release_claim(q, claim)
         q.release_claim.assert_called_once_with(claim)
 
+    def test_clt_consume(self):
+        clt = self.client
+        q = self.queue
+        handler = Mock()
+        q.consume = Mock()
+        clt.consume(q, handler, workers=4, ttl=90)
+        q.consume.assert_called_once_with(handler, workers=4, claim_loops=1,
+                ttl=90, grace=60, count=None, max_in_flight=None,
+                ack_batch_size=10, ack_interval=1, renew_margin=None,
+                idle_sleep=1, max_idle_sleep=30)
+
+
+class QueuePollerTest(unittest.TestCase):
+    def _wait_for(self, test):
+        end = time.time() + 5
+        while time.time() < end and not test():
+            time.sleep(0.01)
+
+    def test_poller(self):
+        busy = fakes.FakeQueue()
+        idle = fakes.FakeQueue()
+        claim = Mock(messages=[Mock()])
+        claims = [claim]
+        busy.claim_messages = Mock(side_effect=lambda ttl, grace, count:
+                claims.pop() if claims else None)
+        idle.claim_messages = Mock(return_value=None)
+        handled = []
+        poller = QueuePoller(lambda queue, clm: handled.append((queue, clm)),
+                queues=[busy, idle], ttl=120, min_interval=0.01,
+                max_interval=0.04)
+        poller.start()
+        self._wait_for(lambda: idle.claim_messages.call_count >= 5)
+        poller.stop()
+        self.assertEqual(handled, [(busy, claim)])
+        busy.claim_messages.assert_called_with(120, 60, count=None)
+        stats = poller.get_stats()
+        self.assertEqual(stats["claims"], 1)
+        self.assertEqual(stats["errors"], 0)
+        self.assertEqual(stats["polls"], stats["claims"] + stats["empty_polls"])
+        self.assertEqual(stats["intervals"][idle.id], 0.04)
+
+    def test_poller_remove_queue(self):
+        queue = fakes.FakeQueue()
+        queue.claim_messages = Mock(return_value=None)
+        poller = QueuePoller(Mock(), queues=[queue], min_interval=0.01,
+                max_interval=0.01)
+        poller.start()
+        self._wait_for(lambda: queue.claim_messages.call_count >= 2)
+        poller.remove_queue(queue.id)
+        time.sleep(0.05)
+        count = queue.claim_messages.call_count
+        time.sleep(0.05)
+        poller.stop()
+        self.assertEqual(queue.claim_messages.call_count, count)
+        self.assertEqual(poller.get_stats()["intervals"], {})
+
+    def test_poller_errors(self):
+        queue = fakes.FakeQueue()
+        claim = Mock(messages=[Mock()])
+        queue.claim_messages = Mock(side_effect=[exc.ServiceResponseFailure(),
+                claim, None, None, None])
+        handler = Mock(side_effect=ValueError)
+        poller = QueuePoller(handler, queues=[queue], min_interval=0.01,
+                max_interval=0.01)
+        poller.start()
+        self._wait_for(lambda: queue.claim_messages.call_count >= 3)
+        poller.stop()
+        handler.assert_called_once_with(queue, claim)
+        self.assertEqual(poller.get_stats()["errors"], 2)
+
+
+class QueueCodecTest(unittest.TestCase):
+    def test_round_trip(self):
+        body = {"name": utils.random_unicode(), "items": list(range(50)),
+                "nested": {"flag": True, "none": None}}
+        for codec in (JSONCodec(), CompactJSONCodec(), ZlibCodec(),
+                ZlibCodec(level=1), GzipCodec(), MsgpackCodec()):
+            encoded = codec.encode(body)
+            # The encoded form must survive a trip through JSON.
+            encoded = json.loads(json.dumps(encoded))
+            self.assertEqual(codec.decode(encoded), body)
+
+    def test_compression(self):
+        body = {"text": "abc" * 1000}
+        for codec in (ZlibCodec(), GzipCodec()):
+            encoded = codec.encode(body)
+            self.assertEqual(encoded[CODEC_KEY], codec.name)
+            self.assertTrue(len(encoded["data"]) < len(json.dumps(body)))
+
+    def test_gzip_format(self):
+        encoded = GzipCodec().encode("test")
+        raw = base64.b64decode(encoded["data"])
+        self.assertEqual(raw[:2], b"\x1f\x8b")
+
+    def test_encode_idempotent(self):
+        codec = ZlibCodec()
+        encoded = codec.encode("test")
+        self.assertEqual(codec.encode(encoded), encoded)
+        self.assertEqual(GzipCodec().encode(encoded), encoded)
+
+    def test_msgpack_not_installed(self):
+        codec = MsgpackCodec()
+        with patch.object(pyrax.queueing, "msgpack", None):
+            self.assertRaises(exc.MsgpackModuleNotInstalled, codec.encode,
+                    "test")
+
+    def test_get_codec(self):
+        self.assertTrue(isinstance(get_codec("zlib"), ZlibCodec))
+        codec = ZlibCodec()
+        self.assertEqual(get_codec(codec), codec)
+        self.assertRaises(exc.UnknownQueueCodec, get_codec, "fake")
+
+    def test_register_codec(self):
+        class ReverseCodec(QueueCodec):
+            name = "reverse-%s" % _safe_id()
+
+            def _dumps(self, body):
+                return body[::-1]
+
+            def _loads(self, data):
+                return data[::-1]
+
+        codec = ReverseCodec()
+        register_codec(codec)
+        self.assertEqual(get_codec(codec.name), codec)
+        encoded = codec.encode("abc")
+        self.assertEqual(encoded["data"], "cba")
+        mgr = fakes.FakeQueue()._message_manager
+        msg = QueueMessage(manager=mgr, info={"body": encoded})
+        self.assertEqual(msg.body, "abc")
+
+
+class QueueStatsSamplerTest(unittest.TestCase):
+    def _queue(self, stats):
+        queue = fakes.FakeQueue()
+        queue.get_stats = Mock(side_effect=stats)
+        return queue
+
+    def test_sample(self):
+        growing = self._queue([
+                {"free": 5, "claimed": 0, "total": 5, "oldest": {"age": 10}},
+                {"free": 15, "claimed": 5, "total": 20,
+                    "oldest": {"age": 40}}])
+        draining = self._queue([
+                {"free": 10, "claimed": 2, "total": 12, "oldest": {"age": 3}},
+                {"free": 0, "claimed": 2, "total": 2, "oldest": {"age": 1}}])
+        sampler = QueueStatsSampler(queues=[growing, draining])
+        with patch.object(time, "time", side_effect=[100, 100, 110, 110]):
+            sampler.sample()
+            metrics = sampler.sample()
+        grow = metrics["queues"][growing.id]
+        self.assertEqual(grow["sampled_at"], 110)
+        self.assertEqual(grow["total"], 20)
+        self.assertEqual(grow["claimed"], 5)
+        self.assertEqual(grow["oldest_age"], 40)
+        self.assertEqual(grow["growth_rate"], 1.5)
+        self.assertIsNone(grow["drain_time"])
+        drain = metrics["queues"][draining.id]
+        self.assertEqual(drain["growth_rate"], -1.0)
+        self.assertEqual(drain["drain_time"], 2.0)
+        fleet = metrics["fleet"]
+        self.assertEqual(fleet["total"], 22)
+        self.assertEqual(fleet["free"], 15)
+        self.assertEqual(fleet["growth_rate"], 0.5)
+        self.assertEqual(fleet["oldest_age"], 40)
+        self.assertEqual(fleet["oldest_queue"], growing.id)
+        self.assertEqual(sampler.get_history(growing.id),
+                [(100, 5, 0, 5, 10), (110, 15, 5, 20, 40)])
+
+    def test_sample_first(self):
+        queue = self._queue([{"free": 0, "claimed": 0, "total": 0}])
+        sampler = QueueStatsSampler(queues=[queue])
+        metrics = sampler.sample()
+        self.assertIsNone(metrics["queues"][queue.id]["growth_rate"])
+        self.assertEqual(metrics["queues"][queue.id]["oldest_age"], 0)
+        self.assertIsNone(metrics["fleet"]["oldest_queue"])
+
+    def test_history_limit(self):
+        queue = self._queue([{"total": num} for num in range(5)])
+        sampler = QueueStatsSampler(queues=[queue], history=3)
+        for num in range(5):
+            sampler.sample()
+        history = sampler.get_history(queue)
+        self.assertEqual([sample[3] for sample in history], [2, 3, 4])
+
+    def test_sample_errors(self):
+        good = self._queue([{"total": 1}])
+        bad = self._queue([exc.ServiceResponseFailure()])
+        on_sample = Mock(side_effect=ValueError)
+        sampler = QueueStatsSampler(queues=[good, bad], on_sample=on_sample)
+        metrics = sampler.sample()
+        on_sample.assert_called_once_with(metrics)
+        self.assertEqual(list(metrics["queues"]), [good.id])
+        self.assertEqual(sampler.errors, 1)
+        self.assertEqual(sampler.rounds, 1)
+
+    def test_remove_queue(self):
+        queue = self._queue([{"total": 1}])
+        sampler = QueueStatsSampler(queues=[queue])
+        sampler.sample()
+        sampler.remove_queue(queue.id)
+        self.assertEqual(sampler.get_metrics()["queues"], {})
+        self.assertEqual(sampler.get_history(queue), [])
+
+    def test_start_stop(self):
+        queue = fakes.FakeQueue()
+        queue.get_stats = Mock(return_value={"total": 1})
+        samples = []
+        sampler = QueueStatsSampler(queues=[queue], interval=0.01,
+                on_sample=samples.append)
+        sampler.start()
+        end = time.time() + 5
+        while time.time() < end and len(samples) < 3:
+            time.sleep(0.01)
+        sampler.stop()
+        count = queue.get_stats.call_count
+        self.assertTrue(count >= 3)
+        time.sleep(0.03)
+        self.assertEqual(queue.get_stats.call_count, count)
+
+
+class QueueProducerTest(unittest.TestCase):
+    def setUp(self):
+        self.queue = fakes.FakeQueue()
+        self.posted = []
+
+        def post_messages(msgs):
+            self.posted.append(list(msgs))
+            return ["id-%s" % body for body, ttl in msgs]
+
+        self.queue.post_messages = Mock(side_effect=post_messages)
+
+    def test_producer_batch_size(self):
+        with QueueProducer(self.queue, 60, batch_size=3, linger=1000) as prod:
+            futs = [prod.post(num) for num in range(7)]
+            # Two full batches should be sent without waiting.
+            ids = [fut.result(timeout=5) for fut in futs[:6]]
+            self.assertEqual(ids, ["id-%s" % num for num in range(6)])
+            self.assertFalse(futs[6].done())
+        self.assertEqual(futs[6].result(timeout=5), "id-6")
+        self.assertEqual([len(batch) for batch in self.posted], [3, 3, 1])
+        self.assertEqual(self.posted[0], [(0, 60), (1, 60), (2, 60)])
+
+    def test_producer_ttl(self):
+        with QueueProducer(self.queue, 60) as prod:
+            prod.post("a", ttl=120)
+            prod.post("b")
+        self.assertEqual(self.posted, [[("a", 120), ("b", 60)]])
+
+    def test_producer_max_bytes(self):
+        body = "x" * 100
+        with QueueProducer(self.queue, 60, batch_size=10, max_bytes=250,
+                linger=1000) as prod:
+            futs = [prod.post(body) for num in range(5)]
+        self.assertEqual([len(batch) for batch in self.posted], [2, 2, 1])
+        self.assertTrue(all(fut.result(timeout=5) for fut in futs))
+
+    def test_producer_codec(self):
+        self.queue.codec = "zlib"
+        with QueueProducer(self.queue, 60) as prod:
+            prod.post("a")
+        body, ttl = self.posted[0][0]
+        self.assertEqual(body[CODEC_KEY], "zlib")
+        self.assertEqual(ZlibCodec().decode(body), "a")
+
+    def test_producer_linger(self):
+        prod = QueueProducer(self.queue, 60, batch_size=10, linger=0.01)
+        fut = prod.post("a")
+        self.assertEqual(fut.result(timeout=5), "id-a")
+        self.assertEqual(self.posted, [[("a", 60)]])
+        prod.close()
+
+    def test_producer_flush(self):
+        prod = QueueProducer(self.queue, 60, linger=1000)
+        fut = prod.post("a")
+        prod.flush()
+        self.assertEqual(fut.result(timeout=5), "id-a")
+        prod.close()
+
+    def test_producer_cancelled(self):
+        prod = QueueProducer(self.queue, 60, batch_size=10, linger=0.01)
+        # Hold the lock so that the batch isn't sent before the cancel.
+        with prod._cond:
+            fut1 = prod.post("a")
+            fut2 = prod.post("b")
+            fut3 = prod.post("c")
+            self.assertTrue(fut2.cancel())
+        self.assertEqual(fut1.result(timeout=5), "id-a")
+        self.assertEqual(fut3.result(timeout=5), "id-c")
+        self.assertEqual(self.posted, [[("a", 60), ("c", 60)]])
+        # The linger thread keeps flushing later messages.
+        self.assertTrue(prod._lingerer.is_alive())
+        fut4 = prod.post("d")
+        self.assertEqual(fut4.result(timeout=5), "id-d")
+        prod.close()
+
+    def test_producer_error(self):
+        err = exc.BadRequest(400)
+        self.queue.post_messages = Mock(side_effect=err)
+        with QueueProducer(self.queue, 60) as prod:
+            fut = prod.post("a")
+        self.assertEqual(fut.exception(timeout=5), err)
+
+    def test_producer_partial(self):
+        self.queue.post_messages = Mock(return_value=["first"])
+        with QueueProducer(self.queue, 60) as prod:
+            fut1 = prod.post("a")
+            fut2 = prod.post("b")
+        self.assertEqual(fut1.result(timeout=5), "first")
+        self.assertTrue(isinstance(fut2.exception(timeout=5),
+                exc.QueueMessagePostFailed))
+
+    def test_producer_closed(self):
+        prod = QueueProducer(self.queue, 60)
+        prod.close()
+        self.assertRaises(exc.QueueProducerClosed, prod.post, "a")
+        # Closing again is harmless.
+        prod.close()
+
+
+class QueueConsumerTest(unittest.TestCase):
+    def setUp(self):
+        self.queue = fakes.FakeQueue()
+        self.queue.delete_by_ids = Mock()
+        self.queue.release_claim = Mock()
+        self.queue.update_claim = Mock()
+
+    def _fake_claims(self, *claims):
+        pending = list(claims)
+
+        def claim_messages(ttl, grace, count=None):
+            return pending.pop(0) if pending else None
+
+        self.queue.claim_messages = Mock(side_effect=claim_messages)
+
+    def _fake_claim(self, num):
+        claim = Mock(id=utils.random_ascii())
+        claim.messages = [Mock(id=utils.random_ascii()) for ii in range(num)]
+        return claim
+
+    def _run(self, consumer, expected):
+        consumer.start()
+        end = time.time() + 5
+        while time.time() < end:
+            stats = consumer.get_stats()
+            if stats["processed"] + stats["failed"] >= expected:
+                break
+            time.sleep(0.01)
+        consumer.stop()
+        return consumer.get_stats()
+
+    def test_consumer_process(self):
+        claim1 = self._fake_claim(10)
+        claim2 = self._fake_claim(5)
+        self._fake_claims(claim1, claim2)
+        handled = []
+        consumer = QueueConsumer(self.queue, lambda msg: handled.append(msg),
+                workers=4, claim_loops=2, idle_sleep=0.01)
+        stats = self._run(consumer, 15)
+        self.assertEqual(len(handled), 15)
+        self.assertEqual(stats["claimed"], 15)
+        self.assertEqual(stats["processed"], 15)
+        self.assertEqual(stats["acked"], 15)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["claims"], 0)
+        self.assertTrue(stats["messages_per_second"] > 0)
+        deleted = []
+        for call in self.queue.delete_by_ids.call_args_list:
+            self.assertTrue(len(call[0][0]) <= consumer.ack_batch_size)
+            deleted.extend(call[0][0])
+        expected = [msg.id for msg in claim1.messages + claim2.messages]
+        self.assertEqual(sorted(deleted), sorted(expected))
+        self.assertFalse(self.queue.release_claim.called)
+
+    def test_consumer_failure_releases_claim(self):
+        claim = self._fake_claim(3)
+        bad = claim.messages[1]
+        self._fake_claims(claim)
+
+        def handler(msg):
+            if msg is bad:
+                raise ValueError("fake")
+
+        consumer = QueueConsumer(self.queue, handler, idle_sleep=0.01)
+        stats = self._run(consumer, 3)
+        self.assertEqual(stats["processed"], 2)
+        self.assertEqual(stats["failed"], 1)
+        self.assertEqual(stats["acked"], 2)
+        self.assertEqual(stats["released"], 1)
+        self.queue.release_claim.assert_called_once_with(claim)
+        deleted = [msg_id for call in self.queue.delete_by_ids.call_args_list
+                for msg_id in call[0][0]]
+        self.assertFalse(bad.id in deleted)
+
+    def test_consumer_renew_claim(self):
+        consumer = QueueConsumer(self.queue, Mock(), ttl=60)
+        claim = self._fake_claim(1)
+        consumer._claims[claim.id] = {"claim": claim,
+                "expires": time.time() + 10, "pending": 1, "failed": 0}
+        consumer._maintain()
+        self.queue.update_claim.assert_called_once_with(claim, ttl=60)
+        self.assertEqual(consumer.renewed, 1)
+        self.assertTrue(consumer._claims[claim.id]["expires"] >
+                time.time() + 50)
+
+    def test_consumer_no_renew(self):
+        consumer = QueueConsumer(self.queue, Mock(), ttl=60)
+        claim = self._fake_claim(1)
+        consumer._claims[claim.id] = {"claim": claim,
+                "expires": time.time() + 50, "pending": 1, "failed": 0}
+        consumer._maintain()
+        self.assertFalse(self.queue.update_claim.called)
+
+    def test_consumer_ack_batches(self):
+        consumer = QueueConsumer(self.queue, Mock(), ack_batch_size=10,
+                ack_interval=1000)
+        ids = [utils.random_ascii() for ii in range(25)]
+        consumer._acks = ids[:5]
+        consumer._maintain()
+        self.assertFalse(self.queue.delete_by_ids.called)
+        consumer._acks = list(ids)
+        consumer._maintain()
+        self.queue.delete_by_ids.assert_any_call(ids[:10])
+        self.queue.delete_by_ids.assert_any_call(ids[10:20])
+        self.queue.delete_by_ids.assert_any_call(ids[20:])
+        self.assertEqual(self.queue.delete_by_ids.call_count, 3)
+        self.assertEqual(consumer._acks, [])
+        self.assertEqual(consumer.acked, 25)
+
+    def test_consumer_restart_after_stop_no_wait(self):
+        claim1 = self._fake_claim(3)
+        claim2 = self._fake_claim(2)
+        self._fake_claims(claim1)
+        handled = []
+        consumer = QueueConsumer(self.queue, lambda msg: handled.append(msg),
+                idle_sleep=0.01)
+        consumer.start()
+        end = time.time() + 5
+        while time.time() < end and consumer.get_stats()["processed"] < 3:
+            time.sleep(0.01)
+        old_threads = list(consumer._threads)
+        consumer.stop(wait=False)
+        self.assertEqual(consumer._threads, [])
+        for thread in old_threads:
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+        self._fake_claims(claim2)
+        stats = self._run(consumer, 5)
+        self.assertEqual(len(handled), 5)
+        self.assertEqual(stats["processed"], 5)
+        self.assertEqual(stats["acked"], 5)
+
+
 
 if __name__ == "__main__":
     unittest.main()
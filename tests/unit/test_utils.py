@@ -4,6 +4,7 @@ from __future__ import absolute_import, unicode_literals
 
 import datetime
 import hashlib
+import mmap
 import os
 import random
 import sys
@@ -114,6 +115,50 @@ class UtilsTest(unittest.TestCase):
                 received = utils.get_checksum(testfile)
         self.assertEqual(expected, received)
 
+    def test_get_checksum_from_memoryview(self):
+        test = os.urandom(1024)
+        md = hashlib.md5()
+        md.update(test)
+        expected = md.hexdigest()
+        received = utils.get_checksum(memoryview(test))
+        self.assertEqual(expected, received)
+
+    def test_get_checksum_from_mmap(self):
+        test = os.urandom(1024)
+        md = hashlib.md5()
+        md.update(test)
+        expected = md.hexdigest()
+        with utils.SelfDeletingTempfile() as tmp:
+            with open(tmp, "wb") as testfile:
+                testfile.write(test)
+            with open(tmp, "rb") as testfile:
+                mapped = mmap.mmap(testfile.fileno(), 0,
+                        access=mmap.ACCESS_READ)
+                received = utils.get_checksum(mapped)
+                mapped.close()
+        self.assertEqual(expected, received)
+
+    def test_run_concurrently(self):
+        items = list(range(20))
+        ret = utils.run_concurrently(lambda x: x * 2, items, max_workers=4)
+        self.assertEqual([r[0] for r in ret], items)
+        self.assertEqual([r[1] for r in ret], [x * 2 for x in items])
+        self.assertTrue(all(r[2] is None for r in ret))
+
+    def test_run_concurrently_exception(self):
+        def fnc(x):
+            if x == 1:
+                raise exc.NotFound("")
+            return x
+
+        ret = utils.run_concurrently(fnc, [0, 1, 2])
+        self.assertEqual(ret[1][1], None)
+        self.assertTrue(isinstance(ret[1][2], exc.NotFound))
+        self.assertEqual(ret[2], (2, 2, None))
+
+    def test_run_concurrently_empty(self):
+        self.assertEqual(utils.run_concurrently(Mock(), []), [])
+
     def test_random_unicode(self):
         testlen = random.randint(50, 500)
         nm = utils.random_unicode(testlen)